@@ -1,14 +1,20 @@
 """Provides a command line implementation of the Cribbage Engine.
 
 Runs the primary Cribbage Engine and outputs to the command line the
-state of the game as it progress.
+state of the game as it progress.  A human can also play against a bot,
+with hints and the bot's replies worked out while the human thinks.
+
+  python3 cribbageai/cribbageaicli.py --opponent mcts --hint-budget 20
 
 """
 
+import argparse
 import logging
 
 import cribbageengine
+import cribbagemcts
 import cribbageplayers
+import cribbagewinprob
 
 def setup():
     """Performs initial environment setup.
@@ -19,14 +25,24 @@ def setup():
       format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("Cribbage Cli Started")
 
-def main():
+def main(argv=None):
     """Initializes the engine and starts the menu system."""
+    parser = argparse.ArgumentParser(description="Plays cribbage on the command line.")
+    parser.add_argument("--opponent", default="optimized",
+      help="the bot from cribbageserver.BOT_PLAYERS a human plays against")
+    parser.add_argument("--hint-budget", type=float,
+      help="seconds after each prompt that speculative work may still start")
+    args = parser.parse_args(argv)
 
-    main_menu()
+    main_menu(args.opponent, args.hint_budget)
 
-def main_menu():
+def main_menu(opponent="optimized", hint_budget=None):
     """Displays the main menu.
 
+    Args:
+        opponent: the bot a human plays against
+        hint_budget: the seconds speculative work may start after a prompt,
+          None for cribbagehints.DEFAULT_BUDGET
     """
     menu_selection = -1
     cribbage_engine = cribbageengine.CribbageEngine()
@@ -37,6 +53,9 @@ def main_menu():
         print("  1. Play Random Game")
         print("  2. Play 1000 Games - Randon v. Random")
         print("  3. Play 100 Games - Randon v. Best")
+        print("  4. Play 100 Games - Best v. MCTS")
+        print(f"  5. Play Against the AI ({opponent})")
+        print("  6. Play Three Player Game - Best v. Best v. Random")
         print("")
         print('  > ', end='')
         menu_selection = input()
@@ -81,6 +100,64 @@ def main_menu():
 
             print(f"Results is Player 1 {player_one_victory} to Player 2 {player_two_victory}")
 
+        elif menu_selection == "4":
+            player_one_victory = 0
+            player_two_victory = 0
+            for i in range(0, 100):
+                cribbage_game = cribbage_engine.new_game(
+                  cribbageplayers.OptimizedPlayer(), cribbagemcts.MctsPlayer())
+
+                player_one_score, player_two_score = run_game(
+                  cribbage_game, False)
+
+                if player_one_score > player_two_score:
+                    player_one_victory += 1
+                else:
+                    player_two_victory += 1
+
+            print(f"Results is Player 1 {player_one_victory} to Player 2 {player_two_victory}")
+
+        elif menu_selection == "5":
+            play_human_game(cribbage_engine, opponent, hint_budget)
+
+        elif menu_selection == "6":
+            cribbage_game = cribbage_engine.new_multiplayer_game([
+              cribbageplayers.OptimizedPlayer(), cribbageplayers.OptimizedPlayer(),
+              cribbageplayers.RandomPlayer()])
+
+            print(f"Final scores are {run_multiplayer_game(cribbage_game, True)}")
+
+
+def play_human_game(cribbage_engine, opponent, hint_budget=None, human_seat=1,
+  input_function=input):
+    """Runs a game of a human against a bot, speculating while the human thinks.
+
+    Args:
+        cribbage_engine: the cribbageengine.CribbageEngine to play on
+        opponent: the key of the bot in cribbageserver.BOT_PLAYERS
+        hint_budget: the seconds speculative work may start after a prompt,
+          None for cribbagehints.DEFAULT_BUDGET
+        human_seat: the human's player number
+        input_function: reads the human's replies
+
+    Returns:
+        (int, int) the scores of player one and player two
+    """
+    # The hints value moves with modules that play games through this one
+    import cribbagehints  # pylint: disable=import-outside-toplevel
+
+    if hint_budget is None:
+        hint_budget = cribbagehints.DEFAULT_BUDGET
+    jobs = cribbagehints.SpeculativeJobs(hint_budget)
+    bot = cribbagehints.SpeculativeBot(opponent, jobs)
+    human = cribbagehints.HumanPlayer(jobs, bot, input_function)
+    players = (human, bot) if human_seat == 1 else (bot, human)
+    cribbage_game = cribbage_engine.new_game(*players)
+    human.attach(cribbage_game, human_seat)
+    try:
+        return run_game(cribbage_game, True)
+    finally:
+        jobs.close()
 
 def run_game(cribbage_game, is_print_on):
     """Runs a new game.
@@ -93,7 +170,9 @@ def run_game(cribbage_game, is_print_on):
         print("# Fresh Game")
 
     game_round = 1
-    while cribbage_game.player_one_score < 121 and cribbage_game.player_two_score < 121:
+    winning_score = cribbage_game.rules.winning_score
+    while cribbage_game.player_one_score < winning_score \
+      and cribbage_game.player_two_score < winning_score:
         cribbage_game.deal_cards()
         if is_print_on:
             print(f"## Dealing Cards - Dealer is Player #{cribbage_game.crib_turn}")
@@ -148,11 +227,49 @@ def run_game(cribbage_game, is_print_on):
             print(f"## End of Round {game_round}")
             print(f"  Player #1 Score: {cribbage_game.player_one_score}")
             print(f"  Player #2 Score: {cribbage_game.player_two_score}")
+        if is_print_on and cribbage_game.rules is cribbageengine.STANDARD_RULES:
+            # Player #1 deals next round when player #2 dealt this one
+            player_one_win_probability = cribbagewinprob.win_probability(
+              cribbagewinprob.load_win_table(), cribbage_game.player_one_score,
+              cribbage_game.player_two_score, cribbage_game.crib_turn == 2)
+            print(f"  Player #1 Win Probability: {player_one_win_probability:.0%}")
 
         game_round += 1
 
     return cribbage_game.player_one_score, cribbage_game.player_two_score
 
+def run_multiplayer_game(cribbage_game, is_print_on):
+    """Runs a game of a variant with more players, like three player cribbage.
+
+    Args:
+        cribbage_game: reference the cribbageengine.MultiPlayerCribbageGame to use.
+
+    Returns:
+        (tuple) the score of each seat
+    """
+    while not cribbage_game.is_won():
+        cribbage_game.deal_cards()
+        cribbage_game.discard_to_crib()
+        cribbage_game.cut_start_card()
+        if is_print_on:
+            print(f"## Seat #{cribbage_game.dealer} deals, cut " \
+              f"{cribbageengine.cards_as_string([cribbage_game.start_card])}")
+
+        while cribbage_game.is_more_run_cards():
+            run_result = cribbage_game.play_next_run_card()
+            if run_result.is_go and is_print_on:
+                print(f"  Seat #{run_result.run_turn} calls a go")
+            elif is_print_on:
+                print(f"  Seat #{run_result.run_turn} plays " \
+                  f"{cribbageengine.cards_as_string([run_result.card_played])} " \
+                  f"total {run_result.run_total} for {run_result.points_earned}")
+
+        hand_scores = cribbage_game.score_hands()
+        if is_print_on:
+            print(f"## Hands score {hand_scores}, scores are {cribbage_game.scores}")
+
+    return tuple(cribbage_game.scores)
+
 def print_all_cards(cribbage_game):
     """Prints to the screen the state of the game.
 
@@ -0,0 +1,323 @@
+"""Answers large batches of hand analysis queries with a shared cache.
+
+Three kinds of query are answered, with cards as cribbagecompact indices:
+
+  {"type": "score", "hand": [4 cards], "cut": card}      -> {"score": points}
+  {"type": "discard", "hand": [6 cards], "is_dealer": b} -> {"discard": [card, card]}
+  {"type": "peg", "hand": [cards], "run": [cards]}       -> {"card": card or None}
+
+Relabelling the suits of a query never changes its answer, so each query is
+reduced to a canonical key: the smallest relabelling of its cards, or just
+the ranks for pegging where suits never score.  Queries in a batch that
+share a key are answered once, and answers are kept in a bounded LRU cache
+that can be saved to and loaded from disk.
+
+  analyzer = HandAnalyzer(max_entries=1000000, path="analysis_cache.json")
+  analyzer.analyze_batch(queries)
+  analyzer.save()
+
+The game server answers the same queries on POST /analyze.
+
+"""
+
+import argparse
+from collections import OrderedDict
+from itertools import permutations
+import json
+import logging
+import os
+import sys
+import time
+
+import cribbagecompact
+import cribbageplayers
+
+SCORE_QUERY = "score"
+DISCARD_QUERY = "discard"
+PEG_QUERY = "peg"
+
+DEFAULT_MAX_ENTRIES = 1 << 20
+
+# Every relabelling of the four suits, as a card index lookup for each.
+SUIT_PERMUTATIONS = tuple(tuple((card & ~3) | permutation[card & 3]
+  for card in range(cribbagecompact.DECK_SIZE)) for permutation in permutations(range(4)))
+
+
+def get_canonical_cards(cards):
+    """Gets the smallest sorted relabelling of the suits of some cards.
+
+    Args:
+        cards: a sequence of card indices
+
+    Returns:
+        (tuple) the canonical sorted cards
+        (tuple) the relabelling used, mapping each original card index to
+          its canonical index
+    """
+    best_cards = None
+    best_permutation = None
+    for permutation in SUIT_PERMUTATIONS:
+        relabelled = tuple(sorted(permutation[card] for card in cards))
+        if best_cards is None or relabelled < best_cards:
+            best_cards = relabelled
+            best_permutation = permutation
+    return best_cards, best_permutation
+
+def _get_card_indices(cards):
+    """Reads card indices, checking each is in the deck and none repeats.
+
+    Raises:
+        ValueError: if a card is outside the deck or given twice
+    """
+    indices = [int(card) for card in cards]
+    if any(not 0 <= card < cribbagecompact.DECK_SIZE for card in indices):
+        raise ValueError(f"Cards must be from 0 to {cribbagecompact.DECK_SIZE - 1}")
+    if len(set(indices)) != len(indices):
+        raise ValueError("A card cannot be used twice in a query")
+    return indices
+
+def get_query_key(query):
+    """Reduces a query to its canonical cache key.
+
+    Args:
+        query: a query dict, see the module docstring
+
+    Returns:
+        (tuple) the key, starting with the query type
+        (tuple) the suit relabelling used, or None when suits are dropped
+
+    Raises:
+        ValueError: if the query is malformed
+    """
+    try:
+        query_type = query["type"]
+        hand = _get_card_indices(query["hand"])
+        if query_type == SCORE_QUERY:
+            if len(hand) != 4:
+                raise ValueError("A score query needs a 4 card hand")
+            # The cut is kept last so it stays apart from the hand
+            cut = _get_card_indices(hand + [query["cut"]])[-1]
+            best_key = None
+            for permutation in SUIT_PERMUTATIONS:
+                key = tuple(sorted(permutation[card] for card in hand)) + (permutation[cut],)
+                if best_key is None or key < best_key:
+                    best_key = key
+            return (SCORE_QUERY,) + best_key, None
+
+        if query_type == DISCARD_QUERY:
+            if len(hand) != 6:
+                raise ValueError("A discard query needs a 6 card hand")
+            canonical_hand, permutation = get_canonical_cards(hand)
+            return (DISCARD_QUERY, int(bool(query.get("is_dealer", False)))) \
+              + canonical_hand, permutation
+
+        if query_type == PEG_QUERY:
+            if not 1 <= len(hand) <= 4:
+                raise ValueError("A peg query needs 1 to 4 cards")
+            # Pegging only sees ranks, so the run may repeat a card index
+            run_ranks = tuple(_get_card_indices([card])[0] >> 2
+              for card in query.get("run", ()))
+            return (PEG_QUERY, len(hand)) + tuple(sorted(card >> 2 for card in hand)) \
+              + run_ranks, None
+    except (KeyError, TypeError) as error:
+        raise ValueError(f"Malformed query: {error}") from error
+
+    raise ValueError(f"Unknown query type {query_type}")
+
+def compute_answer(key, discard_player_factory=cribbageplayers.OptimizedPlayer):
+    """Computes the answer to a canonical key with the engine's scorers and players.
+
+    Args:
+        key: a key from get_query_key
+        discard_player_factory: makes the player that chooses discards
+
+    Returns:
+        the points for a score key, the canonical discards for a discard
+          key, or the rank to play (None for a go) for a peg key
+    """
+    if key[0] == SCORE_QUERY:
+        return cribbagecompact.score_hand(key[1:5], key[5])
+
+    if key[0] == DISCARD_QUERY:
+        player = discard_player_factory()
+        player.start_round(bool(key[1]), 0, 0)
+        hand = {cribbagecompact.index_to_card(card) for card in key[2:]}
+        return tuple(sorted(cribbagecompact.cards_to_indices(player.discard_to_crib(hand))))
+
+    hand_size = key[1]
+    hand = {cribbagecompact.index_to_card(rank << 2 | slot)
+      for slot, rank in enumerate(key[2:2 + hand_size])}
+    run = [cribbagecompact.index_to_card(rank << 2) for rank in key[2 + hand_size:]]
+    run_total = sum(card.value for card in run)
+    if all(run_total + card.value > cribbagecompact.HIGHEST_RUN_ALLOWED for card in hand):
+        return None
+    return cribbageplayers.OptimizedPlayer().get_run_card(hand, run, run_total).face.value - 1
+
+def compute_answers(keys):
+    """Computes the answers to a list of keys, for running on a worker process."""
+    return [compute_answer(key) for key in keys]
+
+def format_answer(query, key, permutation, answer):
+    """Converts a canonical answer back to the cards of the query.
+
+    Returns:
+        (dict) the result for the query
+    """
+    if key[0] == SCORE_QUERY:
+        return {"score": answer}
+    if key[0] == DISCARD_QUERY:
+        inverse = {canonical: card for card, canonical in enumerate(permutation)}
+        return {"discard": sorted(inverse[card] for card in answer)}
+    if answer is None:
+        return {"card": None}
+    return {"card": next(int(card) for card in query["hand"] if int(card) >> 2 == answer)}
+
+
+class AnalysisCache:
+    """A bounded least recently used cache of answers by canonical key.
+
+    Attributes:
+        max_entries: the most answers kept
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Gets an answer, marking it recently used.
+
+        Raises:
+            KeyError: if the key is not cached
+        """
+        answer = self._entries[key]
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(self, key, answer):
+        """Caches an answer, evicting the least recently used past max_entries."""
+        self._entries[key] = answer
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self, path):
+        """Saves the answers as JSON, least recently used first."""
+        with open(path, "w", encoding="utf-8") as cache_file:
+            json.dump([[list(key), answer] for key, answer in self._entries.items()], cache_file)
+
+    def load(self, path):
+        """Adds the answers saved at path, keeping the most recent past max_entries."""
+        with open(path, encoding="utf-8") as cache_file:
+            for key, answer in json.load(cache_file):
+                self.put(tuple(key), tuple(answer) if isinstance(answer, list) else answer)
+
+
+class HandAnalyzer:
+    """Answers batches of queries through an AnalysisCache.
+
+    Attributes:
+        cache: the AnalysisCache of answers
+        path: the file the cache is saved to, or None to keep it in memory
+        query_count: the number of queries answered
+        computed_count: the number of distinct keys computed
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.cache = AnalysisCache(max_entries)
+        self.path = path
+        self.query_count = 0
+        self.computed_count = 0
+        if path is not None and os.path.exists(path):
+            self.cache.load(path)
+
+    def prepare_batch(self, queries):
+        """Reduces queries to keys and finds the ones missing from the cache.
+
+        Returns:
+            (list) a (key, permutation) tuple for each query
+            (list) the distinct keys that need computing
+        """
+        keyed_queries = [get_query_key(query) for query in queries]
+        missing_keys = list(dict.fromkeys(key for key, _ in keyed_queries
+          if key not in self.cache))
+        return keyed_queries, missing_keys
+
+    def finish_batch(self, queries, keyed_queries, missing_keys, missing_answers):
+        """Caches computed answers and formats the result of every query.
+
+        Returns:
+            (list) the result dict for each query
+        """
+        computed = dict(zip(missing_keys, missing_answers))
+        for key, answer in computed.items():
+            self.cache.put(key, answer)
+
+        results = []
+        for query, (key, permutation) in zip(queries, keyed_queries):
+            if key in computed:
+                answer = computed[key]
+            else:
+                # Another batch may have evicted the key since it was prepared
+                if key not in self.cache:
+                    self.cache.put(key, compute_answer(key))
+                    self.computed_count += 1
+                answer = self.cache.get(key)
+            results.append(format_answer(query, key, permutation, answer))
+
+        self.query_count += len(queries)
+        self.computed_count += len(computed)
+        return results
+
+    def analyze_batch(self, queries):
+        """Answers a batch of queries, computing each distinct missing key once.
+
+        Args:
+            queries: a list of query dicts, see the module docstring
+
+        Returns:
+            (list) the result dict for each query
+
+        Raises:
+            ValueError: if a query is malformed
+        """
+        keyed_queries, missing_keys = self.prepare_batch(queries)
+        return self.finish_batch(queries, keyed_queries, missing_keys,
+          compute_answers(missing_keys))
+
+    def save(self):
+        """Saves the cache to the analyzer's path, if it has one."""
+        if self.path is not None:
+            self.cache.save(self.path)
+
+
+def main(argv=None):
+    """Answers a file of JSON line queries from the command line."""
+    parser = argparse.ArgumentParser(description="Answers hand analysis queries.")
+    parser.add_argument("queries", help="a file with one JSON query per line")
+    parser.add_argument("--cache", default=None, help="a file to load and save the cache")
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    with open(args.queries, encoding="utf-8") as queries_file:
+        queries = [json.loads(line) for line in queries_file if line.strip()]
+
+    analyzer = HandAnalyzer(args.max_entries, args.cache)
+    started = time.perf_counter()
+    results = analyzer.analyze_batch(queries)
+    seconds = time.perf_counter() - started
+    analyzer.save()
+
+    for result in results:
+        print(json.dumps(result))
+    print(f"Answered {len(queries)} queries in {seconds:.2f}s, {len(analyzer.cache)} cached",
+      file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,465 @@
+"""Runs players as separate bot processes that speak JSON lines over pipes.
+
+A bot process hosts any number of players, so one process is reused across
+many games.  The engine side uses RemotePlayer, which looks like any other
+player to CribbageGame.  Notifications such as start_round are pipelined
+without waiting for a reply.  Decisions wait until a deadline, after which
+a fallback player moves instead and the late reply is dropped.  A bot that
+crashes or answers with an illegal move also gets the fallback move, so it
+can never stall or break the process running the games.
+
+Each line is one JSON message, with cards as cribbagecompact indices:
+
+  {"id": 1, "op": "new", "rules": name}                  -> {"id": 1, "result": player}
+  {"op": "rules", "p": player, "args": [name]}
+  {"op": "start", "p": player, "args": [is_dealer, player_score, opponent_score]}
+  {"op": "observe", "p": player, "args": [is_player, card or null]}
+  {"op": "cut", "p": player, "args": [card]}
+  {"id": 2, "op": "discard", "p": player, "hand": [...]}  -> {"id": 2, "result": [card, card]}
+  {"id": 3, "op": "run", "p": player, "hand": [...], "run": [...], "total": t}
+                                                         -> {"id": 3, "result": card}
+  {"op": "drop", "p": player}
+
+Rules are named by their cribbageengine.RULES_VARIANTS key, and a player is
+handed them with use_rules when it is made, or again by a "rules" message
+if its game plays different rules.  A failed request is answered with {"id": n, "error": message}.  Bots are
+named from cribbageserver.BOT_PLAYERS, given as module:Class, or loaded from
+a .json player config written by cribbagetuning.
+
+  python3 cribbageai/cribbagearena.py bot --player optimized
+  python3 cribbageai/cribbagearena.py run --players mcts optimized --games 200
+
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import importlib
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import cribbageaicli
+import cribbagecompact
+import cribbageengine
+import cribbageplayers
+import cribbageserver
+import cribbagesharedtables
+import cribbagetuning
+
+DEFAULT_DEADLINE_MS = 1000
+
+# Making a player may wait on the bot process starting and building its
+# lookup tables, so it is given longer than the decision deadline.
+NEW_PLAYER_TIMEOUT = 10
+ARENA_FILE = os.path.abspath(__file__)
+
+
+def load_player_factory(player_spec):
+    """Gets the player class named by a BOT_PLAYERS key, module:Class or player config."""
+    if player_spec in cribbageserver.BOT_PLAYERS:
+        return cribbageserver.BOT_PLAYERS[player_spec]
+    if player_spec.endswith(".json"):
+        return cribbagetuning.load_player_config(player_spec)
+    module_name, _, class_name = player_spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+def serve_bot(player_factory, input_stream, output_stream, delay_ms=0):
+    """Answers engine messages until the input closes.
+
+    Args:
+        player_factory: makes a player for each "new" message
+        input_stream: the text stream messages are read from
+        output_stream: the text stream replies are written to
+        delay_ms: milliseconds to wait before each decision, to test deadlines
+    """
+    # Tables are built before the first player is made, so that building
+    # them never runs into a decision's deadline.
+    for table_name in cribbagesharedtables.get_table_names():
+        cribbagesharedtables.get_table(table_name)
+    players = {}
+    player_ids = itertools.count(1)
+    for line in input_stream:
+        message = json.loads(line)
+        request_id = message.get("id")
+        try:
+            operation = message["op"]
+            if operation == "new":
+                player_id = next(player_ids)
+                players[player_id] = player_factory()
+                _share_rules(players[player_id], message.get("rules"))
+                result = player_id
+            elif operation == "rules":
+                _share_rules(players[message["p"]], message["args"][0])
+                continue
+            elif operation == "drop":
+                players.pop(message["p"], None)
+                continue
+            elif operation == "start":
+                players[message["p"]].start_round(*message["args"])
+                continue
+            elif operation == "observe":
+                is_player, card = message["args"]
+                players[message["p"]].observe_run_play(is_player,
+                  None if card is None else cribbagecompact.index_to_card(card))
+                continue
+            elif operation == "cut":
+                players[message["p"]].observe_start_card(
+                  cribbagecompact.index_to_card(message["args"][0]))
+                continue
+            else:
+                if delay_ms:
+                    time.sleep(delay_ms / 1000)
+                hand = {cribbagecompact.index_to_card(card) for card in message["hand"]}
+                if operation == "discard":
+                    result = cribbagecompact.cards_to_indices(
+                      players[message["p"]].discard_to_crib(hand))
+                else:
+                    run = [cribbagecompact.index_to_card(card) for card in message["run"]]
+                    result = cribbagecompact.card_to_index(
+                      players[message["p"]].get_run_card(hand, run, message["total"]))
+            reply = {"id": request_id, "result": result}
+        except Exception as error:  # pylint: disable=broad-except
+            if request_id is None:
+                continue
+            reply = {"id": request_id, "error": repr(error)}
+
+        output_stream.write(json.dumps(reply) + "\n")
+        output_stream.flush()
+
+def _share_rules(player, rules_name):
+    """Hands the rules named by a message to a player that takes them."""
+    if rules_name is not None:
+        _call_hook(player, "use_rules", cribbageengine.RULES_VARIANTS[rules_name])
+
+def _call_hook(player, hook_name, *args):
+    """Calls one of a player's optional hooks, if it has it."""
+    hook = getattr(player, hook_name, None)
+    if hook is not None:
+        hook(*args)
+
+
+class BotProcess:
+    """A bot subprocess shared by any number of RemotePlayers and threads.
+
+    Requests are written as soon as they are made and replies are matched
+    back by id on a reader thread, so many games can have requests in
+    flight on the same process.
+
+    Attributes:
+        command: the command line that started the bot
+        is_alive: False once the bot's output has closed
+    """
+    def __init__(self, command):
+        self.command = command
+        self.is_alive = True
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE,  # pylint: disable=consider-using-with
+          stdout=subprocess.PIPE, text=True, bufsize=1)
+        self._request_ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def for_player(cls, player_spec, delay_ms=0):
+        """Starts this module's bot mode for a player spec."""
+        return cls([sys.executable, ARENA_FILE, "bot", "--player", player_spec,
+          "--delay-ms", str(delay_ms)])
+
+    def notify(self, message):
+        """Sends a message that has no reply."""
+        self._write(message)
+
+    def request(self, message, timeout):
+        """Sends a message and waits for its reply.
+
+        Args:
+            message: the message, without an id
+            timeout: the seconds to wait, or None to wait forever
+
+        Returns:
+            the result of the reply
+
+        Raises:
+            TimeoutError: if there is no reply in time
+            RuntimeError: if the bot answers with an error or has exited
+        """
+        reply_ready = threading.Event()
+        reply = {}
+        with self._lock:
+            if not self.is_alive:
+                raise RuntimeError("The bot process has exited")
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (reply_ready, reply)
+        self._write(dict(message, id=request_id))
+
+        if not reply_ready.wait(timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise TimeoutError(f"No reply to {message['op']} within {timeout}s")
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    def close(self):
+        """Closes the bot's input and waits for it to exit."""
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._reader.join()
+
+    def _write(self, message):
+        line = json.dumps(message) + "\n"
+        with self._lock:
+            if not self.is_alive:
+                return
+            try:
+                self._process.stdin.write(line)
+                self._process.stdin.flush()
+            except OSError:
+                self.is_alive = False
+
+    def _read_replies(self):
+        for line in self._process.stdout:
+            try:
+                reply = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                # Replies past their deadline no longer have a waiter
+                waiter = self._pending.pop(reply.get("id"), None)
+            if waiter is not None:
+                waiter[1].update(reply)
+                waiter[0].set()
+
+        with self._lock:
+            self.is_alive = False
+            waiters = list(self._pending.values())
+            self._pending.clear()
+        for reply_ready, reply in waiters:
+            reply["error"] = "The bot process has exited"
+            reply_ready.set()
+
+
+class RemotePlayer(cribbageplayers.RandomPlayer):
+    """Plays for CribbageGame by asking a player hosted in a BotProcess.
+
+    Attributes:
+        bot_process: the BotProcess hosting the player
+        deadline_ms: the milliseconds each decision may take
+        fallback_player: the player that moves when the bot does not
+        fallback_count: the number of moves made by the fallback player
+        rules: the RulesConfig the bot's moves are checked against
+    """
+    def __init__(self, bot_process, deadline_ms=DEFAULT_DEADLINE_MS, fallback_player=None,
+      rules=cribbageengine.STANDARD_RULES):
+        self.bot_process = bot_process
+        self.deadline_ms = deadline_ms
+        self.fallback_player = fallback_player or cribbageplayers.OptimizedPlayer()
+        self.fallback_count = 0
+        self.rules = rules
+        self._player_id = None
+        try:
+            self._player_id = bot_process.request({"op": "new", "rules": rules.name},
+              max(deadline_ms / 1000, NEW_PLAYER_TIMEOUT))
+        except (TimeoutError, RuntimeError) as error:
+            logging.warning("Bot %s could not make a player: %s", bot_process.command, error)
+        _call_hook(self.fallback_player, "use_rules", rules)
+
+    def use_rules(self, rules):
+        """Tells the bot and the fallback player the rules of the game.
+
+        The rules given when the player was made were already sent with it,
+        so the bot only hears again if the game plays other rules.
+
+        Args:
+            rules: the game's RulesConfig
+        """
+        if rules is not self.rules:
+            self._notify("rules", [rules.name])
+        self.rules = rules
+        _call_hook(self.fallback_player, "use_rules", rules)
+
+    def use_game_context(self, rng, logger):
+        """Hands the game's rng and logger to this player and the fallback player."""
+        super().use_game_context(rng, logger)
+        _call_hook(self.fallback_player, "use_game_context", rng, logger)
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Tells the bot and the fallback player the round is starting."""
+        self.fallback_player.start_round(is_dealer, player_score, opponent_score)
+        self._notify("start", [is_dealer, player_score, opponent_score])
+
+    def observe_run_play(self, is_player, run_card):
+        """Tells the bot and the fallback player about the turn."""
+        self.fallback_player.observe_run_play(is_player, run_card)
+        self._notify("observe", [is_player,
+          None if run_card is None else cribbagecompact.card_to_index(run_card)])
+
+    def observe_start_card(self, start_card):
+        """Tells the bot and the fallback player the start card."""
+        self.fallback_player.observe_start_card(start_card)
+        self._notify("cut", [cribbagecompact.card_to_index(start_card)])
+
+    def discard_to_crib(self, player_hand):
+        """Asks the bot for its discards, falling back if it does not answer legally.
+
+        Args:
+            player_hand: A set of PlayingCard representing the hand
+
+        Returns:
+           (tuple) the rules' discard_count PlayingCards
+        """
+        result = self._request({"op": "discard",
+          "hand": cribbagecompact.cards_to_indices(player_hand)})
+        try:
+            discards = tuple(cribbagecompact.index_to_card(card) for card in result)
+            if len(set(discards)) == len(discards) == self.rules.discard_count \
+              and set(discards) <= player_hand:
+                return discards
+        except (TypeError, ValueError):
+            pass
+
+        self.fallback_count += 1
+        return self.fallback_player.discard_to_crib(set(player_hand))
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Asks the bot for its run card, falling back if it does not answer legally.
+
+        Args:
+            player_run_hand: The set of PlayingCards the player has in
+              their hand available to play.
+            run: the existing list of PlayingCards in the run
+            run_total: the total value in the run
+        """
+        result = self._request({"op": "run",
+          "hand": cribbagecompact.cards_to_indices(player_run_hand),
+          "run": cribbagecompact.cards_to_indices(run), "total": run_total})
+        try:
+            run_card = cribbagecompact.index_to_card(result)
+            if run_card in player_run_hand \
+              and run_total + run_card.value <= cribbageengine.HIGHEST_RUN_ALLOWED:
+                return run_card
+        except (TypeError, ValueError):
+            pass
+
+        self.fallback_count += 1
+        return self.fallback_player.get_run_card(player_run_hand, run, run_total)
+
+    def close(self):
+        """Frees the player in the bot process."""
+        self._notify("drop", None)
+
+    def _notify(self, operation, args):
+        if self._player_id is not None:
+            self.bot_process.notify({"op": operation, "p": self._player_id, "args": args})
+
+    def _request(self, message):
+        if self._player_id is None:
+            return None
+        try:
+            return self.bot_process.request(dict(message, p=self._player_id),
+              self.deadline_ms / 1000)
+        except (TimeoutError, RuntimeError) as error:
+            logging.info("Bot %s fell back: %s", self.bot_process.command, error)
+            return None
+
+
+def run_arena(player_specs, games, processes_per_bot=1, threads=None,
+  deadline_ms=DEFAULT_DEADLINE_MS, seed=1, delay_ms=0, rules=cribbageengine.STANDARD_RULES):
+    """Plays two bots against each other with every game on its own thread.
+
+    Game threads share each bot's processes round robin, so a heavy bot
+    thinks on several cores while the games themselves stay cheap.
+
+    Args:
+        player_specs: the two bot names or module:Class specs
+        games: the number of games, seats alternating each game
+        processes_per_bot: the bot processes started for each bot
+        threads: the games played at once, two per bot process by default
+        deadline_ms: the milliseconds each decision may take
+        seed: the seed of the first game's rng, each later game adding one
+        delay_ms: extra milliseconds each bot waits per decision
+        rules: the two player RulesConfig of every game
+
+    Returns:
+        (dict) wins and fallbacks for each bot as lists, and seconds
+    """
+    bot_processes = [[BotProcess.for_player(player_spec, delay_ms)
+      for _ in range(processes_per_bot)] for player_spec in player_specs]
+    threads = threads or 2 * processes_per_bot
+    results = {"wins": [0, 0], "fallbacks": [0, 0]}
+    results_lock = threading.Lock()
+    cribbage_engine = cribbageengine.CribbageEngine()
+
+    def play_game(game):
+        bots = [RemotePlayer(bot_processes[bot][game % processes_per_bot], deadline_ms,
+          rules=rules) for bot in (0, 1)]
+        seats = bots if game % 2 == 0 else bots[::-1]
+        scores = cribbageaicli.run_game(cribbage_engine.new_game(*seats,
+          rng=random.Random(seed + game), rules=rules), False)
+        winning_seat = 0 if scores[0] > scores[1] else 1
+        with results_lock:
+            results["wins"][bots.index(seats[winning_seat])] += 1
+            for bot in (0, 1):
+                results["fallbacks"][bot] += bots[bot].fallback_count
+        for bot in bots:
+            bot.close()
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(play_game, range(games)))
+    finally:
+        for bot_process in itertools.chain(*bot_processes):
+            bot_process.close()
+    results["seconds"] = time.perf_counter() - started
+
+    return results
+
+def main(argv=None):
+    """Serves a bot, or runs an arena of two bots, from the command line."""
+    parser = argparse.ArgumentParser(description="Runs players as bot processes.")
+    parser.add_argument("mode", choices=("bot", "run"))
+    parser.add_argument("--player", default="optimized",
+      help="the bot to serve, a BOT_PLAYERS name or module:Class")
+    parser.add_argument("--delay-ms", type=int, default=0,
+      help="milliseconds each decision waits, to test deadlines")
+    parser.add_argument("--players", nargs=2, default=["optimized", "random"])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--processes-per-bot", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--deadline-ms", type=int, default=DEFAULT_DEADLINE_MS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rules", default=cribbageengine.STANDARD_RULES.name,
+      choices=[name for name, rules in cribbageengine.RULES_VARIANTS.items()
+        if rules.player_count == 2])
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    if args.mode == "bot":
+        serve_bot(load_player_factory(args.player), sys.stdin, sys.stdout, args.delay_ms)
+        return 0
+
+    results = run_arena(args.players, args.games, args.processes_per_bot, args.threads,
+      args.deadline_ms, args.seed, rules=cribbageengine.RULES_VARIANTS[args.rules])
+    for bot, player_spec in enumerate(args.players):
+        print(f"{player_spec}: {results['wins'][bot]} wins, "
+          f"{results['fallbacks'][bot]} fallback moves")
+    print(f"Played {args.games} games in {results['seconds']:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""Plays many games at once so players can make their decisions in batches.
+
+Players normally answer one decision per call.  A BatchedPlayer instead gets
+a list of the pending decisions of many games and answers them all in one
+call, so a vectorized or model based player pays its per call cost once per
+batch rather than once per decision.
+
+BatchGameDriver runs a set of CribbageGame instances in lockstep.  Before
+each step it collects the decisions every game is waiting on, asks each
+batched player for its answers, and hands the answers to proxy players that
+the engine calls as usual.  Scalar players like OptimizedPlayer work
+through ScalarPlayerAdapter.  The driver plays any two player RulesConfig,
+handing the rules to the batched players through use_rules.
+
+  driver = BatchGameDriver(ScalarPlayerAdapter(OptimizedPlayer), my_batched_player, 256)
+  scores = driver.run()
+
+"""
+
+import abc
+
+import cribbageengine
+
+HIGHEST_RUN_ALLOWED = 31
+
+
+class DiscardDecision:
+    """A game waiting on a player to discard to the crib.
+
+    Attributes:
+        game_index: the game in the driver
+        seat: the player number, 1 or 2
+        hand: the set of PlayingCards dealt
+    """
+    def __init__(self, game_index, seat, hand):
+        self.game_index = game_index
+        self.seat = seat
+        self.hand = hand
+
+
+class RunCardDecision:
+    """A game waiting on a player to play a card onto the run.
+
+    Only made when the player has a card that can be played.
+
+    Attributes:
+        game_index: the game in the driver
+        seat: the player number, 1 or 2
+        hand: the set of PlayingCards left to play
+        run: the list of PlayingCards in the run since it was last reset
+        run_total: the total value of the run
+    """
+    def __init__(self, game_index, seat, hand, run, run_total):
+        self.game_index = game_index
+        self.seat = seat
+        self.hand = hand
+        self.run = run
+        self.run_total = run_total
+
+
+class BatchedPlayer(abc.ABC):
+    """Provides the interface of a player that decides for many games at once.
+
+    Each game and seat is its own player, identified by the game_index and
+    seat of the decisions and hooks.
+    """
+    # pylint: disable=unused-argument
+    def use_rules(self, game_index, seat, rules):
+        """Tells the player the rules of a game when the game is made.
+
+        Args:
+            game_index: the game in the driver
+            seat: the player number, 1 or 2
+            rules: the game's RulesConfig
+        """
+
+    def use_game_context(self, game_index, seat, rng, logger):
+        """Tells the player the rng and logger of a game that was given them.
+
+        Args:
+            game_index: the game in the driver
+            seat: the player number, 1 or 2
+            rng: the game's random.Random
+            logger: the game's logging.Logger
+        """
+
+    def start_round(self, game_index, seat, is_dealer, player_score, opponent_score):
+        """Tells the player a round is starting in a game, before it discards.
+
+        Args:
+            game_index: the game in the driver
+            seat: the player number, 1 or 2
+            is_dealer: True if the player owns the crib this round
+            player_score: the player's score at the start of the round
+            opponent_score: the opponent's score at the start of the round
+        """
+
+    def observe_run_play(self, game_index, seat, is_player, run_card):
+        """Tells the player about each turn of the run in a game.
+
+        Args:
+            game_index: the game in the driver
+            seat: the player number, 1 or 2
+            is_player: True if this player took the turn
+            run_card: the PlayingCard played, or None if the turn was a go
+        """
+
+    def observe_start_card(self, game_index, seat, start_card):
+        """Tells the player the start card cut in a game.
+
+        Args:
+            game_index: the game in the driver
+            seat: the player number, 1 or 2
+            start_card: the PlayingCard cut
+        """
+    # pylint: enable=unused-argument
+
+    @abc.abstractmethod
+    def discard_to_crib_batch(self, decisions):
+        """Chooses the discards for a batch of games.
+
+        Args:
+            decisions: a list of DiscardDecision
+
+        Returns:
+            (list) a tuple of the rules' discard_count PlayingCards to discard
+              for each decision
+        """
+
+    @abc.abstractmethod
+    def get_run_card_batch(self, decisions):
+        """Chooses the run cards for a batch of games.
+
+        Args:
+            decisions: a list of RunCardDecision
+
+        Returns:
+            (list) the PlayingCard to play for each decision
+        """
+
+
+class ScalarPlayerAdapter(BatchedPlayer):
+    """Lets a player that makes one decision per call act as a BatchedPlayer.
+
+    A new player is made for each game and seat the first time it is needed.
+
+    Attributes:
+        player_factory: a callable, such as a player class, that makes a player
+        players: the players made, keyed by (game_index, seat)
+    """
+    def __init__(self, player_factory):
+        self.player_factory = player_factory
+        self.players = {}
+
+    def get_player(self, game_index, seat):
+        """Gets the player for a game and seat, making it if needed."""
+        player = self.players.get((game_index, seat))
+        if player is None:
+            player = self.player_factory()
+            self.players[(game_index, seat)] = player
+        return player
+
+    def use_rules(self, game_index, seat, rules):
+        """Hands the rules to the game's player if it takes them."""
+        use_rules = getattr(self.get_player(game_index, seat), "use_rules", None)
+        if use_rules is not None:
+            use_rules(rules)
+
+    def use_game_context(self, game_index, seat, rng, logger):
+        """Hands the rng and logger to the game's player if it takes them."""
+        use_game_context = getattr(self.get_player(game_index, seat), "use_game_context", None)
+        if use_game_context is not None:
+            use_game_context(rng, logger)
+
+    def start_round(self, game_index, seat, is_dealer, player_score, opponent_score):
+        """Tells the game's player the round is starting."""
+        self.get_player(game_index, seat).start_round(is_dealer, player_score, opponent_score)
+
+    def observe_run_play(self, game_index, seat, is_player, run_card):
+        """Tells the game's player about the turn."""
+        self.get_player(game_index, seat).observe_run_play(is_player, run_card)
+
+    def observe_start_card(self, game_index, seat, start_card):
+        """Tells the game's player the start card."""
+        self.get_player(game_index, seat).observe_start_card(start_card)
+
+    def discard_to_crib_batch(self, decisions):
+        """Asks each game's player for its discards."""
+        return [self.get_player(decision.game_index, decision.seat).discard_to_crib(
+          set(decision.hand)) for decision in decisions]
+
+    def get_run_card_batch(self, decisions):
+        """Asks each game's player for its run card."""
+        return [self.get_player(decision.game_index, decision.seat).get_run_card(
+          decision.hand, decision.run, decision.run_total) for decision in decisions]
+
+
+class _ProxyPlayer:
+    """Answers the engine with decisions the driver already made in a batch."""
+    def __init__(self, batched_player, game_index, seat):
+        self.batched_player = batched_player
+        self.game_index = game_index
+        self.seat = seat
+        self.answer = None
+
+    def use_rules(self, rules):
+        """Tells the batched player the game's rules."""
+        self.batched_player.use_rules(self.game_index, self.seat, rules)
+
+    def use_game_context(self, rng, logger):
+        """Tells the batched player the game's rng and logger."""
+        self.batched_player.use_game_context(self.game_index, self.seat, rng, logger)
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Does nothing, the driver tells the batched player before it discards."""
+
+    def observe_run_play(self, is_player, run_card):
+        """Tells the batched player about the turn."""
+        self.batched_player.observe_run_play(self.game_index, self.seat, is_player, run_card)
+
+    def observe_start_card(self, start_card):
+        """Tells the batched player the start card."""
+        self.batched_player.observe_start_card(self.game_index, self.seat, start_card)
+
+    def discard_to_crib(self, player_hand):
+        """Returns the discards chosen for this game."""
+        # pylint: disable=unused-argument
+        return self._take_answer()
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Returns the run card chosen for this game."""
+        # pylint: disable=unused-argument
+        return self._take_answer()
+
+    def _take_answer(self):
+        answer = self.answer
+        if answer is None:
+            raise RuntimeError(f"No answer for game {self.game_index} seat {self.seat}")
+        self.answer = None
+        return answer
+
+
+class BatchGameDriver:
+    """Plays many games in lockstep, batching the decisions of each player.
+
+    Every game takes its rounds the same way cribbageaicli.run_game does,
+    finishing the round in which a player reaches the rules' winning score.
+
+    Attributes:
+        players: the BatchedPlayer for seat 1 and seat 2, which may be the
+          same player
+        rules: the two player RulesConfig every game is played by
+        games: the CribbageGame of each game index
+        scores: the final (player one, player two) scores of each game, None
+          until the game finishes
+    """
+    def __init__(self, player_one, player_two, game_count, cribbage_engine=None,
+      rules=cribbageengine.STANDARD_RULES):
+        cribbage_engine = cribbage_engine or cribbageengine.CribbageEngine()
+        self.players = (player_one, player_two)
+        self.rules = rules
+        self._proxies = [(_ProxyPlayer(player_one, game_index, 1),
+          _ProxyPlayer(player_two, game_index, 2)) for game_index in range(game_count)]
+        self.games = [cribbage_engine.new_game(*proxies, rules=rules) for proxies in self._proxies]
+        self.scores = [None] * game_count
+
+    def run(self):
+        """Plays every game to the end.
+
+        Returns:
+            (list) the (player one, player two) scores of each game
+        """
+        active = list(range(len(self.games)))
+        while active:
+            self.play_round(active)
+            for game_index in active:
+                cribbage_game = self.games[game_index]
+                if max(cribbage_game.player_one_score, cribbage_game.player_two_score) \
+                  >= self.rules.winning_score:
+                    self.scores[game_index] = (cribbage_game.player_one_score,
+                      cribbage_game.player_two_score)
+            active = [game_index for game_index in active if self.scores[game_index] is None]
+
+        return self.scores
+
+    def play_round(self, game_indices):
+        """Plays one round of each of the given games.
+
+        Args:
+            game_indices: the games to play a round of
+        """
+        discard_decisions = []
+        for game_index in game_indices:
+            cribbage_game = self.games[game_index]
+            cribbage_game.deal_cards()
+            self.players[0].start_round(game_index, 1, cribbage_game.crib_turn == 1,
+              cribbage_game.player_one_score, cribbage_game.player_two_score)
+            self.players[1].start_round(game_index, 2, cribbage_game.crib_turn == 2,
+              cribbage_game.player_two_score, cribbage_game.player_one_score)
+            discard_decisions.append(DiscardDecision(game_index, 1,
+              set(cribbage_game.player_one_hand)))
+            discard_decisions.append(DiscardDecision(game_index, 2,
+              set(cribbage_game.player_two_hand)))
+        self._answer(discard_decisions, "discard_to_crib_batch")
+
+        for game_index in game_indices:
+            cribbage_game = self.games[game_index]
+            cribbage_game.discard_to_crib()
+            cribbage_game.cut_start_card()
+
+        pegging = list(game_indices)
+        while pegging:
+            run_decisions = []
+            for game_index in pegging:
+                cribbage_game = self.games[game_index]
+                run_hand = cribbage_game.player_one_run_hand if cribbage_game.run_turn == 1 \
+                  else cribbage_game.player_two_run_hand
+                run_total = cribbageengine.CribbageGame.get_cards_total_value(cribbage_game.run)
+                if any(run_total + card.value <= HIGHEST_RUN_ALLOWED for card in run_hand):
+                    run_decisions.append(RunCardDecision(game_index, cribbage_game.run_turn,
+                      run_hand, cribbage_game.run, run_total))
+            self._answer(run_decisions, "get_run_card_batch")
+
+            for game_index in pegging:
+                self.games[game_index].play_next_run_card()
+            pegging = [game_index for game_index in pegging
+              if self.games[game_index].is_more_run_cards()]
+
+        for game_index in game_indices:
+            cribbage_game = self.games[game_index]
+            cribbage_game.score_pone_hand()
+            cribbage_game.score_dealer_hand()
+            cribbage_game.score_dealer_crib()
+
+    def _answer(self, decisions, method_name):
+        """Asks each batched player for all of its decisions in one call."""
+        decisions_by_player = {}
+        for decision in decisions:
+            player = self.players[decision.seat - 1]
+            decisions_by_player.setdefault(id(player), (player, []))[1].append(decision)
+
+        for player, player_decisions in decisions_by_player.values():
+            answers = getattr(player, method_name)(player_decisions)
+            for decision, answer in zip(player_decisions, answers):
+                self._proxies[decision.game_index][decision.seat - 1].answer = answer
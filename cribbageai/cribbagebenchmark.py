@@ -0,0 +1,330 @@
+"""Benchmarks the hot paths of the Cribbage Engine against a stored baseline.
+
+Measures hand scoring, run play scoring, OptimizedPlayer discards, full
+games for each player pairing and rounds of each rules variant.  Results can be saved as a baseline JSON file
+and later runs fail when a metric regresses past a threshold.
+
+  python3 cribbageai/cribbagebenchmark.py --save-baseline
+  python3 cribbageai/cribbagebenchmark.py --check
+
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+
+import cribbageaicli
+import cribbageengine
+import cribbageplayers
+
+DEFAULT_BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+CORPUS_SEED = 121
+
+PLAYER_PAIRINGS = {
+    "random_v_random": (cribbageplayers.RandomPlayer, cribbageplayers.RandomPlayer),
+    "random_v_optimized": (cribbageplayers.RandomPlayer, cribbageplayers.OptimizedPlayer),
+    "optimized_v_optimized": (cribbageplayers.OptimizedPlayer,
+      cribbageplayers.OptimizedPlayer),
+}
+
+# Sizes of each benchmark.  The quick sizes keep a smoke run under a few seconds.
+FULL_SIZES = {"hands": 5000, "run_plays": 20000, "discards": 60, "games": 10,
+  "memory_games": 2, "variant_games": 5}
+QUICK_SIZES = {"hands": 500, "run_plays": 2000, "discards": 5, "games": 1,
+  "memory_games": 1, "variant_games": 1}
+
+
+class _RecordingPlayer(cribbageplayers.RandomPlayer):
+    """A random player that records every run play it makes.
+
+    The hand is sorted before choosing so the recording does not depend on
+    set ordering, which changes with the hash seed of the process.
+    """
+    def __init__(self, recorded_plays):
+        self.recorded_plays = recorded_plays
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        run_card = super().get_run_card(sorted(player_run_hand), run, run_total)
+        self.recorded_plays.append((list(run), run_card))
+        return run_card
+
+
+def build_hand_corpus(size, seed=CORPUS_SEED):
+    """Builds a fixed corpus of hands and start cards.
+
+    Args:
+        size: the number of hands in the corpus
+        seed: the seed for the corpus, the same seed gives the same corpus
+
+    Returns:
+        (list) of (list of PlayingCard, PlayingCard) hand and start card tuples
+    """
+    rng = random.Random(seed)
+    deck = sorted(cribbageengine.CribbageEngine().get_deck_copy())
+    corpus = []
+    for _ in range(size):
+        cards = rng.sample(deck, 5)
+        corpus.append((cards[:4], cards[4]))
+
+    return corpus
+
+def build_discard_corpus(size, seed=CORPUS_SEED):
+    """Builds a fixed corpus of dealt hands to discard from.
+
+    Args:
+        size: the number of hands in the corpus
+        seed: the seed for the corpus
+
+    Returns:
+        (list) of lists of PlayingCard, each a dealt hand
+    """
+    rng = random.Random(seed)
+    deck = sorted(cribbageengine.CribbageEngine().get_deck_copy())
+    return [rng.sample(deck, cribbageengine.CARDS_DEALT_IN_HAND) for _ in range(size)]
+
+def build_run_play_corpus(size, seed=CORPUS_SEED):
+    """Records run plays from seeded games between random players.
+
+    Args:
+        size: the minimum number of run plays to record
+        seed: the seed for the recorded games
+
+    Returns:
+        (list) of (list of PlayingCard, PlayingCard) run and run card tuples
+    """
+    recorded_plays = []
+    cribbage_engine = cribbageengine.CribbageEngine()
+    random_state = random.getstate()
+    try:
+        random.seed(seed)
+        while len(recorded_plays) < size:
+            cribbage_game = cribbage_engine.new_game(
+              _RecordingPlayer(recorded_plays), _RecordingPlayer(recorded_plays))
+            cribbageaicli.run_game(cribbage_game, False)
+    finally:
+        random.setstate(random_state)
+
+    return recorded_plays[:size]
+
+def _measure_calls(function, arguments):
+    """Calls the function once per argument tuple, timing every call.
+
+    Returns:
+        (dict) throughput and latency metrics for the calls
+    """
+    latencies = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for argument in arguments:
+        call_started = perf_counter()
+        function(*argument)
+        latencies.append(perf_counter() - call_started)
+    elapsed = perf_counter() - started
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "calls_per_second": len(latencies) / elapsed,
+        "mean_latency_us": sum(latencies) / len(latencies) * 1e6,
+        "p95_latency_us": latencies[int(len(latencies) * 0.95)] * 1e6,
+    }
+
+def benchmark_hand_scoring(size):
+    """Benchmarks calculate_score_for_hand over the fixed hand corpus."""
+    corpus = build_hand_corpus(size)
+    return _measure_calls(cribbageengine.calculate_score_for_hand, corpus)
+
+def benchmark_run_play_scoring(size):
+    """Benchmarks calculate_score_for_run_play over recorded pegging sequences."""
+    corpus = build_run_play_corpus(size)
+    return _measure_calls(cribbageengine.calculate_score_for_run_play, corpus)
+
+def benchmark_discards(size):
+    """Benchmarks a single OptimizedPlayer.discard_to_crib decision."""
+    player = cribbageplayers.OptimizedPlayer()
+    corpus = [(set(hand),) for hand in build_discard_corpus(size)]
+    return _measure_calls(player.discard_to_crib, corpus)
+
+def benchmark_games(player_classes, games, memory_games, seed=CORPUS_SEED):
+    """Benchmarks full games of run_game for a pairing of players.
+
+    Args:
+        player_classes: a tuple of the two player classes to play
+        games: the number of timed games to play
+        memory_games: the number of games to play under tracemalloc
+        seed: the first seed, each game is seeded with the next value
+
+    Returns:
+        (dict) games per second and the peak memory allocated per game
+    """
+    cribbage_game = cribbageengine.CribbageEngine().new_game(None, None, is_bulk=True)
+    random_state = random.getstate()
+    try:
+        started = time.perf_counter()
+        for game_number in range(games):
+            random.seed(seed + game_number)
+            cribbage_game.reset(player_classes[0](), player_classes[1]())
+            cribbageaicli.run_game(cribbage_game, False)
+        elapsed = time.perf_counter() - started
+
+        peak_total = 0
+        tracemalloc.start()
+        try:
+            for game_number in range(memory_games):
+                random.seed(seed + game_number)
+                tracemalloc.reset_peak()
+                base_size = tracemalloc.get_traced_memory()[0]
+                cribbage_game.reset(player_classes[0](), player_classes[1]())
+                cribbageaicli.run_game(cribbage_game, False)
+                peak_total += tracemalloc.get_traced_memory()[1] - base_size
+        finally:
+            tracemalloc.stop()
+    finally:
+        random.setstate(random_state)
+
+    return {
+        "games": games,
+        "games_per_second": games / elapsed,
+        "peak_kib_per_game": peak_total / memory_games / 1024,
+    }
+
+def benchmark_variant(rules, games, seed=CORPUS_SEED):
+    """Benchmarks OptimizedPlayer games of a rules variant.
+
+    Variants differ in how many rounds a game takes, so rounds per second is
+    the measure to compare with the standard game.
+
+    Args:
+        rules: the cribbageengine.RulesConfig to play
+        games: the number of games to play
+        seed: the first seed, each game is seeded with the next value
+
+    Returns:
+        (dict) rounds per second
+    """
+    cribbage_engine = cribbageengine.CribbageEngine()
+    rounds = 0
+    started = time.perf_counter()
+    for game_number in range(games):
+        rng = random.Random(seed + game_number)
+        players = [cribbageplayers.OptimizedPlayer() for _ in range(rules.player_count)]
+        if rules.player_count == 2:
+            cribbage_game = cribbage_engine.new_game(*players, rng=rng, rules=rules)
+            cribbageaicli.run_game(cribbage_game, False)
+        else:
+            cribbage_game = cribbage_engine.new_multiplayer_game(players, rules, rng)
+            cribbageaicli.run_multiplayer_game(cribbage_game, False)
+        rounds += cribbage_game.round_count
+    elapsed = time.perf_counter() - started
+
+    return {"games": games, "rounds_per_second": rounds / elapsed}
+
+def run_benchmarks(sizes):
+    """Runs every benchmark.
+
+    Args:
+        sizes: a dict like FULL_SIZES with the size of each benchmark
+
+    Returns:
+        (dict) benchmark name to a dict of metric name to value
+    """
+    results = {
+        "hand_scoring": benchmark_hand_scoring(sizes["hands"]),
+        "run_play_scoring": benchmark_run_play_scoring(sizes["run_plays"]),
+        "optimized_discard": benchmark_discards(sizes["discards"]),
+    }
+    for pairing_name, player_classes in PLAYER_PAIRINGS.items():
+        results[f"games_{pairing_name}"] = benchmark_games(
+          player_classes, sizes["games"], sizes["memory_games"])
+    for rules_name, rules in cribbageengine.RULES_VARIANTS.items():
+        results[f"variant_{rules_name}"] = benchmark_variant(rules, sizes["variant_games"])
+
+    return results
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compares benchmark results to a baseline.
+
+    Metrics ending in "_per_second" are better when higher, all other timing
+    and memory metrics are better when lower.  Counts are ignored.
+
+    Args:
+        results: the results of run_benchmarks
+        baseline: a previously saved result of run_benchmarks
+        threshold: the allowed fractional regression, 0.25 allows 25% worse
+
+    Returns:
+        (list) of strings describing each regression, empty if none
+    """
+    regressions = []
+    for benchmark_name, metrics in results.items():
+        baseline_metrics = baseline.get(benchmark_name, {})
+        for metric_name, value in metrics.items():
+            baseline_value = baseline_metrics.get(metric_name)
+            if not baseline_value or metric_name in ("calls", "games"):
+                continue
+
+            if metric_name.endswith("_per_second"):
+                change = (baseline_value - value) / baseline_value
+            else:
+                change = (value - baseline_value) / baseline_value
+
+            if change > threshold:
+                regressions.append(f"{benchmark_name}.{metric_name} regressed "
+                  f"{change:.0%}: {baseline_value:.2f} -> {value:.2f}")
+
+    return regressions
+
+def print_results(results):
+    """Prints the benchmark results to the screen."""
+    for benchmark_name, metrics in results.items():
+        print(f"## {benchmark_name}")
+        for metric_name, value in metrics.items():
+            print(f"  {metric_name}: {value:.2f}")
+
+def main(argv=None):
+    """Runs the benchmarks from the command line.
+
+    Returns:
+        (int) the exit code, 1 if a regression was found
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE,
+      help="the baseline JSON file to save or check against")
+    parser.add_argument("--save-baseline", action="store_true",
+      help="save these results as the new baseline")
+    parser.add_argument("--check", action="store_true",
+      help="fail if any metric regresses past the threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+      help="the allowed fractional regression")
+    parser.add_argument("--quick", action="store_true",
+      help="run the small smoke test sizes")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    results = run_benchmarks(QUICK_SIZES if args.quick else FULL_SIZES)
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""Compact integer representations of cards with fast scorers for simulation.
+
+Search and learning players play out many thousands of hands, which is too
+slow with PlayingCard sets.  Here a card is an integer index from 0 to 51
+where index // 4 is the rank (0 for an ace through 12 for a king) and
+index % 4 is the suit.  The scorers follow the same rules as the engine's
+calculate_score_for_hand and CribbageGame.play_next_run_card.
+
+  hand = cards_to_indices(player_hand)
+  score_hand(hand, card_to_index(start_card))
+
+"""
+
+from itertools import combinations
+
+import cribbageengine
+
+DECK_SIZE = 52
+HIGHEST_RUN_ALLOWED = 31
+JACK_RANK = 10
+
+# The pegging value of each rank, face cards are worth 10.
+RANK_VALUES = tuple(min(rank + 1, 10) for rank in range(13))
+
+# The rank and value of each card index.
+CARD_RANKS = tuple(card >> 2 for card in range(DECK_SIZE))
+CARD_VALUES = tuple(RANK_VALUES[card >> 2] for card in range(DECK_SIZE))
+
+# Every way to choose the two cards to discard from a six card hand, in the
+# same order as itertools.combinations over the hand.
+DISCARD_OPTIONS = tuple(combinations(range(6), 2))
+KEEP_OPTIONS = tuple(tuple(position for position in range(6) if position not in discard)
+  for discard in DISCARD_OPTIONS)
+
+# Lazily filled memo of the fifteens, pairs and runs score of a sorted tuple of ranks.
+_rank_score_memo = {}
+
+
+def card_to_index(card):
+    """Converts a PlayingCard to its integer index.
+
+    Args:
+        card: a PlayingCard
+
+    Returns:
+        (int) the card index from 0 to 51
+    """
+    return (card.face.value - 1) * 4 + card.suit.value - 1
+
+def cards_to_indices(cards):
+    """Converts an iterable of PlayingCard to a list of integer indices."""
+    return [(card.face.value - 1) * 4 + card.suit.value - 1 for card in cards]
+
+def index_to_card(index):
+    """Converts an integer index back to a PlayingCard.
+
+    Args:
+        index: the card index from 0 to 51
+
+    Returns:
+        (PlayingCard) the matching card
+    """
+    face = cribbageengine.Face((index >> 2) + 1)
+    return cribbageengine.PlayingCard(cribbageengine.Suit((index & 3) + 1), face,
+      RANK_VALUES[index >> 2])
+
+def score_ranks(ranks):
+    """Scores the fifteens, pairs and runs of a sorted tuple of ranks.
+
+    These are the parts of a hand score that do not depend on suits, so they
+    are memoized by the rank tuple.
+
+    Args:
+        ranks: a sorted tuple of ranks from 0 to 12
+
+    Returns:
+        (int) the points for fifteens, pairs and runs
+    """
+    score = _rank_score_memo.get(ranks)
+    if score is not None:
+        return score
+
+    # Count the subsets adding up to each total, each 15 is 2 points
+    subset_counts = [1] + [0] * 15
+    for rank in ranks:
+        value = RANK_VALUES[rank]
+        for total in range(15, value - 1, -1):
+            subset_counts[total] += subset_counts[total - value]
+    score = subset_counts[15] * 2
+
+    rank_counts = [0] * 14
+    for rank in ranks:
+        rank_counts[rank] += 1
+
+    # Every pair is 2 points, so n of a kind is n * (n - 1)
+    for count in rank_counts:
+        score += count * (count - 1)
+
+    # A run of distinct ranks scores its length once for every way to pick it
+    run_length = 0
+    run_ways = 1
+    for count in rank_counts:
+        if count:
+            run_length += 1
+            run_ways *= count
+        else:
+            if run_length >= 3:
+                score += run_length * run_ways
+            run_length = 0
+            run_ways = 1
+
+    _rank_score_memo[ranks] = score
+    return score
+
+def score_hand(hand, start_card):
+    """Calculates the score of a hand of card indices with the start card.
+
+    Matches cribbageengine.calculate_score_for_hand.
+
+    Args:
+        hand: a sequence of card indices
+        start_card: the card index of the start card
+
+    Returns:
+        (int) the score for the hand
+    """
+    start_suit = start_card & 3
+    score = 0
+    for card in hand:
+        if card >> 2 == JACK_RANK and card & 3 == start_suit:
+            score += 1
+
+    flush_suit = hand[0] & 3
+    for card in hand:
+        if card & 3 != flush_suit:
+            break
+    else:
+        score += len(hand) + 1 if flush_suit == start_suit else len(hand)
+
+    ranks = [card >> 2 for card in hand]
+    ranks.append(start_card >> 2)
+    ranks.sort()
+    return score + score_ranks(tuple(ranks))
+
+def score_keep_over_cuts(keep, dead_cards):
+    """Totals the score of a kept hand over every live cut, of any hand size.
+
+    The cuts are grouped by rank for the memoized rank scores, and by suit
+    for the flush and his nob, so a keep costs 13 rank lookups instead of a
+    full score per cut.
+
+    Args:
+        keep: a sequence of kept card indices
+        dead_cards: the card indices that cannot be cut, including the keep
+
+    Returns:
+        (int) the total of score_hand over the live cuts
+    """
+    live_by_rank = [4] * 13
+    live_by_suit = [13] * 4
+    for card in dead_cards:
+        live_by_rank[card >> 2] -= 1
+        live_by_suit[card & 3] -= 1
+
+    keep_ranks = sorted(card >> 2 for card in keep)
+    total = 0
+    for rank, live_count in enumerate(live_by_rank):
+        if live_count:
+            total += live_count * score_ranks(tuple(sorted(keep_ranks + [rank])))
+
+    for card in keep:
+        if card >> 2 == JACK_RANK:
+            total += live_by_suit[card & 3]
+
+    flush_suit = keep[0] & 3
+    for card in keep:
+        if card & 3 != flush_suit:
+            break
+    else:
+        total += len(keep) * sum(live_by_suit) + live_by_suit[flush_suit]
+
+    return total
+
+def pack_run_ranks(run_ranks):
+    """Packs the ranks of a run for cribbageengine.get_run_play_key.
+
+    Args:
+        run_ranks: the list of ranks played since the run was last reset
+
+    Returns:
+        (int) the packed faces of the most recent ranks
+    """
+    recent_faces = 0
+    for run_rank in run_ranks[-cribbageengine.RUN_PLAY_LOOKBACK:]:
+        recent_faces = (recent_faces << 4) | (run_rank + 1)
+    return recent_faces
+
+def score_run_play(run_ranks, run_total, rank):
+    """Calculates the points for playing a rank onto the run.
+
+    Matches cribbageengine.calculate_score_for_run_play.
+
+    Args:
+        run_ranks: the list of ranks played since the run was last reset
+        run_total: the total value of the run
+        rank: the rank of the card being played
+
+    Returns:
+        (int) the points for the play
+    """
+    return cribbageengine.score_run_play_key(cribbageengine.get_run_play_key(
+      pack_run_ranks(run_ranks), run_total, rank + 1))
+
+def play_pegging(hands, first_turn, choose_card, run_ranks=None, go_player=-1,
+  points=None):
+    """Plays out the run between two hands of card indices.
+
+    Follows the same turn, go and last card rules as
+    CribbageGame.play_next_run_card.  The hands are emptied as they are played.
+
+    Args:
+        hands: a list of two lists of card indices, one for each seat
+        first_turn: the seat (0 or 1) that plays first
+        choose_card: a callable (seat, hand, run_ranks, run_total, go_player)
+          that returns a playable card index from the hand
+        run_ranks: the list of ranks already in the run, empty by default
+        go_player: the seat that has called a go, or -1 when no one has
+        points: a list of each seat's points to add to, which choose_card
+          may read while the run is played, [0, 0] by default
+
+    Returns:
+        (list) the points earned by each seat
+    """
+    run_ranks = [] if run_ranks is None else list(run_ranks)
+    run_total = sum(RANK_VALUES[rank] for rank in run_ranks)
+    recent_faces = pack_run_ranks(run_ranks)
+    points = [0, 0] if points is None else points
+    turn = first_turn
+    while hands[0] or hands[1]:
+        hand = hands[turn]
+        can_play = False
+        for card in hand:
+            if run_total + CARD_VALUES[card] <= HIGHEST_RUN_ALLOWED:
+                can_play = True
+                break
+
+        if can_play:
+            card = choose_card(turn, hand, run_ranks, run_total, go_player)
+            rank = card >> 2
+            points[turn] += cribbageengine.score_run_play_key(
+              cribbageengine.get_run_play_key(recent_faces, run_total, rank + 1))
+            hand.remove(card)
+            run_ranks.append(rank)
+            run_total += RANK_VALUES[rank]
+            recent_faces = cribbageengine.push_recent_face(recent_faces, rank + 1)
+        elif go_player == -1:
+            go_player = turn
+            points[1 - turn] += 1
+        elif go_player != turn:
+            run_ranks = []
+            run_total = 0
+            recent_faces = 0
+            go_player = -1
+
+        if not hands[0] and not hands[1]:
+            points[turn] += 1
+
+        turn = 1 - turn
+
+    return points
+
+def choose_greedy_card(seat, hand, run_ranks, run_total, go_player=-1):
+    """A fast pegging policy that takes the most points, then the largest card.
+
+    Has the signature expected by play_pegging.
+    """
+    # pylint: disable=unused-argument
+    best_card = -1
+    best_points = -1
+    recent_faces = pack_run_ranks(run_ranks)
+    for card in hand:
+        value = CARD_VALUES[card]
+        if run_total + value > HIGHEST_RUN_ALLOWED:
+            continue
+        points = cribbageengine.score_run_play_key(
+          cribbageengine.get_run_play_key(recent_faces, run_total, (card >> 2) + 1))
+        if points > best_points or (points == best_points and value > CARD_VALUES[best_card]):
+            best_card = card
+            best_points = points
+
+    return best_card
+
+def choose_keep_by_ranks(hand):
+    """Chooses the four cards to keep from six by their score without a cut.
+
+    A fast discard policy for rollouts; it ignores suits and the crib.
+
+    Args:
+        hand: a list of six card indices
+
+    Returns:
+        (tuple) the tuple of kept card indices and the tuple of discarded ones
+    """
+    best_keep = None
+    best_score = -1
+    for keep_positions, discard_positions in zip(KEEP_OPTIONS, DISCARD_OPTIONS):
+        keep = tuple(hand[position] for position in keep_positions)
+        score = score_ranks(tuple(sorted(card >> 2 for card in keep)))
+        if score > best_score:
+            best_keep = (keep, tuple(hand[position] for position in discard_positions))
+            best_score = score
+
+    return best_keep
@@ -0,0 +1,427 @@
+"""Measures the quality of recorded decisions against an oracle.
+
+Streams the shards written by cribbageselfplay and values every option of
+each recorded decision, so a choice can be scored by the points it gave up
+against the best option available:
+
+  discards  The kept hand's mean score over every live cut, plus the crib's
+            expected points for the dealer or minus them for the pone.  The
+            crib is valued exactly over the ranks left once the whole hand
+            is out of the deck, for the opponent's discards and the cut,
+            counting each jack for nobs a quarter of the time.
+  pegging   The points for the play plus the expected pegging margin for the
+            rest of the round, from greedy rollouts against opponent hands
+            sampled from the unseen ranks.  Every option is played against
+            the same sampled hands.  A play with only one legal rank is not
+            a decision and is skipped.
+
+Option values are cached by canonical state, suits relabelled for discards
+and dropped for pegging.  Shards are split into row ranges that are analyzed
+in parallel and merged into a DecisionReport of the decisions, errors and
+points lost by each seat, split by phase and by stage of the game.
+
+  python3 cribbageai/cribbagedecisions.py selfplay --player-names optimized random
+
+"""
+
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+import cribbageanalysis
+import cribbagecompact
+import cribbagedistribution
+import cribbagepegsim
+import cribbageselfplay
+import cribbagesharedtables
+
+PHASE_NAMES = ("discard", "pegging")
+
+# The stage of the game by the deciding player's score, up to each limit.
+STAGE_LIMITS = ((61, "early"), (91, "middle"), (121, "late"))
+
+DEFAULT_ROLLOUTS = 64
+DEFAULT_ERROR_TOLERANCE = 0.1
+DEFAULT_CHUNK_ROWS = 20000
+DEFAULT_MAX_ENTRIES = 1 << 18
+
+# The chance a jack in the crib matches the suit of the cut for nobs.
+NOBS_CHANCE = 0.25
+
+# The columns of the self-play features used here.
+IS_DEALER_COLUMN = cribbageselfplay.FEATURE_COLUMNS.index("is_dealer")
+PLAYER_SCORE_COLUMN = cribbageselfplay.FEATURE_COLUMNS.index("player_score")
+HAND_COLUMNS = slice(cribbageselfplay.FEATURE_COLUMNS.index("hand_0"),
+  cribbageselfplay.FEATURE_COLUMNS.index("run_0"))
+RUN_COLUMNS = slice(cribbageselfplay.FEATURE_COLUMNS.index("run_0"),
+  cribbageselfplay.FEATURE_COLUMNS.index("run_total"))
+SEAT_COLUMN = 3
+
+
+def build_crib_rank_scores():
+    """Builds the crib points for every two discarded ranks, two more and a cut.
+
+    Returns:
+        (ndarray) a (13, 13, 13, 13, 13) float32 array where [first, second,
+          third, fourth, cut] is the points for the ranks, with each jack
+          among the four crib ranks counted for nobs a quarter of the time
+    """
+    ranks = np.indices((13,) * 5).reshape(5, -1).T
+    keys = np.sort(ranks, axis=1) @ (13 ** np.arange(4, -1, -1))
+    rank_scores = {}
+    for key in np.unique(keys).tolist():
+        sorted_ranks = tuple(key // 13 ** power % 13 for power in range(4, -1, -1))
+        rank_scores[key] = cribbagecompact.score_ranks(sorted_ranks)
+    scores = np.vectorize(rank_scores.__getitem__, otypes=[np.float64])(keys)
+    scores += NOBS_CHANCE * (ranks[:, :4] == cribbagecompact.JACK_RANK).sum(axis=1)
+    return scores.reshape((13,) * 5).astype(np.float32)
+
+cribbagesharedtables.register_table("crib_rank_scores", build_crib_rank_scores)
+
+def get_crib_values(hand_ranks):
+    """Gets the expected crib points for discarding each pair of ranks from a hand.
+
+    The opponent's two discards and the cut are drawn from the cards left
+    once the whole hand is out of the deck, weighted by how many cards of
+    each rank remain.
+
+    Args:
+        hand_ranks: the ranks of the six card hand
+
+    Returns:
+        (ndarray) a symmetric (13, 13) array of expected points, only
+          meaningful for pairs of ranks from the hand
+    """
+    rank_counts = np.full(13, 4.0)
+    for rank in hand_ranks:
+        rank_counts[rank] -= 1
+
+    # The weight of drawing the third, fourth and cut ranks in turn
+    same = np.eye(13)
+    weights = rank_counts[:, None, None] * (rank_counts[None, :, None] - same[:, :, None]) \
+      * (rank_counts[None, None, :] - same[:, None, :] - same[None, :, :])
+    weights = np.maximum(weights, 0)
+    return np.tensordot(cribbagesharedtables.get_table("crib_rank_scores"), weights, axes=3) \
+      / weights.sum()
+
+def get_discard_values(hand, is_dealer):
+    """Values every discard from a six card hand.
+
+    Args:
+        hand: a tuple of six card indices
+        is_dealer: True if the crib belongs to the player
+
+    Returns:
+        (tuple) the value of each discard in the order of
+          cribbagecompact.DISCARD_OPTIONS
+    """
+    crib_values = get_crib_values([card >> 2 for card in hand])
+    crib_sign = 1 if is_dealer else -1
+    return tuple(cribbagedistribution.distribution_mean(distribution)
+      + crib_sign * crib_values[discard[0] >> 2, discard[1] >> 2]
+      for discard, distribution in cribbagedistribution.discard_score_distributions(hand))
+
+def get_pegging_values(hand_ranks, run_ranks, is_dealer, rollouts=DEFAULT_ROLLOUTS):
+    """Values every rank the hand can play onto the run.
+
+    The opponent is assumed to hold as many cards as the player when the
+    player leads the round as pone, and one fewer as dealer.  The rollouts
+    are seeded by the state, so the values are the same on every process.
+
+    Args:
+        hand_ranks: a sorted tuple of the ranks in the hand
+        run_ranks: a tuple of the ranks played since the run was last reset
+        is_dealer: True if the player is the dealer
+        rollouts: the number of opponent hands to sample
+
+    Returns:
+        (tuple) (rank, value) pairs for each playable rank, where value is
+          the expected points of the player minus the opponent's from the
+          play to the end of the round
+    """
+    run_total = sum(cribbagecompact.RANK_VALUES[rank] for rank in run_ranks)
+    options = sorted({rank for rank in hand_ranks
+      if run_total + cribbagecompact.RANK_VALUES[rank] <= cribbagecompact.HIGHEST_RUN_ALLOWED})
+    if not options:
+        return ()
+
+    rank_counts = np.full(13, 4)
+    for rank in hand_ranks + run_ranks:
+        rank_counts[rank] -= 1
+    unseen_ranks = np.repeat(np.arange(13, dtype=np.int16), np.maximum(rank_counts, 0))
+    opponent_count = max(0, min(len(hand_ranks) - int(is_dealer), len(unseen_ranks)))
+    rng = np.random.default_rng(zlib.crc32(repr((hand_ranks, run_ranks, is_dealer)).encode()))
+    picks = np.argsort(rng.random((rollouts, len(unseen_ranks))), axis=1)[:, :opponent_count]
+
+    # Every option is played against the same opponent hands in one batch,
+    # the player's first play forced to the option's slot
+    option_slots = np.repeat([hand_ranks.index(rank) for rank in options], rollouts)
+    hands = np.full((len(option_slots), 2, 4), -1, dtype=np.int16)
+    hands[:, 0, :len(hand_ranks)] = hand_ranks
+    hands[:, 1, :opponent_count] = np.tile(unseen_ranks[picks], (len(options), 1))
+
+    def first_play_policy(batch, rows, legal):
+        slots = cribbagepegsim.greedy_policy(batch, rows, legal)
+        is_first_play = batch.play_count[rows] == 0
+        slots[is_first_play] = option_slots[rows[is_first_play]]
+        return slots
+
+    batch = cribbagepegsim.simulate_pegging(hands, 0,
+      (first_play_policy, cribbagepegsim.greedy_policy), list(run_ranks))
+    margins = (batch.points[:, 0] - batch.points[:, 1]).reshape(len(options), rollouts)
+    return tuple((rank, float(margin)) for rank, margin in zip(options, margins.mean(axis=1)))
+
+def get_stage(player_score):
+    """Gets the name of the stage of the game for the deciding player's score."""
+    for limit, stage in STAGE_LIMITS:
+        if player_score < limit:
+            return stage
+    return STAGE_LIMITS[-1][1]
+
+
+class DecisionOracle:
+    """Scores decisions by the points lost against their best option.
+
+    Attributes:
+        cache: an AnalysisCache of option values by canonical state
+        rollouts: the opponent hands sampled for each pegging state
+        query_count: the number of decisions scored
+        computed_count: the number of states valued
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, rollouts=DEFAULT_ROLLOUTS):
+        self.cache = cribbageanalysis.AnalysisCache(max_entries)
+        self.rollouts = rollouts
+        self.query_count = 0
+        self.computed_count = 0
+
+    def get_discard_loss(self, hand, is_dealer, discards):
+        """Gets the points a discard gave up against the best discard.
+
+        Args:
+            hand: the six card indices dealt
+            is_dealer: True if the crib belongs to the player
+            discards: the two card indices discarded
+
+        Returns:
+            (float) the points lost, 0 for the best discard
+        """
+        canonical_hand, permutation = cribbageanalysis.get_canonical_cards(hand)
+        key = (cribbageselfplay.DISCARD_DECISION, int(is_dealer)) + canonical_hand
+        values = self._get_values(key, get_discard_values, canonical_hand, bool(is_dealer))
+        discard_positions = tuple(sorted(canonical_hand.index(permutation[card])
+          for card in discards))
+        return max(values) - values[cribbagecompact.DISCARD_OPTIONS.index(discard_positions)]
+
+    def get_pegging_loss(self, hand, run_ranks, is_dealer, card):
+        """Gets the points a pegging play gave up against the best play.
+
+        Args:
+            hand: the card indices in hand before the play
+            run_ranks: the ranks played since the run was last reset
+            is_dealer: True if the player is the dealer
+            card: the card index played
+
+        Returns:
+            (float) the points lost, 0 for the best play, or None if only one
+              rank could be played
+        """
+        hand_ranks = tuple(sorted(hand_card >> 2 for hand_card in hand))
+        run_ranks = tuple(run_ranks)
+        key = (cribbageselfplay.PEGGING_DECISION, int(is_dealer), hand_ranks, run_ranks)
+        values = dict(self._get_values(key, get_pegging_values, hand_ranks, run_ranks,
+          bool(is_dealer), self.rollouts))
+        if len(values) < 2:
+            return None
+        return max(values.values()) - values[card >> 2]
+
+    def _get_values(self, key, get_values, *args):
+        self.query_count += 1
+        if key in self.cache:
+            return self.cache.get(key)
+        values = get_values(*args)
+        self.cache.put(key, values)
+        self.computed_count += 1
+        return values
+
+
+class DecisionReport:
+    """Mergeable totals of decisions, errors and points lost.
+
+    Attributes:
+        totals: a dict of [decisions, errors, points lost] lists keyed by
+          (seat, phase, stage)
+    """
+    def __init__(self, totals=None):
+        self.totals = {key: list(value) for key, value in (totals or {}).items()}
+
+    def add(self, seat, phase, stage, points_lost, tolerance=DEFAULT_ERROR_TOLERANCE):
+        """Adds a decision, counting it as an error if it lost more than tolerance."""
+        totals = self.totals.setdefault((seat, phase, stage), [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += int(points_lost > tolerance)
+        totals[2] += points_lost
+
+    def merge(self, other):
+        """Adds the totals of another DecisionReport into this one."""
+        for key, (decisions, errors, points_lost) in other.totals.items():
+            totals = self.totals.setdefault(key, [0, 0, 0.0])
+            totals[0] += decisions
+            totals[1] += errors
+            totals[2] += points_lost
+
+    def get_decision_count(self):
+        """Gets the number of decisions in the report."""
+        return sum(totals[0] for totals in self.totals.values())
+
+    def get_rows(self, player_names=None):
+        """Summarizes the report by player and phase, overall and by stage.
+
+        Args:
+            player_names: the name of each seat, "seat 0" and "seat 1" by default
+
+        Returns:
+            (list) of (player, phase, stage, decisions, error rate,
+              points lost per decision) tuples, the overall row of each
+              phase before its stages
+        """
+        player_names = player_names or [f"seat {seat}" for seat in (0, 1)]
+        rows = []
+        for seat, player_name in enumerate(player_names):
+            for phase in PHASE_NAMES:
+                stage_totals = [(stage, self.totals.get((seat, phase, stage)))
+                  for _, stage in STAGE_LIMITS]
+                stage_totals = [(stage, totals) for stage, totals in stage_totals if totals]
+                if not stage_totals:
+                    continue
+                overall = [sum(totals[column] for _, totals in stage_totals)
+                  for column in range(3)]
+                for stage, totals in [("all", overall)] + stage_totals:
+                    rows.append((player_name, phase, stage, totals[0],
+                      totals[1] / totals[0], totals[2] / totals[0]))
+        return rows
+
+
+def get_row_ranges(archive_dir, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Splits the shards of a self-play archive into ranges of rows.
+
+    Returns:
+        (list) of (shard paths, first row, end row) tuples
+    """
+    row_ranges = []
+    for features_path in sorted(glob.glob(os.path.join(archive_dir, "shard-*-features.npy"))):
+        shard_paths = (features_path, features_path.replace("-features.npy", "-actions.npy"),
+          features_path.replace("-features.npy", "-outcomes.npy"))
+        row_count = len(np.load(features_path, mmap_mode="r"))
+        row_ranges += [(shard_paths, first_row, min(first_row + chunk_rows, row_count))
+          for first_row in range(0, row_count, chunk_rows)]
+    return row_ranges
+
+def analyze_rows(shard_paths, first_row, end_row, rollouts=DEFAULT_ROLLOUTS,
+  tolerance=DEFAULT_ERROR_TOLERANCE, max_entries=DEFAULT_MAX_ENTRIES):
+    """Scores the decisions in a range of rows of a shard.
+
+    Args:
+        shard_paths: the features, actions and outcomes paths of the shard
+        first_row: the first row to score
+        end_row: the row to stop before
+        rollouts: the opponent hands sampled for each pegging state
+        tolerance: the points a decision may lose before it is an error
+        max_entries: the most states the oracle caches
+
+    Returns:
+        (DecisionReport) the report of the rows
+        (int) the number of states the oracle valued
+    """
+    features, actions, outcomes = (np.load(path, mmap_mode="r") for path in shard_paths)
+    features = np.array(features[first_row:end_row])
+    actions = np.array(actions[first_row:end_row])
+    if outcomes.shape[1] > SEAT_COLUMN:
+        seats = np.array(outcomes[first_row:end_row, SEAT_COLUMN])
+    else:
+        # Shards from before the seat was recorded
+        seats = np.zeros(end_row - first_row, dtype=np.int32)
+
+    oracle = DecisionOracle(max_entries, rollouts)
+    report = DecisionReport()
+    for feature, action, seat in zip(features.tolist(), actions.tolist(), seats.tolist()):
+        is_dealer = feature[IS_DEALER_COLUMN]
+        hand = [card for card in feature[HAND_COLUMNS] if card >= 0]
+        if feature[0] == cribbageselfplay.DISCARD_DECISION:
+            points_lost = oracle.get_discard_loss(hand, is_dealer, action)
+        else:
+            run_ranks = [rank for rank in feature[RUN_COLUMNS] if rank >= 0]
+            points_lost = oracle.get_pegging_loss(hand, run_ranks, is_dealer, action[0])
+            if points_lost is None:
+                continue
+        report.add(seat, PHASE_NAMES[feature[0]], get_stage(feature[PLAYER_SCORE_COLUMN]),
+          points_lost, tolerance)
+    return report, oracle.computed_count
+
+def analyze_archive(archive_dir, processes=None, rollouts=DEFAULT_ROLLOUTS,
+  tolerance=DEFAULT_ERROR_TOLERANCE, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Scores every decision in a self-play archive on worker processes.
+
+    Args:
+        archive_dir: the directory of shards written by cribbageselfplay
+        processes: the number of worker processes, all cores by default
+        rollouts: the opponent hands sampled for each pegging state
+        tolerance: the points a decision may lose before it is an error
+        chunk_rows: the most rows each worker scores at a time
+
+    Returns:
+        (DecisionReport) the merged report
+        (int) the number of states the oracles valued
+    """
+    tasks = [(shard_paths, first_row, end_row, rollouts, tolerance)
+      for shard_paths, first_row, end_row in get_row_ranges(archive_dir, chunk_rows)]
+    if processes == 1:
+        results = [analyze_rows(*task) for task in tasks]
+    else:
+        with multiprocessing.Pool(processes or os.cpu_count()) as pool:
+            results = pool.starmap(analyze_rows, tasks)
+
+    report = DecisionReport()
+    computed_count = 0
+    for range_report, range_computed_count in results:
+        report.merge(range_report)
+        computed_count += range_computed_count
+    return report, computed_count
+
+def main(argv=None):
+    """Scores the decisions of a self-play archive from the command line."""
+    parser = argparse.ArgumentParser(description="Scores recorded decisions against an oracle.")
+    parser.add_argument("archive_dir", help="a directory written by cribbageselfplay")
+    parser.add_argument("--player-names", nargs=2, default=None,
+      help="the names of the players in seat 0 and seat 1")
+    parser.add_argument("--processes", type=int, default=None,
+      help="the number of worker processes, all cores by default")
+    parser.add_argument("--rollouts", type=int, default=DEFAULT_ROLLOUTS)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_ERROR_TOLERANCE,
+      help="the points a decision may lose before it counts as an error")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    started = time.perf_counter()
+    report, computed_count = analyze_archive(args.archive_dir, args.processes, args.rollouts,
+      args.tolerance, args.chunk_rows)
+
+    print(f"{'player':<12} {'phase':<8} {'stage':<7} {'decisions':>9} {'errors':>7} "
+      f"{'lost/decision':>13}")
+    for player_name, phase, stage, decisions, error_rate, points_lost in \
+      report.get_rows(args.player_names):
+        print(f"{player_name:<12} {phase:<8} {stage:<7} {decisions:>9} {error_rate:>7.1%} "
+          f"{points_lost:>13.3f}")
+    print(f"Scored {report.get_decision_count()} decisions, valuing {computed_count} states, "
+      f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Provides the full distribution of a hand's score over the unknown cut.
+
+The mean score over the cut hides how likely a hand is to reach a target,
+which matters more than the mean near the end of a game.  Every 4 card hand
+has a score vector holding its score with every possible cut, so a
+distribution is only a count over the cuts that are still live.  The
+vectors of all 270725 hands are built at once into a table registered with
+cribbagesharedtables, so worker processes share one copy, and the 15 keeps
+of a dealt hand are 15 rows of it.
+
+Cards are the integer indices of cribbagecompact.
+
+  hand = cribbagecompact.cards_to_indices(player_hand)
+  distribution = hand_score_distribution(hand, dead_cards)
+  probability_of_at_least(distribution, 12)
+
+"""
+
+from itertools import combinations
+from itertools import combinations_with_replacement
+import math
+
+import numpy as np
+
+import cribbagecompact
+import cribbagesharedtables
+
+MAX_HAND_SCORE = 29
+
+# The score vector of a card held in the hand, which can never be the cut.
+NOT_A_CUT = 255
+
+# The terms of a sorted hand's row in the hand score table, by card and by
+# position in the hand, so the rows run in colexicographic order.
+HAND_CODE_TERMS = tuple(tuple(math.comb(card, position + 1) for position in range(4))
+  for card in range(cribbagecompact.DECK_SIZE))
+
+HAND_CODE_ARRAY = np.array(HAND_CODE_TERMS, dtype=np.int64)
+
+# The hand positions of each keep, in the order of cribbagecompact.KEEP_OPTIONS,
+# and the slot of each kept card for HAND_CODE_ARRAY.
+KEEP_POSITIONS = np.array(cribbagecompact.KEEP_OPTIONS)
+KEEP_SLOTS = np.arange(4)
+
+
+def get_hand_code(sorted_hand):
+    """Gets the row of a sorted four card hand in the hand score table."""
+    first, second, third, fourth = sorted_hand
+    return HAND_CODE_TERMS[first][0] + HAND_CODE_TERMS[second][1] \
+      + HAND_CODE_TERMS[third][2] + HAND_CODE_TERMS[fourth][3]
+
+def build_hand_scores():
+    """Builds the score of every four card hand with every cut.
+
+    The fifteens, pairs and runs come from the sorted ranks with the cut
+    rank, and the flush and nobs from the suits.
+
+    Returns:
+        (ndarray) a (270725, 52) uint8 array, the row of each hand given by
+          get_hand_code, NOT_A_CUT for cards in the hand
+    """
+    hands = np.array(list(combinations(range(cribbagecompact.DECK_SIZE), 4)), dtype=np.int64)
+    ranks = hands >> 2
+    suits = hands & 3
+
+    rank_scores = np.zeros(13 ** 5, dtype=np.uint8)
+    for sorted_ranks in combinations_with_replacement(range(13), 5):
+        rank_scores[np.ravel_multi_index(sorted_ranks, (13,) * 5)] = \
+          cribbagecompact.score_ranks(sorted_ranks)
+    rank_points = np.empty((len(hands), 13), dtype=np.uint8)
+    for cut_rank in range(13):
+        with_cut = np.sort(np.hstack([ranks, np.full((len(hands), 1), cut_rank)]), axis=1)
+        rank_points[:, cut_rank] = rank_scores[np.ravel_multi_index(with_cut.T, (13,) * 5)]
+
+    is_jack = ranks == cribbagecompact.JACK_RANK
+    suit_points = np.stack([(is_jack & (suits == suit)).sum(axis=1) for suit in range(4)],
+      axis=1).astype(np.uint8)
+    is_flush = (suits == suits[:, :1]).all(axis=1)
+    suit_points[is_flush] += 4
+    suit_points[np.flatnonzero(is_flush), suits[is_flush, 0]] += 1
+
+    cuts = np.arange(cribbagecompact.DECK_SIZE)
+    scores = rank_points[:, cuts >> 2] + suit_points[:, cuts & 3]
+    scores[np.arange(len(hands))[:, None], hands] = NOT_A_CUT
+
+    codes = HAND_CODE_ARRAY[hands, KEEP_SLOTS].sum(axis=1)
+    hand_scores = np.empty_like(scores)
+    hand_scores[codes] = scores
+    return hand_scores
+
+cribbagesharedtables.register_table("hand_scores", build_hand_scores)
+
+def get_hand_score_vector(hand):
+    """Gets the score of a hand with each of the 52 cards as the cut.
+
+    Args:
+        hand: an iterable of four card indices
+
+    Returns:
+        (bytes) the score for each cut card index, NOT_A_CUT for cards in the hand
+    """
+    return cribbagesharedtables.get_table("hand_scores")[get_hand_code(sorted(hand))].tobytes()
+
+def hand_score_counts(hand, dead_cards=()):
+    """Counts the live cuts giving each score.
+
+    Args:
+        hand: an iterable of card indices
+        dead_cards: card indices that cannot be the cut, such as the
+          discards or cards already seen
+
+    Returns:
+        (list) the number of live cuts for each score from 0 to MAX_HAND_SCORE
+    """
+    return _count_scores(get_hand_score_vector(hand), dead_cards)
+
+def _count_scores(hand_scores, dead_cards):
+    counts = [0] * (MAX_HAND_SCORE + 1)
+    dead_cards = set(dead_cards)
+    for cut, score in enumerate(hand_scores):
+        if score != NOT_A_CUT and cut not in dead_cards:
+            counts[score] += 1
+
+    return counts
+
+def get_discard_score_vectors(hand):
+    """Gets the kept hand's score vector for all 15 discards at once.
+
+    Args:
+        hand: a sequence of six card indices
+
+    Returns:
+        (tuple) the get_hand_score_vector of the kept cards for each discard,
+          in the order of cribbagecompact.DISCARD_OPTIONS over the hand
+    """
+    keeps = np.sort(np.asarray(hand)[KEEP_POSITIONS], axis=1)
+    rows = cribbagesharedtables.get_table("hand_scores")[
+      HAND_CODE_ARRAY[keeps, KEEP_SLOTS].sum(axis=1)]
+    return tuple(row.tobytes() for row in rows)
+
+def hand_score_distribution(hand, dead_cards=()):
+    """Gets the probability of each score of a hand over the unknown cut.
+
+    Args:
+        hand: an iterable of card indices
+        dead_cards: card indices that cannot be the cut
+
+    Returns:
+        (list) the probability of each score from 0 to MAX_HAND_SCORE
+    Raises:
+        ValueError: if every cut is in the hand or dead
+    """
+    counts = hand_score_counts(hand, dead_cards)
+    total = sum(counts)
+    if total == 0:
+        raise ValueError("No cards are left to cut")
+    return [count / total for count in counts]
+
+def distribution_mean(distribution):
+    """Gets the expected score of a distribution."""
+    return sum(score * probability for score, probability in enumerate(distribution))
+
+def probability_of_at_least(distribution, points):
+    """Gets the chance a hand scores at least the given points.
+
+    Args:
+        distribution: a distribution from hand_score_distribution
+        points: the points needed
+
+    Returns:
+        (float) the probability of scoring the points or more
+    """
+    return sum(distribution[max(points, 0):])
+
+def discard_score_distributions(hand, dead_cards=()):
+    """Gets the kept hand's score distribution for all 15 discards at once.
+
+    The discards are dead cards for the cut of every option.
+
+    Args:
+        hand: a sequence of six card indices
+        dead_cards: other card indices that cannot be the cut
+
+    Returns:
+        (list) of (discard, distribution) tuples in the order of
+          cribbagecompact.DISCARD_OPTIONS, where discard is a tuple of the
+          two discarded card indices
+    Raises:
+        ValueError: if every cut is in the hand or dead
+    """
+    dead_cards = set(dead_cards) | set(hand)
+    distributions = []
+    for discard_positions, hand_scores in zip(cribbagecompact.DISCARD_OPTIONS,
+      get_discard_score_vectors(hand)):
+        counts = _count_scores(hand_scores, dead_cards)
+        total = sum(counts)
+        if total == 0:
+            raise ValueError("No cards are left to cut")
+        distributions.append((tuple(hand[position] for position in discard_positions),
+          [count / total for count in counts]))
+
+    return distributions
+
+def crib_score_distributions(hand, dead_cards=()):
+    """Gets the crib's score distribution for all 15 discards at once.
+
+    The opponent's two crib cards are any two cards the player has not
+    seen, every pair equally likely, and the cut is any card left.  The crib
+    is scored like a hand, as the engine scores it.
+
+    Args:
+        hand: a sequence of six card indices
+        dead_cards: other card indices seen, which are neither in the crib
+          nor the cut
+
+    Returns:
+        (list) the probability of each crib score from 0 to MAX_HAND_SCORE for
+          each discard, in the order of cribbagecompact.DISCARD_OPTIONS
+    Raises:
+        ValueError: if too few cards are left for the crib and the cut
+    """
+    unseen = np.array(sorted(set(range(cribbagecompact.DECK_SIZE)) - set(hand) - set(dead_cards)))
+    if len(unseen) < 3:
+        raise ValueError("No cards are left to cut")
+    pairs = np.array(list(combinations(unseen, 2)))
+    discards = np.asarray(hand)[np.array(cribbagecompact.DISCARD_OPTIONS)]
+    cribs = np.sort(np.concatenate([np.broadcast_to(discards[:, None, :],
+      (len(discards), len(pairs), 2)), np.broadcast_to(pairs, (len(discards),) + pairs.shape)],
+      axis=2), axis=2)
+    # The crib's own cards are NOT_A_CUT in its row, so only unseen cuts count
+    scores = cribbagesharedtables.get_table("hand_scores")[
+      HAND_CODE_ARRAY[cribs, KEEP_SLOTS].sum(axis=2)][:, :, unseen]
+    counts = np.stack([np.bincount(option_scores.ravel(), minlength=NOT_A_CUT + 1)
+      for option_scores in scores])[:, :MAX_HAND_SCORE + 1]
+
+    return [(option_counts / option_counts.sum()).tolist() for option_counts in counts]
@@ -10,6 +10,7 @@ A command line, REST, or other interface can be built on top of the main engine.
 __author__ = 'Jordan Reed'
 
 from enum import Enum
+from functools import lru_cache
 from itertools import combinations
 import logging
 import random
@@ -18,6 +19,12 @@ import random
 CARDS_DEALT_IN_HAND = 6
 HIGHEST_RUN_ALLOWED = 31
 
+# The most recent run cards a play can score with, the longest run under 31
+# being an ace through a seven.
+RUN_PLAY_LOOKBACK = 6
+RUN_PLAY_CACHE_SIZE = 1 << 16
+_RECENT_FACES_MASK = (1 << (4 * RUN_PLAY_LOOKBACK)) - 1
+
 
 class Suit(Enum):
     """Provides the four suits of cards"""
@@ -46,11 +53,13 @@ class PlayingCard:
     """
     A playing card has a Suit, Face, and Value.
     The Value is specific to cribbage where face cards are worth 10 points.
+    The Rank is the face as an int, 1 for an ace through 13 for a king.
     """
     def __init__(self, suit: Suit, face: Face, value: int):
         self.suit = suit
         self.face = face
         self.value = value
+        self.rank = face.value
 
     def get_suit_display(self):
         """Gets the unicode character for the suite for display purposes."""
@@ -118,15 +127,159 @@ class PlayingCard:
         return False
 
 
+class ScoringEventType(Enum):
+    """Provides the kinds of scoring events published by the engine."""
+    FIFTEEN = 1
+    THIRTY_ONE = 2
+    PAIR = 3
+    RUN = 4
+    FLUSH = 5
+    HIS_NOB = 6
+    HIS_HEELS = 7
+    GO = 8
+    LAST_CARD = 9
+
+class ScoringEvent:
+    """Describes a single scoring combination found by the engine.
+
+    Attributes:
+        event_type: the ScoringEventType that was found
+        points: the points awarded for the combination
+        cards: a tuple of the PlayingCards that make up the combination
+        player: the player number credited with the points, or 0 when the
+          scorer is not tied to a game (e.g. calculate_score_for_hand)
+    """
+    def __init__(self, event_type, points, cards=(), player=0):
+        self.event_type = event_type
+        self.points = points
+        self.cards = cards
+        self.player = player
+
+    def __str__(self):
+        return f"{self.event_type.name} [{cards_as_string(self.cards)}] " \
+          f"for {self.points} to player #{self.player}"
+
+
+
+class RunPlayResult:
+    """The result of one play_next_run_card, readable as attributes or keys.
+
+    Attributes:
+        run_turn: player number
+        is_go: is it a "go"
+        card_played: the card played, None for a go
+        run_total: the run total
+        points_earned: the points earned
+    """
+    __slots__ = ("run_turn", "is_go", "card_played", "run_total", "points_earned")
+
+    def __init__(self):
+        self.run_turn = 0
+        self.is_go = False
+        self.card_played = None
+        self.run_total = 0
+        self.points_earned = 0
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        """Gets a field by name like dict.get."""
+        return getattr(self, key, default)
+
+
+class RulesConfig:
+    """The rules of a cribbage variant, with its dealing worked out up front.
+
+    Games and players look up everything that differs between variants
+    here, so the standard game keeps its original path and each variant gets
+    its own precomputed deal plan and discard choices.
+
+    Attributes:
+        name: the variant's name
+        player_count: the number of players
+        hand_size: the cards dealt to each player
+        discard_count: the cards each player discards to the crib
+        crib_deal_count: the cards dealt from the deck straight to the crib
+        winning_score: the score that wins the game
+        first_pone_points: the points the first pone pegs before the first deal
+        single_count: if the play ends at the first go or 31, leaving the
+          rest of the cards unpegged
+        kept_size: the cards each player keeps
+        deal_plan: a tuple of who gets each card dealt, as seats counted
+          from the left of the dealer, with 0 for the crib
+        discard_options: every tuple of hand positions a player can discard
+        keep_options: the positions kept with each of discard_options
+    """
+    def __init__(self, name, player_count=2, hand_size=6, discard_count=2, crib_deal_count=0,
+      winning_score=121, first_pone_points=0, single_count=False):
+        self.name = name
+        self.player_count = player_count
+        self.hand_size = hand_size
+        self.discard_count = discard_count
+        self.crib_deal_count = crib_deal_count
+        self.winning_score = winning_score
+        self.first_pone_points = first_pone_points
+        self.single_count = single_count
+        self.kept_size = hand_size - discard_count
+        if player_count * discard_count + crib_deal_count != 4:
+            raise ValueError(f"The {name} crib would not have four cards")
+
+        self.deal_plan = tuple(seat for _ in range(hand_size)
+          for seat in range(1, player_count + 1)) + (0,) * crib_deal_count
+        self.discard_options = tuple(combinations(range(hand_size), discard_count))
+        self.keep_options = tuple(tuple(position for position in range(hand_size)
+          if position not in discard) for discard in self.discard_options)
+
+    def __repr__(self):
+        return f"RulesConfig({self.name!r})"
+
+
+STANDARD_RULES = RulesConfig("standard")
+SHORT_RULES = RulesConfig("short", winning_score=61)
+FIVE_CARD_RULES = RulesConfig("five_card", hand_size=5, winning_score=61, first_pone_points=3,
+  single_count=True)
+THREE_PLAYER_RULES = RulesConfig("three_player", player_count=3, hand_size=5, discard_count=1,
+  crib_deal_count=1)
+RULES_VARIANTS = {rules.name: rules for rules in (STANDARD_RULES, SHORT_RULES, FIVE_CARD_RULES,
+  THREE_PLAYER_RULES)}
+
 
 class CribbageGame:
     """Holds the state information for a game of cribbage.
 
+    A game may be reset and played again instead of making a new one.  In
+    bulk mode the game also reuses the set passed to discard_to_crib and the
+    RunPlayResult returned from play_next_run_card, so players and callers
+    must not keep them past the call.
+
+    Games draw their cards from their own rng and log to their own logger,
+    so games can run on threads and a seeded rng replays a game exactly.
+    Given either, the game also hands them to players with use_game_context.
+    Players are handed the game's rules with use_rules.
+
     Attributes:
         game_deck: A set of PlayingCards still in the deck for the game.
+        is_bulk: if buffers handed out by the game are reused
+        rng: the random.Random the cards are drawn from, the random module
+          by default
+        logger: the logging.Logger the game logs to, the root logger by default
+        rules: the two player RulesConfig of the game
+        round_count: the number of rounds dealt
     """
-    def __init__(self, base_deck, player_one, player_two):
+    def __init__(self, base_deck, player_one, player_two, is_bulk=False, rng=None,
+      logger=None, rules=STANDARD_RULES):
+        if rules.player_count != 2:
+            raise ValueError(f"{rules.name} is not a two player variant")
+        self.rules = rules
+        self.rng = rng if rng is not None else random
+        self.logger = logger if logger is not None else logging.getLogger()
+        self._has_context = rng is not None or logger is not None
         self._base_deck = base_deck
+        self._deck_cards = list(_get_sorted_deck(base_deck))
+        self._discard_hand = set()
+        self._run_play_result = RunPlayResult()
+        self.is_bulk = is_bulk
         self.game_deck = set(self._base_deck)
         self.player_one = player_one
         self.player_one_score = 0
@@ -142,6 +295,59 @@ class CribbageGame:
         self.start_card = None
         self.crib_turn = 0
         self.run_turn = 0
+        self.round_count = 0
+        self._share_context()
+
+    def reset(self, player_one=None, player_two=None, rng=None, logger=None):
+        """Returns the game to its starting state, reusing its containers.
+
+        Args:
+            player_one: a new CribbagePlayer for player one, None to keep it
+            player_two: a new CribbagePlayer for player two, None to keep it
+            rng: a new random.Random for the game, None to keep it
+            logger: a new logging.Logger for the game, None to keep it
+        """
+        if player_one is not None:
+            self.player_one = player_one
+        if player_two is not None:
+            self.player_two = player_two
+        if rng is not None:
+            self.rng = rng
+        if logger is not None:
+            self.logger = logger
+        self._has_context = self._has_context or rng is not None or logger is not None
+        self._share_context()
+
+        self._deck_cards[:] = _get_sorted_deck(self._base_deck)
+        self.game_deck.clear()
+        self.game_deck.update(self._base_deck)
+        self.player_one_score = 0
+        self.player_one_hand.clear()
+        self.player_one_run_hand.clear()
+        self.player_two_score = 0
+        self.player_two_hand.clear()
+        self.player_two_run_hand.clear()
+        self.crib.clear()
+        self.run.clear()
+        self.go_player = 0
+        self.start_card = None
+        self.crib_turn = 0
+        self.run_turn = 0
+        self.round_count = 0
+
+    def _share_context(self):
+        """Hands the game's rules, rng and logger to players that take them."""
+        _share_rules((self.player_one, self.player_two), self.rules)
+        if not self._has_context:
+            return
+        for player in (self.player_one, self.player_two):
+            use_game_context = getattr(player, "use_game_context", None)
+            if use_game_context is not None:
+                use_game_context(self.rng, self.logger)
+
+    def _is_logging_info(self):
+        """Checks if info messages are logged, to skip building their card strings."""
+        return self.logger.isEnabledFor(logging.INFO)
 
     @staticmethod
     def get_cards_total_value(cards):
@@ -167,7 +373,13 @@ class CribbageGame:
         This will remove cards from game_deck and put them into player_one_hand
         and player_two_hand.
         """
-        self.game_deck = set(self._base_deck)
+        deck_cards = self._deck_cards
+        deck_cards[:] = _get_sorted_deck(self._base_deck)
+
+        self.round_count += 1
+        if self.crib_turn == 0 and self.rules.first_pone_points:
+            self.player_two_score += self.rules.first_pone_points
+            self.logger.info("Player #2 pegs %i as the first pone", self.rules.first_pone_points)
 
         if self.crib_turn in (0, 2):
             self.crib_turn = 1
@@ -177,58 +389,89 @@ class CribbageGame:
             self.run_turn = 1
 
 
-        self.player_one_hand = set()
-        self.player_two_hand = set()
-        self.crib = set()
+        self.player_one_hand.clear()
+        self.player_two_hand.clear()
+        self.crib.clear()
+        self.run.clear()
+        self.go_player = 0
 
-        for _ in range(CARDS_DEALT_IN_HAND):
-            card = random.sample(sorted(self.game_deck), 1)[0]
-            self.game_deck.remove(card)
-            self.player_one_hand.add(card)
+        # The deck is kept sorted, so each draw takes the same card that
+        # random.sample(sorted(game_deck), 1) would
+        for _ in range(self.rules.hand_size):
+            self.player_one_hand.add(deck_cards.pop(self.rng.randrange(len(deck_cards))))
+            self.player_two_hand.add(deck_cards.pop(self.rng.randrange(len(deck_cards))))
 
-            card = random.sample(sorted(self.game_deck), 1)[0]
-            self.game_deck.remove(card)
-            self.player_two_hand.add(card)
+        self.game_deck.clear()
+        self.game_deck.update(deck_cards)
 
-        logging.info("Hands are dealt --")
-        logging.info("P1 Hand: %s", cards_as_string(self.player_one_hand))
-        logging.info("P2 Hand: %s", cards_as_string(self.player_two_hand))
+        if self._is_logging_info():
+            self.logger.info("Hands are dealt --")
+            self.logger.info("P1 Hand: %s", cards_as_string(self.player_one_hand))
+            self.logger.info("P2 Hand: %s", cards_as_string(self.player_two_hand))
 
     def discard_to_crib(self):
         """Allows both players to pick two cards to put into the crib."""
-        crib_cards = self.player_one.discard_to_crib(set(self.player_one_hand))
+        _call_hook(self.player_one, "start_round", self.crib_turn == 1,
+          self.player_one_score, self.player_two_score)
+        _call_hook(self.player_two, "start_round", self.crib_turn == 2,
+          self.player_two_score, self.player_one_score)
+
+        crib_cards = self.player_one.discard_to_crib(self._get_discard_hand(self.player_one_hand))
         for crib_card in crib_cards:
             self.crib.add(crib_card)
             self.player_one_hand.remove(crib_card)
 
-        crib_cards = self.player_two.discard_to_crib(set(self.player_two_hand))
+        crib_cards = self.player_two.discard_to_crib(self._get_discard_hand(self.player_two_hand))
         for crib_card in crib_cards:
             self.crib.add(crib_card)
             self.player_two_hand.remove(crib_card)
 
-        logging.info("Discarded to Crib --")
-        logging.info("P1 Hand: %s", cards_as_string(self.player_one_hand))
-        logging.info("P2 Hand: %s", cards_as_string(self.player_two_hand))
-        logging.info("Crib: %s", cards_as_string(self.crib))
+        if self._is_logging_info():
+            self.logger.info("Discarded to Crib --")
+            self.logger.info("P1 Hand: %s", cards_as_string(self.player_one_hand))
+            self.logger.info("P2 Hand: %s", cards_as_string(self.player_two_hand))
+            self.logger.info("Crib: %s", cards_as_string(self.crib))
+
+    def _get_discard_hand(self, hand):
+        """Copies a hand for a player to discard from, reusing a set in bulk mode."""
+        if not self.is_bulk:
+            return set(hand)
+        self._discard_hand.clear()
+        self._discard_hand.update(hand)
+        return self._discard_hand
 
     def cut_start_card(self):
         """Picks a random start card and check for his heels (2 points to dealer)"""
-        card = random.sample(sorted(self.game_deck), 1)[0]
+        deck_cards = self._deck_cards
+        if len(deck_cards) != len(self.game_deck):
+            # The deck was changed outside of deal_cards
+            deck_cards[:] = sorted(self.game_deck)
+        card = deck_cards.pop(self.rng.randrange(len(deck_cards)))
         self.game_deck.remove(card)
         self.start_card = card
-        logging.info("Start Card: %s", card.get_display())
+        if self._is_logging_info():
+            self.logger.info("Start Card: %s", card.get_display())
 
         ## If it's a jack, dealer gets 2 points
         if card.face == Face.JACK:
             if self.run_turn == 2:
                 self.player_one_score += 1
-                logging.info("Dealer Gets His Heels for +2: %s", self.player_one_score)
+                self.logger.info("Dealer Gets His Heels for +2: %s", self.player_one_score)
             else:
                 self.player_two_score += 1
-                logging.info("Dealer Gets His Heels for +2: %s", self.player_two_score)
+                self.logger.info("Dealer Gets His Heels for +2: %s", self.player_two_score)
+
+            if _scoring_event_subscribers:
+                _publish_scoring_event(ScoringEventType.HIS_HEELS, 1, (card,),
+                  self.crib_turn)
 
-        self.player_one_run_hand = set(self.player_one_hand)
-        self.player_two_run_hand = set(self.player_two_hand)
+        self.player_one_run_hand.clear()
+        self.player_one_run_hand.update(self.player_one_hand)
+        self.player_two_run_hand.clear()
+        self.player_two_run_hand.update(self.player_two_hand)
+
+        _call_hook(self.player_one, "observe_start_card", card)
+        _call_hook(self.player_two, "observe_start_card", card)
 
     def is_more_run_cards(self):
         """Checks if either player has more cards in their run hand to play.
@@ -247,13 +490,9 @@ class CribbageGame:
         If there is no way to play a run card, then it will exit.
 
         Returns:
-            (map): results of the play
-              run_turn: player number
-              is_go: is it a "go"
-              card_played: the card played
-              run_total: the run total
-              points_earned: the points earned.
-       Raises:
+            (RunPlayResult): results of the play, reused by the next play in
+              bulk mode
+        Raises:
             RuntimeError: if there are no more cards to play.  Check first using
               the is_more_run_cards method.
         """
@@ -261,13 +500,14 @@ class CribbageGame:
             raise RuntimeError("Cannot play if there are no more cards.")
 
         # Tracks the result of the play
-        run_play_result = {}
+        run_play_result = self._run_play_result if self.is_bulk else RunPlayResult()
 
         # Set the following method variables for the run
         # active_run_player - the AI for the active player
         # active_run_hand - the active player's hand
-        run_play_result["run_turn"] = self.run_turn
-        run_play_result["points_earned"] = 0
+        run_play_result.run_turn = self.run_turn
+        run_play_result.points_earned = 0
+        run_play_result.card_played = None
         if self.run_turn == 1:
             active_run_player = self.player_one
             active_run_hand = self.player_one_run_hand
@@ -277,113 +517,136 @@ class CribbageGame:
 
         ## Test if the player can play a card and stay under 31
         run_total = CribbageGame.get_cards_total_value(self.run)
-        logging.info("Checking if player #%i can play against run %i",
+        self.logger.info("Checking if player #%i can play against run %i",
           self.run_turn, run_total)
 
-        if self._can_play_card(active_run_hand):
-            result = self._play_run_card(active_run_player, active_run_hand)
-            run_play_result["is_go"] = False
-            run_play_result["card_played"] = result[0]
-            run_play_result["points_earned"] += result[1]
+        is_count_over = False
+        if self._can_play_card(active_run_hand, run_total):
+            result = self._play_run_card(active_run_player, active_run_hand, run_total)
+            run_play_result.is_go = False
+            run_play_result.card_played = result[0]
+            run_play_result.points_earned += result[1]
+            run_total += result[0].value
         else:
-            run_play_result["is_go"] = True
-            self._play_call_go()
+            run_play_result.is_go = True
+            if self._play_call_go(run_total):
+                run_total = 0
+                if self.rules.single_count:
+                    # The play ends with the first count, and its go has scored
+                    self.player_one_run_hand.clear()
+                    self.player_two_run_hand.clear()
+                    is_count_over = True
 
 
         # The last card gets one more point
-        if not self.is_more_run_cards():
+        if not is_count_over and not self.is_more_run_cards():
             if self.run_turn == 1:
                 self.player_one_score += 1
-                logging.info("Player #1 plays last card scores to total %i",
+                self.logger.info("Player #1 plays last card scores to total %i",
                   (self.player_one_score))
             else:
                 self.player_two_score += 1
-                logging.info("Player #2 plays last card scores to total %i",
+                self.logger.info("Player #2 plays last card scores to total %i",
                   (self.player_two_score))
 
+            if _scoring_event_subscribers:
+                _publish_scoring_event(ScoringEventType.LAST_CARD, 1, (),
+                  self.run_turn)
+
+
+        # Let both players see the card played, or the go
+        run_card = run_play_result.card_played
+        _call_hook(self.player_one, "observe_run_play", self.run_turn == 1, run_card)
+        _call_hook(self.player_two, "observe_run_play", self.run_turn == 2, run_card)
 
         self.run_turn = 2 if self.run_turn == 1 else 1
-        run_play_result["run_total"] = CribbageGame.get_cards_total_value(self.run)
+        run_play_result.run_total = run_total
         return run_play_result
 
-    def _can_play_card(self, active_run_hand):
+    def _can_play_card(self, active_run_hand, run_total):
         """Checks if the hand has a card it is able to play.
         It must stay under the maximum of 31.
         """
-        can_play_card = False
-        run_total = CribbageGame.get_cards_total_value(self.run)
-        logging.info("Checking if player #%i can play against run %i",
-          self.run_turn, run_total)
-
         for card in active_run_hand:
-            logging.debug("Player #%i run total [%i] + card %s [%i]",
-              self.run_turn, run_total, card.get_display(), card.value)
-
             if run_total + card.value <= HIGHEST_RUN_ALLOWED:
-                can_play_card = True
+                return True
 
-        return can_play_card
+        return False
 
-    def _play_run_card(self, active_run_player, active_run_hand):
+    def _play_run_card(self, active_run_player, active_run_hand, run_total):
         """Plays a card from the player onto the run.
 
         Args:
             active_run_player: the CribbagePlayer who plays
             active_run_hand: the hand of cards the player has left
+            run_total: the total value of the run
         Returns:
             (PlayingCard) the card played
             (int) The points earned for the card
         """
-        run_total = CribbageGame.get_cards_total_value(self.run)
-        logging.info("Player #%i can play against run %i",
+        self.logger.info("Player #%i can play against run %i",
           self.run_turn, run_total)
 
         run_card = active_run_player.get_run_card(
                      active_run_hand, self.run, run_total)
 
         points_for_card = calculate_score_for_run_play(self.run, run_card)
-        logging.info("Player #%i played %s for %i points against the run %s",
-          self.run_turn, run_card.get_display(), points_for_card,
-          cards_as_string(self.run))
+        is_logging_info = self._is_logging_info()
+        if is_logging_info:
+            self.logger.info("Player #%i played %s for %i points against the run %s",
+              self.run_turn, run_card.get_display(), points_for_card,
+              cards_as_string(self.run))
 
         if self.run_turn == 1:
             self.player_one_score += points_for_card
-            logging.info("Player #1 scores to total %i", self.player_one_score)
+            self.logger.info("Player #1 scores to total %i", self.player_one_score)
         else:
             self.player_two_score += points_for_card
-            logging.info("Player #2 scores to total %i", self.player_two_score)
+            self.logger.info("Player #2 scores to total %i", self.player_two_score)
 
         active_run_hand.remove(run_card)
         self.run.append(run_card)
 
-        logging.info("Player #%i played %s, the run is now %s",
-          self.run_turn, run_card.get_display(), cards_as_string(self.run))
+        if is_logging_info:
+            self.logger.info("Player #%i played %s, the run is now %s",
+              self.run_turn, run_card.get_display(), cards_as_string(self.run))
 
         return run_card, points_for_card
 
-    def _play_call_go(self):
-        run_total = CribbageGame.get_cards_total_value(self.run)
-        logging.info("Player #%i cannot play against run %i",
+    def _play_call_go(self, run_total):
+        """Calls a go for the active player.
+
+        Returns:
+            (bool) if the run was reset
+        """
+        self.logger.info("Player #%i cannot play against run %i",
           self.run_turn, run_total)
 
         # The active player cannot play.
         # If no one has said "Go" - the active player says "Go"
         if self.go_player == 0:
             self.go_player = self.run_turn
-            logging.info("Player #%i call a Go", self.run_turn)
+            self.logger.info("Player #%i call a Go", self.run_turn)
             # The other player gets one point when Go happens.
             if self.run_turn == 1:
                 self.player_two_score += 1
-                logging.info("Player #2 scores to total %i", self.player_two_score)
+                self.logger.info("Player #2 scores to total %i", self.player_two_score)
             else:
                 self.player_one_score += 1
-                logging.info("Player #1 scores to total %i", self.player_one_score)
+                self.logger.info("Player #1 scores to total %i", self.player_one_score)
+
+            if _scoring_event_subscribers:
+                _publish_scoring_event(ScoringEventType.GO, 1, (),
+                  2 if self.run_turn == 1 else 1)
 
         # If someone has said "Go" and it was the other player
         # then reset the run
         elif self.go_player != self.run_turn:
-            self.run = []
+            self.run.clear()
             self.go_player = 0
+            return True
+
+        return False
 
 
     def score_pone_hand(self):
@@ -394,7 +657,7 @@ class CribbageGame:
 
             self.player_two_score += hand_score
         else:
-            hand_score = calculate_score_for_hand(list(self.player_two_hand), self.start_card)
+            hand_score = calculate_score_for_hand(list(self.player_one_hand), self.start_card)
 
             self.player_one_score += hand_score
 
@@ -408,7 +671,7 @@ class CribbageGame:
 
             self.player_two_score += hand_score
         else:
-            hand_score = calculate_score_for_hand(list(self.player_two_hand), self.start_card)
+            hand_score = calculate_score_for_hand(list(self.player_one_hand), self.start_card)
 
             self.player_one_score += hand_score
 
@@ -429,6 +692,203 @@ class CribbageGame:
         return hand_score
 
 
+class MultiPlayerCribbageGame:
+    """Holds the state of a game for any number of players, like three player cribbage.
+
+    Seats are numbered from 0, and play passes to the left, the next seat.
+    The players use the same hooks as in CribbageGame, with opponent_score
+    the best score of the other players.  In the run a player who cannot
+    play says go and waits for the next run.  Once no one can play, the
+    last player to play pegs 1 unless the run made 31, and the next seat to
+    the left of them starts a new run.
+
+    Attributes:
+        players: the player in each seat
+        scores: the score of each seat
+        hands: the set of PlayingCards each seat holds
+        run_hands: the set of PlayingCards each seat still has to play
+        crib: the set of PlayingCards in the crib
+        run: the list of PlayingCards in the current run
+        start_card: the PlayingCard cut, None before the cut
+        dealer: the dealer's seat, -1 before the first deal
+        run_turn: the seat playing next in the run
+        round_count: the number of rounds dealt
+        rules: the RulesConfig of the game
+        rng: the random.Random the cards are drawn from
+        logger: the logging.Logger the game logs to
+    """
+    def __init__(self, base_deck, players, rules=THREE_PLAYER_RULES, rng=None, logger=None):
+        if len(players) != rules.player_count:
+            raise ValueError(f"{rules.name} needs {rules.player_count} players")
+        self.rules = rules
+        self.rng = rng if rng is not None else random
+        self.logger = logger if logger is not None else logging.getLogger()
+        self._base_deck = base_deck
+        self._deck_cards = list(_get_sorted_deck(base_deck))
+        self.game_deck = set(base_deck)
+        self.players = list(players)
+        self.scores = [0] * len(players)
+        self.hands = [set() for _ in players]
+        self.run_hands = [set() for _ in players]
+        self.crib = set()
+        self.run = []
+        self.start_card = None
+        self.dealer = -1
+        self.run_turn = 0
+        self.round_count = 0
+        self._last_player = -1
+        _share_rules(self.players, rules)
+        if rng is not None or logger is not None:
+            for player in self.players:
+                use_game_context = getattr(player, "use_game_context", None)
+                if use_game_context is not None:
+                    use_game_context(self.rng, self.logger)
+
+    def get_left_seat(self, seat):
+        """Gets the seat to the left of a seat."""
+        return (seat + 1) % len(self.players)
+
+    def _get_next_seat_with_cards(self, seat):
+        """Gets the first seat to the left of a seat that has cards to play."""
+        for _ in range(len(self.players)):
+            seat = self.get_left_seat(seat)
+            if self.run_hands[seat]:
+                break
+        return seat
+
+    def is_won(self):
+        """Checks if a seat has reached the winning score."""
+        return max(self.scores) >= self.rules.winning_score
+
+    def deal_cards(self):
+        """Passes the deal to the left and deals the hands and crib cards."""
+        is_first_deal = self.dealer < 0
+        self.round_count += 1
+        self.dealer = self.get_left_seat(self.dealer)
+        if is_first_deal and self.rules.first_pone_points:
+            self.scores[self.get_left_seat(self.dealer)] += self.rules.first_pone_points
+
+        deck_cards = self._deck_cards
+        deck_cards[:] = _get_sorted_deck(self._base_deck)
+        for hand in self.hands:
+            hand.clear()
+        self.crib.clear()
+        self.run.clear()
+
+        player_count = len(self.players)
+        for seat in self.rules.deal_plan:
+            card = deck_cards.pop(self.rng.randrange(len(deck_cards)))
+            if seat:
+                self.hands[(self.dealer + seat) % player_count].add(card)
+            else:
+                self.crib.add(card)
+
+        self.game_deck.clear()
+        self.game_deck.update(deck_cards)
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Seat #%i deals --", self.dealer)
+            for seat, hand in enumerate(self.hands):
+                self.logger.info("Seat #%i Hand: %s", seat, cards_as_string(hand))
+
+    def discard_to_crib(self):
+        """Lets every player discard to the crib."""
+        for seat, player in enumerate(self.players):
+            _call_hook(player, "start_round", seat == self.dealer, self.scores[seat],
+              max(score for other_seat, score in enumerate(self.scores) if other_seat != seat))
+
+        for player, hand in zip(self.players, self.hands):
+            for crib_card in player.discard_to_crib(set(hand)):
+                self.crib.add(crib_card)
+                hand.remove(crib_card)
+
+    def cut_start_card(self):
+        """Cuts the start card, the dealer pegging for his heels."""
+        deck_cards = self._deck_cards
+        if len(deck_cards) != len(self.game_deck):
+            deck_cards[:] = sorted(self.game_deck)
+        card = deck_cards.pop(self.rng.randrange(len(deck_cards)))
+        self.game_deck.remove(card)
+        self.start_card = card
+        if card.face == Face.JACK:
+            self.scores[self.dealer] += 1
+
+        for hand, run_hand in zip(self.hands, self.run_hands):
+            run_hand.clear()
+            run_hand.update(hand)
+        self.run.clear()
+        self.run_turn = self.get_left_seat(self.dealer)
+        self._last_player = -1
+        for player in self.players:
+            _call_hook(player, "observe_start_card", card)
+
+    def is_more_run_cards(self):
+        """Checks if any player has cards left to play."""
+        return any(self.run_hands)
+
+    def play_next_run_card(self):
+        """Plays the next turn of the run.
+
+        Returns:
+            (RunPlayResult): the result of the play, with run_turn as the seat
+        Raises:
+            RuntimeError: if there are no more cards to play
+        """
+        if not self.is_more_run_cards():
+            raise RuntimeError("Cannot play if there are no more cards.")
+
+        run_play_result = RunPlayResult()
+        seat = self.run_turn
+        run_hand = self.run_hands[seat]
+        run_total = CribbageGame.get_cards_total_value(self.run)
+        run_play_result.run_turn = seat
+        run_play_result.is_go = not _can_play(run_hand, run_total)
+        if not run_play_result.is_go:
+            run_card = self.players[seat].get_run_card(run_hand, self.run, run_total)
+            points = calculate_score_for_run_play(self.run, run_card)
+            self.scores[seat] += points
+            run_hand.remove(run_card)
+            self.run.append(run_card)
+            run_total += run_card.value
+            self._last_player = seat
+            run_play_result.card_played = run_card
+            run_play_result.points_earned = points
+
+        for other_seat, player in enumerate(self.players):
+            _call_hook(player, "observe_run_play", other_seat == seat,
+              run_play_result.card_played)
+
+        if not any(_can_play(hand, run_total) for hand in self.run_hands):
+            # No one can play, so the run ends
+            if run_total != HIGHEST_RUN_ALLOWED:
+                self.scores[self._last_player] += 1
+                if self._last_player == seat:
+                    run_play_result.points_earned += 1
+            self.run.clear()
+            run_total = 0
+            seat = self._last_player
+            if self.rules.single_count:
+                for run_hand in self.run_hands:
+                    run_hand.clear()
+        self.run_turn = self._get_next_seat_with_cards(seat)
+        run_play_result.run_total = run_total
+        return run_play_result
+
+    def score_hands(self):
+        """Scores the hands from the dealer's left, then the dealer's crib.
+
+        Returns:
+            (list) the hand points of each seat, the crib counted to the dealer
+        """
+        hand_scores = [0] * len(self.players)
+        for offset in range(1, len(self.players) + 1):
+            seat = (self.dealer + offset) % len(self.players)
+            hand_scores[seat] = calculate_score_for_hand(list(self.hands[seat]), self.start_card)
+            if seat == self.dealer:
+                hand_scores[seat] += calculate_score_for_hand(list(self.crib), self.start_card)
+            self.scores[seat] += hand_scores[seat]
+        return hand_scores
+
+
 class CribbageEngine:
     """
     Represents the main engine for storage and manipulation of the state of the game.
@@ -463,16 +923,30 @@ class CribbageEngine:
         logging.info("CribbageEngine initialized")
 
 
-    def new_game(self, player_one, player_two):
+    def new_game(self, player_one, player_two, is_bulk=False, rng=None, logger=None,
+      rules=STANDARD_RULES):
         """Creates and returns a new game with the given players.
 
         Args:
             player_one: a CribbagePlayer AI for player one
             player_two: a CribbagePlayer AI for player two
+            is_bulk: reuse the buffers handed to players and callers, for
+              simulations that reset one game instead of making many
+            rng: the game's random.Random, the random module by default
+            logger: the game's logging.Logger, the root logger by default
+            rules: the game's two player RulesConfig
         Returns:
             (CribbageGame) a new instance of a game
         """
-        return CribbageGame(self.base_deck, player_one, player_two)
+        return CribbageGame(self.base_deck, player_one, player_two, is_bulk, rng, logger, rules)
+
+    def new_multiplayer_game(self, players, rules=THREE_PLAYER_RULES, rng=None, logger=None):
+        """Creates a game for the players of a variant like three player cribbage.
+
+        Returns:
+            (MultiPlayerCribbageGame) a new instance of a game
+        """
+        return MultiPlayerCribbageGame(self.base_deck, players, rules, rng, logger)
 
     def get_deck_copy(self):
         """Returns a copy of the full base deck."""
@@ -480,7 +954,82 @@ class CribbageEngine:
         return set(self.base_deck)
 
 
+## Scoring Event Subscriptions
+# Maps a ScoringEventType to a tuple of subscribed callbacks.  Event types with
+# no subscribers are removed so the scorers only need a truthiness check to
+# skip building events entirely.
+_scoring_event_subscribers = {}
+
+def subscribe_scoring_event(event_type, callback):
+    """Registers a callback to receive ScoringEvents of the given type.
+
+    Args:
+        event_type: the ScoringEventType to listen for
+        callback: a callable that accepts a single ScoringEvent
+    """
+    _scoring_event_subscribers[event_type] = \
+      _scoring_event_subscribers.get(event_type, ()) + (callback,)
+
+def unsubscribe_scoring_event(event_type, callback):
+    """Removes a callback previously registered with subscribe_scoring_event.
+
+    Args:
+        event_type: the ScoringEventType the callback listens for
+        callback: the callable to remove
+
+    Raises:
+        ValueError: if the callback is not subscribed to the event type.
+    """
+    callbacks = list(_scoring_event_subscribers.get(event_type, ()))
+    callbacks.remove(callback)
+    if callbacks:
+        _scoring_event_subscribers[event_type] = tuple(callbacks)
+    else:
+        del _scoring_event_subscribers[event_type]
+
+def log_scoring_event(event):
+    """A ready made subscriber that writes each ScoringEvent to the log.
+
+    Args:
+        event: the ScoringEvent to log
+    """
+    logging.info("Scored %s", event)
+
+def _publish_scoring_event(event_type, points, cards, player=0):
+    """Builds a ScoringEvent and hands it to each subscriber of its type."""
+    callbacks = _scoring_event_subscribers.get(event_type)
+    if callbacks:
+        event = ScoringEvent(event_type, points, cards, player)
+        for callback in callbacks:
+            callback(event)
+
+
 ## Static Helper Methods
+def _share_rules(players, rules):
+    """Hands a game's rules to the players that take them."""
+    for player in players:
+        use_rules = getattr(player, "use_rules", None)
+        if use_rules is not None:
+            use_rules(rules)
+
+def _call_hook(player, hook_name, *args):
+    """Calls a player's optional hook, skipping players that do not have it."""
+    hook = getattr(player, hook_name, None)
+    if hook is not None:
+        hook(*args)
+
+def _can_play(hand, run_total):
+    """Checks if a hand has a card that keeps the run at 31 or under."""
+    for card in hand:
+        if run_total + card.value <= HIGHEST_RUN_ALLOWED:
+            return True
+    return False
+
+@lru_cache(maxsize=4)
+def _get_sorted_deck(base_deck):
+    """Gets the cards of a deck in sorted order, shared by every game."""
+    return tuple(sorted(base_deck))
+
 def cards_as_string(cards):
     """Converts a list of PlayingCards into a comma-separated string.
 
@@ -509,33 +1058,51 @@ def calculate_score_for_run_play(run, run_card):
     Raises:
         TODO: Invalid Input errors
     """
+    is_observed = bool(_scoring_event_subscribers)
+    if not is_observed:
+        # Without subscribers only the points are needed, so look them up by
+        # the key get_run_play_key would pack
+        run_total = 0
+        recent_faces = 0
+        for card in run:
+            run_total += card.value
+            recent_faces = ((recent_faces << 4) | card.rank) & _RECENT_FACES_MASK
+        if run_total <= HIGHEST_RUN_ALLOWED:
+            return score_run_play_key((((recent_faces << 6) | run_total) << 4) | run_card.rank)
+
     run_play_score = 0
     run_total = CribbageGame.get_cards_total_value(run)
 
     if run:
         # 2 points if you get 15 or 31 in the run
         if run_total + run_card.value == 15 or run_total + run_card.value == 31:
-            logging.debug("Adding 2 points for a 15 or 31")
             run_play_score += 2
+            if is_observed:
+                _publish_scoring_event(
+                  ScoringEventType.FIFTEEN if run_total + run_card.value == 15
+                    else ScoringEventType.THIRTY_ONE,
+                  2, tuple(run) + (run_card,))
 
         # 2 points for every pair.  This is a combinatorial function
         total_pairs = 0
         pair_lookback = -1
         while len(run) >= abs(pair_lookback) and run[pair_lookback].face == run_card.face:
-            logging.debug("Adding 1 pair to the count")
             total_pairs += 1
             pair_lookback -= 1
 
         # starting pythong 3.8 you can use math.comb
+        pair_play_score = 0
         if total_pairs == 1:
-            logging.debug("Adding 2 points for a pair")
-            run_play_score += 2
+            pair_play_score = 2
         elif total_pairs == 2:
-            logging.debug("Adding 6 points for a double pair")
-            run_play_score += 6
+            pair_play_score = 6
         elif total_pairs == 3:
-            logging.debug("Adding 12 points for a triple pair")
-            run_play_score += 12
+            pair_play_score = 12
+
+        run_play_score += pair_play_score
+        if is_observed and pair_play_score:
+            _publish_scoring_event(ScoringEventType.PAIR, pair_play_score,
+              tuple(run[-total_pairs:]) + (run_card,))
 
         # 1 point for each card in a sequence, even if it's out of order
         sequence_check_list = []
@@ -546,12 +1113,86 @@ def calculate_score_for_run_play(run, run_card):
         while len(sequence_check_list) >= 3:
             if _can_sort_values_to_sequence(sequence_check_list):
                 run_play_score += len(sequence_check_list)
+                if is_observed:
+                    _publish_scoring_event(ScoringEventType.RUN,
+                      len(sequence_check_list),
+                      tuple(run[1 - len(sequence_check_list):]) + (run_card,))
                 del sequence_check_list[:]
             else:
                 sequence_check_list.pop(0)
 
     return run_play_score
 
+def push_recent_face(recent_faces, face):
+    """Adds a card's face value to packed recent faces of the run.
+
+    Args:
+        recent_faces: the packed faces, 4 bits each with the newest lowest,
+          0 for an empty run
+        face: the face value, 1 for an ace through 13 for a king
+
+    Returns:
+        (int) the packed faces, keeping the newest RUN_PLAY_LOOKBACK
+    """
+    return ((recent_faces << 4) | face) & _RECENT_FACES_MASK
+
+def get_run_play_key(recent_faces, run_total, face):
+    """Packs a run play into the key for score_run_play_key.
+
+    Args:
+        recent_faces: the faces of the run packed by push_recent_face
+        run_total: the total value of the run
+        face: the face value of the card being played
+
+    Returns:
+        (int) the key
+    """
+    return (((recent_faces << 6) | run_total) << 4) | face
+
+@lru_cache(maxsize=RUN_PLAY_CACHE_SIZE)
+def score_run_play_key(key):
+    """Gets the points for a run play from its packed key.
+
+    Matches calculate_score_for_run_play, which only ever needs the recent
+    faces, the run total and the face played.
+
+    Args:
+        key: the key from get_run_play_key
+
+    Returns:
+        (int) the points for the play
+    """
+    face = key & 0xF
+    run_total = (key >> 4) & 0x3F
+    recent_faces = key >> 10
+    if not recent_faces:
+        return 0
+
+    faces = []
+    while recent_faces:
+        faces.append(recent_faces & 0xF)
+        recent_faces >>= 4
+    faces.reverse()
+
+    run_play_score = 0
+    new_total = run_total + min(face, 10)
+    if new_total in (15, HIGHEST_RUN_ALLOWED):
+        run_play_score += 2
+
+    total_pairs = 0
+    while total_pairs < len(faces) and faces[-1 - total_pairs] == face:
+        total_pairs += 1
+    run_play_score += (0, 2, 6, 12)[total_pairs]
+
+    faces.append(face)
+    while len(faces) >= 3:
+        if _can_sort_values_to_sequence(faces):
+            run_play_score += len(faces)
+            break
+        faces.pop(0)
+
+    return run_play_score
+
 def calculate_score_for_hand(player_hand, start_card):
     """Calculates the score of points for the current hand.
     Args:
@@ -561,18 +1202,12 @@ def calculate_score_for_hand(player_hand, start_card):
     Returns:
         (int) the score for the hand
     """
-
-    logging.info("Calculating score for player hand [%s] with start card [%s]",
-      cards_as_string(player_hand), start_card.get_display())
-
+    is_observed = bool(_scoring_event_subscribers)
     hand_play_score = 0
     player_full_hand = player_hand.copy()
 
     ## Check for His Nob Before Appending the Start Card
-    his_nob_score = _calculate_score_for_hand_his_nob(player_hand, start_card)
-    hand_play_score += his_nob_score
-    logging.info("His nob score [%s] gives total hand score [%s]",
-      his_nob_score, hand_play_score)
+    hand_play_score += _calculate_score_for_hand_his_nob(player_hand, start_card)
 
     ## Check for a flush and full flush before appending the start card
     ## Todo: the crib must be a full flush
@@ -584,14 +1219,15 @@ def calculate_score_for_hand(player_hand, start_card):
             is_flush = False
 
     if is_flush:
-        if temp_flush_suit == start_card.suit:
-            flush_play_score = 5
-        else:
-            flush_play_score = 4
+        # Every card of the hand, and the start card if it matches
+        is_full_flush = temp_flush_suit == start_card.suit
+        flush_play_score = len(player_hand) + is_full_flush
+
+        if is_observed:
+            _publish_scoring_event(ScoringEventType.FLUSH, flush_play_score,
+              tuple(player_hand) + ((start_card,) if is_full_flush else ()))
 
     hand_play_score += flush_play_score
-    logging.info("Flush score [%s] gives total hand score [%s]",
-      flush_play_score, hand_play_score)
 
     player_full_hand.append(start_card)
 
@@ -602,8 +1238,8 @@ def calculate_score_for_hand(player_hand, start_card):
             cards_total_value = CribbageGame.get_cards_total_value(combo)
             if cards_total_value == 15:
                 hand_play_score += 2
-                logging.info("Found 15 [%s] for 2 gives total hand score [%s]",
-                  cards_as_string(combo), hand_play_score)
+                if is_observed:
+                    _publish_scoring_event(ScoringEventType.FIFTEEN, 2, combo)
 
 
     ## Find all pairs, they each are 2 points
@@ -612,8 +1248,8 @@ def calculate_score_for_hand(player_hand, start_card):
     for combo in combinations_set:
         if combo[0].face == combo[1].face:
             hand_play_score += 2
-            logging.info("Found pair [%s] for 2 gives total hand score [%s]",
-              cards_as_string(combo), hand_play_score)
+            if is_observed:
+                _publish_scoring_event(ScoringEventType.PAIR, 2, combo)
 
     ## Find the runs, but don't count sub-runs.  Runs are between 3-5 cards. If the
     ## larger run of 4-5 is scored, subruns should be ignored.
@@ -627,14 +1263,13 @@ def calculate_score_for_hand(player_hand, start_card):
                 for found_sequence in found_sequences:
                     if set(combo) <= set(found_sequence):
                         is_subsequence = True
-                        logging.info("Sequence [%s] is sub-sequence of [%s]",
-                          cards_as_string(combo), cards_as_string(found_sequence))
 
                 if not is_subsequence:
                     sequence_play_score = len(combo)
                     hand_play_score += sequence_play_score
-                    logging.info("Found sequence [%s] for [%s] gives total [%s]",
-                      cards_as_string(combo), sequence_play_score, hand_play_score)
+                    if is_observed:
+                        _publish_scoring_event(ScoringEventType.RUN,
+                          sequence_play_score, combo)
                     found_sequences.add(combo)
 
 
@@ -655,6 +1290,9 @@ def _calculate_score_for_hand_his_nob(player_hand, start_card):
     for card in player_hand:
         if card.face == Face.JACK and card.suit == start_card.suit:
             hand_play_score += 1
+            if _scoring_event_subscribers:
+                _publish_scoring_event(ScoringEventType.HIS_NOB, 1,
+                  (card, start_card))
 
     return hand_play_score
 
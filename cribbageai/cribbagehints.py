@@ -0,0 +1,426 @@
+"""Plays a human against a bot, thinking ahead while the human decides.
+
+While input() waits on the human, a background thread works through
+speculative jobs: the values of the human's options, shown as hints, and
+the bot's reply to each move the human could make.  When the human moves,
+the jobs the move made irrelevant are cancelled and the bot plays the reply
+already worked out for it, so hints and bot moves appear at once.
+
+  jobs = SpeculativeJobs(budget=10)
+  bot = SpeculativeBot("optimized", jobs)
+  human = HumanPlayer(jobs, bot)
+  cribbage_game = cribbageengine.CribbageEngine().new_game(human, bot)
+  human.attach(cribbage_game, 1)
+
+Bot moves are made the same way the game server makes them, by a fresh
+player replaying the round's observations, so a speculative reply is the
+move the bot would have made when asked.
+
+"""
+
+from collections import deque
+import threading
+import time
+
+import cribbagecompact
+import cribbagedecisions
+import cribbageengine
+import cribbageserver
+
+DEFAULT_BUDGET = 10.0
+
+PENDING_STATE = "pending"
+RUNNING_STATE = "running"
+DONE_STATE = "done"
+
+
+class _Job:
+    """A speculative call and its result once run."""
+    def __init__(self, function, args, deadline):
+        self.function = function
+        self.args = args
+        self.deadline = deadline
+        self.state = PENDING_STATE
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def run(self):
+        """Calls the function, keeping its result or error."""
+        try:
+            self.result = self.function(*self.args)
+        except Exception as error:  # pylint: disable=broad-except
+            self.error = error
+        self.state = DONE_STATE
+        self.done.set()
+
+
+class SpeculativeJobs:
+    """Runs keyed jobs on a background thread until they are cancelled.
+
+    Jobs run in the order submitted.  A job still waiting when its time
+    budget runs out is skipped, and only runs if its result is asked for.
+
+    Attributes:
+        budget: the seconds after submitting that a job may still start
+        run_count: the number of jobs run in the background
+        cancelled_count: the number of jobs cancelled before being used
+    """
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.run_count = 0
+        self.cancelled_count = 0
+        self._jobs = {}
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._is_closed = False
+        self._thread = threading.Thread(target=self._run_jobs, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, function, *args):
+        """Queues a job unless one with the same key is already known.
+
+        Args:
+            key: a hashable key for the result
+            function: the callable to run
+            args: the arguments for the callable
+        """
+        with self._condition:
+            if key in self._jobs:
+                return
+            self._jobs[key] = _Job(function, args, time.monotonic() + self.budget)
+            self._queue.append(key)
+            self._condition.notify()
+
+    def get(self, key, function=None, *args):
+        """Gets the result of a job, waiting for it or running it here.
+
+        Args:
+            key: the key of the job
+            function: the callable to run when no job has the key, or None
+              to return None instead
+            args: the arguments for the callable
+
+        Returns:
+            the result of the job
+        """
+        with self._condition:
+            job = self._jobs.get(key)
+            if job is None:
+                if function is None:
+                    return None
+                job = self._jobs[key] = _Job(function, args, 0)
+            if job.state == PENDING_STATE:
+                job.state = RUNNING_STATE
+                is_run_here = True
+            else:
+                is_run_here = False
+
+        if is_run_here:
+            job.run()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def is_done(self, key):
+        """Checks if a job's result is ready."""
+        job = self._jobs.get(key)
+        return job is not None and job.state == DONE_STATE
+
+    def cancel(self, keep=()):
+        """Forgets every job not kept, so its result is never used.
+
+        A running job cannot be stopped, but its result is dropped.
+
+        Args:
+            keep: the keys of the jobs still relevant
+        """
+        keep = set(keep)
+        with self._condition:
+            for key in list(self._jobs):
+                if key not in keep:
+                    if self._jobs.pop(key).state != DONE_STATE:
+                        self.cancelled_count += 1
+            self._queue = deque(key for key in self._queue if key in keep)
+
+    def close(self):
+        """Cancels every job and stops the background thread."""
+        self.cancel()
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run_jobs(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._is_closed:
+                    self._condition.wait()
+                if self._is_closed:
+                    return
+                job = self._jobs.get(self._queue.popleft())
+                if job is None or job.state != PENDING_STATE \
+                  or time.monotonic() > job.deadline:
+                    continue
+                job.state = RUNNING_STATE
+                self.run_count += 1
+            job.run()
+
+
+class SpeculativeBot:
+    """Plays a bot from BOT_PLAYERS, using replies worked out ahead of time.
+
+    Attributes:
+        player_name: the key of the bot in cribbageserver.BOT_PLAYERS
+        round_start: the (is_dealer, player_score, opponent_score) of the round
+        observations: the (is_player, run_card) turns of the round so far
+        start_card: the PlayingCard cut, None before the cut
+        dealt_cards: the frozenset of PlayingCards dealt, None before the discard
+    """
+    def __init__(self, player_name, jobs):
+        self.player_name = player_name
+        self.jobs = jobs
+        self.round_start = None
+        self.observations = []
+        self.start_card = None
+        self.dealt_cards = None
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Starts recording the round."""
+        self.round_start = (is_dealer, player_score, opponent_score)
+        self.observations = []
+        self.start_card = None
+        self.dealt_cards = None
+
+    def observe_start_card(self, start_card):
+        """Records the start card."""
+        self.start_card = start_card
+
+    def observe_run_play(self, is_player, run_card):
+        """Records the turn."""
+        self.observations.append((is_player, run_card))
+
+    def discard_to_crib(self, player_hand):
+        """Discards what the bot decided, now or ahead of time."""
+        self.dealt_cards = frozenset(player_hand)
+        return self.jobs.get(*self._get_discard_job(player_hand))
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Plays what the bot decided, now or ahead of time."""
+        return self.jobs.get(*self._get_run_job(self.observations, player_run_hand, run,
+          run_total))
+
+    def speculate_discard(self, player_hand):
+        """Starts deciding the bot's discard in the background.
+
+        Returns:
+            the key of the job
+        """
+        job = self._get_discard_job(player_hand)
+        self.jobs.submit(*job)
+        return job[0]
+
+    def speculate_run_card(self, run_card, player_run_hand, run, run_total):
+        """Starts deciding the bot's reply to a card the opponent may play.
+
+        Args:
+            run_card: the PlayingCard the opponent may play
+            player_run_hand: the bot's cards left to play
+            run: the run before the opponent's card
+            run_total: the total of the run before the opponent's card
+
+        Returns:
+            the key of the job
+        """
+        job = self._get_run_job(self.observations + [(False, run_card)], player_run_hand,
+          run + [run_card], run_total + run_card.value)
+        self.jobs.submit(*job)
+        return job[0]
+
+    def _get_discard_job(self, player_hand):
+        player_hand = frozenset(player_hand)
+        return (("discard", self.round_start, player_hand), cribbageserver.decide_bot_move,
+          self.player_name, self.round_start, (), player_hand)
+
+    def _get_run_job(self, observations, player_run_hand, run, run_total):
+        observations = tuple(observations)
+        player_run_hand = frozenset(player_run_hand)
+        run = tuple(run)
+        return (("run", self.round_start, observations, player_run_hand, run),
+          cribbageserver.decide_bot_move, self.player_name, self.round_start, observations,
+          player_run_hand, list(run), run_total, self.start_card, self.dealt_cards)
+
+
+def get_discard_hints(player_hand, is_dealer):
+    """Values every discard from a six card hand.
+
+    Args:
+        player_hand: the six PlayingCards dealt
+        is_dealer: True if the crib belongs to the player
+
+    Returns:
+        (list) (discards, value) pairs best first, where discards is a tuple
+          of two PlayingCards and value is the expected points of the hand,
+          plus the crib for the dealer or minus it for the pone
+    """
+    hand = sorted(player_hand)
+    values = cribbagedecisions.get_discard_values(
+      tuple(cribbagecompact.cards_to_indices(hand)), is_dealer)
+    hints = [((hand[discard[0]], hand[discard[1]]), value)
+      for discard, value in zip(cribbagecompact.DISCARD_OPTIONS, values)]
+    hints.sort(key=lambda hint: -hint[1])
+    return hints
+
+def get_pegging_hints(player_run_hand, run, is_dealer):
+    """Values every card the player can play onto the run.
+
+    Args:
+        player_run_hand: the PlayingCards left to play
+        run: the PlayingCards played since the run was last reset
+        is_dealer: True if the player is the dealer
+
+    Returns:
+        (list) (run card, value) pairs best first, where value is the
+          expected pegging points of the player minus the opponent's
+    """
+    hand_ranks = tuple(sorted(card.rank - 1 for card in player_run_hand))
+    run_ranks = tuple(card.rank - 1 for card in run)
+    values = dict(cribbagedecisions.get_pegging_values(hand_ranks, run_ranks, is_dealer))
+    hints = [(card, values[card.rank - 1]) for card in sorted(player_run_hand)
+      if card.rank - 1 in values]
+    hints.sort(key=lambda hint: -hint[1])
+    return hints
+
+
+class HumanPlayer:
+    """Asks a human for each move, speculating while they think.
+
+    Attributes:
+        jobs: the SpeculativeJobs shared with the opponent
+        opponent: the SpeculativeBot played against, None to only hint
+        cribbage_game: the CribbageGame being played, set by attach
+        seat: the human's player number, set by attach
+    """
+    def __init__(self, jobs, opponent=None, input_function=input, print_function=print):
+        self.jobs = jobs
+        self.opponent = opponent
+        self.cribbage_game = None
+        self.seat = None
+        self._is_dealer = False
+        self._input = input_function
+        self._print = print_function
+
+    def attach(self, cribbage_game, seat):
+        """Lets the player see the opponent's cards, to speculate on them.
+
+        Args:
+            cribbage_game: the CribbageGame being played
+            seat: the human's player number
+        """
+        self.cribbage_game = cribbage_game
+        self.seat = seat
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Remembers who deals."""
+        # pylint: disable=unused-argument
+        self._is_dealer = is_dealer
+
+    def observe_start_card(self, start_card):
+        """Does nothing, the game shows the start card."""
+
+    def observe_run_play(self, is_player, run_card):
+        """Does nothing, the game shows each play."""
+
+    def discard_to_crib(self, player_hand):
+        """Asks the human for two cards to discard.
+
+        Args:
+            player_hand: A set of PlayingCard representing the hand
+
+        Returns:
+           {PlayingCard, PlayingCard} two cards as a tuple
+        """
+        hand = sorted(player_hand)
+        hint_key = ("discard_hints", tuple(hand), self._is_dealer)
+        self.jobs.submit(hint_key, get_discard_hints, hand, self._is_dealer)
+        keep = []
+        # The opponent only discards after the human as player two
+        if self.opponent is not None and self.seat == 1:
+            keep.append(self.opponent.speculate_discard(self.cribbage_game.player_two_hand))
+
+        self._print(f"## Your Hand: {self._get_choices(hand)}")
+        while True:
+            reply = self._input("  Discard two cards by number, or h for hints > ").strip()
+            if reply.lower() == "h":
+                for discards, value in self.jobs.get(hint_key, get_discard_hints, hand,
+                  self._is_dealer)[:5]:
+                    self._print(f"    {cribbageengine.cards_as_string(discards)}: {value:.1f}")
+                continue
+            numbers = reply.replace(",", " ").split()
+            if len(numbers) == 2 and all(number.isdigit() for number in numbers) \
+              and len(set(numbers)) == 2 and all(1 <= int(number) <= len(hand)
+              for number in numbers):
+                break
+            self._print("  Please enter two different card numbers.")
+
+        self.jobs.cancel(keep)
+        return tuple(hand[int(number) - 1] for number in numbers)
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Asks the human for a card to play onto the run.
+
+        Args:
+            player_run_hand: The set of PlayingCards the player has in
+              their hand available to play.
+            run: the existing list of PlayingCards in the run
+            run_total: the total value in the run
+        """
+        hand = sorted(player_run_hand)
+        playable = [card for card in hand
+          if run_total + card.value <= cribbageengine.HIGHEST_RUN_ALLOWED]
+        hint_key = ("pegging_hints", tuple(hand), tuple(run), self._is_dealer)
+        self.jobs.submit(hint_key, get_pegging_hints, hand, list(run), self._is_dealer)
+        reply_keys = self._speculate_replies(playable, run, run_total)
+
+        self._print(f"## Run: {cribbageengine.cards_as_string(run) or '-'} total {run_total}"
+          f"  Your Hand: {self._get_choices(hand)}")
+        while True:
+            reply = self._input("  Play a card by number, or h for hints > ").strip()
+            if reply.lower() == "h":
+                for run_card, value in self.jobs.get(hint_key, get_pegging_hints, hand,
+                  list(run), self._is_dealer):
+                    self._print(f"    {run_card}: {value:+.1f}")
+                continue
+            if reply.isdigit() and 1 <= int(reply) <= len(hand) \
+              and hand[int(reply) - 1] in playable:
+                break
+            self._print("  Please enter the number of a card that keeps the run to 31.")
+
+        run_card = hand[int(reply) - 1]
+        self.jobs.cancel([reply_keys[run_card]] if run_card in reply_keys else [])
+        return run_card
+
+    def _speculate_replies(self, playable, run, run_total):
+        """Starts deciding the opponent's reply to each card the human can play.
+
+        Returns:
+            (dict) the job key of the reply to each run card
+        """
+        if self.opponent is None or self.cribbage_game is None:
+            return {}
+
+        opponent_hand = self.cribbage_game.player_two_run_hand if self.seat == 1 \
+          else self.cribbage_game.player_one_run_hand
+        reply_keys = {}
+        for run_card in playable:
+            new_total = run_total + run_card.value
+            if any(new_total + card.value <= cribbageengine.HIGHEST_RUN_ALLOWED
+              for card in opponent_hand):
+                reply_keys[run_card] = self.opponent.speculate_run_card(run_card,
+                  opponent_hand, list(run), run_total)
+        return reply_keys
+
+    @staticmethod
+    def _get_choices(hand):
+        return " ".join(f"{number}) {card}" for number, card in enumerate(hand, 1))
@@ -0,0 +1,377 @@
+"""Infers the opponent's pegging cards from everything a player has seen.
+
+An OpponentHandTracker holds a posterior over the four cards the opponent
+kept.  Every 4 card hand that avoids the player's own six cards starts with
+a prior weight from a discard model, then each event of the round rules
+hands out:
+
+  the start card     hands holding it are impossible
+  an opponent play   hands without the card are impossible
+  an opponent go     hands with a card left that fit under 31 are impossible
+
+Candidate hands are kept as NumPy arrays and compacted after each event, so
+an update costs time in proportion to the hands still possible.  They are
+gathered lazily, usually at the opponent's first play from the 20,825 hands
+holding that card, and are a few thousand or fewer from then on.
+
+Discard models are callables (hands, is_dealer) returning a prior weight for
+each row of a (hands, 4) array of card indices.  The default weighs a hand
+by the fifteens, pairs and runs of its ranks, since players keep good hands.
+
+  tracker = OpponentHandTracker()
+  tracker.reset(dealt_cards, is_opponent_dealer)
+  tracker.observe_seen_card(start_card)
+  tracker.observe_opponent_card(card)
+  tracker.get_card_probabilities()
+
+InferencePlayer uses the tracker to avoid plays the opponent is likely to
+answer with points.
+
+"""
+
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+
+import cribbagecompact
+import cribbageplayers
+import cribbagesharedtables
+
+DEFAULT_TEMPERATURE = 4.0
+DEFAULT_SAMPLES = 64
+
+CARD_VALUES = np.array(cribbagecompact.CARD_VALUES, dtype=np.int16)
+
+# A value above any card, for cards already played.
+PLAYED_VALUE = 99
+
+
+def _build_hands():
+    return np.array(list(combinations(range(cribbagecompact.DECK_SIZE), 4)), dtype=np.int8)
+
+def _build_hand_masks():
+    hands = cribbagesharedtables.get_table("inference_hands").astype(np.int64)
+    return np.bitwise_or.reduce(np.left_shift(np.int64(1), hands), axis=1)
+
+def _build_hands_by_card():
+    masks = cribbagesharedtables.get_table("inference_hand_masks")
+    return np.array([np.flatnonzero(masks & np.int64(1 << card))
+      for card in range(cribbagecompact.DECK_SIZE)])
+
+cribbagesharedtables.register_table("inference_hands", _build_hands)
+cribbagesharedtables.register_table("inference_hand_masks", _build_hand_masks)
+cribbagesharedtables.register_table("inference_hands_by_card", _build_hands_by_card)
+
+def get_all_hands():
+    """Gets every 4 card hand of the deck.
+
+    Returns:
+        (ndarray) a (270725, 4) array of sorted card indices
+        (ndarray) the bit mask of the cards of each hand
+    """
+    return (cribbagesharedtables.get_table("inference_hands"),
+      cribbagesharedtables.get_table("inference_hand_masks"))
+
+def get_hands_by_card():
+    """Gets the indices into get_all_hands of the hands holding each card.
+
+    Returns:
+        (ndarray) a (52, 20825) array of hand indices
+    """
+    return cribbagesharedtables.get_table("inference_hands_by_card")
+
+@lru_cache(maxsize=8)
+def get_prior_weights(discard_model, is_dealer):
+    """Gets a discard model's weight for every hand of get_all_hands."""
+    return discard_model(get_all_hands()[0], is_dealer)
+
+def _build_rank_scores():
+    scores = np.zeros(13 ** 4, dtype=np.int16)
+    for ranks in combinations(range(13 + 3), 4):
+        # Stars and bars over the sorted ranks, so ranks may repeat
+        ranks = tuple(rank - offset for offset, rank in enumerate(ranks))
+        scores[((ranks[0] * 13 + ranks[1]) * 13 + ranks[2]) * 13 + ranks[3]] = \
+          cribbagecompact.score_ranks(ranks)
+    return scores
+
+cribbagesharedtables.register_table("inference_rank_scores", _build_rank_scores)
+
+def get_rank_scores():
+    """Gets the fifteens, pairs and runs score of every sorted 4 rank code.
+
+    Returns:
+        (ndarray) the score by r0 * 2197 + r1 * 169 + r2 * 13 + r3
+    """
+    return cribbagesharedtables.get_table("inference_rank_scores")
+
+def uniform_discard_model(hands, is_dealer):
+    """A discard model that finds every kept hand equally likely."""
+    # pylint: disable=unused-argument
+    return np.ones(len(hands))
+
+def make_rank_score_discard_model(temperature=DEFAULT_TEMPERATURE):
+    """Creates a discard model that favors hands whose ranks score well.
+
+    Args:
+        temperature: the points for e times the weight, lower trusts the
+          opponent to keep good hands more
+
+    Returns:
+        (callable) the discard model
+    """
+    def rank_score_discard_model(hands, is_dealer):
+        # pylint: disable=unused-argument
+        ranks = hands.astype(np.int64) >> 2
+        codes = ((ranks[:, 0] * 13 + ranks[:, 1]) * 13 + ranks[:, 2]) * 13 + ranks[:, 3]
+        return np.exp(get_rank_scores()[codes] / temperature)
+
+    return rank_score_discard_model
+
+DEFAULT_DISCARD_MODEL = make_rank_score_discard_model()
+
+
+class OpponentHandTracker:
+    """A posterior over the opponent's pegging cards, updated by each event.
+
+    The candidate hands are only gathered when first needed.  Usually that is
+    the opponent's first play, and then only the hands holding that card are
+    looked at.
+
+    Attributes:
+        discard_model: the callable giving the prior weight of a kept hand
+        played_cards: the cards the opponent has played this round
+    """
+    def __init__(self, discard_model=None):
+        self.discard_model = discard_model or DEFAULT_DISCARD_MODEL
+        self.played_cards = []
+        self._is_opponent_dealer = False
+        self._seen_mask = 0
+        self._hands = None
+        self._masks = None
+        self._weights = None
+
+    @property
+    def hands(self):
+        """A (hands, 4) array of the opponent hands still possible."""
+        self._gather()
+        return self._hands
+
+    @property
+    def weights(self):
+        """The posterior weight of each hand, not normalized."""
+        self._gather()
+        return self._weights
+
+    def reset(self, own_cards, is_opponent_dealer):
+        """Starts the round's posterior from the discard model.
+
+        Args:
+            own_cards: the six card indices dealt to the player
+            is_opponent_dealer: True if the crib is the opponent's
+        """
+        self.played_cards = []
+        self._is_opponent_dealer = is_opponent_dealer
+        self._seen_mask = sum(1 << card for card in own_cards)
+        self._hands = None
+
+    def observe_seen_card(self, card):
+        """Rules out hands holding a card seen elsewhere, such as the start card."""
+        if self._hands is None:
+            self._seen_mask |= 1 << card
+        else:
+            self._keep((self._masks & np.int64(1 << card)) == 0)
+
+    def observe_opponent_card(self, card):
+        """Rules out hands without a card the opponent played."""
+        if self._hands is None:
+            self._gather(get_hands_by_card()[card])
+        else:
+            self._keep((self._masks & np.int64(1 << card)) != 0)
+        self.played_cards.append(card)
+
+    def observe_opponent_go(self, run_total):
+        """Rules out hands with a card left the opponent could have played.
+
+        Args:
+            run_total: the total of the run when the opponent said go
+        """
+        if len(self.played_cards) >= 4:
+            return
+        values = np.where(np.isin(self.hands, self.played_cards), PLAYED_VALUE,
+          CARD_VALUES[self.hands])
+        self._keep(values.min(axis=1) > cribbagecompact.HIGHEST_RUN_ALLOWED - run_total)
+
+    def get_hand_count(self):
+        """Gets the number of opponent hands still possible."""
+        return len(self.hands)
+
+    def get_card_probabilities(self):
+        """Gets the chance each card is still in the opponent's hand.
+
+        Returns:
+            (ndarray) the probability of each card index, 0 for cards played
+        """
+        probabilities = np.bincount(self.hands.ravel().astype(np.int64),
+          weights=np.repeat(self.weights, 4), minlength=cribbagecompact.DECK_SIZE)
+        probabilities /= max(self.weights.sum(), np.finfo(float).tiny)
+        probabilities[self.played_cards] = 0
+        return probabilities
+
+    def get_rank_probabilities(self):
+        """Gets the chance the opponent still holds at least one card of each rank.
+
+        Returns:
+            (ndarray) the probability of each rank from 0 to 12
+        """
+        is_left = ~np.isin(self.hands, self.played_cards)
+        rank_masks = np.bitwise_or.reduce(np.where(is_left,
+          np.left_shift(1, self.hands.astype(np.int64) >> 2), 0), axis=1)
+        total = max(self.weights.sum(), np.finfo(float).tiny)
+        return np.array([self.weights[(rank_masks >> rank) & 1 == 1].sum() / total
+          for rank in range(13)])
+
+    def sample_ranks(self, count, rng):
+        """Samples the ranks the opponent has left from the posterior.
+
+        Args:
+            count: the number of hands to sample
+            rng: a numpy.random.Generator
+
+        Returns:
+            (ndarray) a (count, 4) array of ranks, -1 for cards played, or
+              None if no hand is possible
+        """
+        total = self.weights.sum()
+        if not total:
+            return None
+        hands = self.hands[rng.choice(len(self.hands), size=count, p=self.weights / total)]
+        return np.where(np.isin(hands, self.played_cards), -1, hands.astype(np.int16) >> 2)
+
+    def _gather(self, candidates=None):
+        if self._hands is not None:
+            return
+        all_hands, all_masks = get_all_hands()
+        masks = all_masks if candidates is None else all_masks[candidates]
+        candidates = np.flatnonzero((masks & np.int64(self._seen_mask)) == 0) \
+          if candidates is None else candidates[(masks & np.int64(self._seen_mask)) == 0]
+        self._hands = all_hands.take(candidates, axis=0)
+        self._masks = all_masks.take(candidates)
+        self._weights = get_prior_weights(self.discard_model,
+          self._is_opponent_dealer).take(candidates)
+
+    def _keep(self, is_kept):
+        kept = np.flatnonzero(is_kept)
+        self._hands = self._hands.take(kept, axis=0)
+        self._masks = self._masks.take(kept)
+        self._weights = self._weights.take(kept)
+
+
+class InferencePlayer(cribbageplayers.OptimizedPlayer):
+    """Discards like OptimizedPlayer and pegs against the opponent's likely cards.
+
+    Each play is valued as its points less the points of the opponent's best
+    answer, averaged over hands sampled from an OpponentHandTracker.
+
+    Attributes:
+        tracker: the OpponentHandTracker of the opponent's cards
+        samples: the opponent hands sampled for each decision
+    """
+    def __init__(self, discard_model=None, samples=DEFAULT_SAMPLES, rng=None):
+        self.tracker = OpponentHandTracker(discard_model)
+        self.samples = samples
+        self._rng = rng or np.random.default_rng()
+        self._is_dealer = False
+        self._run_total = 0
+        self._go_caller = None
+
+    def use_game_context(self, rng, logger):
+        """Samples from a generator seeded by the game's rng, so seeded games replay exactly."""
+        super().use_game_context(rng, logger)
+        self._rng = np.random.default_rng(rng.getrandbits(64))
+
+    # pylint: disable=unused-argument
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Remembers the seat for the opponent's discard model."""
+        self._is_dealer = is_dealer
+    # pylint: enable=unused-argument
+
+    def discard_to_crib(self, player_hand):
+        """Discards like OptimizedPlayer and starts the opponent's posterior."""
+        self.observe_dealt_cards(player_hand)
+        return super().discard_to_crib(player_hand)
+
+    def observe_dealt_cards(self, dealt_cards):
+        """Starts the opponent's posterior from the cards this player was dealt.
+
+        Called by discard_to_crib, or directly when a player rebuilt after
+        its discard replays the round.
+
+        Args:
+            dealt_cards: the PlayingCards dealt to this player
+        """
+        self.tracker.reset(cribbagecompact.cards_to_indices(dealt_cards), not self._is_dealer)
+        self._run_total = 0
+        self._go_caller = None
+
+    def observe_start_card(self, start_card):
+        """Rules out opponent hands holding the start card."""
+        self.tracker.observe_seen_card(cribbagecompact.card_to_index(start_card))
+
+    def observe_run_play(self, is_player, run_card):
+        """Updates the posterior and tracks the run the same way the engine does."""
+        if run_card is not None:
+            if not is_player:
+                self.tracker.observe_opponent_card(cribbagecompact.card_to_index(run_card))
+            self._run_total += run_card.value
+            return
+
+        if not is_player:
+            self.tracker.observe_opponent_go(self._run_total)
+        if self._go_caller is None:
+            self._go_caller = is_player
+        elif self._go_caller != is_player:
+            self._go_caller = None
+            self._run_total = 0
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Selects the card with the most points less the opponent's best answer.
+
+        Args:
+            player_run_hand: The set of PlayingCards the player has in
+              their hand available to play.
+            run: the existing list of PlayingCards in the run
+            run_total: the total value in the run
+        """
+        playable = sorted(card for card in player_run_hand
+          if run_total + card.value <= cribbagecompact.HIGHEST_RUN_ALLOWED)
+        opponent_ranks = self.tracker.sample_ranks(self.samples, self._rng) \
+          if len({card.face for card in playable}) > 1 else None
+        if opponent_ranks is None:
+            return super().get_run_card(player_run_hand, run, run_total)
+
+        run_ranks = [card.face.value - 1 for card in run]
+        best_card = None
+        best_value = None
+        for card in playable:
+            rank = card.face.value - 1
+            points = cribbagecompact.score_run_play(run_ranks, run_total, rank)
+
+            # The opponent's points for each rank they could answer with, -1 if
+            # it does not fit or all four are out, with a trailing -1 for the
+            # slots already played
+            new_run_ranks = run_ranks + [rank]
+            new_total = run_total + card.value
+            answer_points = np.array([cribbagecompact.score_run_play(new_run_ranks, new_total,
+              answer_rank) if new_total + cribbagecompact.RANK_VALUES[answer_rank]
+                <= cribbagecompact.HIGHEST_RUN_ALLOWED and new_run_ranks.count(answer_rank) < 4
+              else -1 for answer_rank in range(13)] + [-1])
+            answer = np.maximum(answer_points[opponent_ranks].max(axis=1), 0)
+            value = points - answer.mean()
+
+            if best_value is None or value > best_value or \
+              (value == best_value and card.value > best_card.value):
+                best_card = card
+                best_value = value
+
+        return best_card
@@ -0,0 +1,289 @@
+"""Ranks many player configurations with adaptively scheduled matches.
+
+Players are given as cribbageserver.BOT_PLAYERS names, module:Class or .json
+player configs from cribbagetuning.  Matches are short batches of seeded
+games between two players, played on a process pool.  As each batch finishes
+its wins go into Bradley-Terry ratings, refit from the last fit, and the next
+batch goes to the pair whose order is least certain.  Pairs that are clearly
+ordered stop getting games, so a league needs far fewer games than a full
+round robin at a fixed count.
+
+Ratings are the maximum a posteriori Bradley-Terry strengths under a normal
+prior, reported on the Elo scale.  Their confidence intervals come from the
+inverse of the Hessian at the fit.
+
+  python3 cribbageai/cribbageleague.py --players random optimized tabular tuned_player.json
+
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import cribbageaicli
+import cribbagearena
+import cribbageengine
+import cribbagesharedtables
+import cribbagetournament
+
+DEFAULT_BATCH_GAMES = 10
+DEFAULT_MAX_GAMES = 2000
+DEFAULT_CONFIDENCE = 0.95
+
+# The prior standard deviation of a strength, in natural log odds.
+PRIOR_SD = 1.0
+ELO_SCALE = 400 / math.log(10)
+ELO_BASE = 1500
+FIT_ITERATIONS = 20
+FIT_TOLERANCE = 1e-9
+
+
+def play_pairing(player_specs, first_seed, game_count):
+    """Plays a batch of games between two players, swapping seats each game.
+
+    Args:
+        player_specs: the two player specs, as cribbagearena.load_player_factory takes
+        first_seed: the seed of the first game
+        game_count: the number of games
+
+    Returns:
+        (TournamentResult) the totals, indexed by player rather than seat
+    """
+    player_factories = [cribbagearena.load_player_factory(spec) for spec in player_specs]
+    result = cribbagetournament.TournamentResult()
+    cribbage_game = cribbageengine.CribbageEngine().new_game(None, None, is_bulk=True,
+      logger=cribbagetournament.GAME_LOGGER)
+    for seed in range(first_seed, first_seed + game_count):
+        players = [player_factory() for player_factory in player_factories]
+        is_swapped = seed % 2 == 1
+        if is_swapped:
+            players.reverse()
+        cribbage_game.reset(*players, rng=random.Random(seed))
+        scores = cribbageaicli.run_game(cribbage_game, False)
+        result.add_game(scores[::-1] if is_swapped else scores)
+    return result
+
+
+class BradleyTerryRatings:
+    """Bradley-Terry ratings fit to the wins between every pair of players.
+
+    Attributes:
+        wins: an ndarray where [i, j] is the number of times i beat j
+        strengths: the ndarray of fitted strengths in natural log odds
+        covariance: the ndarray covariance of the strengths at the fit
+    """
+    def __init__(self, player_count, prior_sd=PRIOR_SD):
+        self.wins = np.zeros((player_count, player_count))
+        self.strengths = np.zeros(player_count)
+        self.covariance = np.eye(player_count) * prior_sd ** 2
+        self._prior_precision = 1 / prior_sd ** 2
+
+    def add_result(self, player, opponent, player_wins, opponent_wins):
+        """Adds the wins of a match and refits from the current strengths."""
+        self.wins[player, opponent] += player_wins
+        self.wins[opponent, player] += opponent_wins
+        self.fit()
+
+    def fit(self, iterations=FIT_ITERATIONS):
+        """Fits the strengths by Newton's method, starting from the last fit."""
+        games = self.wins + self.wins.T
+        total_wins = self.wins.sum(axis=1)
+        for _ in range(iterations):
+            chances = 1 / (1 + np.exp(self.strengths[None, :] - self.strengths[:, None]))
+            gradient = total_wins - (games * chances).sum(axis=1) \
+              - self._prior_precision * self.strengths
+            weights = games * chances * chances.T
+            information = np.diag(weights.sum(axis=1) + self._prior_precision) - weights
+            self.covariance = np.linalg.inv(information)
+            step = self.covariance @ gradient
+            self.strengths += step
+            if np.abs(step).max() < FIT_TOLERANCE:
+                break
+
+    def get_ratings(self):
+        """Gets the ratings on the Elo scale, centred on ELO_BASE."""
+        return ELO_BASE + ELO_SCALE * (self.strengths - self.strengths.mean())
+
+    def get_intervals(self, confidence=DEFAULT_CONFIDENCE):
+        """Gets the (low, high) Elo ratings of each player at the confidence."""
+        margin = _get_z_score(confidence) * ELO_SCALE * np.sqrt(np.diag(self.covariance))
+        ratings = self.get_ratings()
+        return ratings - margin, ratings + margin
+
+    def get_order_doubt(self, player, opponent):
+        """Gets the chance the fitted order of two players is wrong."""
+        difference_sd = math.sqrt(max(self.covariance[player, player]
+          + self.covariance[opponent, opponent] - 2 * self.covariance[player, opponent], 0))
+        if difference_sd == 0:
+            return 0.0
+        gap = abs(self.strengths[player] - self.strengths[opponent])
+        return statistics.NormalDist().cdf(-gap / difference_sd)
+
+
+class League:
+    """Schedules batches between players until their order is settled.
+
+    Attributes:
+        player_specs: the spec of each player
+        ratings: the BradleyTerryRatings of the players
+        games_played: an ndarray where [i, j] is the games between i and j
+        batch_games: the games in one batch
+        max_games: the most games the league plays
+        confidence: the confidence every pair's order is settled at
+    """
+    def __init__(self, player_specs, batch_games=DEFAULT_BATCH_GAMES,
+      max_games=DEFAULT_MAX_GAMES, confidence=DEFAULT_CONFIDENCE, first_seed=1):
+        if len(player_specs) < 2:
+            raise ValueError("A league needs at least two players")
+        self.player_specs = list(player_specs)
+        self.ratings = BradleyTerryRatings(len(player_specs))
+        self.games_played = np.zeros((len(player_specs), len(player_specs)), dtype=np.int64)
+        self.batch_games = batch_games
+        self.max_games = max_games
+        self.confidence = confidence
+        self._first_seed = first_seed
+        self._scheduled_games = 0
+
+    def get_total_games(self):
+        """Gets the number of games played so far."""
+        return int(self.games_played.sum()) // 2
+
+    def choose_pairing(self, busy=()):
+        """Chooses the next pair to play, the one whose order is least certain.
+
+        Args:
+            busy: pairs with a batch already being played, skipped
+
+        Returns:
+            (tuple) the (player, opponent) indices, or None if every pair is
+              settled, busy or the league is out of games
+        """
+        if self._scheduled_games + self.batch_games > self.max_games:
+            return None
+        best_pairing = None
+        best_doubt = 1 - self.confidence
+        for pairing in itertools.combinations(range(len(self.player_specs)), 2):
+            if pairing in busy:
+                continue
+            doubt = self.ratings.get_order_doubt(*pairing)
+            if doubt > best_doubt or (best_pairing is not None and doubt == best_doubt
+              and self.games_played[pairing] < self.games_played[best_pairing]):
+                best_pairing = pairing
+                best_doubt = doubt
+        return best_pairing
+
+    def get_batch(self, pairing):
+        """Gets the play_pairing arguments for the next batch of a pair.
+
+        Each pair plays the seeds from first_seed onwards, so every pair sees
+        the same deals.
+        """
+        self._scheduled_games += self.batch_games
+        first_seed = self._first_seed + int(self.games_played[pairing])
+        return [self.player_specs[player] for player in pairing], first_seed, self.batch_games
+
+    def add_batch(self, pairing, result):
+        """Adds the result of a pair's batch and updates the ratings."""
+        player, opponent = pairing
+        self.games_played[player, opponent] += result.games
+        self.games_played[opponent, player] += result.games
+        self._scheduled_games += result.games - self.batch_games
+        self.ratings.add_result(player, opponent, result.wins[0], result.wins[1])
+
+    def run(self, pool, in_flight):
+        """Plays batches on a pool until every pair is settled or the games run out.
+
+        Args:
+            pool: the multiprocessing pool to play batches on
+            in_flight: the most batches queued at once
+        """
+        finished = queue.Queue()
+        busy = {}
+        while True:
+            while len(busy) < in_flight:
+                pairing = self.choose_pairing(busy)
+                if pairing is None:
+                    break
+                busy[pairing] = pool.apply_async(play_pairing, self.get_batch(pairing),
+                  callback=lambda result, pairing=pairing: finished.put((pairing, result)),
+                  error_callback=lambda error, pairing=pairing: finished.put((pairing, error)))
+            if not busy:
+                return
+
+            pairing, result = finished.get()
+            del busy[pairing]
+            if isinstance(result, Exception):
+                raise result
+            self.add_batch(pairing, result)
+
+    def get_standings(self):
+        """Gets the players from best to worst.
+
+        Returns:
+            (list) a (spec, rating, low, high, games) tuple per player
+        """
+        ratings = self.ratings.get_ratings()
+        lows, highs = self.ratings.get_intervals(self.confidence)
+        games = self.games_played.sum(axis=1)
+        return sorted(((spec, float(ratings[player]), float(lows[player]),
+          float(highs[player]), int(games[player]))
+          for player, spec in enumerate(self.player_specs)), key=lambda row: -row[1])
+
+
+def _get_z_score(confidence):
+    """Gets the two sided normal z score for a confidence level."""
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+def run_league(player_specs, max_games=DEFAULT_MAX_GAMES, processes=None,
+  batch_games=DEFAULT_BATCH_GAMES, confidence=DEFAULT_CONFIDENCE, first_seed=1):
+    """Runs a league on a local process pool.
+
+    Returns:
+        (League) the finished league
+    """
+    processes = processes or os.cpu_count()
+    league = League(player_specs, batch_games, max_games, confidence, first_seed)
+    with cribbagesharedtables.SharedTables() as manifest, multiprocessing.Pool(
+      processes, cribbagesharedtables.attach_tables, (manifest,)) as pool:
+        league.run(pool, 2 * processes)
+    return league
+
+def print_standings(league, seconds):
+    """Prints each player's rating and confidence interval."""
+    print(f"{'player':<30} {'rating':>7} {'interval':>15} {'games':>6}")
+    for spec, rating, low, high, games in league.get_standings():
+        print(f"{spec:<30} {rating:7.0f} {low:7.0f}-{high:<7.0f} {games:6d}")
+    round_robin_games = math.comb(len(league.player_specs), 2) * int(league.games_played.max())
+    print(f"Played {league.get_total_games()} games in {seconds:.1f}s, a round robin at the "
+      f"busiest pair's count would take {round_robin_games}")
+
+def main(argv=None):
+    """Runs a league from the command line."""
+    parser = argparse.ArgumentParser(description="Ranks players with adaptive matches.")
+    parser.add_argument("--players", nargs="+", required=True,
+      help="BOT_PLAYERS names, module:Class or .json player configs")
+    parser.add_argument("--max-games", type=int, default=DEFAULT_MAX_GAMES)
+    parser.add_argument("--batch-games", type=int, default=DEFAULT_BATCH_GAMES)
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None,
+      help="worker processes, all cores by default")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    league = run_league(args.players, args.max_games, args.workers, args.batch_games,
+      args.confidence, args.seed)
+    print_standings(league, time.perf_counter() - started)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""A Monte Carlo tree search player that discards by playing out whole rounds.
+
+For each of the fifteen ways to discard, the player samples the opponent's
+hand and the cut, plays out the run with a fast greedy policy and scores the
+show and the crib.  Rollouts are spread across the discards with UCB1 so
+clearly bad discards stop receiving them, and the search stops at a rollout
+or time budget, whichever comes first.
+
+The opponent hands sampled for the chosen discard are kept for the rest of
+the round.  Each pegging decision reuses the ones still consistent with the
+start card and every card the opponent has played instead of sampling from
+scratch, and its rollouts carry on from the current go.  Variants other
+than the standard game are played like OptimizedPlayer.
+
+  player = MctsPlayer(max_rollouts=2000, time_limit_ms=250)
+
+"""
+
+import math
+import random
+import time
+
+import cribbagecompact
+import cribbageengine
+import cribbageplayers
+
+DEFAULT_MAX_ROLLOUTS = 1500
+DEFAULT_PEGGING_ROLLOUTS = 200
+DEFAULT_EXPLORATION = 10.0
+
+# Fewer consistent opponent hands than this are topped up with fresh samples.
+MIN_PEGGING_WORLDS = 32
+
+# How many rollouts run between checks of the time limit.
+DEADLINE_CHECK_INTERVAL = 16
+
+
+def ucb_search(arm_count, evaluate, max_rollouts, deadline=None,
+  exploration=DEFAULT_EXPLORATION):
+    """Spreads rollouts across a set of choices with UCB1.
+
+    Every arm is tried once, then each rollout goes to the arm with the best
+    mean reward plus exploration bonus.  The search stops after max_rollouts
+    or once the deadline passes, but never before every arm is tried.
+
+    Args:
+        arm_count: the number of choices
+        evaluate: a callable (arm) returning the reward of one rollout
+        max_rollouts: the most rollouts to run
+        deadline: a time.perf_counter() value to stop at, or None
+        exploration: the UCB1 exploration constant in points
+
+    Returns:
+        (int) the arm with the most rollouts, ties going to the better mean
+        (list) the number of rollouts for each arm
+        (list) the total reward for each arm
+    """
+    visits = [0] * arm_count
+    totals = [0.0] * arm_count
+    rollouts = 0
+    while rollouts < max(max_rollouts, arm_count):
+        if rollouts >= arm_count and deadline is not None \
+          and rollouts % DEADLINE_CHECK_INTERVAL == 0 and time.perf_counter() >= deadline:
+            break
+
+        if rollouts < arm_count:
+            arm = rollouts
+        else:
+            log_rollouts = math.log(rollouts)
+            arm = max(range(arm_count), key=lambda candidate: totals[candidate]
+              / visits[candidate] + exploration * math.sqrt(log_rollouts / visits[candidate]))
+
+        totals[arm] += evaluate(arm)
+        visits[arm] += 1
+        rollouts += 1
+
+    best_arm = max(range(arm_count),
+      key=lambda candidate: (visits[candidate], totals[candidate] / visits[candidate]))
+    return best_arm, visits, totals
+
+
+class MctsPlayer(cribbageplayers.OptimizedPlayer):
+    """Provides a player that searches discards and pegging with rollouts.
+
+    Attributes:
+        max_rollouts: the most rollouts to spend on a discard
+        pegging_rollouts: the most rollouts to spend on a pegging decision
+        time_limit_ms: the most milliseconds to spend on a decision, or None
+        exploration: the UCB1 exploration constant in points
+    """
+    def __init__(self, max_rollouts=DEFAULT_MAX_ROLLOUTS, time_limit_ms=None,
+      pegging_rollouts=DEFAULT_PEGGING_ROLLOUTS, exploration=DEFAULT_EXPLORATION,
+      rng=None):
+        self.max_rollouts = max_rollouts
+        self.pegging_rollouts = pegging_rollouts
+        self.time_limit_ms = time_limit_ms
+        self.exploration = exploration
+        self._rng = rng if rng is not None else random.Random()
+        self._is_dealer = False
+        self._kept = ()
+        self._discarded = ()
+        self._worlds = []
+        self._opponent_played = set()
+        self._start_card = None
+        self._go_caller = None
+
+    def use_game_context(self, rng, logger):
+        """Searches with the game's rng, so seeded games replay exactly."""
+        super().use_game_context(rng, logger)
+        self._rng = rng
+
+    # pylint: disable=unused-argument
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Resets the sampled opponent hands for the new round."""
+        self._is_dealer = is_dealer
+        self._kept = ()
+        self._discarded = ()
+        self._worlds = []
+        self._opponent_played = set()
+        self._start_card = None
+        self._go_caller = None
+    # pylint: enable=unused-argument
+
+    def observe_start_card(self, start_card):
+        """Records the start card so no sampled opponent hand holds it."""
+        self._start_card = cribbagecompact.card_to_index(start_card)
+
+    def observe_run_play(self, is_player, run_card):
+        """Records the opponent's cards and tracks the go the same way the engine does."""
+        if run_card is not None:
+            if not is_player:
+                self._opponent_played.add(cribbagecompact.card_to_index(run_card))
+        elif self._go_caller is None:
+            self._go_caller = is_player
+        elif self._go_caller != is_player:
+            self._go_caller = None
+
+    def discard_to_crib(self, player_hand):
+        """Discards the two cards whose rollouts earn the most net points.
+
+        Args:
+            player_hand: A set of PlayingCard representing the hand
+
+        Returns:
+           {PlayingCard, PlayingCard} two cards as a tuple
+        """
+        # The rollouts play out a standard two player deal, so variants
+        # discard and peg like OptimizedPlayer
+        if self.rules is not cribbageengine.STANDARD_RULES:
+            return super().discard_to_crib(player_hand)
+
+        hand_cards = sorted(player_hand)
+        hand = cribbagecompact.cards_to_indices(hand_cards)
+        unseen = [card for card in range(cribbagecompact.DECK_SIZE) if card not in hand]
+        worlds_by_arm = [[] for _ in cribbagecompact.DISCARD_OPTIONS]
+
+        def evaluate(arm):
+            keep = [hand[position] for position in cribbagecompact.KEEP_OPTIONS[arm]]
+            discard = [hand[position] for position in cribbagecompact.DISCARD_OPTIONS[arm]]
+            sample = self._rng.sample(unseen, 7)
+            opponent_keep, opponent_discard = cribbagecompact.choose_keep_by_ranks(sample[:6])
+            worlds_by_arm[arm].append(opponent_keep)
+            return self._play_out_round(keep, discard, opponent_keep,
+              opponent_discard, sample[6])
+
+        best_arm = ucb_search(len(cribbagecompact.DISCARD_OPTIONS), evaluate,
+          self.max_rollouts, self._get_deadline(), self.exploration)[0]
+
+        discard_positions = cribbagecompact.DISCARD_OPTIONS[best_arm]
+        card_one = hand_cards[discard_positions[0]]
+        card_two = hand_cards[discard_positions[1]]
+        player_hand.remove(card_one)
+        player_hand.remove(card_two)
+
+        self._kept = tuple(hand[position] for position in cribbagecompact.KEEP_OPTIONS[best_arm])
+        self._discarded = tuple(hand[position] for position in discard_positions)
+        self._worlds = worlds_by_arm[best_arm]
+
+        return card_one, card_two
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Selects the card whose rollouts earn the most net pegging points.
+
+        Args:
+            player_run_hand: The set of PlayingCards the player has in
+              their hand available to play.
+            run: the existing list of PlayingCards in the run
+            run_total: the total value in the run
+        """
+        cards_by_index = {cribbagecompact.card_to_index(card): card
+          for card in player_run_hand}
+        legal = [card for card in sorted(cards_by_index)
+          if run_total + cribbagecompact.CARD_VALUES[card] <= cribbagecompact.HIGHEST_RUN_ALLOWED]
+        if not self._kept or len(legal) <= 1:
+            return super().get_run_card(player_run_hand, run, run_total)
+
+        run_ranks = [card >> 2 for card in cribbagecompact.cards_to_indices(run)]
+        # The rollouts seat this player at 0 and the opponent at 1
+        go_player = -1 if self._go_caller is None else int(not self._go_caller)
+        worlds = self._get_pegging_worlds()
+        hand = sorted(cards_by_index)
+        world_counters = [0] * len(legal)
+
+        def evaluate(arm):
+            card = legal[arm]
+            world = worlds[world_counters[arm] % len(worlds)]
+            world_counters[arm] += 1
+            points = cribbagecompact.score_run_play(run_ranks, run_total, card >> 2)
+            player_hand = [held for held in hand if held != card]
+            opponent_hand = [held for held in world if held not in self._opponent_played]
+            if not player_hand and not opponent_hand:
+                return points + 1
+
+            later_points = cribbagecompact.play_pegging([player_hand, opponent_hand], 1,
+              cribbagecompact.choose_greedy_card, run_ranks + [card >> 2], go_player)
+            return points + later_points[0] - later_points[1]
+
+        best_arm = ucb_search(len(legal), evaluate, self.pegging_rollouts,
+          self._get_deadline(), self.exploration)[0]
+        return cards_by_index[legal[best_arm]]
+
+    def _get_pegging_worlds(self):
+        """Gets the sampled opponent hands that agree with the opponent's plays.
+
+        Returns:
+            (list) of tuples of card indices the opponent may have kept
+        """
+        worlds = [world for world in self._worlds if self._opponent_played.issubset(world)
+          and self._start_card not in world]
+        if len(worlds) < MIN_PEGGING_WORLDS:
+            known = set(self._kept) | set(self._discarded) | self._opponent_played
+            if self._start_card is not None:
+                known.add(self._start_card)
+            unseen = [card for card in range(cribbagecompact.DECK_SIZE) if card not in known]
+            unplayed_count = max(0, 4 - len(self._opponent_played))
+            played = tuple(sorted(self._opponent_played))
+            while len(worlds) < MIN_PEGGING_WORLDS:
+                worlds.append(played + tuple(self._rng.sample(unseen, unplayed_count)))
+            self._worlds = worlds
+
+        return worlds
+
+    def _play_out_round(self, keep, discard, opponent_keep, opponent_discard, start_card):
+        """Plays the run and the show for one sampled deal.
+
+        Returns:
+            (int) the player's points minus the opponent's points
+        """
+        points = cribbagecompact.play_pegging([list(keep), list(opponent_keep)],
+          1 if self._is_dealer else 0, cribbagecompact.choose_greedy_card)
+        player_points = points[0] + cribbagecompact.score_hand(keep, start_card)
+        opponent_points = points[1] + cribbagecompact.score_hand(opponent_keep, start_card)
+
+        crib_points = cribbagecompact.score_hand(list(discard) + list(opponent_discard),
+          start_card)
+        if start_card >> 2 == cribbagecompact.JACK_RANK:
+            crib_points += 1
+
+        if self._is_dealer:
+            return player_points + crib_points - opponent_points
+        return player_points - opponent_points - crib_points
+
+    def _get_deadline(self):
+        if self.time_limit_ms is None:
+            return None
+        return time.perf_counter() + self.time_limit_ms / 1000
@@ -0,0 +1,283 @@
+"""Plays thousands of pegging runs at once with NumPy arrays.
+
+Hands are arrays of card ranks (0 for an ace through 12 for a king) with -1
+for an empty slot, shaped (games, 2, cards per hand).  Every game in the
+batch takes one turn per step, following the same pegging, go, 31 and last
+card rules as CribbageGame.play_next_run_card.
+
+Policies choose which slot of the current hand to play for every game that
+can play.  A policy is a callable (batch, rows, legal) returning the chosen
+slot for each row, and a different policy can be given to each seat.
+
+  hands = deal_random_hands(10000, numpy.random.default_rng(1))
+  points = simulate_pegging(hands, 1, greedy_policy)
+
+"""
+
+import numpy as np
+
+HIGHEST_RUN_ALLOWED = 31
+
+# The pegging value of each rank, with a trailing 0 so an empty slot (-1) has no value.
+RANK_VALUES = np.array([min(rank + 1, 10) for rank in range(13)] + [0], dtype=np.int16)
+
+# The points for playing onto 0, 1, 2 or 3 cards of the same rank.
+PAIR_POINTS = np.array([0, 2, 6, 12], dtype=np.int16)
+
+
+class PeggingBatch:
+    """Holds the state of many pegging runs played in lockstep.
+
+    Attributes:
+        hands: (games, 2, slots) ranks left in each hand, -1 for a played slot
+        run: (games, width) ranks in the run since it was last reset
+        run_length: (games,) the number of cards in the run
+        run_total: (games,) the total value of the run
+        go_player: (games,) the seat that called a go, or -1 when no one has
+        turn: (games,) the seat whose turn it is
+        points: (games, 2) the points each seat has pegged
+        plays: (games, plays) the ranks played in order, -1 past the last play
+        play_seats: (games, plays) the seat that made each play
+        play_count: (games,) the number of plays made
+        is_done: (games,) True once both hands are empty
+    """
+    def __init__(self, hands, first_turn, run_ranks=None):
+        hands = np.array(hands, dtype=np.int16)
+        game_count, _, slot_count = hands.shape
+        initial_length = 0 if run_ranks is None else len(run_ranks)
+
+        self.hands = hands
+        self.run = np.full((game_count, initial_length + 2 * slot_count), -1, dtype=np.int16)
+        self.run_length = np.full(game_count, initial_length, dtype=np.int16)
+        if initial_length:
+            self.run[:, :initial_length] = run_ranks
+        self.run_total = RANK_VALUES[self.run].sum(axis=1).astype(np.int16)
+        self.go_player = np.full(game_count, -1, dtype=np.int16)
+        self.turn = np.broadcast_to(np.asarray(first_turn, dtype=np.int16),
+          (game_count,)).copy()
+        self.points = np.zeros((game_count, 2), dtype=np.int32)
+        self.plays = np.full((game_count, 2 * slot_count), -1, dtype=np.int16)
+        self.play_seats = np.full((game_count, 2 * slot_count), -1, dtype=np.int16)
+        self.play_count = np.zeros(game_count, dtype=np.int16)
+        self.is_done = ~(self.hands >= 0).any(axis=(1, 2))
+
+    def get_legal_slots(self, rows):
+        """Gets which slots of the current hand can be played for each row.
+
+        Args:
+            rows: an array of game indices
+
+        Returns:
+            (ndarray) a (rows, slots) boolean array of playable slots
+        """
+        hand = self.hands[rows, self.turn[rows]]
+        return (hand >= 0) & (self.run_total[rows, None] + RANK_VALUES[hand]
+          <= HIGHEST_RUN_ALLOWED)
+
+    def score_plays(self, rows, ranks):
+        """Calculates the points for playing a rank onto the run of each row.
+
+        Matches cribbageengine.calculate_score_for_run_play.
+
+        Args:
+            rows: an array of game indices
+            ranks: an array of the rank played in each row
+
+        Returns:
+            (ndarray) the points for each play
+        """
+        run = self.run[rows]
+        run_length = self.run_length[rows].astype(np.int64)
+        row_range = np.arange(len(rows))
+        ranks = ranks.astype(np.int16)
+
+        new_total = self.run_total[rows] + RANK_VALUES[ranks]
+        points = np.where((run_length > 0) & ((new_total == 15) | (new_total == 31)), 2, 0)
+
+        # Count the run cards matching the new rank, stopping at the first mismatch
+        total_pairs = np.zeros(len(rows), dtype=np.int64)
+        is_matching = np.ones(len(rows), dtype=bool)
+        for lookback in range(1, 4):
+            is_matching &= (run_length >= lookback) & \
+              (run[row_range, np.maximum(run_length - lookback, 0)] == ranks)
+            total_pairs += is_matching
+        points += PAIR_POINTS[total_pairs]
+
+        # The longest tail that sorts to a sequence scores its length.  Tails
+        # are grown one card at a time, tracking their ranks as a bit mask.
+        rank_mask = np.left_shift(1, ranks.astype(np.int64))
+        low_rank = ranks.copy()
+        high_rank = ranks.copy()
+        is_distinct = np.ones(len(rows), dtype=bool)
+        sequence_length = np.zeros(len(rows), dtype=np.int64)
+        for lookback in range(1, run.shape[1] + 1):
+            has_card = run_length >= lookback
+            tail_rank = run[row_range, np.maximum(run_length - lookback, 0)]
+            tail_bit = np.left_shift(1, np.maximum(tail_rank, 0).astype(np.int64))
+            is_distinct &= ~has_card | ((rank_mask & tail_bit) == 0)
+            rank_mask = np.where(has_card, rank_mask | tail_bit, rank_mask)
+            low_rank = np.where(has_card, np.minimum(low_rank, tail_rank), low_rank)
+            high_rank = np.where(has_card, np.maximum(high_rank, tail_rank), high_rank)
+            if lookback >= 2:
+                is_sequence = has_card & is_distinct & (high_rank - low_rank == lookback)
+                sequence_length = np.where(is_sequence, lookback + 1, sequence_length)
+            if not has_card.any():
+                break
+        points += sequence_length
+
+        return points
+
+    def step(self, policies):
+        """Takes one turn in every game that is not done.
+
+        Args:
+            policies: a tuple of the policy for seat 0 and seat 1
+        """
+        rows = np.nonzero(~self.is_done)[0]
+        if not len(rows):
+            return
+
+        legal = self.get_legal_slots(rows)
+        can_play = legal.any(axis=1)
+
+        play_rows = rows[can_play]
+        if len(play_rows):
+            play_legal = legal[can_play]
+            slots = np.empty(len(play_rows), dtype=np.int64)
+            play_turns = self.turn[play_rows]
+            for seat in (0, 1):
+                is_seat = play_turns == seat
+                if is_seat.any():
+                    slots[is_seat] = policies[seat](self, play_rows[is_seat], play_legal[is_seat])
+            self._play_slots(play_rows, slots)
+
+        go_rows = rows[~can_play]
+        if len(go_rows):
+            self._call_go(go_rows)
+
+        # The last card gets one more point
+        is_finished = ~(self.hands[rows] >= 0).any(axis=(1, 2))
+        finished_rows = rows[is_finished]
+        self.points[finished_rows, self.turn[finished_rows]] += 1
+        self.is_done[finished_rows] = True
+
+        self.turn[rows] = 1 - self.turn[rows]
+
+    def _play_slots(self, rows, slots):
+        turns = self.turn[rows]
+        ranks = self.hands[rows, turns, slots]
+        self.points[rows, turns] += self.score_plays(rows, ranks)
+        self.hands[rows, turns, slots] = -1
+        self.run[rows, self.run_length[rows]] = ranks
+        self.run_length[rows] += 1
+        self.run_total[rows] += RANK_VALUES[ranks]
+        self.plays[rows, self.play_count[rows]] = ranks
+        self.play_seats[rows, self.play_count[rows]] = turns
+        self.play_count[rows] += 1
+
+    def _call_go(self, rows):
+        turns = self.turn[rows]
+        go_players = self.go_player[rows]
+
+        # If no one has said "Go" the active player says "Go" for the other's point
+        first_go_rows = rows[go_players == -1]
+        self.go_player[first_go_rows] = self.turn[first_go_rows]
+        self.points[first_go_rows, 1 - self.turn[first_go_rows]] += 1
+
+        # If the other player said "Go" then the run is reset
+        reset_rows = rows[(go_players != -1) & (go_players != turns)]
+        self.run[reset_rows] = -1
+        self.run_length[reset_rows] = 0
+        self.run_total[reset_rows] = 0
+        self.go_player[reset_rows] = -1
+
+
+def first_legal_policy(batch, rows, legal):
+    """Plays the first playable slot of each hand."""
+    # pylint: disable=unused-argument
+    return legal.argmax(axis=1)
+
+def greedy_policy(batch, rows, legal):
+    """Plays the slot with the most points, then the largest value.
+
+    Matches cribbagecompact.choose_greedy_card for hands sorted by rank.
+    """
+    hand = batch.hands[rows, batch.turn[rows]]
+    best_slots = np.zeros(len(rows), dtype=np.int64)
+    best_keys = np.full(len(rows), -1, dtype=np.int64)
+    for slot in range(hand.shape[1]):
+        points = batch.score_plays(rows, np.maximum(hand[:, slot], 0))
+        keys = np.where(legal[:, slot], points * 16 + RANK_VALUES[hand[:, slot]], -1)
+        is_better = keys > best_keys
+        best_slots = np.where(is_better, slot, best_slots)
+        best_keys = np.where(is_better, keys, best_keys)
+    return best_slots
+
+def make_random_policy(rng):
+    """Creates a policy that plays a uniformly random playable slot.
+
+    Args:
+        rng: a numpy.random.Generator
+
+    Returns:
+        (callable) the policy
+    """
+    def random_policy(batch, rows, legal):
+        # pylint: disable=unused-argument
+        noise = rng.random(legal.shape)
+        return np.where(legal, noise, -1.0).argmax(axis=1)
+
+    return random_policy
+
+def deal_random_hands(game_count, rng, cards_per_hand=4):
+    """Deals two hands of ranks for each game from its own shuffled deck.
+
+    Args:
+        game_count: the number of games
+        rng: a numpy.random.Generator
+        cards_per_hand: the cards in each hand
+
+    Returns:
+        (ndarray) a (games, 2, cards_per_hand) array of ranks, each hand sorted
+    """
+    cards = np.argsort(rng.random((game_count, 52)), axis=1)[:, :2 * cards_per_hand]
+    hands = (cards // 4).reshape(game_count, 2, cards_per_hand)
+    return np.sort(hands, axis=2).astype(np.int16)
+
+def hands_from_cards(card_hands):
+    """Converts pairs of PlayingCard hands to an array of ranks.
+
+    Args:
+        card_hands: a list of (hand, hand) tuples of PlayingCard iterables
+
+    Returns:
+        (ndarray) a (games, 2, slots) array of ranks, each hand sorted and
+          padded with -1
+    """
+    slot_count = max(len(hand) for hands in card_hands for hand in hands)
+    ranks = np.full((len(card_hands), 2, slot_count), -1, dtype=np.int16)
+    for game, hands in enumerate(card_hands):
+        for seat, hand in enumerate(hands):
+            hand_ranks = sorted(card.face.value - 1 for card in hand)
+            ranks[game, seat, :len(hand_ranks)] = hand_ranks
+    return ranks
+
+def simulate_pegging(hands, first_turn, policies, run_ranks=None):
+    """Plays every pegging run in the batch to the end.
+
+    Args:
+        hands: a (games, 2, slots) array of ranks, -1 for an empty slot
+        first_turn: the seat that plays first, for all games or as an array
+        policies: one policy for both seats, or a tuple with one per seat
+        run_ranks: ranks already in the run for every game, empty by default
+
+    Returns:
+        (PeggingBatch) the finished batch, see its points and plays
+    """
+    if callable(policies):
+        policies = (policies, policies)
+
+    batch = PeggingBatch(hands, first_turn, run_ranks)
+    while not batch.is_done.all():
+        batch.step(policies)
+    return batch
@@ -3,15 +3,86 @@
 
 import logging
 import random
-from itertools import combinations
 
+import cribbagecompact
+import cribbagedistribution
 import cribbageengine
 
 HIGHEST_RUN_ALLOWED = 31
 
+# The OptimizedPlayer's pegging heuristics, in points added to a play that
+# leaves the run total under 5, leaves it at 5, leaves it at 15, jumps it past
+# 15, and per pip of the card played.
+PEGGING_WEIGHT_NAMES = ("under_five", "at_five", "at_fifteen", "past_fifteen", "card_value")
+DEFAULT_PEGGING_WEIGHTS = (0.5, -0.5, -0.3, 0.5, 0.0)
+
 class RandomPlayer:
     """Provides a base implementation for a player that makes random choices.
+
+    Attributes:
+        rng: the random.Random the player draws from, the random module
+          until a game hands it one
+        logger: the logging.Logger the player logs to, the root logger until
+          a game hands it one
+        rules: the RulesConfig of the game being played
     """
+    rng = random
+    logger = logging.getLogger()
+    rules = cribbageengine.STANDARD_RULES
+
+    def use_rules(self, rules):
+        """Tells the player the rules of the game it is playing.
+
+        Args:
+            rules: the game's RulesConfig
+        """
+        self.rules = rules
+
+    def use_game_context(self, rng, logger):
+        """Tells the player the rng and logger of the game it is playing.
+
+        Games given their own rng or logger call this when players join, so
+        a player's random choices replay with the game's seed.
+
+        Args:
+            rng: the game's random.Random
+            logger: the game's logging.Logger
+        """
+        self.rng = rng
+        self.logger = logger
+
+    # pylint: disable=unused-argument
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Tells the player a new round is starting, before it discards.
+
+        Players that do not track the game can ignore this.
+
+        Args:
+            is_dealer: True if the player owns the crib this round
+            player_score: the player's score at the start of the round
+            opponent_score: the opponent's score at the start of the round
+        """
+
+    def observe_run_play(self, is_player, run_card):
+        """Tells the player about each turn of the run, by either player.
+
+        Players that do not track the run can ignore this.
+
+        Args:
+            is_player: True if this player took the turn
+            run_card: the PlayingCard played, or None if the turn was a go
+        """
+
+    def observe_start_card(self, start_card):
+        """Tells the player the start card cut after the discards.
+
+        Players that do not track the unseen cards can ignore this.
+
+        Args:
+            start_card: the PlayingCard cut
+        """
+    # pylint: enable=unused-argument
+
     def discard_to_crib(self, player_hand):
         """Discards two cards randomly to the crib.
 
@@ -19,15 +90,16 @@ class RandomPlayer:
             player_hand: A set of PlayingCard representing the hand
 
         Returns:
-           {PlayingCard, PlayingCard} two cards as a tuple
+           (tuple) the discard_count PlayingCards of the rules, two cards
+             in the standard game
         """
+        discards = []
+        for _ in range(self.rules.discard_count):
+            card = self.rng.sample(sorted(player_hand), 1)[0]
+            player_hand.remove(card)
+            discards.append(card)
 
-        card_one = random.sample(sorted(player_hand), 1)[0]
-        player_hand.remove(card_one)
-        card_two = random.sample(sorted(player_hand), 1)[0]
-        player_hand.remove(card_two)
-
-        return card_one, card_two
+        return tuple(discards)
 
     # pylint: disable=unused-argument
     def get_run_card(self, player_run_hand, run, run_total):
@@ -39,15 +111,26 @@ class RandomPlayer:
             run: the existing list of PlayingCards in the run
             run_total: the total value in the run
         """
-        for card in player_run_hand:
-            if run_total + card.value <= HIGHEST_RUN_ALLOWED:
-                return card
-
-        return None
+        # Sorted so the choice does not depend on the set's hash order
+        legal_cards = [card for card in sorted(player_run_hand)
+          if run_total + card.value <= HIGHEST_RUN_ALLOWED]
+        if not legal_cards:
+            return None
+        return self.rng.choice(legal_cards)
     # pylint: enable=unused-argument
 
 class OptimizedPlayer(RandomPlayer):
-    """Provides a run optimized player"""
+    """Provides a run optimized player
+
+    Attributes:
+        pegging_weights: the pegging heuristics, ordered as PEGGING_WEIGHT_NAMES
+    """
+    pegging_weights = DEFAULT_PEGGING_WEIGHTS
+
+    def __init__(self, pegging_weights=None):
+        if pegging_weights is not None:
+            self.pegging_weights = tuple(pegging_weights)
+
     def get_run_card(self, player_run_hand, run, run_total):
         """Selects a random valid card for the run
 
@@ -59,29 +142,31 @@ class OptimizedPlayer(RandomPlayer):
         """
         best_card = None
         best_points = None
+        under_five, at_five, at_fifteen, past_fifteen, card_value = self.pegging_weights
 
-        # First see if points can be earned, and maximize that.
-        for run_card in player_run_hand:
+        # First see if points can be earned, and maximize that.  Cards are
+        # tried in order so ties do not depend on the hash seed.
+        for run_card in sorted(player_run_hand):
             if run_total + run_card.value <= HIGHEST_RUN_ALLOWED:
                 this_points = cribbageengine.calculate_score_for_run_play(run, run_card)
-                logging.debug("OptimizedPlayer Initial Review Card %s for Score %s", run_card, this_points)
 
                 # keep the total under 5 is good
                 # as is avoiding leaving a 5 or 10 run total where the opponent
                 #   could try and get 15
                 if run_total + run_card.value < 5:
-                    this_points += 0.5
+                    this_points += under_five
                 elif run_total + run_card.value == 5:
-                    this_points -= 0.5
+                    this_points += at_five
                 elif run_total + run_card.value == 15:
-                    this_points -= 0.3
+                    this_points += at_fifteen
 
                 # if the run total is less than 15, and the card takes it above
                 # 15 that helps to prevent opponent from getting a 15
                 if run_total < 15 < run_total + run_card.value:
-                    this_points += 0.5
+                    this_points += past_fifteen
+                if card_value:
+                    this_points += card_value * run_card.value
 
-                logging.debug("OptimizedPlayer Review Card %s for Score %s", run_card, this_points)
                 # Choose the card that gives the best points.  If there is a tie
                 # choose the largest card we can drop
                 if best_points is None or this_points > best_points:
@@ -91,7 +176,7 @@ class OptimizedPlayer(RandomPlayer):
                     best_card = run_card
                     best_points = this_points
 
-        logging.info("OptimizedPlayer Best Card %s for Score %s", best_card, best_points)
+        self.logger.info("OptimizedPlayer Best Card %s for Score %s", best_card, best_points)
         return best_card
 
     def discard_to_crib(self, player_hand):
@@ -103,55 +188,59 @@ class OptimizedPlayer(RandomPlayer):
         Returns:
            {PlayingCard, PlayingCard} two cards as a tuple
         """
+        if self.rules.discard_options != cribbagecompact.DISCARD_OPTIONS:
+            return self._discard_by_keep_scores(player_hand)
 
-        # Get a deck of all potential cards not included in the hand
-        remaining_deck = cribbageengine.CribbageEngine().get_deck_copy()
-        for card in player_hand:
-            remaining_deck.remove(card)
+        # Every card not in the hand could be the cut
+        hand = sorted(player_hand)
+        hand_indices = cribbagecompact.cards_to_indices(hand)
+        live_cuts = [cut for cut in range(cribbagecompact.DECK_SIZE) if cut not in hand_indices]
 
-        logging.debug("Remaining Deck [%s]",
-          cribbageengine.cards_as_string(remaining_deck))
-
-        # Go through all combinations of discarding two cards
+        # Go through all combinations of discarding two cards, with the score
+        # of every kept hand against every cut found in one shared pass
         best_discard_score = 0
         card_one = None
         card_two = None
-        combinations_set = list(combinations(player_hand, 2))
-        for combo in combinations_set:
-            player_hand_copy = player_hand.copy()
-            player_discard = set()
-            for discard_card in combo:
-              player_hand_copy.remove(discard_card)
-              player_discard.add(discard_card)
-
-            logging.debug("Calculate Hand Value For: %s",
-              cribbageengine.cards_as_string(player_hand_copy))
-            logging.debug("Calculate Crib Value For: %s",
-              cribbageengine.cards_as_string(player_discard))
-            average_score = self._calculate_average_hand_score(player_hand_copy, remaining_deck)
+        for discard_positions, hand_scores in zip(cribbagecompact.DISCARD_OPTIONS,
+          cribbagedistribution.get_discard_score_vectors(hand_indices)):
+            average_score = sum(hand_scores[cut] for cut in live_cuts) / len(live_cuts)
 
             if average_score > best_discard_score or card_one is None:
-              card_one = combo[0]
-              card_two = combo[1]
+              card_one = hand[discard_positions[0]]
+              card_two = hand[discard_positions[1]]
               best_discard_score = average_score
 
-        logging.info("Discard best option [%s] with score [%s]",
+        self.logger.info("Discard best option [%s] with score [%s]",
           cribbageengine.cards_as_string([card_one,card_two]), best_discard_score)
         player_hand.remove(card_one)
         player_hand.remove(card_two)
 
         return card_one, card_two
 
-    def _calculate_average_hand_score(self, player_hand, remaining_deck):
-        iteration = 0
-        total_score = 0
-        for run_card in remaining_deck:
-            iteration += 1
-            total_hand_score = cribbageengine.calculate_score_for_hand(list(player_hand), run_card)
-
-            total_score += total_hand_score
-
-        logging.info("Total Iterations %s has total score %s (%s)", iteration,
-          total_score, total_score / iteration)
+    def _discard_by_keep_scores(self, player_hand):
+        """Discards the cards whose keep scores best over the cut, for variant rules.
 
-        return total_score / iteration
+        Returns:
+           (tuple) the discard_count PlayingCards of the rules
+        """
+        hand = sorted(player_hand)
+        hand_indices = cribbagecompact.cards_to_indices(hand)
+
+        best_discard = None
+        best_discard_total = -1
+        for discard_positions, keep_positions in zip(self.rules.discard_options,
+          self.rules.keep_options):
+            discard_total = cribbagecompact.score_keep_over_cuts(
+              [hand_indices[position] for position in keep_positions], hand_indices)
+            if discard_total > best_discard_total:
+                best_discard = discard_positions
+                best_discard_total = discard_total
+        best_discard_score = best_discard_total / (cribbagecompact.DECK_SIZE - len(hand))
+
+        discards = tuple(hand[position] for position in best_discard)
+        self.logger.info("Discard best option [%s] with score [%s]",
+          cribbageengine.cards_as_string(discards), best_discard_score)
+        for card in discards:
+            player_hand.remove(card)
+
+        return discards
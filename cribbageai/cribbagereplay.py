@@ -0,0 +1,391 @@
+"""A fixed size experience replay buffer kept in memory mapped files.
+
+Transitions of (state, action, reward, next state, done) are written to
+typed .npy files in one directory, so a buffer of tens of millions of
+transitions costs no Python objects, survives between runs and can be opened
+by several processes at once.  Appending reserves the next slots in the ring
+under a file lock, so simulation workers can write to the same buffer while a
+learner samples from it.  Sampling takes the lock too, so a batch never
+mixes rows from before and after an append.
+
+Prioritized sampling descends a sum tree of the scaled priorities, kept in
+its own memory mapped file beside the priorities, so a batch costs
+O(batch size * log capacity) however large the buffer is.
+
+States and actions use the feature rows of cribbageselfplay by default.
+
+  buffer = ReplayBuffer("replay", capacity=10000000, alpha=0.6)
+  fill_replay_buffer("replay", games=1000)
+  batch = buffer.sample(256, numpy.random.default_rng(), prioritized=True)
+
+"""
+
+import argparse
+import contextlib
+import fcntl
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import cribbageaicli
+import cribbageengine
+import cribbageselfplay
+
+DEFAULT_PRIORITY = 1.0
+DEFAULT_ALPHA = 0.6
+DEFAULT_BETA = 0.4
+
+# The slots of the meta file.
+META_CAPACITY = 0
+META_NEXT_INDEX = 1
+META_SIZE = 2
+META_APPENDED = 3
+META_WIDTH = 4
+
+# The sum tree keeps its root at node 1 and the children of node n at 2n and
+# 2n + 1, which leaves node 0 free to hold the alpha the tree was built with.
+TREE_ALPHA = 0
+TREE_ROOT = 1
+
+
+class ReplayBuffer:
+    """Holds transitions in a ring of memory mapped arrays.
+
+    Once the buffer is full each append overwrites the oldest transition.
+    The ring position is kept in a meta file so every process sees the same
+    buffer, and is only changed while holding the buffer's lock file.
+
+    Attributes:
+        directory: the directory holding the buffer's files
+        capacity: the most transitions the buffer holds
+        states: (capacity, state_width) int16 states
+        actions: (capacity, action_width) int16 actions
+        rewards: (capacity,) float32 rewards
+        next_states: (capacity, state_width) int16 states after the action
+        dones: (capacity,) bool, True if the transition ended the episode
+        priorities: (capacity,) float32 sampling priorities
+        alpha: how strongly priorities skew prioritized sampling
+    """
+    def __init__(self, directory, capacity=None, state_width=None, action_width=None,
+      alpha=None):
+        """Opens the buffer in the directory, creating it if it does not exist.
+
+        Args:
+            directory: the directory holding the buffer's files
+            capacity: the most transitions to hold, needed to create a buffer
+            state_width: the number of columns in a state, the buffer's own or
+              cribbageselfplay.FEATURE_WIDTH for a new buffer by default
+            action_width: the number of columns in an action, the buffer's own
+              or cribbageselfplay.ACTION_WIDTH for a new buffer by default
+            alpha: how strongly priorities skew sampling, the buffer's own or
+              DEFAULT_ALPHA for a new buffer by default
+
+        Raises:
+            ValueError: if the buffer does not exist and no capacity is given,
+              or it exists with other widths or another alpha
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "lock"), "a+b")  # pylint: disable=consider-using-with
+
+        with self._locked():
+            meta_path = self._get_path("meta")
+            is_new = not os.path.exists(meta_path)
+            if is_new and capacity is None:
+                raise ValueError(f"No replay buffer in {directory}, a capacity is needed")
+            mode = "w+" if is_new else "r+"
+            if is_new:
+                self._meta = np.lib.format.open_memmap(meta_path, mode, np.int64, (META_WIDTH,))
+                self._meta[META_CAPACITY] = capacity
+            else:
+                self._meta = np.lib.format.open_memmap(meta_path, mode)
+            self.capacity = int(self._meta[META_CAPACITY])
+
+            self.states = self._open_array("states", mode, np.int16,
+              (cribbageselfplay.FEATURE_WIDTH if state_width is None else state_width,))
+            self.actions = self._open_array("actions", mode, np.int16,
+              (cribbageselfplay.ACTION_WIDTH if action_width is None else action_width,))
+            self.rewards = self._open_array("rewards", mode, np.float32, ())
+            self.next_states = self._open_array("next_states", mode, np.int16,
+              self.states.shape[1:])
+            self.dones = self._open_array("dones", mode, np.bool_, ())
+            self.priorities = self._open_array("priorities", mode, np.float32, ())
+            for name, width, array in (("state", state_width, self.states),
+              ("action", action_width, self.actions)):
+                if width is not None and array.shape[1] != width:
+                    raise ValueError(f"The replay buffer in {directory} has a {name} width of "
+                      f"{array.shape[1]}, not {width}")
+            self._open_tree(DEFAULT_ALPHA if alpha is None else alpha, alpha is not None)
+            if is_new:
+                self._meta.flush()
+
+    def __len__(self):
+        return int(self._meta[META_SIZE])
+
+    def get_appended_count(self):
+        """Gets the number of transitions ever appended, including overwritten ones."""
+        return int(self._meta[META_APPENDED])
+
+    def append(self, state, action, reward, next_state, done, priority=DEFAULT_PRIORITY):
+        """Appends one transition."""
+        self.append_batch([state], [action], [reward], [next_state], [done], [priority])
+
+    def append_batch(self, states, actions, rewards, next_states, dones, priorities=None):
+        """Appends transitions in one reservation of the ring.
+
+        Args:
+            states: (rows, state_width) states
+            actions: (rows, action_width) actions
+            rewards: (rows,) rewards
+            next_states: (rows, state_width) states after the actions
+            dones: (rows,) True where the transition ended the episode
+            priorities: (rows,) priorities, DEFAULT_PRIORITY by default
+
+        Returns:
+            (ndarray) the slots written
+        """
+        row_count = len(states)
+        if priorities is None:
+            priorities = np.full(row_count, DEFAULT_PRIORITY, dtype=np.float32)
+
+        # Only the newest transitions survive a batch longer than the ring
+        skipped = max(0, row_count - self.capacity)
+        with self._locked():
+            next_index = int(self._meta[META_NEXT_INDEX])
+            slots = (next_index + skipped + np.arange(row_count - skipped)) % self.capacity
+            self.states[slots] = np.asarray(states)[skipped:]
+            self.actions[slots] = np.asarray(actions)[skipped:]
+            self.rewards[slots] = np.asarray(rewards)[skipped:]
+            self.next_states[slots] = np.asarray(next_states)[skipped:]
+            self.dones[slots] = np.asarray(dones)[skipped:]
+            self.priorities[slots] = np.asarray(priorities)[skipped:]
+            self._update_tree(slots)
+
+            self._meta[META_NEXT_INDEX] = (next_index + row_count) % self.capacity
+            self._meta[META_SIZE] = min(self.capacity, int(self._meta[META_SIZE]) + row_count)
+            self._meta[META_APPENDED] += row_count
+
+        return slots
+
+    def sample(self, batch_size, rng, prioritized=False, beta=DEFAULT_BETA):
+        """Samples transitions with replacement.
+
+        Prioritized sampling picks each slot with probability proportional to
+        its priority to the power alpha, and weights each sample by its
+        importance so the weights correct for the bias, scaled to at most 1.
+
+        Args:
+            batch_size: the number of transitions to sample
+            rng: a numpy.random.Generator
+            prioritized: True to sample by priority, False for uniform
+            beta: how strongly the importance weights correct the skew
+
+        Returns:
+            (dict) arrays keyed by indices, states, actions, rewards,
+              next_states, dones and weights
+
+        Raises:
+            ValueError: if the buffer is empty
+        """
+        with self._locked():
+            size = len(self)
+            if not size:
+                raise ValueError("Cannot sample an empty replay buffer")
+
+            if prioritized:
+                targets = rng.random(batch_size) * self._tree[TREE_ROOT]
+                nodes = np.full(batch_size, TREE_ROOT)
+                while nodes[0] < self._leaf_offset:
+                    left_sums = self._tree[2 * nodes]
+                    # Rounding must never lead into an empty right subtree
+                    is_right = (targets >= left_sums) & (self._tree[2 * nodes + 1] > 0)
+                    targets -= np.where(is_right, left_sums, 0.0)
+                    nodes = 2 * nodes + is_right
+                indices = np.minimum(nodes - self._leaf_offset, size - 1)
+                weights = np.power(size * self._tree[self._leaf_offset + indices]
+                  / self._tree[TREE_ROOT], -beta)
+                weights = (weights / weights.max()).astype(np.float32)
+            else:
+                indices = rng.integers(0, size, batch_size)
+                weights = np.ones(batch_size, dtype=np.float32)
+
+            return {"indices": indices, "states": self.states[indices],
+              "actions": self.actions[indices], "rewards": self.rewards[indices],
+              "next_states": self.next_states[indices], "dones": self.dones[indices],
+              "weights": weights}
+
+    def update_priorities(self, indices, priorities):
+        """Sets the priorities of sampled transitions, such as their TD errors."""
+        with self._locked():
+            self.priorities[indices] = priorities
+            self._update_tree(np.asarray(indices))
+
+    def flush(self):
+        """Writes the arrays to their files."""
+        for array in (self.states, self.actions, self.rewards, self.next_states,
+          self.dones, self.priorities, self._tree, self._meta):
+            array.flush()
+
+    def close(self):
+        """Flushes the arrays and releases the lock file."""
+        self.flush()
+        self._lock_file.close()
+
+    def _get_path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def _open_array(self, name, mode, dtype, row_shape):
+        if mode == "w+":
+            return np.lib.format.open_memmap(self._get_path(name), mode, dtype,
+              (self.capacity,) + row_shape)
+        return np.lib.format.open_memmap(self._get_path(name), mode)
+
+    def _open_tree(self, alpha, is_alpha_given):
+        """Opens the sum tree, building it from the priorities if it is missing."""
+        tree_path = self._get_path("priority_tree")
+        self._leaf_offset = 1 << max(self.capacity - 1, 0).bit_length()
+        if os.path.exists(tree_path):
+            self._tree = np.lib.format.open_memmap(tree_path, "r+")
+            self.alpha = float(self._tree[TREE_ALPHA])
+            if is_alpha_given and alpha != self.alpha:
+                raise ValueError(f"The replay buffer in {self.directory} samples with an alpha "
+                  f"of {self.alpha}, not {alpha}")
+            return
+
+        self.alpha = alpha
+        self._tree = np.lib.format.open_memmap(tree_path, "w+", np.float64,
+          (2 * self._leaf_offset,))
+        self._tree[TREE_ALPHA] = alpha
+        self._update_tree(np.arange(len(self)))
+
+    def _update_tree(self, slots):
+        """Writes the scaled priorities of slots and the sums above them."""
+        nodes = self._leaf_offset + slots
+        self._tree[nodes] = np.power(self.priorities[slots], self.alpha, dtype=np.float64)
+        while len(nodes) and nodes[0] > TREE_ROOT:
+            nodes = np.unique(nodes // 2)
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+    @contextlib.contextmanager
+    def _locked(self):
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+
+def get_game_transitions(recording_player, won):
+    """Converts the decisions a RecordingPlayer recorded into transitions.
+
+    The next state is the player's next decision.  Rewards are 0 until the
+    last decision of the game, which is rewarded 1 for a win and -1 for a
+    loss.
+
+    Args:
+        recording_player: a cribbageselfplay.RecordingPlayer after a game
+        won: True if the player won
+
+    Returns:
+        (tuple) states, actions, rewards, next_states and dones arrays
+    """
+    states = np.array(recording_player.features, dtype=np.int16)
+    actions = np.array(recording_player.actions, dtype=np.int16)
+    next_states = np.zeros_like(states)
+    next_states[:-1] = states[1:]
+    rewards = np.zeros(len(states), dtype=np.float32)
+    rewards[-1] = 1.0 if won else -1.0
+    dones = np.zeros(len(states), dtype=np.bool_)
+    dones[-1] = True
+    return states, actions, rewards, next_states, dones
+
+def collect_transitions(directory, games, seed,
+  player_classes=cribbageselfplay.DEFAULT_PLAYER_CLASSES):
+    """Plays games and appends each player's transitions to a buffer.
+
+    Args:
+        directory: the directory of an existing ReplayBuffer
+        games: the number of games to play
+        seed: the seed for the random module
+        player_classes: a tuple of the two player classes to play
+
+    Returns:
+        (int) the number of transitions appended
+    """
+    random.seed(seed)
+    replay_buffer = ReplayBuffer(directory)
+    cribbage_engine = cribbageengine.CribbageEngine()
+    transition_count = 0
+
+    try:
+        for _ in range(games):
+            recording_players = (cribbageselfplay.RecordingPlayer(player_classes[0]()),
+              cribbageselfplay.RecordingPlayer(player_classes[1]()))
+            scores = cribbageaicli.run_game(cribbage_engine.new_game(*recording_players), False)
+            for seat, recording_player in enumerate(recording_players):
+                if recording_player.features:
+                    transitions = get_game_transitions(recording_player,
+                      scores[seat] > scores[1 - seat])
+                    replay_buffer.append_batch(*transitions)
+                    transition_count += len(transitions[0])
+    finally:
+        replay_buffer.close()
+
+    return transition_count
+
+def fill_replay_buffer(directory, games, capacity=None, seed=1, processes=None,
+  player_classes=cribbageselfplay.DEFAULT_PLAYER_CLASSES):
+    """Plays games on worker processes that all write to the same buffer.
+
+    Args:
+        directory: the buffer's directory
+        games: the total number of games to play
+        capacity: the capacity if the buffer has to be created
+        seed: the seed of the first worker, each worker uses the next value
+        processes: the number of worker processes, all cores by default
+        player_classes: a tuple of the two player classes to play
+
+    Returns:
+        (int) the total number of transitions appended
+    """
+    ReplayBuffer(directory, capacity).close()
+    processes = processes or os.cpu_count()
+    worker_arguments = [(directory, games // processes + (worker < games % processes),
+      seed + worker, player_classes) for worker in range(processes)]
+
+    if processes == 1:
+        return collect_transitions(*worker_arguments[0])
+
+    with multiprocessing.Pool(processes) as pool:
+        return sum(pool.starmap(collect_transitions, worker_arguments))
+
+def main(argv=None):
+    """Fills a replay buffer with self-play transitions from the command line."""
+    parser = argparse.ArgumentParser(description="Fills a replay buffer from self-play.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--capacity", type=int, default=1000000,
+      help="the capacity used if the buffer does not exist yet")
+    parser.add_argument("--directory", default="replay")
+    parser.add_argument("--processes", type=int, default=None,
+      help="the number of worker processes, all cores by default")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    started = time.perf_counter()
+    transition_count = fill_replay_buffer(args.directory, args.games, args.capacity,
+      args.seed, args.processes)
+    replay_buffer = ReplayBuffer(args.directory)
+    print(f"Appended {transition_count} transitions from {args.games} games in "
+      f"{time.perf_counter() - started:.1f}s, the buffer holds {len(replay_buffer)} "
+      f"of {replay_buffer.capacity}")
+    replay_buffer.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""Generates training data by recording every decision of self-play games.
+
+Games are played through CribbageGame on worker processes.  Each discard and
+pegging decision becomes a fixed width row of features with the action taken
+and the eventual outcome for the player who made it.  Rows are written to
+.npy files through memory maps that grow in chunks, so tens of millions of
+samples never have to fit in memory.
+
+Each worker writes its own shard of three arrays, which np.load can open
+with mmap_mode="r":
+
+  shard-000-features.npy  (samples, FEATURE_WIDTH) int16, see FEATURE_COLUMNS
+  shard-000-actions.npy   (samples, 2) int16 card indices, -1 when unused
+  shard-000-outcomes.npy  (samples, 4) int32 won, final margin, game number and seat
+
+  python3 cribbageai/cribbageselfplay.py --games 100000 --output-dir selfplay
+
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import cribbageaicli
+import cribbagecompact
+import cribbageengine
+import cribbageplayers
+
+DISCARD_DECISION = 0
+PEGGING_DECISION = 1
+
+HAND_SLOTS = 6
+RUN_SLOTS = 8
+
+# The go_caller and last_player columns are -1 for no one, 0 for the player
+# and 1 for the opponent.
+FEATURE_COLUMNS = ("decision_type", "is_dealer", "player_score", "opponent_score") \
+  + tuple(f"hand_{slot}" for slot in range(HAND_SLOTS)) \
+  + tuple(f"run_{slot}" for slot in range(RUN_SLOTS)) + ("run_total", "go_caller", "last_player")
+FEATURE_WIDTH = len(FEATURE_COLUMNS)
+ACTION_WIDTH = 2
+OUTCOME_WIDTH = 4
+
+DEFAULT_CHUNK_ROWS = 1 << 16
+DEFAULT_PLAYER_CLASSES = (cribbageplayers.OptimizedPlayer, cribbageplayers.OptimizedPlayer)
+
+
+class GrowableNpyArray:
+    """Writes rows to a .npy file through a memory map that grows in chunks.
+
+    The header is given a fixed size so it can be rewritten in place with the
+    new shape each time the file grows, and with the final row count on close.
+
+    Attributes:
+        path: the .npy file being written
+        row_count: the number of rows written
+        capacity: the number of rows the file has room for
+    """
+    HEADER_SIZE = 128
+
+    def __init__(self, path, dtype, row_shape, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.row_count = 0
+        self.capacity = 0
+        self._dtype = np.dtype(dtype)
+        self._row_shape = tuple(row_shape)
+        self._row_bytes = self._dtype.itemsize * int(np.prod(self._row_shape, dtype=np.int64))
+        self._chunk_rows = chunk_rows
+        self._file = open(path, "w+b")  # pylint: disable=consider-using-with
+        self._map = None
+        self._grow()
+
+    def append(self, rows):
+        """Appends rows, growing the file by whole chunks when it is full.
+
+        Args:
+            rows: an array of shape (rows,) + row_shape
+        """
+        new_row_count = self.row_count + len(rows)
+        while new_row_count > self.capacity:
+            self._grow()
+        self._map[self.row_count:new_row_count] = rows
+        self.row_count = new_row_count
+
+    def close(self):
+        """Flushes the rows, trims the unused capacity and closes the file."""
+        self._release_map()
+        self._write_header(self.row_count)
+        self._file.truncate(self.HEADER_SIZE + self.row_count * self._row_bytes)
+        self._file.close()
+
+    def _grow(self):
+        self._release_map()
+        self.capacity += self._chunk_rows
+        self._file.truncate(self.HEADER_SIZE + self.capacity * self._row_bytes)
+        self._write_header(self.capacity)
+        self._map = np.memmap(self._file, dtype=self._dtype, mode="r+",
+          offset=self.HEADER_SIZE, shape=(self.capacity,) + self._row_shape)
+
+    def _release_map(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+
+    def _write_header(self, rows):
+        header = repr({"descr": np.lib.format.dtype_to_descr(self._dtype),
+          "fortran_order": False, "shape": (rows,) + self._row_shape})
+        prefix = np.lib.format.magic(1, 0) + (self.HEADER_SIZE - 10).to_bytes(2, "little")
+        self._file.seek(0)
+        self._file.write(prefix + header.ljust(self.HEADER_SIZE - 11).encode("latin1") + b"\n")
+
+
+class RecordingPlayer:
+    """Wraps a player and records each of its decisions as a feature row.
+
+    The scores and the go are followed through the observe hooks the way
+    the engine scores the play, so a pegging row has the scores as they
+    stand at that decision.
+
+    Attributes:
+        player: the wrapped player that makes the decisions
+        features: the list of feature rows recorded
+        actions: the list of action rows recorded
+    """
+    def __init__(self, player):
+        self.player = player
+        self.features = []
+        self.actions = []
+        self._rules = cribbageengine.STANDARD_RULES
+        self._is_dealer = False
+        self._scores = [0, 0]
+        self._run_ranks = []
+        self._run_total = 0
+        self._go_caller = None
+        self._last_player = None
+        self._cards_played = 0
+
+    def use_rules(self, rules):
+        """Keeps the rules for the last card, then tells the wrapped player."""
+        self._rules = rules
+        _call_hook(self.player, "use_rules", rules)
+
+    def use_game_context(self, rng, logger):
+        """Tells the wrapped player the game's rng and logger."""
+        _call_hook(self.player, "use_game_context", rng, logger)
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Records the seat and scores, then tells the wrapped player."""
+        self._is_dealer = is_dealer
+        self._scores = [player_score, opponent_score]
+        self._run_ranks = []
+        self._run_total = 0
+        self._go_caller = None
+        self._last_player = None
+        self._cards_played = 0
+        _call_hook(self.player, "start_round", is_dealer, player_score, opponent_score)
+
+    def observe_run_play(self, is_player, run_card):
+        """Scores the turn, then tells the wrapped player about it."""
+        seat = 0 if is_player else 1
+        if run_card is None:
+            if self._go_caller is None:
+                # The other player pegs one for the go
+                self._go_caller = seat
+                self._scores[1 - seat] += 1
+            elif self._go_caller != seat:
+                self._run_ranks = []
+                self._run_total = 0
+                self._go_caller = None
+                self._last_player = None
+        else:
+            rank = run_card.face.value - 1
+            self._scores[seat] += cribbagecompact.score_run_play(self._run_ranks,
+              self._run_total, rank)
+            self._run_ranks.append(rank)
+            self._run_total += run_card.value
+            self._last_player = seat
+            self._cards_played += 1
+            if self._cards_played == 2 * self._rules.kept_size:
+                self._scores[seat] += 1
+        _call_hook(self.player, "observe_run_play", is_player, run_card)
+
+    def observe_start_card(self, start_card):
+        """Scores his heels, then tells the wrapped player the start card."""
+        # The engine pegs one for his heels
+        if start_card.face == cribbageengine.Face.JACK:
+            self._scores[0 if self._is_dealer else 1] += 1
+        _call_hook(self.player, "observe_start_card", start_card)
+
+    def discard_to_crib(self, player_hand):
+        """Records the dealt hand and the discards of the wrapped player."""
+        hand = sorted(cribbagecompact.cards_to_indices(player_hand))
+        crib_cards = self.player.discard_to_crib(player_hand)
+        self._record(DISCARD_DECISION, hand, [], 0,
+          cribbagecompact.cards_to_indices(crib_cards))
+        return crib_cards
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Records the pegging state and the card played by the wrapped player."""
+        hand = sorted(cribbagecompact.cards_to_indices(player_run_hand))
+        run_ranks = [card.face.value - 1 for card in run]
+        run_card = self.player.get_run_card(player_run_hand, run, run_total)
+        self._record(PEGGING_DECISION, hand, run_ranks, run_total,
+          [cribbagecompact.card_to_index(run_card), -1])
+        return run_card
+
+    def _record(self, decision_type, hand, run_ranks, run_total, action):
+        run_ranks = run_ranks[-RUN_SLOTS:]
+        self.features.append([decision_type, int(self._is_dealer)] + self._scores
+          + hand + [-1] * (HAND_SLOTS - len(hand))
+          + run_ranks + [-1] * (RUN_SLOTS - len(run_ranks)) + [run_total]
+          + [_get_seat_feature(self._go_caller), _get_seat_feature(self._last_player)])
+        self.actions.append(action)
+
+
+def _get_seat_feature(seat):
+    """Gets the feature of an optional seat, -1 for no one."""
+    return -1 if seat is None else seat
+
+def _call_hook(player, hook_name, *args):
+    """Calls a wrapped player's optional hook, if it has it."""
+    hook = getattr(player, hook_name, None)
+    if hook is not None:
+        hook(*args)
+
+def get_shard_paths(output_dir, shard):
+    """Gets the features, actions and outcomes file paths of a shard."""
+    return tuple(os.path.join(output_dir, f"shard-{shard:03d}-{name}.npy")
+      for name in ("features", "actions", "outcomes"))
+
+def generate_shard(shard, games, seed, output_dir, player_classes=DEFAULT_PLAYER_CLASSES,
+  chunk_rows=DEFAULT_CHUNK_ROWS, first_game=0):
+    """Plays self-play games and writes their decisions to one shard.
+
+    Args:
+        shard: the shard number, used in the file names
+        games: the number of games to play
+        seed: the seed for the random module
+        output_dir: the directory to write the shard to
+        player_classes: a tuple of the two player classes to play
+        chunk_rows: the number of rows to grow the files by
+        first_game: the game number of the shard's first game, unique
+          across all the shards
+
+    Returns:
+        (int) the number of samples written
+    """
+    random.seed(seed)
+    features_path, actions_path, outcomes_path = get_shard_paths(output_dir, shard)
+    writers = (GrowableNpyArray(features_path, np.int16, (FEATURE_WIDTH,), chunk_rows),
+      GrowableNpyArray(actions_path, np.int16, (ACTION_WIDTH,), chunk_rows),
+      GrowableNpyArray(outcomes_path, np.int32, (OUTCOME_WIDTH,), chunk_rows))
+    cribbage_engine = cribbageengine.CribbageEngine()
+
+    try:
+        for game in range(games):
+            recording_players = (RecordingPlayer(player_classes[0]()),
+              RecordingPlayer(player_classes[1]()))
+            scores = cribbageaicli.run_game(cribbage_engine.new_game(*recording_players), False)
+            game_number = first_game + game
+
+            for seat, recording_player in enumerate(recording_players):
+                if not recording_player.features:
+                    continue
+                margin = scores[seat] - scores[1 - seat]
+                outcomes = np.empty((len(recording_player.features), OUTCOME_WIDTH), np.int32)
+                outcomes[:] = (int(margin > 0), margin, game_number, seat)
+                writers[0].append(np.array(recording_player.features, dtype=np.int16))
+                writers[1].append(np.array(recording_player.actions, dtype=np.int16))
+                writers[2].append(outcomes)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    return writers[0].row_count
+
+def generate_selfplay(output_dir, games, seed=1, processes=None,
+  player_classes=DEFAULT_PLAYER_CLASSES, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Plays self-play games on worker processes, one shard per worker.
+
+    Args:
+        output_dir: the directory to write the shards to
+        games: the total number of games to play
+        seed: the seed of the first shard, each shard uses the next value
+        processes: the number of worker processes, all cores by default
+        player_classes: a tuple of the two player classes to play
+        chunk_rows: the number of rows to grow the files by
+
+    Returns:
+        (int) the total number of samples written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    processes = processes or os.cpu_count()
+    shard_games = [games // processes + (shard < games % processes) for shard in range(processes)]
+    shard_arguments = [(shard, shard_games[shard], seed + shard, output_dir, player_classes,
+      chunk_rows, sum(shard_games[:shard])) for shard in range(processes)]
+
+    if processes == 1:
+        return generate_shard(*shard_arguments[0])
+
+    with multiprocessing.Pool(processes) as pool:
+        return sum(pool.starmap(generate_shard, shard_arguments))
+
+def main(argv=None):
+    """Generates self-play data from the command line."""
+    parser = argparse.ArgumentParser(description="Generates self-play training data.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--output-dir", default="selfplay")
+    parser.add_argument("--processes", type=int, default=None,
+      help="the number of worker processes, all cores by default")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    started = time.perf_counter()
+    samples = generate_selfplay(args.output_dir, args.games, args.seed, args.processes,
+      chunk_rows=args.chunk_rows)
+    print(f"Wrote {samples} samples from {args.games} games to {args.output_dir} "
+      f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,644 @@
+"""Hosts many concurrent games over a small JSON HTTP interface.
+
+Games live in memory as GameSessions, each seat played by a human over HTTP
+or by one of the BOT_PLAYERS.  Bot decisions run on a process pool so the
+event loop only ever waits on them, and sessions left idle are evicted.
+Cards are the integer indices of cribbagecompact.
+
+  POST   /games               {"players": ["human", "optimized"]}
+  GET    /games/<id>
+  POST   /games/<id>/move     {"seat": 1, "cards": [4, 17]} to discard
+                              {"seat": 1, "card": 4} to play onto the run
+  DELETE /games/<id>
+  GET    /stats
+  POST   /analyze             {"queries": [...]}, see cribbageanalysis
+
+Every response is the game state as JSON, or {"error": message}.
+
+Bots are rebuilt in a worker for each decision.  The worker replays the
+round's start_round and observe_run_play calls first, so bots that track
+the round through those hooks still see it.  Bots with an
+observe_dealt_cards method are told the six cards they were dealt before a
+pegging decision, so the InferencePlayer rebuilds its view of the opponent,
+but other state a bot keeps from its own discard, such as the MctsPlayer's
+sampled hands, is lost.
+
+  python3 cribbageai/cribbageserver.py serve --port 8080
+  python3 cribbageai/cribbageserver.py loadtest --port 8080 --games 1000
+
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+
+import cribbageanalysis
+import cribbagecompact
+import cribbageengine
+import cribbageinference
+import cribbagemcts
+import cribbageplayers
+import cribbagetabular
+import cribbagewinprob
+
+HUMAN = "human"
+BOT_PLAYERS = {
+  "random": cribbageplayers.RandomPlayer,
+  "optimized": cribbageplayers.OptimizedPlayer,
+  "mcts": cribbagemcts.MctsPlayer,
+  "endgame": cribbagewinprob.EndgamePlayer,
+  "tabular": cribbagetabular.TabularPeggingPlayer,
+  "inference": cribbageinference.InferencePlayer,
+}
+
+DISCARD_PHASE = "discard"
+PEGGING_PHASE = "pegging"
+FINISHED_PHASE = "finished"
+
+WINNING_SCORE = 121
+DEFAULT_PORT = 8080
+DEFAULT_IDLE_TIMEOUT = 600.0
+MAX_BODY_SIZE = 1 << 16
+
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+  409: "Conflict", 413: "Payload Too Large"}
+
+
+class MoveError(Exception):
+    """Raised when a move cannot be made, with the HTTP status to answer."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def decide_bot_move(player_name, round_start, observations, hand, run=None, run_total=None,
+  start_card=None, dealt_cards=None):
+    """Makes one bot decision, run on a worker process.
+
+    Args:
+        player_name: the key of the bot in BOT_PLAYERS
+        round_start: the (is_dealer, player_score, opponent_score) of the round
+        observations: the (is_player, run_card) turns of the run so far
+        hand: the set of PlayingCards to choose from
+        run: the run since it was last reset, None to discard instead
+        run_total: the total value of the run
+        start_card: the PlayingCard cut, None before the cut
+        dealt_cards: the PlayingCards the bot was dealt, for a run card
+
+    Returns:
+        (tuple) the two PlayingCards discarded, or (PlayingCard) the run card
+    """
+    player = BOT_PLAYERS[player_name]()
+    player.start_round(*round_start)
+    observe_dealt_cards = getattr(player, "observe_dealt_cards", None)
+    if run is not None and dealt_cards is not None and observe_dealt_cards is not None:
+        observe_dealt_cards(set(dealt_cards))
+    if start_card is not None:
+        player.observe_start_card(start_card)
+    for is_player, run_card in observations:
+        player.observe_run_play(is_player, run_card)
+
+    if run is None:
+        return tuple(player.discard_to_crib(set(hand)))
+    return player.get_run_card(set(hand), run, run_total)
+
+
+class _SeatPlayer:
+    """Plays the move the session already chose and records the run's turns."""
+    def __init__(self, session, seat):
+        self.session = session
+        self.seat = seat
+        self.answer = None
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Does nothing, the session records the round start before discards."""
+
+    def observe_run_play(self, is_player, run_card):
+        """Records the turn for the seat's bot and the game state."""
+        self.session.observations[self.seat].append((is_player, run_card))
+        if is_player:
+            self.session.plays.append((self.seat, run_card))
+
+    def observe_start_card(self, start_card):
+        """Does nothing, the session passes the start card to bot moves."""
+
+    def discard_to_crib(self, player_hand):
+        """Returns the chosen discards."""
+        # pylint: disable=unused-argument
+        return self.answer
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Returns the chosen run card."""
+        # pylint: disable=unused-argument
+        return self.answer
+
+
+class GameSession:
+    """Holds one game and steps it until a human has to move.
+
+    Attributes:
+        game_id: the session's id
+        players: the player name of seat 1 and seat 2, HUMAN or a bot
+        phase: DISCARD_PHASE, PEGGING_PHASE or FINISHED_PHASE
+        last_active: the event loop time of the last request
+        lock: serializes the requests of the session
+        observations: the (is_player, run_card) turns of the round by seat
+        plays: the (seat, run_card) turns of the round, run_card None for a go
+        dealt_hands: the cards dealt to each seat this round
+    """
+    def __init__(self, game_id, players, cribbage_engine):
+        self.game_id = game_id
+        self.players = tuple(players)
+        self.phase = DISCARD_PHASE
+        self.last_active = 0.0
+        self.lock = asyncio.Lock()
+        self.observations = {1: [], 2: []}
+        self.plays = []
+        self.dealt_hands = {1: (), 2: ()}
+        self._seat_players = {1: _SeatPlayer(self, 1), 2: _SeatPlayer(self, 2)}
+        self._pending = {1: None, 2: None}
+        self._round_starts = {}
+        self.game = cribbage_engine.new_game(self._seat_players[1], self._seat_players[2])
+        self._deal()
+
+    def is_human(self, seat):
+        """Checks if a seat is played over HTTP."""
+        return self.players[seat - 1] == HUMAN
+
+    def get_waiting_seats(self):
+        """Gets the human seats the game is waiting on."""
+        if self.phase == DISCARD_PHASE:
+            return [seat for seat in (1, 2) if self.is_human(seat) and self._pending[seat] is None]
+        if self.phase == PEGGING_PHASE and self.is_human(self.game.run_turn):
+            return [self.game.run_turn]
+        return []
+
+    def get_state(self):
+        """Gets the game state, showing only the hands of human seats."""
+        game = self.game
+        hands = {}
+        legal_cards = {}
+        for seat in (1, 2):
+            if not self.is_human(seat):
+                continue
+            if self.phase == DISCARD_PHASE:
+                hand = game.player_one_hand if seat == 1 else game.player_two_hand
+            else:
+                hand = game.player_one_run_hand if seat == 1 else game.player_two_run_hand
+            hands[str(seat)] = sorted(cribbagecompact.cards_to_indices(hand))
+            if self.phase == PEGGING_PHASE and seat == game.run_turn:
+                legal_cards[str(seat)] = sorted(cribbagecompact.cards_to_indices(
+                  self._get_legal_cards(seat)))
+
+        return {
+          "game_id": self.game_id,
+          "players": list(self.players),
+          "phase": self.phase,
+          "scores": [game.player_one_score, game.player_two_score],
+          "dealer": game.crib_turn,
+          "start_card": None if game.start_card is None or self.phase == DISCARD_PHASE
+            else cribbagecompact.card_to_index(game.start_card),
+          "run": cribbagecompact.cards_to_indices(game.run),
+          "run_total": cribbageengine.CribbageGame.get_cards_total_value(game.run),
+          "plays": [[seat, None if card is None else cribbagecompact.card_to_index(card)]
+            for seat, card in self.plays],
+          "waiting_for": self.get_waiting_seats(),
+          "hands": hands,
+          "legal_cards": legal_cards,
+        }
+
+    def submit_move(self, seat, move):
+        """Records a human move, to be played by the next advance.
+
+        Args:
+            seat: the player number, 1 or 2
+            move: the request body, with "cards" to discard or "card" to play
+
+        Raises:
+            MoveError: if the seat cannot make the move now
+        """
+        if seat not in (1, 2) or not self.is_human(seat):
+            raise MoveError(f"Seat {seat} is not a human seat")
+        if seat not in self.get_waiting_seats():
+            raise MoveError(f"It is not seat {seat}'s move", 409)
+
+        try:
+            if self.phase == DISCARD_PHASE:
+                cards = [cribbagecompact.index_to_card(int(card)) for card in move["cards"]]
+                hand = self.game.player_one_hand if seat == 1 else self.game.player_two_hand
+                if len(set(cards)) != 2 or not set(cards) <= hand:
+                    raise MoveError("Discard two different cards from the hand")
+                self._pending[seat] = tuple(cards)
+            else:
+                card = cribbagecompact.index_to_card(int(move["card"]))
+                if card not in self._get_legal_cards(seat):
+                    raise MoveError("That card cannot be played")
+                self._pending[seat] = card
+        except (KeyError, TypeError, ValueError) as error:
+            raise MoveError(f"Malformed move: {error}") from error
+
+    async def advance(self, loop, bot_executor):
+        """Plays bot moves and submitted human moves until a human has to move.
+
+        Args:
+            loop: the running event loop
+            bot_executor: the executor that runs decide_bot_move
+        """
+        game = self.game
+        while self.phase != FINISHED_PHASE:
+            if self.phase == DISCARD_PHASE:
+                bot_seats = [seat for seat in (1, 2)
+                  if not self.is_human(seat) and self._pending[seat] is None]
+                discards = await asyncio.gather(*(loop.run_in_executor(bot_executor,
+                  decide_bot_move, self.players[seat - 1], self._round_starts[seat], [],
+                  game.player_one_hand if seat == 1 else game.player_two_hand)
+                  for seat in bot_seats))
+                for seat, discard in zip(bot_seats, discards):
+                    self._pending[seat] = discard
+                if self.get_waiting_seats():
+                    return
+
+                self._seat_players[1].answer = self._pending[1]
+                self._seat_players[2].answer = self._pending[2]
+                self._pending = {1: None, 2: None}
+                game.discard_to_crib()
+                game.cut_start_card()
+                self.phase = PEGGING_PHASE
+
+            while game.is_more_run_cards():
+                seat = game.run_turn
+                if self._get_legal_cards(seat):
+                    if self._pending[seat] is None:
+                        if self.is_human(seat):
+                            return
+                        self._pending[seat] = await loop.run_in_executor(bot_executor,
+                          decide_bot_move, self.players[seat - 1], self._round_starts[seat],
+                          list(self.observations[seat]),
+                          game.player_one_run_hand if seat == 1 else game.player_two_run_hand,
+                          list(game.run), cribbageengine.CribbageGame.get_cards_total_value(
+                            game.run), game.start_card, self.dealt_hands[seat])
+                    self._seat_players[seat].answer = self._pending[seat]
+                    self._pending[seat] = None
+                game.play_next_run_card()
+
+            game.score_pone_hand()
+            game.score_dealer_hand()
+            game.score_dealer_crib()
+            if max(game.player_one_score, game.player_two_score) >= WINNING_SCORE:
+                self.phase = FINISHED_PHASE
+            else:
+                self._deal()
+
+    def _deal(self):
+        game = self.game
+        game.deal_cards()
+        self.phase = DISCARD_PHASE
+        self.observations = {1: [], 2: []}
+        self.plays = []
+        self.dealt_hands = {1: tuple(game.player_one_hand), 2: tuple(game.player_two_hand)}
+        self._round_starts = {
+          1: (game.crib_turn == 1, game.player_one_score, game.player_two_score),
+          2: (game.crib_turn == 2, game.player_two_score, game.player_one_score)}
+
+    def _get_legal_cards(self, seat):
+        run_hand = self.game.player_one_run_hand if seat == 1 else self.game.player_two_run_hand
+        run_total = cribbageengine.CribbageGame.get_cards_total_value(self.game.run)
+        return [card for card in run_hand
+          if run_total + card.value <= cribbageengine.HIGHEST_RUN_ALLOWED]
+
+
+class GameServer:
+    """Serves game sessions over HTTP from one event loop.
+
+    Attributes:
+        sessions: the GameSession of each game id
+        idle_timeout: the seconds a session may go without a request
+        evicted_count: the number of sessions evicted for being idle
+        analyzer: the cribbageanalysis.HandAnalyzer answering /analyze
+    """
+    def __init__(self, bot_executor=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, analyzer=None):
+        self.sessions = {}
+        self.idle_timeout = idle_timeout
+        self.evicted_count = 0
+        self.analyzer = analyzer if analyzer is not None else cribbageanalysis.HandAnalyzer()
+        self._bot_executor = bot_executor
+        self._owns_executor = bot_executor is None
+        self._cribbage_engine = cribbageengine.CribbageEngine()
+        self._game_ids = itertools.count(1)
+        self._server = None
+        self._eviction_task = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Starts listening and evicting idle sessions.
+
+        Returns:
+            (int) the port listened on, useful when port is 0
+        """
+        if self._bot_executor is None:
+            self._bot_executor = ProcessPoolExecutor()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._eviction_task = asyncio.create_task(self._evict_periodically())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stops listening and shuts down the executor if the server made it."""
+        self._eviction_task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+        if self._owns_executor:
+            self._bot_executor.shutdown()
+
+    def evict_idle(self, now):
+        """Removes the sessions idle since before now minus the idle timeout."""
+        idle_ids = [game_id for game_id, session in self.sessions.items()
+          if now - session.last_active > self.idle_timeout and not session.lock.locked()]
+        for game_id in idle_ids:
+            del self.sessions[game_id]
+        self.evicted_count += len(idle_ids)
+
+    async def handle_request(self, method, path, body):
+        """Routes one request.
+
+        Args:
+            method: the HTTP method
+            path: the request path
+            body: the parsed JSON body, or None
+
+        Returns:
+            (int) the HTTP status
+            (dict) the JSON response
+        """
+        loop = asyncio.get_running_loop()
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        body = {} if body is None else body
+        try:
+            if not isinstance(body, dict):
+                raise MoveError("The body must be a JSON object")
+
+            if parts == ["stats"] and method == "GET":
+                return 200, {"games": len(self.sessions), "evicted": self.evicted_count,
+                  "analysis_queries": self.analyzer.query_count,
+                  "analysis_cached": len(self.analyzer.cache)}
+
+            if parts == ["analyze"] and method == "POST":
+                queries = body.get("queries", [])
+                if not isinstance(queries, list):
+                    raise MoveError("Queries must be a list")
+                return 200, {"results": await self._analyze(queries, loop)}
+
+            if parts == ["games"] and method == "POST":
+                players = body.get("players", [HUMAN, "optimized"])
+                if not isinstance(players, list) or len(players) != 2 or any(
+                  not isinstance(player, str) or (player != HUMAN and player not in BOT_PLAYERS)
+                  for player in players):
+                    raise MoveError(f"Players must be two of {[HUMAN] + sorted(BOT_PLAYERS)}")
+                session = GameSession(str(next(self._game_ids)), players,
+                  self._cribbage_engine)
+                self.sessions[session.game_id] = session
+                return 200, await self._advance(session, loop)
+
+            if len(parts) < 2 or parts[0] != "games":
+                raise MoveError(f"Unknown path {path}", 404)
+            session = self.sessions.get(parts[1])
+            if session is None:
+                raise MoveError(f"Unknown game {parts[1]}", 404)
+
+            if len(parts) == 2 and method == "GET":
+                session.last_active = loop.time()
+                return 200, session.get_state()
+            if len(parts) == 2 and method == "DELETE":
+                del self.sessions[session.game_id]
+                return 200, session.get_state()
+            if parts[2:] == ["move"] and method == "POST":
+                seat = body.get("seat", 0)
+                if not isinstance(seat, (int, str)):
+                    raise MoveError("The seat must be a number")
+                async with session.lock:
+                    session.submit_move(int(seat), body)
+                return 200, await self._advance(session, loop)
+
+            raise MoveError(f"{method} is not allowed on {path}", 405)
+        except MoveError as error:
+            return error.status, {"error": str(error)}
+        except ValueError as error:
+            return 400, {"error": str(error)}
+
+    async def _analyze(self, queries, loop):
+        """Answers queries from the cache, computing the missing ones on the executor."""
+        keyed_queries, missing_keys = self.analyzer.prepare_batch(queries)
+        missing_answers = []
+        if missing_keys:
+            missing_answers = await loop.run_in_executor(self._bot_executor,
+              cribbageanalysis.compute_answers, missing_keys)
+        return self.analyzer.finish_batch(queries, keyed_queries, missing_keys, missing_answers)
+
+    async def _advance(self, session, loop):
+        async with session.lock:
+            await session.advance(loop, self._bot_executor)
+            session.last_active = loop.time()
+            return session.get_state()
+
+    async def _evict_periodically(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            self.evict_idle(loop.time())
+
+    async def _handle_connection(self, reader, writer):
+        """Answers requests on one keep-alive connection until it closes."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    status, response = 413, {"error": "Request body too large"}
+                else:
+                    raw_body = await reader.readexactly(length) if length else b""
+                    try:
+                        body = json.loads(raw_body) if raw_body else None
+                        status, response = await self.handle_request(method, path, body)
+                    except json.JSONDecodeError:
+                        status, response = 400, {"error": "The body is not JSON"}
+
+                payload = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+                  .encode("latin1") + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close" or length > MAX_BODY_SIZE:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class HttpClient:
+    """A minimal JSON client over one keep-alive connection."""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, body=None):
+        """Sends a request and reads the JSON response.
+
+        Returns:
+            (int) the HTTP status
+            (dict) the JSON response
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        payload = b"" if body is None else json.dumps(body).encode()
+        self._writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+          f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+          .encode("latin1") + payload)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self._reader.readexactly(length))
+
+    async def close(self):
+        """Closes the connection."""
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+def get_percentile(sorted_values, percentile):
+    """Gets a percentile of a sorted list by the nearest rank."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+async def play_load_test_game(host, port, opponent, latencies, rng):
+    """Plays one human seat against a bot with random legal moves.
+
+    Args:
+        host: the server host
+        port: the server port
+        opponent: the bot name for seat 2
+        latencies: a list to add the seconds of each request to
+        rng: a random.Random for the moves
+    """
+    client = HttpClient(host, port)
+
+    async def timed_request(method, path, body=None):
+        started = time.perf_counter()
+        status, response = await client.request(method, path, body)
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            raise RuntimeError(f"{method} {path} failed: {response}")
+        return response
+
+    try:
+        state = await timed_request("POST", "/games", {"players": [HUMAN, opponent]})
+        path = f"/games/{state['game_id']}"
+        while state["phase"] != FINISHED_PHASE:
+            if state["phase"] == DISCARD_PHASE:
+                move = {"seat": 1, "cards": rng.sample(state["hands"]["1"], 2)}
+            else:
+                move = {"seat": 1, "card": rng.choice(state["legal_cards"]["1"])}
+            state = await timed_request("POST", f"{path}/move", move)
+        await timed_request("DELETE", path)
+    finally:
+        await client.close()
+
+async def run_load_test(host, port, games, concurrency, opponent="optimized", seed=1):
+    """Plays games against a server, concurrency at a time.
+
+    Returns:
+        (dict) games, requests, seconds, requests_per_second and the p50, p95
+          and p99 request latency in milliseconds
+    """
+    rng = random.Random(seed)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def play_game():
+        async with semaphore:
+            await play_load_test_game(host, port, opponent, latencies, random.Random(rng.random()))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(play_game() for _ in range(games)))
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {"games": games, "requests": len(latencies), "seconds": seconds,
+      "requests_per_second": len(latencies) / seconds,
+      "p50_ms": get_percentile(latencies, 50) * 1000,
+      "p95_ms": get_percentile(latencies, 95) * 1000,
+      "p99_ms": get_percentile(latencies, 99) * 1000}
+
+async def serve(host, port, idle_timeout, processes):
+    """Runs a GameServer until interrupted."""
+    game_server = GameServer(ProcessPoolExecutor(processes), idle_timeout)
+    port = await game_server.start(host, port)
+    print(f"Serving games on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await game_server.stop()
+
+def main(argv=None):
+    """Serves games, or load tests a server, from the command line."""
+    parser = argparse.ArgumentParser(description="Hosts cribbage games over HTTP.")
+    parser.add_argument("mode", choices=("serve", "loadtest"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--processes", type=int, default=None,
+      help="the number of bot worker processes, all cores by default")
+    parser.add_argument("--games", type=int, default=1000,
+      help="the number of games to load test")
+    parser.add_argument("--concurrency", type=int, default=1000,
+      help="the number of games load tested at once")
+    parser.add_argument("--opponent", default="optimized", choices=sorted(BOT_PLAYERS))
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    if args.mode == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.idle_timeout, args.processes))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    results = asyncio.run(run_load_test(args.host, args.port, args.games, args.concurrency,
+      args.opponent))
+    print(f"Played {results['games']} games with {results['requests']} requests in "
+      f"{results['seconds']:.1f}s ({results['requests_per_second']:.0f} requests/s)")
+    print(f"Latency p50 {results['p50_ms']:.1f} ms, p95 {results['p95_ms']:.1f} ms, "
+      f"p99 {results['p99_ms']:.1f} ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Shares precomputed lookup tables between worker processes.
+
+Modules register a builder for each of their large tables, and look tables
+up with get_table.  In a single process the table is built on first use
+and kept.  Before starting a pool, the parent builds the tables once into
+multiprocessing.shared_memory blocks with SharedTables, and each worker
+attaches to them by name, so every process maps the same pages instead of
+holding its own copy.
+
+  with SharedTables() as manifest:
+      with multiprocessing.Pool(8, attach_tables, (manifest,)) as pool:
+          ...
+
+Blocks are named after the process that made them.  The owner unlinks them
+when the with block ends, and Python's resource tracker unlinks them if the
+owner is killed.  clean_stale_blocks also removes blocks whose owner is no
+longer running, and is run each time tables are published.  Workers only
+ever attach, so a crashed worker leaks nothing.  Workers should be started
+by the owner, so that they share its resource tracker.
+
+A table looked up inside the block stays readable after the block ends,
+because each table holds its block's mapping open until the last view of
+it is dropped.  Lookups after the block build private tables again.
+
+  python3 cribbageai/cribbagesharedtables.py --workers 4
+
+"""
+
+import argparse
+import ctypes
+import itertools
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+BLOCK_PREFIX = "cribbage_"
+SHARED_MEMORY_DIR = "/dev/shm"
+
+# The /proc/self/status fields reported by get_memory_usage, in kB.
+MEMORY_FIELDS = ("VmRSS", "RssAnon", "RssFile", "RssShmem")
+
+_builders = {}
+_tables = {}
+_attached_blocks = {}
+_block_serials = itertools.count()
+_build_lock = threading.RLock()
+
+
+def register_table(name, builder):
+    """Registers how to build a table, usually when its module is imported.
+
+    Args:
+        name: the name the table is looked up by
+        builder: a callable returning the table as an ndarray
+    """
+    _builders[name] = builder
+
+def get_table_names():
+    """Gets the names of the registered tables."""
+    return sorted(_builders)
+
+def get_table(name):
+    """Gets a table, attached from shared memory or built on first use.
+
+    Threads share the one table, built by whichever thread asks first.
+
+    Args:
+        name: the name of a registered or attached table
+
+    Returns:
+        (ndarray) the read only table
+
+    Raises:
+        KeyError: if the table is neither attached nor registered
+    """
+    table = _tables.get(name)
+    if table is None:
+        with _build_lock:
+            table = _tables.get(name)
+            if table is None:
+                table = np.array(_builders[name]())
+                table.setflags(write=False)
+                _tables[name] = table
+    return table
+
+def attach_tables(manifest):
+    """Attaches to tables published by SharedTables, as a pool initializer.
+
+    Args:
+        manifest: the manifest of SharedTables, from the owner process
+    """
+    for name, (block_name, shape, dtype) in manifest.items():
+        if name in _attached_blocks:
+            continue
+        block = shared_memory.SharedMemory(block_name)
+        table = np.asarray(_BlockView(block, shape, dtype))
+        table.setflags(write=False)
+        _attached_blocks[name] = block
+        _tables[name] = table
+
+def detach_tables():
+    """Drops the attached tables, so later lookups build their own."""
+    # Each block closes once the last view of its table is dropped
+    for name in _attached_blocks:
+        _tables.pop(name, None)
+    _attached_blocks.clear()
+
+def clean_stale_blocks():
+    """Unlinks the shared memory blocks of owner processes no longer running.
+
+    Returns:
+        (list) the names of the blocks unlinked
+    """
+    if not os.path.isdir(SHARED_MEMORY_DIR):
+        return []
+
+    unlinked = []
+    for block_name in os.listdir(SHARED_MEMORY_DIR):
+        if not block_name.startswith(BLOCK_PREFIX):
+            continue
+        try:
+            os.kill(int(block_name[len(BLOCK_PREFIX):].split("_")[0]), 0)
+            continue
+        except ValueError:
+            continue
+        except PermissionError:
+            # The owner is running as another user
+            continue
+        except ProcessLookupError:
+            pass
+        try:
+            os.unlink(os.path.join(SHARED_MEMORY_DIR, block_name))
+            unlinked.append(block_name)
+        except OSError:
+            pass
+
+    if unlinked:
+        logging.warning("Unlinked %i stale shared tables", len(unlinked))
+    return unlinked
+
+def get_memory_usage(pid="self"):
+    """Gets the resident memory of a process on Linux.
+
+    Args:
+        pid: the process id, the calling process by default
+
+    Returns:
+        (dict) kB by MEMORY_FIELDS name, where RssShmem counts the pages of
+          shared tables the process has touched, or an empty dict when
+          /proc is not available
+    """
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status_file:
+            for line in status_file:
+                field, _, value = line.partition(":")
+                if field in MEMORY_FIELDS:
+                    usage[field] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+class _BlockView:
+    """Exposes an attached block to numpy, keeping it open while viewed.
+
+    Arrays made from a block's buffer keep only its mmap, which closing
+    the block unmaps under them.  Arrays made from a _BlockView keep the
+    view and so the block, which closes when the last of them is dropped.
+    """
+    def __init__(self, block, shape, dtype):
+        self.block = block
+        address = ctypes.addressof(ctypes.c_char.from_buffer(block.buf))
+        self.__array_interface__ = {"shape": tuple(shape), "typestr": np.dtype(dtype).str,
+          "data": (address, False), "version": 3}
+
+
+class SharedTables:
+    """Publishes tables to shared memory for the life of a with block.
+
+    Attributes:
+        names: the names of the tables published
+        manifest: the (block name, shape, dtype) of each table by name, to
+          pass to attach_tables
+    """
+    def __init__(self, names=None):
+        self.names = list(get_table_names() if names is None else names)
+        self.manifest = {}
+        self._blocks = []
+
+    def __enter__(self):
+        clean_stale_blocks()
+        serial = next(_block_serials)
+        try:
+            for name in self.names:
+                table = get_table(name)
+                block = shared_memory.SharedMemory(
+                  f"{BLOCK_PREFIX}{os.getpid()}_{serial}_{name}", create=True,
+                  size=max(table.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(table.shape, table.dtype, buffer=block.buf)[...] = table
+                self.manifest[name] = (block.name, table.shape, table.dtype.str)
+
+            # The owner uses the shared copies too, dropping its private ones
+            detach_tables()
+            for name in self.names:
+                _tables.pop(name, None)
+            attach_tables(self.manifest)
+        except BaseException:
+            self.close()
+            raise
+        return self.manifest
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Unlinks the blocks, leaving later lookups to build their own tables."""
+        detach_tables()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _measure_worker(names):
+    """Looks up every table on a worker, then reports the worker's memory."""
+    checksum = sum(float(get_table(name).sum()) for name in names)
+    return os.getpid(), bool(_attached_blocks), checksum, get_memory_usage()
+
+def main(argv=None):
+    """Reports worker memory with and without shared tables from the command line."""
+    parser = argparse.ArgumentParser(description="Measures shared lookup tables.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clean", action="store_true",
+      help="only unlink the blocks left by owners that are no longer running")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        print(f"Unlinked {len(clean_stale_blocks())} stale blocks")
+        return 0
+
+    # Importing the players registers their tables
+    import cribbageserver  # pylint: disable=import-outside-toplevel,unused-import
+    names = get_table_names()
+    print("Tables: " + ", ".join(names))
+
+    for is_shared in (False, True):
+        started = time.perf_counter()
+        if is_shared:
+            shared_tables = SharedTables(names)
+            manifest = shared_tables.__enter__()
+            pool = multiprocessing.Pool(args.workers, attach_tables, (manifest,))
+        else:
+            shared_tables = None
+            pool = multiprocessing.Pool(args.workers)
+        try:
+            reports = pool.map(_measure_worker, [names] * args.workers, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+            if shared_tables is not None:
+                shared_tables.close()
+
+        print("Shared tables:" if is_shared else "Private tables:")
+        for pid, is_attached, _, usage in sorted(reports):
+            print(f"  worker {pid} attached={is_attached} "
+              + " ".join(f"{field}={usage.get(field, 0)}kB" for field in MEMORY_FIELDS))
+        print(f"  {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == '__main__':
+    # Run as the imported module, so the tables registered on import are found
+    import cribbagesharedtables  # pylint: disable=import-self
+    sys.exit(cribbagesharedtables.main())
@@ -0,0 +1,368 @@
+"""A pegging player that looks up its play in a table learned by self-play.
+
+The pegging state is packed into one integer: the last ranks played since
+the run was last reset, the run total, the ranks left in the hand and who
+has called a go.  Suits are left out since they never score while pegging.
+
+Training is Monte Carlo control on cribbagecompact.play_pegging.  Both seats
+play epsilon greedy from the same table, and every choice between two or
+more ranks is credited with the net points pegged from that play to the end
+of the run.  The greedy rank of each state is then kept as the policy.
+The shipped policy is a table of sorted states registered with
+cribbagesharedtables, so worker processes share it and a pegging decision
+costs one binary search.
+
+  python3 cribbageai/cribbagetabular.py --games 2000000
+
+  player = TabularPeggingPlayer()
+
+"""
+
+import argparse
+from functools import lru_cache
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import cribbagecompact
+import cribbageplayers
+import cribbagesharedtables
+
+# Who has called a go, relative to the player deciding.
+GO_NONE = 0
+GO_PLAYER = 1
+GO_OPPONENT = 2
+
+RANK_BITS = 4
+RUN_KEY_RANKS = 3
+TOTAL_SHIFT = RUN_KEY_RANKS * RANK_BITS
+HAND_SHIFT = TOTAL_SHIFT + 5
+GO_SHIFT = HAND_SHIFT + 4 * RANK_BITS
+
+DEFAULT_EPSILON = 0.1
+DEFAULT_POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+  "data", "tabular_pegging.npz")
+
+
+def pack_state(run_ranks, run_total, hand_ranks, go_state):
+    """Packs a pegging state into an integer key.
+
+    Only the last RUN_KEY_RANKS ranks of the run are kept, which covers every
+    pair and all but the longest sequences, so similar runs share what they
+    learn.  Each rank is stored plus one in four bits, so runs and hands of
+    different lengths never share a key.
+
+    Args:
+        run_ranks: the ranks in the run since it was last reset
+        run_total: the total value of the run
+        hand_ranks: the sorted ranks left in the hand
+        go_state: GO_NONE, GO_PLAYER or GO_OPPONENT
+
+    Returns:
+        (int) the packed state
+    """
+    run_key = 0
+    for rank in run_ranks[-RUN_KEY_RANKS:]:
+        run_key = run_key << RANK_BITS | (rank + 1)
+    hand_key = 0
+    for rank in hand_ranks:
+        hand_key = hand_key << RANK_BITS | (rank + 1)
+    return run_key | run_total << TOTAL_SHIFT | hand_key << HAND_SHIFT | go_state << GO_SHIFT
+
+
+class PeggingQTable:
+    """Holds the mean net points of each rank played from each state.
+
+    Attributes:
+        totals: the summed returns keyed by state << RANK_BITS | rank
+        counts: the number of returns keyed the same way
+    """
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def choose_rank(self, state, legal_ranks, rng, epsilon=DEFAULT_EPSILON):
+        """Chooses a rank epsilon greedily, trying unplayed ranks first.
+
+        Args:
+            state: the packed state
+            legal_ranks: the distinct ranks that can be played
+            rng: a random.Random
+            epsilon: the chance of a random rank
+
+        Returns:
+            (int) the rank to play
+        """
+        if rng.random() < epsilon:
+            return rng.choice(legal_ranks)
+
+        best_rank = legal_ranks[0]
+        best_value = None
+        for rank in legal_ranks:
+            count = self.counts.get(state << RANK_BITS | rank)
+            if not count:
+                return rank
+            value = self.totals[state << RANK_BITS | rank] / count
+            if best_value is None or value > best_value:
+                best_rank = rank
+                best_value = value
+        return best_rank
+
+    def update(self, action_key, points):
+        """Adds the return of one play."""
+        self.totals[action_key] = self.totals.get(action_key, 0) + points
+        self.counts[action_key] = self.counts.get(action_key, 0) + 1
+
+    def get_policy(self, min_visits=1):
+        """Gets the rank with the best mean return in each state.
+
+        Args:
+            min_visits: the fewest returns a rank needs to be chosen
+
+        Returns:
+            (dict) the best rank keyed by packed state
+        """
+        best_values = {}
+        policy = {}
+        for action_key, count in self.counts.items():
+            if count < min_visits:
+                continue
+            state = action_key >> RANK_BITS
+            value = self.totals[action_key] / count
+            if state not in best_values or value > best_values[state]:
+                best_values[state] = value
+                policy[state] = action_key & ((1 << RANK_BITS) - 1)
+        return policy
+
+
+def get_go_state(seat, go_player):
+    """Converts the seat that called a go to a go state for the given seat."""
+    if go_player == -1:
+        return GO_NONE
+    return GO_PLAYER if go_player == seat else GO_OPPONENT
+
+def deal_pegging_hands(rng, deck):
+    """Deals six cards to each seat and keeps four by their score.
+
+    Args:
+        rng: a random.Random
+        deck: a list of the card indices, shuffled in place
+
+    Returns:
+        (list) two lists of card indices, one for each seat
+    """
+    rng.shuffle(deck)
+    return [list(cribbagecompact.choose_keep_by_ranks(deck[:6])[0]),
+      list(cribbagecompact.choose_keep_by_ranks(deck[6:12])[0])]
+
+def train_q_table(games, seed=1, epsilon=DEFAULT_EPSILON, q_table=None):
+    """Trains a table by playing pegging runs against itself.
+
+    Args:
+        games: the number of runs to play
+        seed: the seed for the random.Random used
+        epsilon: the chance of a random rank at each decision
+        q_table: a PeggingQTable to keep training, a new one by default
+
+    Returns:
+        (PeggingQTable) the trained table
+    """
+    rng = random.Random(seed)
+    q_table = q_table if q_table is not None else PeggingQTable()
+    deck = list(range(cribbagecompact.DECK_SIZE))
+    decisions = []
+    points = [0, 0]
+
+    def choose_card(seat, hand, run_ranks, run_total, go_player):
+        legal_ranks = sorted({card >> 2 for card in hand
+          if run_total + cribbagecompact.CARD_VALUES[card] <= cribbagecompact.HIGHEST_RUN_ALLOWED})
+        rank = legal_ranks[0]
+        if len(legal_ranks) > 1:
+            state = pack_state(run_ranks, run_total, sorted(card >> 2 for card in hand),
+              get_go_state(seat, go_player))
+            rank = q_table.choose_rank(state, legal_ranks, rng, epsilon)
+            decisions.append((seat, state << RANK_BITS | rank, points[seat] - points[1 - seat]))
+        for card in hand:
+            if card >> 2 == rank:
+                return card
+        raise ValueError(f"No card of rank {rank} in hand")
+
+    for _ in range(games):
+        decisions.clear()
+        points[0] = points[1] = 0
+        cribbagecompact.play_pegging(deal_pegging_hands(rng, deck), rng.randrange(2),
+          choose_card, points=points)
+        for seat, action_key, net_before in decisions:
+            q_table.update(action_key, points[seat] - points[1 - seat] - net_before)
+
+    return q_table
+
+def make_policy_chooser(policy):
+    """Creates a play_pegging chooser that follows a policy, else plays greedily.
+
+    Args:
+        policy: a dict of the rank to play keyed by packed state
+
+    Returns:
+        (callable) the chooser
+    """
+    def choose_card(seat, hand, run_ranks, run_total, go_player):
+        rank = policy.get(pack_state(run_ranks, run_total, sorted(card >> 2 for card in hand),
+          get_go_state(seat, go_player)))
+        if rank is not None:
+            for card in hand:
+                if card >> 2 == rank:
+                    return card
+        return cribbagecompact.choose_greedy_card(seat, hand, run_ranks, run_total)
+
+    return choose_card
+
+def evaluate_policy(policy, games, seed=2):
+    """Plays a policy against the greedy chooser, each dealing half the runs.
+
+    Returns:
+        (float) the policy's mean net pegging points per run
+    """
+    rng = random.Random(seed)
+    deck = list(range(cribbagecompact.DECK_SIZE))
+    choosers = (make_policy_chooser(policy), cribbagecompact.choose_greedy_card)
+    net_points = 0
+
+    def choose_card(seat, hand, run_ranks, run_total, go_player):
+        return choosers[seat](seat, hand, run_ranks, run_total, go_player)
+
+    for game in range(games):
+        points = cribbagecompact.play_pegging(deal_pegging_hands(rng, deck), game % 2,
+          choose_card)
+        net_points += points[0] - points[1]
+
+    return net_points / games
+
+@lru_cache(maxsize=4)
+def load_policy(path=DEFAULT_POLICY_FILE):
+    """Loads a policy, cached after the first load.
+
+    Args:
+        path: the .npz file written by save_policy
+
+    Returns:
+        (dict) the rank to play keyed by packed state
+    """
+    with np.load(path) as arrays:
+        return dict(zip(arrays["states"].tolist(), arrays["ranks"].tolist()))
+
+def _build_policy_table():
+    with np.load(DEFAULT_POLICY_FILE) as arrays:
+        order = np.argsort(arrays["states"])
+        return np.vstack([arrays["states"][order], arrays["ranks"][order].astype(np.uint64)])
+
+cribbagesharedtables.register_table("tabular_policy", _build_policy_table)
+
+
+class SharedPolicy:
+    """Looks up the shipped policy in its shared table, like a dict.
+
+    The table is fetched for each lookup rather than kept, so a policy made
+    while the tables are shared keeps working after they are unlinked.
+    """
+    def get(self, state, default=None):
+        """Gets the rank to play in a packed state, or default if it is not learned."""
+        table = cribbagesharedtables.get_table("tabular_policy")
+        states = table[0]
+        position = int(np.searchsorted(states, np.uint64(state)))
+        if position < len(states) and states[position] == state:
+            return int(table[1, position])
+        return default
+
+
+def save_policy(policy, path=DEFAULT_POLICY_FILE):
+    """Saves a policy as a compressed .npz file of states and ranks."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, states=np.fromiter(policy.keys(), dtype=np.uint64, count=len(policy)),
+      ranks=np.fromiter(policy.values(), dtype=np.uint8, count=len(policy)))
+
+
+class TabularPeggingPlayer(cribbageplayers.OptimizedPlayer):
+    """Provides a player that pegs from a learned table of states.
+
+    Discards like the OptimizedPlayer.  States missing from the table, and
+    turns with only one rank to play, fall back to its pegging heuristic.
+
+    Attributes:
+        policy: the rank to play keyed by packed state, the shared shipped
+          policy by default
+    """
+    def __init__(self, policy=None):
+        self.policy = policy if policy is not None else SharedPolicy()
+        self._go_caller = None
+
+    # pylint: disable=unused-argument
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Clears the go for the new round."""
+        self._go_caller = None
+    # pylint: enable=unused-argument
+
+    def observe_run_play(self, is_player, run_card):
+        """Tracks who has called a go the same way the engine does."""
+        if run_card is not None:
+            return
+        if self._go_caller is None:
+            self._go_caller = is_player
+        elif self._go_caller != is_player:
+            self._go_caller = None
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Selects the card the table plays from this state.
+
+        Args:
+            player_run_hand: The set of PlayingCards the player has in
+              their hand available to play.
+            run: the existing list of PlayingCards in the run
+            run_total: the total value in the run
+        """
+        if self._go_caller is None:
+            go_state = GO_NONE
+        else:
+            go_state = GO_PLAYER if self._go_caller else GO_OPPONENT
+        hand_ranks = sorted(card.face.value - 1 for card in player_run_hand)
+        rank = self.policy.get(pack_state([card.face.value - 1 for card in run[-RUN_KEY_RANKS:]],
+          run_total, hand_ranks, go_state))
+
+        if rank is not None:
+            for card in player_run_hand:
+                if card.face.value - 1 == rank:
+                    return card
+        return super().get_run_card(player_run_hand, run, run_total)
+
+
+def main(argv=None):
+    """Trains and saves the pegging policy from the command line."""
+    parser = argparse.ArgumentParser(description="Trains the tabular pegging policy.")
+    parser.add_argument("--games", type=int, default=2000000,
+      help="the number of pegging runs to train on")
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON)
+    parser.add_argument("--min-visits", type=int, default=2,
+      help="the fewest returns a rank needs to be kept in the policy")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--evaluate-games", type=int, default=20000)
+    parser.add_argument("--output", default=DEFAULT_POLICY_FILE)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    started = time.perf_counter()
+    q_table = train_q_table(args.games, args.seed, args.epsilon)
+    policy = q_table.get_policy(args.min_visits)
+    save_policy(policy, args.output)
+
+    print(f"Trained {len(policy)} states on {args.games} runs and saved {args.output} "
+      f"in {time.perf_counter() - started:.1f}s")
+    print(f"Net points per run against greedy: "
+      f"{evaluate_policy(policy, args.evaluate_games):+.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Plays tournaments between two players on a process pool or across hosts.
+
+Every game is seeded by its number, and the players break ties in card
+order rather than set order, so a range of seeds gives the same results
+wherever it runs, whatever the hash seed of the process.  Ranges can be
+handed out, retried and merged freely.  Results are TournamentResults that add together.
+
+Locally a multiprocessing pool plays the seed ranges, or a thread pool that
+scales across cores on free-threaded CPython builds and shares the lookup
+tables without copying them.  Each game draws from its own random.Random and
+logs to GAME_LOGGER, so both pools give the same results.  Across hosts a
+coordinator hands ranges to workers over TCP, one JSON line per message.
+Each range is leased: if its worker disconnects the range goes straight back
+in the queue, and if the lease runs out it is handed to the next idle worker
+as well, keeping whichever result arrives first.
+
+  python3 cribbageai/cribbagetournament.py local --players mcts optimized --games 1000
+  python3 cribbageai/cribbagetournament.py threads --players mcts optimized --games 1000
+  python3 cribbageai/cribbagetournament.py compare --players optimized random --games 400
+  python3 cribbageai/cribbagetournament.py coordinator --players mcts optimized --games 100000
+  python3 cribbageai/cribbagetournament.py worker --host coordinator-host --workers 8
+
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+
+import cribbageaicli
+import cribbageengine
+import cribbageserver
+import cribbagesharedtables
+
+DEFAULT_PORT = 8765
+DEFAULT_RANGE_SIZE = 50
+DEFAULT_LEASE_SECONDS = 300.0
+WAIT_SECONDS = 0.5
+
+# The logger every tournament game and its players log to.
+GAME_LOGGER = logging.getLogger("cribbagetournament.games")
+GAME_LOGGER.setLevel(logging.WARN)
+
+
+class TournamentResult:
+    """Mergeable totals of the games between two players.
+
+    Attributes:
+        games: the number of games played
+        wins: the wins of each player
+        points: the total points of each player
+    """
+    def __init__(self, games=0, wins=None, points=None):
+        self.games = games
+        self.wins = list(wins or [0, 0])
+        self.points = list(points or [0, 0])
+
+    def add_game(self, scores):
+        """Adds the final (player, player) scores of a game."""
+        self.games += 1
+        self.wins[0 if scores[0] > scores[1] else 1] += 1
+        self.points[0] += scores[0]
+        self.points[1] += scores[1]
+
+    def merge(self, other):
+        """Adds the totals of another TournamentResult into this one."""
+        self.games += other.games
+        for player in (0, 1):
+            self.wins[player] += other.wins[player]
+            self.points[player] += other.points[player]
+
+    def to_dict(self):
+        """Converts the result to a JSON friendly dict."""
+        return {"games": self.games, "wins": self.wins, "points": self.points}
+
+    @classmethod
+    def from_dict(cls, values):
+        """Makes a result from to_dict's dict."""
+        return cls(values["games"], values["wins"], values["points"])
+
+    def __eq__(self, other):
+        return isinstance(other, TournamentResult) and self.to_dict() == other.to_dict()
+
+
+def split_seed_ranges(first_seed, games, range_size):
+    """Splits games into (first seed, game count) ranges of at most range_size."""
+    return [(seed, min(range_size, first_seed + games - seed))
+      for seed in range(first_seed, first_seed + games, range_size)]
+
+def play_seed_range(player_names, first_seed, game_count):
+    """Plays the games of a seed range, the players swapping seats each game.
+
+    Args:
+        player_names: the two player names from cribbageserver.BOT_PLAYERS
+        first_seed: the seed of the first game
+        game_count: the number of games
+
+    Games are seeded through their own random.Random rather than the random
+    module, so ranges can be played on threads.
+
+    Returns:
+        (TournamentResult) the totals, indexed by player rather than seat
+    """
+    result = TournamentResult()
+    cribbage_game = cribbageengine.CribbageEngine().new_game(None, None, is_bulk=True,
+      logger=GAME_LOGGER)
+    for seed in range(first_seed, first_seed + game_count):
+        players = [cribbageserver.BOT_PLAYERS[name]() for name in player_names]
+        is_swapped = seed % 2 == 1
+        if is_swapped:
+            players.reverse()
+        cribbage_game.reset(*players, rng=random.Random(seed))
+        scores = cribbageaicli.run_game(cribbage_game, False)
+        result.add_game(scores[::-1] if is_swapped else scores)
+    return result
+
+def run_tournament(player_names, games, first_seed=1, processes=None,
+  range_size=DEFAULT_RANGE_SIZE):
+    """Plays a tournament on a local process pool.
+
+    Returns:
+        (TournamentResult) the totals of all games
+    """
+    seed_ranges = split_seed_ranges(first_seed, games, range_size)
+    result = TournamentResult()
+    with cribbagesharedtables.SharedTables() as manifest, multiprocessing.Pool(
+      processes or os.cpu_count(), cribbagesharedtables.attach_tables, (manifest,)) as pool:
+        for range_result in pool.starmap(play_seed_range,
+          [(player_names, seed, count) for seed, count in seed_ranges]):
+            result.merge(range_result)
+    return result
+
+def run_tournament_threads(player_names, games, first_seed=1, threads=None,
+  range_size=DEFAULT_RANGE_SIZE):
+    """Plays a tournament on a thread pool in this process.
+
+    The threads share this process's lookup tables.  With the GIL the games
+    take turns on one core, so this only scales on free-threaded builds.
+
+    Returns:
+        (TournamentResult) the totals of all games
+    """
+    seed_ranges = split_seed_ranges(first_seed, games, range_size)
+    result = TournamentResult()
+    with ThreadPoolExecutor(threads or os.cpu_count()) as executor:
+        for range_result in executor.map(lambda seed_range: play_seed_range(player_names,
+          *seed_range), seed_ranges):
+            result.merge(range_result)
+    return result
+
+def is_gil_enabled():
+    """Checks if the GIL is enabled, always True before Python 3.13."""
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+def compare_pools(player_names, games, first_seed=1, workers=None,
+  range_size=DEFAULT_RANGE_SIZE):
+    """Times the same tournament on the process pool and the thread pool.
+
+    Returns:
+        (dict) the seconds taken by "processes" and "threads", and
+          "is_matching" if both gave the same result
+    """
+    started = time.perf_counter()
+    process_result = run_tournament(player_names, games, first_seed, workers, range_size)
+    process_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    thread_result = run_tournament_threads(player_names, games, first_seed, workers, range_size)
+    thread_seconds = time.perf_counter() - started
+
+    return {"processes": process_seconds, "threads": thread_seconds,
+      "is_matching": process_result == thread_result}
+
+
+class TournamentCoordinator:
+    """Hands seed ranges to workers over TCP and merges their results.
+
+    Attributes:
+        player_names: the two player names every worker plays
+        result: the merged TournamentResult of the finished ranges
+        lease_seconds: how long a worker has to finish a range before it is
+          handed out again
+        reassigned_count: the number of times a range was handed out again
+    """
+    def __init__(self, player_names, games, first_seed=1, range_size=DEFAULT_RANGE_SIZE,
+      lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.player_names = list(player_names)
+        self.result = TournamentResult()
+        self.lease_seconds = lease_seconds
+        self.reassigned_count = 0
+        self._queue = split_seed_ranges(first_seed, games, range_size)
+        self._range_count = len(self._queue)
+        self._leases = {}
+        self._finished = set()
+        self._done = None
+        self._server = None
+        self._handlers = {}
+
+    async def start(self, host="0.0.0.0", port=DEFAULT_PORT):
+        """Starts listening for workers.
+
+        Returns:
+            (int) the port listened on, useful when port is 0
+        """
+        self._done = asyncio.Event()
+        if not self._queue:
+            self._done.set()
+        self._server = await asyncio.start_server(self._handle_worker, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def wait_finished(self):
+        """Waits for every range to finish, then stops listening.
+
+        Returns:
+            (TournamentResult) the merged result
+        """
+        await self._done.wait()
+        self._server.close()
+        # Workers still waiting for a range see the connection close
+        handlers = list(self._handlers)
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        return self.result
+
+    def get_next_range(self, now):
+        """Gets the next range to hand out, or None if there is nothing to do yet.
+
+        Queued ranges go first, then the range whose lease ran out longest ago.
+        """
+        while self._queue:
+            seed_range = self._queue.pop(0)
+            if seed_range not in self._finished:
+                self._leases[seed_range] = now + self.lease_seconds
+                return seed_range
+
+        expired = [(expires, seed_range) for seed_range, expires in self._leases.items()
+          if expires <= now]
+        if expired:
+            seed_range = min(expired)[1]
+            self._leases[seed_range] = now + self.lease_seconds
+            self.reassigned_count += 1
+            logging.warning("Reassigning seeds %s after its lease ran out", seed_range)
+            return seed_range
+        return None
+
+    def finish_range(self, seed_range, range_result):
+        """Merges a range's result unless another worker already finished it."""
+        if seed_range in self._finished:
+            return
+        self._finished.add(seed_range)
+        self._leases.pop(seed_range, None)
+        self.result.merge(range_result)
+        if len(self._finished) == self._range_count:
+            self._done.set()
+
+    def release_range(self, seed_range):
+        """Puts an unfinished range back at the front of the queue."""
+        if seed_range not in self._finished and seed_range in self._leases:
+            del self._leases[seed_range]
+            self._queue.insert(0, seed_range)
+            self.reassigned_count += 1
+
+    async def _handle_worker(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        seed_range = None
+        self._handlers[asyncio.current_task()] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get("op") == "result":
+                    self.finish_range(tuple(message["range"]),
+                      TournamentResult.from_dict(message["result"]))
+                    seed_range = None
+
+                if self._done.is_set():
+                    reply = {"op": "done"}
+                else:
+                    seed_range = self.get_next_range(loop.time())
+                    if seed_range is None:
+                        reply = {"op": "wait", "seconds": WAIT_SECONDS}
+                    else:
+                        reply = {"op": "work", "range": list(seed_range),
+                          "players": self.player_names}
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+                if reply["op"] == "done":
+                    break
+        except (ConnectionError, json.JSONDecodeError, KeyError, ValueError):
+            pass
+        finally:
+            if seed_range is not None:
+                self.release_range(seed_range)
+            self._handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+
+def run_coordinator(player_names, games, host="0.0.0.0", port=DEFAULT_PORT, first_seed=1,
+  range_size=DEFAULT_RANGE_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Runs a coordinator until its tournament finishes.
+
+    Returns:
+        (TournamentResult) the merged result
+    """
+    async def coordinate():
+        coordinator = TournamentCoordinator(player_names, games, first_seed, range_size,
+          lease_seconds)
+        await coordinator.start(host, port)
+        return await coordinator.wait_finished()
+
+    return asyncio.run(coordinate())
+
+def run_worker(host, port=DEFAULT_PORT, connect_timeout=30.0):
+    """Plays ranges for a coordinator until it says the tournament is done.
+
+    Args:
+        host: the coordinator's host
+        port: the coordinator's port
+        connect_timeout: the seconds to keep retrying the first connection
+
+    Returns:
+        (int) the number of ranges played
+    """
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = socket.create_connection((host, port))
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(WAIT_SECONDS)
+
+    ranges_played = 0
+    with connection, connection.makefile("rw", encoding="utf-8") as stream:
+        stream.write(json.dumps({"op": "ready"}) + "\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if message["op"] == "done":
+                break
+            if message["op"] == "wait":
+                time.sleep(message["seconds"])
+                reply = {"op": "ready"}
+            else:
+                first_seed, game_count = message["range"]
+                range_result = play_seed_range(message["players"], first_seed, game_count)
+                reply = {"op": "result", "range": message["range"],
+                  "result": range_result.to_dict()}
+                ranges_played += 1
+            stream.write(json.dumps(reply) + "\n")
+            stream.flush()
+
+    return ranges_played
+
+def print_result(player_names, result, seconds):
+    """Prints the wins and average points of each player."""
+    for player, name in enumerate(player_names):
+        print(f"{name}: {result.wins[player]} wins, "
+          f"{result.points[player] / max(result.games, 1):.1f} points per game")
+    print(f"Played {result.games} games in {seconds:.1f}s")
+
+def main(argv=None):
+    """Runs a local tournament, a coordinator or workers from the command line."""
+    parser = argparse.ArgumentParser(description="Plays tournaments between two players.")
+    parser.add_argument("mode", choices=("local", "threads", "compare", "coordinator",
+      "worker"))
+    parser.add_argument("--players", nargs=2, default=["optimized", "random"],
+      choices=sorted(cribbageserver.BOT_PLAYERS))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--range-size", type=int, default=DEFAULT_RANGE_SIZE)
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None,
+      help="worker processes or threads, all cores by default")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    started = time.perf_counter()
+    if args.mode == "local":
+        result = run_tournament(args.players, args.games, args.seed, args.workers,
+          args.range_size)
+    elif args.mode == "threads":
+        result = run_tournament_threads(args.players, args.games, args.seed, args.workers,
+          args.range_size)
+    elif args.mode == "compare":
+        timings = compare_pools(args.players, args.games, args.seed, args.workers,
+          args.range_size)
+        print(f"GIL {'enabled' if is_gil_enabled() else 'disabled'}, "
+          f"{args.workers or os.cpu_count()} workers")
+        for pool_name in ("processes", "threads"):
+            print(f"{pool_name}: {timings[pool_name]:.2f}s, "
+              f"{args.games / timings[pool_name]:.1f} games per second")
+        print("Results match" if timings["is_matching"] else "Results differ")
+        return 0 if timings["is_matching"] else 1
+    elif args.mode == "coordinator":
+        result = run_coordinator(args.players, args.games, args.host, args.port, args.seed,
+          args.range_size, args.lease_seconds)
+    else:
+        worker_count = args.workers or os.cpu_count()
+        with cribbagesharedtables.SharedTables() as manifest, multiprocessing.Pool(
+          worker_count, cribbagesharedtables.attach_tables, (manifest,)) as pool:
+            ranges_played = sum(pool.starmap(run_worker,
+              [(args.host, args.port)] * worker_count))
+        print(f"Played {ranges_played} ranges in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    print_result(args.players, result, time.perf_counter() - started)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
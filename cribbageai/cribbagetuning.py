@@ -0,0 +1,321 @@
+"""Tunes the OptimizedPlayer's pegging weights by a cross entropy search.
+
+Each generation samples a population of weight vectors around the current
+mean, always including the mean itself.  Every candidate plays the same
+seeded games against the default OptimizedPlayer, from both seats, so the
+differences between candidates come from their weights rather than the cards
+(common random numbers).  The games are split into seed ranges and played on a process pool.
+The best candidates of a generation set the next mean and spread.
+
+Because the elite are picked on those fixed seeds, their fitness there
+flatters them.  The elite are replayed on a held-out seed range that the
+search never selects on, and only that fitness decides the best weights.
+
+After every generation the tuner's state is written to a JSON checkpoint, so
+a stopped run resumes where it left off, and the best weights found so far are
+written as a player config:
+
+  python3 cribbageai/cribbagetuning.py --generations 20 --games 400 --output tuned_player.json
+
+  player_factory = load_player_config("tuned_player.json")
+  player = player_factory()
+
+"""
+
+import argparse
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import cribbageaicli
+import cribbageengine
+import cribbageplayers
+import cribbagesharedtables
+import cribbagetournament
+
+DEFAULT_POPULATION_SIZE = 16
+DEFAULT_ELITE_COUNT = 4
+DEFAULT_GAMES = 200
+DEFAULT_VALIDATION_GAMES = 200
+DEFAULT_SIGMA = 0.25
+MIN_SIGMA = 0.02
+DEFAULT_CHECKPOINT_FILE = "tuning_checkpoint.json"
+DEFAULT_CONFIG_FILE = "tuned_player.json"
+
+
+def play_weight_games(pegging_weights, first_seed, game_count):
+    """Plays a seed range between weighted and default OptimizedPlayers.
+
+    Each seed is played twice with the players in either seat, so the cards
+    favour neither player and equal weights come out even.
+
+    Args:
+        pegging_weights: the candidate's weights, ordered as PEGGING_WEIGHT_NAMES
+        first_seed: the seed of the first game
+        game_count: the number of seeds
+
+    Returns:
+        (TournamentResult) the totals, with the candidate as player one
+    """
+    result = cribbagetournament.TournamentResult()
+    cribbage_game = cribbageengine.CribbageEngine().new_game(None, None, is_bulk=True,
+      logger=cribbagetournament.GAME_LOGGER)
+    for seed in range(first_seed, first_seed + game_count):
+        for is_swapped in (False, True):
+            players = [cribbageplayers.OptimizedPlayer(pegging_weights),
+              cribbageplayers.OptimizedPlayer()]
+            if is_swapped:
+                players.reverse()
+            cribbage_game.reset(*players, rng=random.Random(seed))
+            scores = cribbageaicli.run_game(cribbage_game, False)
+            result.add_game(scores[::-1] if is_swapped else scores)
+    return result
+
+def get_fitness(result):
+    """Gets a candidate's points won per game over the default player."""
+    return (result.points[0] - result.points[1]) / max(result.games, 1)
+
+def evaluate_population(population, games, first_seed, pool,
+  range_size=cribbagetournament.DEFAULT_RANGE_SIZE):
+    """Plays every candidate on the same seeds over a process pool.
+
+    Args:
+        population: a list of weight vectors
+        games: the number of seeds each candidate plays from both seats
+        first_seed: the seed of the first game
+        pool: the multiprocessing pool to play the seed ranges on
+        range_size: the most games in one pool task
+
+    Returns:
+        (list) the TournamentResult of each candidate
+    """
+    seed_ranges = cribbagetournament.split_seed_ranges(first_seed, games, range_size)
+    range_results = pool.starmap(play_weight_games, [(tuple(weights), seed, count)
+      for weights in population for seed, count in seed_ranges])
+
+    results = []
+    for candidate in range(len(population)):
+        result = cribbagetournament.TournamentResult()
+        for range_result in range_results[candidate * len(seed_ranges):
+          (candidate + 1) * len(seed_ranges)]:
+            result.merge(range_result)
+        results.append(result)
+    return results
+
+
+class WeightTuner:
+    """Searches the pegging weights with the cross entropy method.
+
+    Attributes:
+        population_size: the candidates played each generation, including the mean
+        elite_count: the best candidates the next mean and spread come from
+        games: the seeds each candidate plays from both seats
+        first_seed: the seed of the first game, the same every generation
+        validation_games: the held-out seeds the elite replay from both seats
+        validation_seed: the first held-out seed, past the search's seeds
+        generation: the number of generations finished
+        mean: the ndarray the next population is sampled around
+        sigma: the ndarray of the spread of each weight
+        best_weights: the tuple of the best weights on the held-out seeds
+        best_fitness: their held-out points won per game, or None before any
+          generation
+        history: a dict per generation of its best, mean and held-out fitness
+    """
+    def __init__(self, population_size=DEFAULT_POPULATION_SIZE, elite_count=DEFAULT_ELITE_COUNT,
+      games=DEFAULT_GAMES, first_seed=1, sigma=DEFAULT_SIGMA, seed=1,
+      validation_games=DEFAULT_VALIDATION_GAMES, validation_seed=None):
+        if not 0 < elite_count <= population_size:
+            raise ValueError("elite_count must be between 1 and population_size")
+        if validation_games < 1:
+            raise ValueError("validation_games must be at least 1")
+        self.population_size = population_size
+        self.elite_count = elite_count
+        self.games = games
+        self.first_seed = first_seed
+        self.validation_games = validation_games
+        self.validation_seed = validation_seed if validation_seed is not None \
+          else first_seed + games
+        if self.validation_seed < first_seed + games \
+          and first_seed < self.validation_seed + validation_games:
+            raise ValueError("The held-out seeds overlap the search's seeds")
+        self.generation = 0
+        self.mean = np.array(cribbageplayers.DEFAULT_PEGGING_WEIGHTS, dtype=np.float64)
+        self.sigma = np.full(len(self.mean), sigma)
+        self.best_weights = cribbageplayers.DEFAULT_PEGGING_WEIGHTS
+        self.best_fitness = None
+        self.history = []
+        self._rng = np.random.default_rng(seed)
+
+    def sample_population(self):
+        """Samples the next population, the current mean first."""
+        samples = self.mean + self.sigma * self._rng.standard_normal(
+          (self.population_size - 1, len(self.mean)))
+        return [tuple(float(weight) for weight in weights)
+          for weights in np.vstack([self.mean, samples])]
+
+    def step(self, pool, range_size=cribbagetournament.DEFAULT_RANGE_SIZE):
+        """Plays one generation and moves the search towards its best candidates.
+
+        The elite are then replayed on the held-out seeds, and the best of them
+        replaces best_weights if it beats it there.  The held-out seeds are the
+        same every generation, so best_fitness stays comparable.
+
+        Returns:
+            (list) the fitness of each candidate
+        """
+        population = self.sample_population()
+        fitness = [get_fitness(result) for result in evaluate_population(population,
+          self.games, self.first_seed, pool, range_size)]
+
+        ranked = np.argsort(fitness)[::-1]
+        elite = [population[candidate] for candidate in ranked[:self.elite_count]]
+        self.mean = np.mean(elite, axis=0)
+        self.sigma = np.maximum(np.std(elite, axis=0), MIN_SIGMA)
+
+        validated = [get_fitness(result) for result in evaluate_population(elite,
+          self.validation_games, self.validation_seed, pool, range_size)]
+        top = int(np.argmax(validated))
+        if self.best_fitness is None or validated[top] > self.best_fitness:
+            self.best_weights = elite[top]
+            self.best_fitness = validated[top]
+        self.history.append({"generation": self.generation, "best": fitness[ranked[0]],
+          "mean": float(np.mean(fitness)), "validated": validated[top]})
+        self.generation += 1
+        logging.info("Generation %s best %.3f points per game, %.3f held out with %s",
+          self.generation, fitness[ranked[0]], validated[top], elite[top])
+        return fitness
+
+    def to_dict(self):
+        """Converts the tuner's state to a JSON friendly dict."""
+        return {"population_size": self.population_size, "elite_count": self.elite_count,
+          "games": self.games, "first_seed": self.first_seed,
+          "validation_games": self.validation_games, "validation_seed": self.validation_seed,
+          "generation": self.generation,
+          "mean": self.mean.tolist(), "sigma": self.sigma.tolist(),
+          "best_weights": list(self.best_weights), "best_fitness": self.best_fitness,
+          "history": self.history, "rng_state": self._rng.bit_generator.state}
+
+    @classmethod
+    def from_dict(cls, values):
+        """Makes a tuner from to_dict's dict."""
+        tuner = cls(values["population_size"], values["elite_count"], values["games"],
+          values["first_seed"], validation_games=values["validation_games"],
+          validation_seed=values["validation_seed"])
+        tuner.generation = values["generation"]
+        tuner.mean = np.array(values["mean"])
+        tuner.sigma = np.array(values["sigma"])
+        tuner.best_weights = tuple(values["best_weights"])
+        tuner.best_fitness = values["best_fitness"]
+        tuner.history = values["history"]
+        tuner._rng.bit_generator.state = values["rng_state"]  # pylint: disable=protected-access
+        return tuner
+
+    def save_checkpoint(self, path):
+        """Writes the tuner's state, replacing any older checkpoint whole."""
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(self.to_dict(), checkpoint_file, indent=2)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Makes a tuner from a checkpoint written by save_checkpoint."""
+        with open(path, encoding="utf-8") as checkpoint_file:
+            return cls.from_dict(json.load(checkpoint_file))
+
+
+def save_player_config(pegging_weights, path, fitness=None):
+    """Writes pegging weights as a player config for load_player_config."""
+    config = {"player": "optimized",
+      "pegging_weights": dict(zip(cribbageplayers.PEGGING_WEIGHT_NAMES, pegging_weights)),
+      "fitness": fitness}
+    with open(path, "w", encoding="utf-8") as config_file:
+        json.dump(config, config_file, indent=2)
+
+def load_player_config(path):
+    """Reads a player config written by save_player_config.
+
+    Weights missing from the config keep their defaults.
+
+    Returns:
+        (callable) makes an OptimizedPlayer with the config's weights
+    """
+    with open(path, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    if config.get("player") != "optimized":
+        raise ValueError(f"Unknown player in config: {config.get('player')}")
+    weights = config["pegging_weights"]
+    return functools.partial(cribbageplayers.OptimizedPlayer, tuple(
+      weights.get(name, default) for name, default in zip(cribbageplayers.PEGGING_WEIGHT_NAMES,
+      cribbageplayers.DEFAULT_PEGGING_WEIGHTS)))
+
+def run_tuning(tuner, generations, processes=None, checkpoint_path=DEFAULT_CHECKPOINT_FILE,
+  config_path=DEFAULT_CONFIG_FILE, range_size=cribbagetournament.DEFAULT_RANGE_SIZE):
+    """Plays generations until the tuner has finished the given number.
+
+    The checkpoint and player config are written after every generation.
+    The workers attach to lookup tables this process shares once, rather
+    than each building its own.
+
+    Returns:
+        (WeightTuner) the tuner
+    """
+    with cribbagesharedtables.SharedTables() as manifest, multiprocessing.Pool(
+      processes or os.cpu_count(), cribbagesharedtables.attach_tables, (manifest,)) as pool:
+        while tuner.generation < generations:
+            tuner.step(pool, range_size)
+            tuner.save_checkpoint(checkpoint_path)
+            save_player_config(tuner.best_weights, config_path, tuner.best_fitness)
+    return tuner
+
+def main(argv=None):
+    """Tunes the pegging weights from the command line."""
+    parser = argparse.ArgumentParser(description="Tunes the OptimizedPlayer pegging weights.")
+    parser.add_argument("--generations", type=int, default=10,
+      help="the total generations, including any already in the checkpoint")
+    parser.add_argument("--population", type=int, default=DEFAULT_POPULATION_SIZE)
+    parser.add_argument("--elite", type=int, default=DEFAULT_ELITE_COUNT)
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES,
+      help="the seeds each candidate plays from both seats")
+    parser.add_argument("--validation-games", type=int, default=DEFAULT_VALIDATION_GAMES,
+      help="the held-out seeds the elite replay to pick the saved weights")
+    parser.add_argument("--sigma", type=float, default=DEFAULT_SIGMA)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--range-size", type=int, default=cribbagetournament.DEFAULT_RANGE_SIZE)
+    parser.add_argument("--workers", type=int, default=None,
+      help="worker processes, all cores by default")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument("--output", default=DEFAULT_CONFIG_FILE)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    if os.path.exists(args.checkpoint):
+        tuner = WeightTuner.load_checkpoint(args.checkpoint)
+        print(f"Resuming from generation {tuner.generation}")
+    else:
+        tuner = WeightTuner(args.population, args.elite, args.games, args.seed, args.sigma,
+          args.seed, args.validation_games)
+
+    started = time.perf_counter()
+    run_tuning(tuner, args.generations, args.workers, args.checkpoint, args.output,
+      args.range_size)
+
+    for entry in tuner.history:
+        print(f"Generation {entry['generation'] + 1}: best {entry['best']:.2f}, "
+          f"mean {entry['mean']:.2f}, held out {entry['validated']:.2f} points per game")
+    if tuner.best_fitness is not None:
+        weights = ", ".join(f"{name}={weight:.3f}" for name, weight
+          in zip(cribbageplayers.PEGGING_WEIGHT_NAMES, tuner.best_weights))
+        print(f"Best {weights} at {tuner.best_fitness:.2f} held-out points per game, saved {args.output} "
+          f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
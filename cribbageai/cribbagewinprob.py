@@ -0,0 +1,456 @@
+"""Provides the chance of winning for any score and dealer, by dynamic programming.
+
+The points each seat scores in a round are measured by simulating rounds
+with the engine across all cores.  A table of the dealer's chance to win
+from every pair of scores is then solved backwards from 121, and shipped as
+a small array so players and the command line can look it up directly.
+The measured points are shipped too, so the EndgamePlayer can play out the
+rest of the current round before looking up the table.
+
+Within a round the pone's points are counted first, so if both players pass
+121 in the same round the pone wins.  The pegging points of both players are
+treated as a single step.
+
+  python3 cribbageai/cribbagewinprob.py --rounds 20000
+
+  table = load_win_table()
+  win_probability(table, 100, 110, True)
+
+"""
+
+import argparse
+from functools import lru_cache
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import cribbagecompact
+import cribbagedistribution
+import cribbageengine
+import cribbageplayers
+import cribbagesharedtables
+
+WINNING_SCORE = 121
+
+# The most points measured for a seat in any one part of a round.
+MAX_ROUND_POINTS = 64
+
+DEFAULT_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+  "data", "win_probability.npy")
+DEFAULT_ROUND_POINTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+  "data", "round_points.npz")
+DEFAULT_PLAYER_CLASSES = (cribbageplayers.OptimizedPlayer, cribbageplayers.OptimizedPlayer)
+DEFAULT_ENDGAME_SCORE = 91
+
+
+class RoundPoints:
+    """Counts how many points each seat scores in the parts of a round.
+
+    Attributes:
+        pegging: counts of (dealer, pone) pegging points, with his heels
+          counted as dealer pegging
+        pone_show: counts of the pone's hand points
+        dealer_show: counts of the dealer's hand plus crib points
+        crib: counts of the crib's points alone
+        dealer_hand: counts of the dealer's hand points alone
+    """
+    def __init__(self):
+        self.pegging = np.zeros((MAX_ROUND_POINTS, MAX_ROUND_POINTS), dtype=np.int64)
+        self.pone_show = np.zeros(MAX_ROUND_POINTS, dtype=np.int64)
+        self.dealer_show = np.zeros(MAX_ROUND_POINTS, dtype=np.int64)
+        self.crib = np.zeros(MAX_ROUND_POINTS, dtype=np.int64)
+        self.dealer_hand = np.zeros(MAX_ROUND_POINTS, dtype=np.int64)
+
+    def add_round(self, dealer_pegging, pone_pegging, pone_show, dealer_show, crib=0):
+        """Counts the points of one round."""
+        self.pegging[dealer_pegging, pone_pegging] += 1
+        self.pone_show[pone_show] += 1
+        self.dealer_show[dealer_show] += 1
+        self.crib[crib] += 1
+        self.dealer_hand[dealer_show - crib] += 1
+
+    def merge(self, other):
+        """Adds the counts of another RoundPoints into this one."""
+        self.pegging += other.pegging
+        self.pone_show += other.pone_show
+        self.dealer_show += other.dealer_show
+        self.crib += other.crib
+        self.dealer_hand += other.dealer_hand
+
+    def get_round_count(self):
+        """Gets the number of rounds counted."""
+        return int(self.pone_show.sum())
+
+
+def measure_round_points(rounds, seed, player_classes=DEFAULT_PLAYER_CLASSES):
+    """Plays rounds with the engine and counts the points of each part.
+
+    Args:
+        rounds: the number of rounds to play
+        seed: the seed for the random module
+        player_classes: a tuple of the two player classes to play
+
+    Returns:
+        (RoundPoints) the counts for the rounds
+    """
+    random.seed(seed)
+    round_points = RoundPoints()
+    cribbage_game = cribbageengine.CribbageEngine().new_game(
+      player_classes[0](), player_classes[1](), is_bulk=True)
+
+    for _ in range(rounds):
+        cribbage_game.deal_cards()
+        cribbage_game.discard_to_crib()
+        start_scores = (cribbage_game.player_one_score, cribbage_game.player_two_score)
+
+        cribbage_game.cut_start_card()
+        while cribbage_game.is_more_run_cards():
+            cribbage_game.play_next_run_card()
+
+        pegging = (cribbage_game.player_one_score - start_scores[0],
+          cribbage_game.player_two_score - start_scores[1])
+        dealer = cribbage_game.crib_turn - 1
+        pone_show = cribbage_game.score_pone_hand()
+        crib = cribbage_game.score_dealer_crib()
+        dealer_show = cribbage_game.score_dealer_hand() + crib
+
+        round_points.add_round(min(pegging[dealer], MAX_ROUND_POINTS - 1),
+          min(pegging[1 - dealer], MAX_ROUND_POINTS - 1), pone_show, dealer_show, crib)
+
+    return round_points
+
+def measure_round_points_parallel(rounds, seed, processes=None,
+  player_classes=DEFAULT_PLAYER_CLASSES):
+    """Measures round points on a process pool, one seed per chunk of rounds.
+
+    Args:
+        rounds: the total number of rounds to play
+        seed: the seed of the first chunk
+        processes: the number of worker processes, all cores by default
+        player_classes: a tuple of the two player classes to play
+
+    Returns:
+        (RoundPoints) the merged counts for all rounds
+    """
+    processes = processes or os.cpu_count()
+    chunk_count = processes * 4
+    chunk_arguments = [(rounds // chunk_count + (chunk < rounds % chunk_count),
+      seed + chunk, player_classes) for chunk in range(chunk_count)]
+
+    round_points = RoundPoints()
+    with multiprocessing.Pool(processes) as pool:
+        for chunk_points in pool.starmap(measure_round_points, chunk_arguments):
+            round_points.merge(chunk_points)
+
+    return round_points
+
+def solve_win_table(round_points, winning_score=WINNING_SCORE):
+    """Solves the dealer's chance of winning from every pair of scores.
+
+    States are solved in order of decreasing total score, since every round
+    adds at least the point for the last card.
+
+    Args:
+        round_points: the RoundPoints measured for the players
+        winning_score: the score that wins the game
+
+    Returns:
+        (ndarray) a (winning_score, winning_score) float32 array where
+          [dealer score, pone score] is the dealer's chance of winning
+    """
+    pegging = round_points.pegging.astype(np.float64)
+    # A round with no pegging points cannot happen, dropping it keeps the
+    # solve from depending on its own state.
+    pegging[0, 0] = 0
+    pegging_dealer_size = int(np.nonzero(pegging.any(axis=1))[0].max()) + 1
+    pegging_pone_size = int(np.nonzero(pegging.any(axis=0))[0].max()) + 1
+    pegging = pegging[:pegging_dealer_size, :pegging_pone_size] / pegging.sum()
+    pone_show = np.trim_zeros(round_points.pone_show, "b") / round_points.pone_show.sum()
+    dealer_show = np.trim_zeros(round_points.dealer_show, "b") / round_points.dealer_show.sum()
+
+    target = winning_score
+    dealer_wins = np.zeros((target, target))
+
+    # The old dealer's chance to win once the next round starts, indexed by
+    # [old pone score, old dealer score].  Past the target the old dealer won.
+    after_round = np.ones((target, target + len(dealer_show)))
+
+    # The dealer's chance before the dealer's show, indexed by
+    # [dealer score, pone score].  Past the target the pone won.
+    before_dealer_show = np.zeros((target, target + len(pone_show)))
+
+    # The dealer's chance before the pone's show, indexed by
+    # [dealer score, pone score].  The pone wins past the target first.
+    before_pone_show = np.ones((target + pegging_dealer_size, target + pegging_pone_size))
+    before_pone_show[:, target:] = 0
+
+    for total in range(2 * target - 2, -1, -1):
+        diagonal = [(dealer_score, total - dealer_score) for dealer_score
+          in range(max(0, total - target + 1), min(total, target - 1) + 1)]
+
+        for dealer_score, pone_score in diagonal:
+            dealer_wins[dealer_score, pone_score] = (pegging * before_pone_show[
+              dealer_score:dealer_score + pegging_dealer_size,
+              pone_score:pone_score + pegging_pone_size]).sum()
+            after_round[dealer_score, pone_score] = 1 - dealer_wins[dealer_score, pone_score]
+
+        for dealer_score, pone_score in diagonal:
+            before_dealer_show[dealer_score, pone_score] = dealer_show.dot(
+              after_round[pone_score, dealer_score:dealer_score + len(dealer_show)])
+
+        for dealer_score, pone_score in diagonal:
+            before_pone_show[dealer_score, pone_score] = pone_show.dot(
+              before_dealer_show[dealer_score, pone_score:pone_score + len(pone_show)])
+
+    return dealer_wins.astype(np.float32)
+
+def load_win_table(path=DEFAULT_TABLE_FILE):
+    """Loads a win probability table, cached after the first load.
+
+    The default table is shared with worker processes by cribbagesharedtables,
+    which keeps it, so only other paths are cached here.  A cached view of a
+    shared block would outlive the block.
+
+    Args:
+        path: the .npy file written by save_win_table
+
+    Returns:
+        (ndarray) the read only table
+    """
+    if path == DEFAULT_TABLE_FILE:
+        return cribbagesharedtables.get_table("win_probability")
+    return _load_table_file(path)
+
+@lru_cache(maxsize=4)
+def _load_table_file(path):
+    table = np.load(path)
+    table.setflags(write=False)
+    return table
+
+cribbagesharedtables.register_table("win_probability", lambda: np.load(DEFAULT_TABLE_FILE))
+
+def save_win_table(table, path=DEFAULT_TABLE_FILE):
+    """Saves a win probability table as a .npy file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, table)
+
+def save_round_points(round_points, path=DEFAULT_ROUND_POINTS_FILE):
+    """Saves measured round points as a .npz file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, pegging=round_points.pegging, pone_show=round_points.pone_show,
+      dealer_show=round_points.dealer_show, crib=round_points.crib,
+      dealer_hand=round_points.dealer_hand)
+
+def load_round_points(path=DEFAULT_ROUND_POINTS_FILE):
+    """Loads round points written by save_round_points."""
+    round_points = RoundPoints()
+    with np.load(path) as arrays:
+        round_points.pegging = arrays["pegging"]
+        round_points.pone_show = arrays["pone_show"]
+        round_points.dealer_show = arrays["dealer_show"]
+        round_points.crib = arrays["crib"]
+        round_points.dealer_hand = arrays["dealer_hand"]
+    return round_points
+
+def win_probability(table, player_score, opponent_score, is_dealer):
+    """Looks up the chance a player wins from the start of a round.
+
+    Args:
+        table: a table from solve_win_table or load_win_table
+        player_score: the player's score
+        opponent_score: the opponent's score
+        is_dealer: True if the player deals this round
+
+    Returns:
+        (float) the chance the player wins the game
+    """
+    winning_score = table.shape[0]
+    if player_score >= winning_score:
+        return 1.0
+    if opponent_score >= winning_score:
+        return 0.0
+    if is_dealer:
+        return float(table[player_score, opponent_score])
+    return 1.0 - float(table[opponent_score, player_score])
+
+def _add_points(chances, distribution, axis, past_target):
+    """Gets the chances from before a random number of points is added.
+
+    Args:
+        chances: a chance of winning for each pair of scores
+        distribution: the probability of each number of points
+        axis: 0 if the player gets the points, 1 if the opponent does
+        past_target: the chance of winning once the points pass the target
+
+    Returns:
+        (ndarray) where [i, j] sums distribution[k] * chances at i or j plus k
+    """
+    padding = [(0, 0), (0, 0)]
+    padding[axis] = (0, len(distribution))
+    padded = np.pad(chances, padding, constant_values=past_target)
+    result = np.zeros(chances.shape)
+    for points, probability in enumerate(distribution):
+        if probability:
+            result += probability * np.take(padded,
+              range(points, points + chances.shape[axis]), axis=axis)
+    return result
+
+def round_win_probabilities(table, round_points, player_score, opponent_score, is_dealer,
+  hand_distributions, crib_distributions=None):
+    """Gets the chance of winning for each distribution of the player's hand score.
+
+    The rest of the round is played out in the order solve_win_table
+    assumes: the pegging of both players, then the pone's show, then the
+    dealer's hand and crib.  The pegging and the opponent's hand come from
+    the measured round points.  The crib comes from crib_distributions when
+    given, so it follows what the player threw into it, and otherwise from
+    the measured crib.  Once no one has won, the table gives the chance from
+    the start of the next round.
+
+    Args:
+        table: a table from solve_win_table or load_win_table
+        round_points: the RoundPoints the table was solved from
+        player_score: the player's score
+        opponent_score: the opponent's score
+        is_dealer: True if the player deals this round
+        hand_distributions: the probability of each score of the player's hand,
+          one distribution per choice
+        crib_distributions: the probability of each score of the crib, one
+          distribution per choice, or None to use the measured crib
+
+    Returns:
+        (list) the chance of winning for each distribution
+    """
+    winning_score = table.shape[0]
+    pegging = round_points.pegging / round_points.pegging.sum()
+    pone_show = round_points.pone_show / round_points.pone_show.sum()
+    dealer_show = round_points.dealer_show / round_points.dealer_show.sum()
+    crib = round_points.crib / max(round_points.crib.sum(), 1)
+    dealer_hand = round_points.dealer_hand / max(round_points.dealer_hand.sum(), 1)
+    player_room = winning_score - player_score
+    opponent_room = winning_score - opponent_score
+
+    if is_dealer:
+        next_round = 1 - table[opponent_score:, player_score:].T
+        # The pone wins first if both pass the target in the pegging
+        after_pegging = np.ones((player_room + len(pegging), opponent_room + len(pegging)))
+        after_pegging[:, opponent_room:] = 0
+    else:
+        next_round = table[player_score:, opponent_score:]
+        after_opponent_show = _add_points(next_round, dealer_show, 1, 0.0)
+        after_pegging = np.zeros((player_room + len(pegging), opponent_room + len(pegging)))
+        after_pegging[player_room:, :] = 1
+
+    probabilities = []
+    for choice, hand_distribution in enumerate(hand_distributions):
+        choice_crib = crib if crib_distributions is None else crib_distributions[choice]
+        if is_dealer:
+            player_show = np.convolve(hand_distribution, choice_crib)
+            after_pegging[:player_room, :opponent_room] = _add_points(
+              _add_points(next_round, player_show, 0, 1.0), pone_show, 1, 0.0)
+            chance = (pegging * after_pegging[:len(pegging), :len(pegging)]).sum()
+        else:
+            if crib_distributions is not None:
+                after_opponent_show = _add_points(next_round,
+                  np.convolve(dealer_hand, choice_crib), 1, 0.0)
+            after_pegging[:player_room, :opponent_room] = _add_points(after_opponent_show,
+              hand_distribution, 0, 1.0)
+            chance = (pegging.T * after_pegging[:len(pegging), :len(pegging)]).sum()
+        probabilities.append(float(chance))
+    return probabilities
+
+
+class EndgamePlayer(cribbageplayers.OptimizedPlayer):
+    """Provides a player that discards for the chance of winning near the end.
+
+    Before either player reaches the endgame score it discards like the
+    OptimizedPlayer.  After that it keeps the hand whose score distribution
+    gives the best chance of winning.  The pegging and the opponent's hand
+    are played out from the measured round points and the crib from the
+    cards thrown into it, before looking up the table.  The table is for the standard game, so in variants it always
+    discards like the OptimizedPlayer.
+
+    Attributes:
+        endgame_score: the score at which to switch to win probability
+    """
+    def __init__(self, endgame_score=DEFAULT_ENDGAME_SCORE, table=None, round_points=None):
+        self.endgame_score = endgame_score
+        # The default table is looked up when needed, since it may be shared
+        self._table = table
+        self._round_points = round_points if round_points is not None \
+          else load_round_points()
+        self._is_dealer = False
+        self._player_score = 0
+        self._opponent_score = 0
+
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Records the seat and scores for the round."""
+        self._is_dealer = is_dealer
+        self._player_score = player_score
+        self._opponent_score = opponent_score
+
+    def discard_to_crib(self, player_hand):
+        """Discards to maximize the chance of winning once in the endgame.
+
+        Args:
+            player_hand: A set of PlayingCard representing the hand
+
+        Returns:
+           {PlayingCard, PlayingCard} two cards as a tuple
+        """
+        if max(self._player_score, self._opponent_score) < self.endgame_score \
+          or self.rules is not cribbageengine.STANDARD_RULES:
+            return super().discard_to_crib(player_hand)
+
+        hand_cards = sorted(player_hand)
+        hand = cribbagecompact.cards_to_indices(hand_cards)
+        probabilities = round_win_probabilities(
+          self._table if self._table is not None else load_win_table(), self._round_points,
+          self._player_score, self._opponent_score, self._is_dealer,
+          [distribution for _, distribution
+          in cribbagedistribution.discard_score_distributions(hand)],
+          cribbagedistribution.crib_score_distributions(hand))
+        best_option = max(range(len(probabilities)), key=probabilities.__getitem__)
+        best_discard = cribbagecompact.DISCARD_OPTIONS[best_option]
+        best_probability = probabilities[best_option]
+
+        self.logger.info("Endgame discard with win probability [%s]", best_probability)
+        card_one = hand_cards[best_discard[0]]
+        card_two = hand_cards[best_discard[1]]
+        player_hand.remove(card_one)
+        player_hand.remove(card_two)
+
+        return card_one, card_two
+
+
+def main(argv=None):
+    """Builds and saves the win probability table from the command line."""
+    parser = argparse.ArgumentParser(description="Builds the win probability table.")
+    parser.add_argument("--rounds", type=int, default=20000,
+      help="the number of rounds to simulate")
+    parser.add_argument("--processes", type=int, default=None,
+      help="the number of worker processes, all cores by default")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=DEFAULT_TABLE_FILE)
+    parser.add_argument("--round-points-output", default=DEFAULT_ROUND_POINTS_FILE)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARN)
+    started = time.perf_counter()
+    round_points = measure_round_points_parallel(args.rounds, args.seed, args.processes)
+    table = solve_win_table(round_points)
+    save_win_table(table, args.output)
+    save_round_points(round_points, args.round_points_output)
+
+    print(f"Simulated {round_points.get_round_count()} rounds and saved {args.output} "
+      f"in {time.perf_counter() - started:.1f}s")
+    print(f"Dealer win probability at 0-0: {table[0, 0]:.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Unit testing class for the batch hand analysis API
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageanalysis
+import cribbagecompact
+from cribbageanalysis import AnalysisCache
+from cribbageanalysis import HandAnalyzer
+from cribbageengine import calculate_score_for_hand
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+
+def _index(suit, face, value):
+    return cribbagecompact.card_to_index(PlayingCard(suit, face, value))
+
+class TestCribbageAnalysis(unittest.TestCase):
+    def test_suit_isomorphic_keys_match(self):
+        # A heart flush with the jack of the cut's suit, and the same in clubs
+        hearts = {"type": "score", "cut": _index(Suit.HEART, Face.TWO, 2), "hand": [
+          _index(Suit.HEART, Face.JACK, 10), _index(Suit.HEART, Face.FOUR, 4),
+          _index(Suit.HEART, Face.SIX, 6), _index(Suit.HEART, Face.NINE, 9)]}
+        clubs = {"type": "score", "cut": _index(Suit.CLUB, Face.TWO, 2), "hand": [
+          _index(Suit.CLUB, Face.NINE, 9), _index(Suit.CLUB, Face.SIX, 6),
+          _index(Suit.CLUB, Face.JACK, 10), _index(Suit.CLUB, Face.FOUR, 4)]}
+        off_suit_cut = dict(clubs, cut=_index(Suit.SPADE, Face.TWO, 2))
+
+        self.assertEqual(cribbageanalysis.get_query_key(hearts)[0],
+          cribbageanalysis.get_query_key(clubs)[0])
+        self.assertNotEqual(cribbageanalysis.get_query_key(clubs)[0],
+          cribbageanalysis.get_query_key(off_suit_cut)[0])
+
+    def test_batch_answers_match_engine(self):
+        analyzer = HandAnalyzer()
+        hand = [PlayingCard(Suit.CLUB, Face.FIVE, 5), PlayingCard(Suit.SPADE, Face.FIVE, 5),
+          PlayingCard(Suit.HEART, Face.JACK, 10), PlayingCard(Suit.HEART, Face.FOUR, 4)]
+        cut = PlayingCard(Suit.HEART, Face.SIX, 6)
+        six_cards = [_index(Suit.CLUB, Face.FIVE, 5), _index(Suit.SPADE, Face.FIVE, 5),
+          _index(Suit.HEART, Face.FIVE, 5), _index(Suit.DIAMOND, Face.FIVE, 5),
+          _index(Suit.SPADE, Face.ACE, 1), _index(Suit.HEART, Face.KING, 10)]
+        queries = [
+          {"type": "score", "hand": cribbagecompact.cards_to_indices(hand),
+            "cut": cribbagecompact.card_to_index(cut)},
+          {"type": "discard", "hand": six_cards, "is_dealer": True},
+          {"type": "peg", "hand": [_index(Suit.DIAMOND, Face.FIVE, 5),
+            _index(Suit.SPADE, Face.TWO, 2)], "run": [_index(Suit.HEART, Face.KING, 10)]},
+          {"type": "peg", "hand": [_index(Suit.DIAMOND, Face.FIVE, 5)],
+            "run": [_index(Suit.HEART, Face.KING, 10)] * 3}]
+
+        results = analyzer.analyze_batch(queries)
+
+        self.assertEqual(results[0], {"score": calculate_score_for_hand(hand, cut)})
+        self.assertEqual(results[1], {"discard": sorted(six_cards[4:])})
+        self.assertEqual(results[2], {"card": _index(Suit.DIAMOND, Face.FIVE, 5)})
+        self.assertEqual(results[3], {"card": None})
+
+    def test_duplicates_computed_once(self):
+        analyzer = HandAnalyzer()
+        query = {"type": "discard", "is_dealer": False, "hand": list(range(0, 24, 4))}
+        relabelled = dict(query, hand=[card + 1 for card in query["hand"]])
+
+        results = analyzer.analyze_batch([query, relabelled, query])
+        analyzer.analyze_batch([relabelled])
+
+        self.assertEqual(analyzer.computed_count, 1)
+        self.assertEqual(analyzer.query_count, 4)
+        self.assertEqual(results[1]["discard"], [card + 1 for card in results[0]["discard"]])
+
+    def test_malformed_query(self):
+        with self.assertRaises(ValueError):
+            HandAnalyzer().analyze_batch([{"type": "discard", "hand": [1, 2, 3]}])
+        with self.assertRaises(ValueError):
+            HandAnalyzer().analyze_batch([{"type": "unknown", "hand": [1]}])
+
+    def test_rejects_cards_outside_deck_or_repeated(self):
+        for query in ({"type": "score", "hand": [1, 2, 3, 60], "cut": 5},
+          {"type": "score", "hand": [-1, 2, 3, 4], "cut": 5},
+          {"type": "score", "hand": [1, 2, 3, 4], "cut": 4},
+          {"type": "discard", "hand": [1, 2, 3, 4, 5, 5]},
+          {"type": "peg", "hand": [2, 2], "run": [5]},
+          {"type": "peg", "hand": [1, 2], "run": [52]}):
+            with self.assertRaises(ValueError):
+                HandAnalyzer().analyze_batch([query])
+
+    def test_cache_evicts_least_recent_and_persists(self):
+        cache = AnalysisCache(2)
+        cache.put(("score", 1), 1)
+        cache.put(("score", 2), 2)
+        cache.get(("score", 1))
+        cache.put(("discard", 3), (4, 5))
+
+        self.assertNotIn(("score", 2), cache)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = os.path.join(cache_dir, "cache.json")
+            cache.save(path)
+            loaded = AnalysisCache(2)
+            loaded.load(path)
+
+        self.assertEqual(loaded.get(("discard", 3)), (4, 5))
+        self.assertEqual(loaded.get(("score", 1)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Unit testing class for the out of process bot arena
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageaicli
+import cribbagearena
+from cribbagearena import BotProcess
+from cribbagearena import RemotePlayer
+from cribbageengine import CribbageEngine
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+from cribbageengine import THREE_PLAYER_RULES
+from cribbageplayers import OptimizedPlayer
+
+class TestCribbageArena(unittest.TestCase):
+    def setUp(self):
+        self.player_hand = {
+          PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.FIVE, 5),
+          PlayingCard(Suit.HEART, Face.FIVE, 5),
+          PlayingCard(Suit.DIAMOND, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.ACE, 1),
+          PlayingCard(Suit.HEART, Face.NINE, 9)}
+
+    def test_serve_bot_messages(self):
+        messages = [{"id": 1, "op": "new"},
+          {"op": "start", "p": 1, "args": [True, 0, 0]},
+          {"op": "cut", "p": 1, "args": [51]},
+          {"id": 2, "op": "run", "p": 1, "hand": [16, 4], "run": [40], "total": 10},
+          {"id": 3, "op": "run", "p": 9, "hand": [16], "run": [], "total": 0}]
+        output = io.StringIO()
+
+        cribbagearena.serve_bot(OptimizedPlayer,
+          io.StringIO("".join(json.dumps(message) + "\n" for message in messages)), output)
+
+        replies = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(replies[0], {"id": 1, "result": 1})
+        # The five makes fifteen
+        self.assertEqual(replies[1], {"id": 2, "result": 16})
+        self.assertEqual(replies[2]["id"], 3)
+        self.assertIn("error", replies[2])
+
+    def test_serve_bot_rules(self):
+        hand = [16, 20, 24, 28, 0]
+        messages = [{"id": 1, "op": "new", "rules": "three_player"},
+          {"id": 2, "op": "new"},
+          {"op": "rules", "p": 2, "args": ["three_player"]},
+          {"id": 3, "op": "discard", "p": 1, "hand": hand},
+          {"id": 4, "op": "discard", "p": 2, "hand": hand}]
+        output = io.StringIO()
+
+        cribbagearena.serve_bot(OptimizedPlayer,
+          io.StringIO("".join(json.dumps(message) + "\n" for message in messages)), output)
+
+        replies = [json.loads(line) for line in output.getvalue().splitlines()]
+        # Three player hands discard a single card
+        self.assertEqual(len(replies[2]["result"]), 1)
+        self.assertEqual(len(replies[3]["result"]), 1)
+
+    def test_three_player_game_with_bot_processes(self):
+        bot_process = BotProcess.for_player("optimized")
+        try:
+            players = [RemotePlayer(bot_process, rules=THREE_PLAYER_RULES) for _ in range(3)]
+            scores = cribbageaicli.run_multiplayer_game(CribbageEngine().new_multiplayer_game(
+              players, rng=random.Random(3)), False)
+        finally:
+            bot_process.close()
+
+        self.assertGreaterEqual(max(scores), 121)
+        self.assertEqual(sum(player.fallback_count for player in players), 0)
+
+    def test_game_with_bot_processes(self):
+        random.seed(2)
+        bot_process = BotProcess.for_player("optimized")
+        try:
+            players = (RemotePlayer(bot_process), RemotePlayer(bot_process))
+            scores = cribbageaicli.run_game(CribbageEngine().new_game(*players), False)
+        finally:
+            bot_process.close()
+
+        self.assertGreaterEqual(max(scores), 121)
+        self.assertEqual(players[0].fallback_count + players[1].fallback_count, 0)
+
+    def test_deadline_falls_back(self):
+        bot_process = BotProcess.for_player("optimized", delay_ms=400)
+        try:
+            player = RemotePlayer(bot_process, deadline_ms=50)
+            discards = player.discard_to_crib(set(self.player_hand))
+        finally:
+            bot_process.close()
+
+        self.assertEqual(player.fallback_count, 1)
+        self.assertEqual(set(discards), {PlayingCard(Suit.SPADE, Face.ACE, 1),
+          PlayingCard(Suit.HEART, Face.NINE, 9)})
+
+    def test_crashed_bot_falls_back(self):
+        bot_process = BotProcess([sys.executable, "-c", "pass"])
+        try:
+            player = RemotePlayer(bot_process, deadline_ms=2000)
+            discards = player.discard_to_crib(set(self.player_hand))
+        finally:
+            bot_process.close()
+
+        self.assertFalse(bot_process.is_alive)
+        self.assertEqual(player.fallback_count, 1)
+        self.assertEqual(len(discards), 2)
+
+    def test_run_arena(self):
+        random.seed(5)
+        state = random.getstate()
+        results = cribbagearena.run_arena(["optimized", "random"], 4, processes_per_bot=2)
+
+        # Each game draws from its own rng, never the shared random module
+        self.assertEqual(random.getstate(), state)
+
+        self.assertEqual(sum(results["wins"]), 4)
+        self.assertEqual(results["fallbacks"], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
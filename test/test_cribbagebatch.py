@@ -0,0 +1,98 @@
+"""
+Unit testing class for the batched decision driver
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+from cribbagebatch import BatchGameDriver
+from cribbagebatch import BatchedPlayer
+from cribbagebatch import ScalarPlayerAdapter
+from cribbageengine import FIVE_CARD_RULES
+from cribbageplayers import OptimizedPlayer
+from cribbageplayers import RandomPlayer
+
+class CountingPlayer(BatchedPlayer):
+    """Plays the lowest cards and counts its batches."""
+    def __init__(self):
+        self.batch_sizes = []
+        self.go_count = 0
+
+    def observe_run_play(self, game_index, seat, is_player, run_card):
+        if run_card is None and is_player:
+            self.go_count += 1
+
+    def discard_to_crib_batch(self, decisions):
+        self.batch_sizes.append(len(decisions))
+        return [tuple(sorted(decision.hand)[:2]) for decision in decisions]
+
+    def get_run_card_batch(self, decisions):
+        self.batch_sizes.append(len(decisions))
+        return [min(decision.hand, key=lambda card: card.value) for decision in decisions]
+
+
+class RulesPlayer(RandomPlayer):
+    """Plays randomly and keeps the rules it was handed."""
+    def use_rules(self, rules):
+        super().use_rules(rules)
+        self.given_rules = rules
+
+
+class TestCribbageBatch(unittest.TestCase):
+    def test_games_finish(self):
+        random.seed(3)
+        driver = BatchGameDriver(ScalarPlayerAdapter(OptimizedPlayer),
+          ScalarPlayerAdapter(RandomPlayer), 8)
+
+        scores = driver.run()
+
+        self.assertEqual(len(scores), 8)
+        for player_one_score, player_two_score in scores:
+            self.assertGreaterEqual(max(player_one_score, player_two_score), 121)
+
+    def test_self_play_batches_both_seats(self):
+        random.seed(4)
+        player = CountingPlayer()
+        driver = BatchGameDriver(player, player, 16)
+
+        driver.run()
+
+        # The first discard holds both seats of every game
+        self.assertEqual(player.batch_sizes[0], 32)
+        self.assertGreater(max(player.batch_sizes[1:]), 8)
+        self.assertGreater(player.go_count, 0)
+
+    def test_scalar_players_per_game_and_seat(self):
+        random.seed(5)
+        adapter = ScalarPlayerAdapter(OptimizedPlayer)
+        BatchGameDriver(adapter, adapter, 3).run()
+
+        self.assertEqual(len(adapter.players), 6)
+
+    def test_rules_variant(self):
+        random.seed(6)
+        adapter = ScalarPlayerAdapter(RulesPlayer)
+        driver = BatchGameDriver(adapter, adapter, 4, rules=FIVE_CARD_RULES)
+
+        scores = driver.run()
+
+        for player_one_score, player_two_score in scores:
+            self.assertGreaterEqual(max(player_one_score, player_two_score), 61)
+            self.assertLess(max(player_one_score, player_two_score), 121)
+        for player in adapter.players.values():
+            self.assertIs(player.given_rules, FIVE_CARD_RULES)
+
+    def test_batched_player_needs_decisions(self):
+        class DiscardOnlyPlayer(BatchedPlayer):
+            def discard_to_crib_batch(self, decisions):
+                return []
+
+        with self.assertRaises(TypeError):
+            DiscardOnlyPlayer()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Unit testing class for the the Cribbage benchmark harness
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagebenchmark
+
+class TestCribbageBenchmark(unittest.TestCase):
+    def test_hand_corpus_is_fixed(self):
+        self.assertEqual(cribbagebenchmark.build_hand_corpus(20),
+          cribbagebenchmark.build_hand_corpus(20))
+
+    def test_run_play_corpus_is_fixed(self):
+        first_corpus = cribbagebenchmark.build_run_play_corpus(50)
+        second_corpus = cribbagebenchmark.build_run_play_corpus(50)
+
+        self.assertEqual(len(first_corpus), 50)
+        self.assertEqual(first_corpus, second_corpus)
+
+    def test_compare_to_baseline_throughput_regression(self):
+        baseline = {"hand_scoring": {"calls": 10, "calls_per_second": 1000.0}}
+        results = {"hand_scoring": {"calls": 10, "calls_per_second": 700.0}}
+
+        regressions = cribbagebenchmark.compare_to_baseline(results, baseline, 0.25)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("hand_scoring.calls_per_second", regressions[0])
+
+    def test_compare_to_baseline_latency_within_threshold(self):
+        baseline = {"games_random_v_random": {"peak_kib_per_game": 10.0,
+          "games_per_second": 20.0}}
+        results = {"games_random_v_random": {"peak_kib_per_game": 12.0,
+          "games_per_second": 40.0}}
+
+        self.assertEqual(cribbagebenchmark.compare_to_baseline(results, baseline, 0.25), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
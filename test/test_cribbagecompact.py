@@ -0,0 +1,99 @@
+"""
+Unit testing class for the compact card scorers
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagecompact
+import cribbageengine
+from cribbageplayers import RandomPlayer
+
+class _LowestCardPlayer(RandomPlayer):
+    """Plays the lowest indexed playable card so games can be replayed."""
+    def get_run_card(self, player_run_hand, run, run_total):
+        return min((card for card in player_run_hand if run_total + card.value <= 31),
+          key=cribbagecompact.card_to_index)
+
+def _choose_lowest_card(seat, hand, run_ranks, run_total, go_player):
+    # pylint: disable=unused-argument
+    return min(card for card in hand if run_total + cribbagecompact.CARD_VALUES[card] <= 31)
+
+class TestCribbageCompact(unittest.TestCase):
+    def setUp(self):
+        self.deck = sorted(cribbageengine.CribbageEngine().get_deck_copy())
+
+    def test_index_round_trip(self):
+        for index, card in enumerate(self.deck):
+            self.assertEqual(cribbagecompact.card_to_index(card), index)
+            self.assertEqual(cribbagecompact.index_to_card(index), card)
+
+    def test_score_hand_matches_engine(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            cards = rng.sample(self.deck, 5)
+            self.assertEqual(
+              cribbagecompact.score_hand(cribbagecompact.cards_to_indices(cards[:4]),
+                cribbagecompact.card_to_index(cards[4])),
+              cribbageengine.calculate_score_for_hand(cards[:4], cards[4]))
+
+    def test_score_hand_matches_engine_for_three_cards(self):
+        rng = random.Random(9)
+        hearts = [card for card in self.deck if card.suit == cribbageengine.Suit.HEART]
+        for _ in range(500):
+            cards = rng.sample(hearts if rng.random() < 0.3 else self.deck, 4)
+            self.assertEqual(
+              cribbagecompact.score_hand(cribbagecompact.cards_to_indices(cards[:3]),
+                cribbagecompact.card_to_index(cards[3])),
+              cribbageengine.calculate_score_for_hand(cards[:3], cards[3]))
+
+    def test_score_keep_over_cuts(self):
+        rng = random.Random(5)
+        for keep_size, dealt_size in ((3, 5), (4, 5), (4, 6)):
+            for _ in range(50):
+                dealt = rng.sample(range(cribbagecompact.DECK_SIZE), dealt_size)
+                keep = dealt[:keep_size]
+                self.assertEqual(cribbagecompact.score_keep_over_cuts(keep, dealt),
+                  sum(cribbagecompact.score_hand(keep, cut)
+                    for cut in range(cribbagecompact.DECK_SIZE) if cut not in dealt))
+
+    def test_score_run_play_matches_engine(self):
+        rng = random.Random(11)
+        for _ in range(2000):
+            cards = rng.sample(self.deck, rng.randint(1, 8))
+            run = cards[:-1]
+            run_total = cribbageengine.CribbageGame.get_cards_total_value(run)
+            if run_total + cards[-1].value > 31:
+                continue
+            self.assertEqual(
+              cribbagecompact.score_run_play([card.face.value - 1 for card in run],
+                run_total, cards[-1].face.value - 1),
+              cribbageengine.calculate_score_for_run_play(run, cards[-1]))
+
+    def test_play_pegging_matches_game(self):
+        rng = random.Random(13)
+        cribbage_engine = cribbageengine.CribbageEngine()
+        for _ in range(300):
+            cards = rng.sample(self.deck, 8)
+            cribbage_game = cribbage_engine.new_game(_LowestCardPlayer(), _LowestCardPlayer())
+            cribbage_game.player_one_run_hand = set(cards[:4])
+            cribbage_game.player_two_run_hand = set(cards[4:])
+            cribbage_game.run_turn = rng.randint(1, 2)
+            first_turn = cribbage_game.run_turn - 1
+            while cribbage_game.is_more_run_cards():
+                cribbage_game.play_next_run_card()
+
+            points = cribbagecompact.play_pegging(
+              [cribbagecompact.cards_to_indices(cards[:4]),
+                cribbagecompact.cards_to_indices(cards[4:])],
+              first_turn, _choose_lowest_card)
+
+            self.assertEqual(points,
+              [cribbage_game.player_one_score, cribbage_game.player_two_score])
+
+
+if __name__ == '__main__':
+    unittest.main()
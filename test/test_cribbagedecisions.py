@@ -0,0 +1,89 @@
+"""
+Unit testing class for the decision quality analyzer
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagecompact
+import cribbagedecisions
+import cribbageselfplay
+from cribbagedecisions import DecisionOracle
+
+class TestCribbageDecisions(unittest.TestCase):
+    def test_discard_loss(self):
+        oracle = DecisionOracle()
+        # Four fives with a jack and a king, kept fives are best for both seats
+        hand = [16, 17, 18, 19, 40, 48]
+
+        self.assertEqual(oracle.get_discard_loss(hand, False, [40, 48]), 0)
+        self.assertGreater(oracle.get_discard_loss(hand, False, [16, 17]), 5)
+        # Relabelling the suits finds the same cached values
+        self.assertEqual(oracle.get_discard_loss([16, 17, 18, 19, 41, 49], False, [41, 49]), 0)
+        self.assertEqual((oracle.query_count, oracle.computed_count), (3, 1))
+
+    def test_dealer_values_the_crib(self):
+        hand = (0, 4, 16, 17, 44, 48)
+        pone_values = cribbagedecisions.get_discard_values(hand, False)
+        dealer_values = cribbagedecisions.get_discard_values(hand, True)
+        crib_values = cribbagedecisions.get_crib_values([card >> 2 for card in hand])
+
+        # The dealer gains the crib the pone gives away
+        fives = cribbagecompact.DISCARD_OPTIONS.index((2, 3))
+        self.assertAlmostEqual(dealer_values[fives] - pone_values[fives], 2 * crib_values[4, 4])
+        self.assertGreater(crib_values[4, 4], crib_values[0, 12])
+        self.assertEqual(crib_values[4, 10], crib_values[10, 4])
+
+    def test_crib_values_exact_for_hand(self):
+        hand = (0, 4, 16, 17, 44, 48)
+        crib_values = cribbagedecisions.get_crib_values([card >> 2 for card in hand])
+        unseen = [card for card in range(cribbagecompact.DECK_SIZE) if card not in hand]
+
+        # Every opponent discard and cut from the cards left after the hand
+        total_points = 0.0
+        total_weight = 0
+        for opponent_discard in itertools.combinations(unseen, 2):
+            crib_ranks = [4, 4, opponent_discard[0] >> 2, opponent_discard[1] >> 2]
+            for cut in unseen:
+                if cut not in opponent_discard:
+                    total_points += cribbagecompact.score_ranks(tuple(sorted(crib_ranks
+                      + [cut >> 2]))) + 0.25 * crib_ranks.count(cribbagecompact.JACK_RANK)
+                    total_weight += 1
+
+        self.assertAlmostEqual(crib_values[4, 4], total_points / total_weight)
+
+    def test_pegging_loss(self):
+        oracle = DecisionOracle(rollouts=32)
+
+        # A five onto a ten makes fifteen
+        self.assertEqual(oracle.get_pegging_loss([16, 48], [9], False, 16), 0)
+        self.assertGreater(oracle.get_pegging_loss([16, 48], [9], False, 48), 1)
+        # Only one rank can be played, so there is no decision
+        self.assertIsNone(oracle.get_pegging_loss([16, 17], [], True, 16))
+
+    def test_analyze_archive(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            samples = cribbageselfplay.generate_selfplay(archive_dir, 2, processes=1)
+            report, computed_count = cribbagedecisions.analyze_archive(archive_dir, 1,
+              rollouts=16, chunk_rows=50)
+            parallel_report, _ = cribbagedecisions.analyze_archive(archive_dir, 2,
+              rollouts=16, chunk_rows=50)
+
+        self.assertEqual(report.totals, parallel_report.totals)
+        self.assertLessEqual(report.get_decision_count(), samples)
+        self.assertGreater(computed_count, 0)
+        rows = report.get_rows(["optimized", "optimized"])
+        self.assertEqual({(row[1], row[2]) for row in rows if row[2] == "all"},
+          {("discard", "all"), ("pegging", "all")})
+        # Every game deals six cards to each seat at least four times
+        self.assertTrue(all(row[3] >= 8 for row in rows if row[:3] == ("optimized", "discard",
+          "all")))
+        self.assertTrue(all(row[5] >= 0 for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Unit testing class for the hand score distributions
+"""
+
+from itertools import combinations
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagecompact
+import cribbagedistribution
+import cribbageengine
+from cribbageengine import CribbageEngine
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+
+class TestCribbageDistribution(unittest.TestCase):
+    def test_hand_score_distribution(self):
+        hand = cribbagecompact.cards_to_indices([
+          PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.FIVE, 5),
+          PlayingCard(Suit.HEART, Face.FIVE, 5),
+          PlayingCard(Suit.DIAMOND, Face.JACK, 10)])
+        start_card = PlayingCard(Suit.DIAMOND, Face.FIVE, 5)
+        dead_cards = cribbagecompact.cards_to_indices([
+          PlayingCard(Suit.CLUB, Face.KING, 10),
+          PlayingCard(Suit.CLUB, Face.ACE, 1)])
+
+        distribution = cribbagedistribution.hand_score_distribution(hand, dead_cards)
+
+        self.assertAlmostEqual(sum(distribution), 1.0)
+        self.assertAlmostEqual(distribution[29], 1 / 46)
+        self.assertAlmostEqual(cribbagedistribution.probability_of_at_least(distribution, 29),
+          1 / 46)
+
+        deck = CribbageEngine().get_deck_copy()
+        live_cuts = [card for card in deck
+          if cribbagecompact.card_to_index(card) not in set(hand) | set(dead_cards)]
+        expected_mean = sum(cribbageengine.calculate_score_for_hand(
+          [cribbagecompact.index_to_card(card) for card in hand], cut)
+          for cut in live_cuts) / len(live_cuts)
+        self.assertAlmostEqual(cribbagedistribution.distribution_mean(distribution),
+          expected_mean)
+        self.assertEqual(cribbagedistribution.get_hand_score_vector(hand)[
+          cribbagecompact.card_to_index(start_card)], 29)
+
+    def test_hand_score_table_matches_scoring(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            cards = rng.sample(range(cribbagecompact.DECK_SIZE), 5)
+            self.assertEqual(cribbagedistribution.get_hand_score_vector(cards[:4])[cards[4]],
+              cribbagecompact.score_hand(cards[:4], cards[4]))
+        self.assertEqual(cribbagedistribution.get_hand_score_vector([0, 1, 2, 3])[2],
+          cribbagedistribution.NOT_A_CUT)
+
+    def test_hand_score_distribution_without_live_cuts(self):
+        hand = list(range(4))
+
+        with self.assertRaises(ValueError):
+            cribbagedistribution.hand_score_distribution(hand,
+              range(4, cribbagecompact.DECK_SIZE))
+
+    def test_discard_score_distributions(self):
+        hand = list(range(0, 24, 4))
+
+        distributions = cribbagedistribution.discard_score_distributions(hand)
+
+        self.assertEqual(len(distributions), 15)
+        for discard, distribution in distributions:
+            self.assertEqual(len(discard), 2)
+            self.assertAlmostEqual(sum(distribution), 1.0)
+
+        with self.assertRaises(ValueError):
+            cribbagedistribution.discard_score_distributions(hand,
+              set(range(cribbagecompact.DECK_SIZE)) - set(hand))
+
+    def test_crib_score_distributions(self):
+        hand = [0, 5, 17, 22, 40, 51]
+        discard = [hand[position] for position in cribbagecompact.DISCARD_OPTIONS[3]]
+        unseen = [card for card in range(cribbagecompact.DECK_SIZE) if card not in hand]
+        counts = [0] * (cribbagedistribution.MAX_HAND_SCORE + 1)
+        for opponent_discard in combinations(unseen, 2):
+            for cut in unseen:
+                if cut not in opponent_discard:
+                    counts[cribbagecompact.score_hand(discard + list(opponent_discard), cut)] += 1
+
+        distributions = cribbagedistribution.crib_score_distributions(hand)
+
+        self.assertEqual(len(distributions), 15)
+        for score, count in enumerate(counts):
+            self.assertAlmostEqual(distributions[3][score], count / sum(counts))
+        with self.assertRaises(ValueError):
+            cribbagedistribution.crib_score_distributions(hand, unseen[2:])
+
+    def test_discard_score_vectors(self):
+        # Four fives and two jacks of one suit, then a flush with runs unsorted
+        for hand in ([19, 16, 17, 18, 40, 44], [48, 0, 8, 4, 16, 12], [2, 6, 10, 14, 42, 30]):
+            vectors = cribbagedistribution.get_discard_score_vectors(hand)
+
+            self.assertEqual(len(vectors), 15)
+            for keep_positions, hand_scores in zip(cribbagecompact.KEEP_OPTIONS, vectors):
+                self.assertEqual(hand_scores, cribbagedistribution.get_hand_score_vector(
+                  [hand[position] for position in keep_positions]))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
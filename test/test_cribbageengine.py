@@ -2,10 +2,14 @@
 Unit testing class for the the CribbageEngine
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import random
+import tracemalloc
 import unittest
 
 from cribbageai import cribbageengine
+from cribbageai.cribbageengine import CribbageGame
 from cribbageai.cribbageengine import PlayingCard
 from cribbageai.cribbageengine import Face
 from cribbageai.cribbageengine import Suit
@@ -200,5 +204,407 @@ class TestCribbageScoringEngine(unittest.TestCase):
         self.assertEqual(cribbageengine.calculate_score_for_hand(hand, start_card), 29)
 
 
+class TestCribbageScoringEvents(unittest.TestCase):
+    """
+    Unit Tests for the scoring event subscriptions in the Cribbage Engine
+    """
+    def setUp(self):
+        self.events = []
+
+    # pylint: disable=protected-access
+    def tearDown(self):
+        cribbageengine._scoring_event_subscribers.clear()
+
+    def test_hand_fifteen_events(self):
+        """ Tests that each 15 in (5,7,10,3,2) is published as an event """
+        cribbageengine.subscribe_scoring_event(
+          cribbageengine.ScoringEventType.FIFTEEN, self.events.append)
+        hand = [PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.DIAMOND, Face.SEVEN, 7),
+          PlayingCard(Suit.SPADE, Face.TEN, 10),
+          PlayingCard(Suit.SPADE, Face.THREE, 3)]
+        start_card = PlayingCard(Suit.SPADE, Face.TWO, 2)
+
+        self.assertEqual(cribbageengine.calculate_score_for_hand(hand, start_card), 6)
+        self.assertEqual(len(self.events), 3)
+        for event in self.events:
+            self.assertEqual(event.points, 2)
+            self.assertEqual(CribbageGame.get_cards_total_value(event.cards), 15)
+
+    def test_hand_events_sum_to_score(self):
+        """ Tests that all events for (5,5,5,J),(5) add up to the 29 hand """
+        for event_type in cribbageengine.ScoringEventType:
+            cribbageengine.subscribe_scoring_event(event_type, self.events.append)
+        hand = [PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.FIVE, 5),
+          PlayingCard(Suit.HEART, Face.FIVE, 5),
+          PlayingCard(Suit.DIAMOND, Face.JACK, 10)]
+        start_card = PlayingCard(Suit.DIAMOND, Face.FIVE, 5)
+
+        self.assertEqual(cribbageengine.calculate_score_for_hand(hand, start_card), 29)
+        self.assertEqual(sum(event.points for event in self.events), 29)
+
+    def test_run_play_events(self):
+        """ Tests that playing 4 onto (5,7,6) publishes a 4 card run """
+        cribbageengine.subscribe_scoring_event(
+          cribbageengine.ScoringEventType.RUN, self.events.append)
+        run = [PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.DIAMOND, Face.SEVEN, 7),
+          PlayingCard(Suit.SPADE, Face.SIX, 6)]
+        run_card = PlayingCard(Suit.SPADE, Face.FOUR, 4)
+
+        self.assertEqual(cribbageengine.calculate_score_for_run_play(run, run_card), 4)
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0].cards, tuple(run) + (run_card,))
+
+    def test_unsubscribe_clears_subscribers(self):
+        """ Tests that removing the last subscriber leaves the hot path idle """
+        cribbageengine.subscribe_scoring_event(
+          cribbageengine.ScoringEventType.PAIR, self.events.append)
+        cribbageengine.unsubscribe_scoring_event(
+          cribbageengine.ScoringEventType.PAIR, self.events.append)
+        run = [PlayingCard(Suit.CLUB, Face.FIVE, 5)]
+        run_card = PlayingCard(Suit.SPADE, Face.FIVE, 5)
+
+        self.assertEqual(cribbageengine.calculate_score_for_run_play(run, run_card), 2)
+        self.assertEqual(self.events, [])
+        self.assertFalse(cribbageengine._scoring_event_subscribers)
+    # pylint: enable=protected-access
+
+    def test_run_play_lookup_matches_events_path(self):
+        """ Tests the packed key lookup against the scorer used with subscribers """
+        cards = {face: [PlayingCard(suit, face, min(face.value, 10)) for suit in Suit]
+          for face in Face}
+        rng = random.Random(17)
+        runs = [[]]
+        for run in runs:
+            # Every run of up to three cards, then random runs up to 31
+            if len(run) < 3:
+                runs.extend(run + [face] for face in Face
+                  if run.count(face) < 4 and sum(min(f.value, 10) for f in run + [face]) <= 31)
+        while len(runs) < 8000:
+            run = []
+            while True:
+                face = rng.choice(list(Face))
+                if run.count(face) == 4 or sum(min(f.value, 10) for f in run + [face]) > 31:
+                    break
+                run.append(face)
+            runs.append(run)
+
+        plays = []
+        for run in runs:
+            run_cards = [cards[face][run[:index].count(face)] for index, face in enumerate(run)]
+            for face in Face:
+                run_card = cards[face][run.count(face)] if run.count(face) < 4 else None
+                if run_card and CribbageGame.get_cards_total_value(run_cards) \
+                  + run_card.value <= 31:
+                    plays.append((run_cards, run_card))
+
+        looked_up = [cribbageengine.calculate_score_for_run_play(*play) for play in plays]
+        cribbageengine.subscribe_scoring_event(
+          cribbageengine.ScoringEventType.GO, self.events.append)
+        scored = [cribbageengine.calculate_score_for_run_play(*play) for play in plays]
+
+        self.assertEqual(looked_up, scored)
+        self.assertIn(12, scored)
+
+
+class _LowestCardPlayer:
+    """Discards its two highest cards and pegs its lowest playable card."""
+    def start_round(self, is_dealer, player_score, opponent_score):
+        """Does nothing."""
+
+    def observe_start_card(self, start_card):
+        """Does nothing."""
+
+    def observe_run_play(self, is_player, run_card):
+        """Does nothing."""
+
+    def discard_to_crib(self, player_hand):
+        """Discards the two highest cards."""
+        return max(player_hand), max(player_hand - {max(player_hand)})
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Plays the lowest card."""
+        return min(card for card in player_run_hand
+          if run_total + card.value <= cribbageengine.HIGHEST_RUN_ALLOWED)
+
+class _HooklessPlayer:
+    """Only makes decisions, like players written before the optional hooks."""
+    def discard_to_crib(self, player_hand):
+        """Keeps the four lowest cards."""
+        return tuple(sorted(player_hand)[4:])
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Plays the lowest card."""
+        return min(card for card in player_run_hand
+          if run_total + card.value <= cribbageengine.HIGHEST_RUN_ALLOWED)
+
+def _play_game(cribbage_game):
+    """Plays a game to 121 and returns the scores."""
+    while max(cribbage_game.player_one_score, cribbage_game.player_two_score) < 121:
+        cribbage_game.deal_cards()
+        cribbage_game.discard_to_crib()
+        cribbage_game.cut_start_card()
+        while cribbage_game.is_more_run_cards():
+            cribbage_game.play_next_run_card()
+        cribbage_game.score_pone_hand()
+        cribbage_game.score_dealer_hand()
+        cribbage_game.score_dealer_crib()
+    return cribbage_game.player_one_score, cribbage_game.player_two_score
+
+class TestCribbageGameReuse(unittest.TestCase):
+    """
+    Unit Tests for resetting games and the bulk mode
+    """
+    def test_reset_replays_the_same_game(self):
+        """ Tests that a reset bulk game plays a seed the same as a new game """
+        cribbage_engine = cribbageengine.CribbageEngine()
+        random.seed(7)
+        scores = _play_game(cribbage_engine.new_game(_LowestCardPlayer(), _LowestCardPlayer()))
+
+        cribbage_game = cribbage_engine.new_game(_LowestCardPlayer(), _LowestCardPlayer(),
+          is_bulk=True)
+        _play_game(cribbage_game)
+        cribbage_game.reset()
+        random.seed(7)
+
+        self.assertEqual(_play_game(cribbage_game), scores)
+        self.assertEqual(len(cribbage_game.game_deck), 52 - 13)
+
+    def test_run_play_result(self):
+        """ Tests that the play result reads by key and is reused in bulk mode """
+        cribbage_game = cribbageengine.CribbageEngine().new_game(_LowestCardPlayer(),
+          _LowestCardPlayer(), is_bulk=True)
+        cribbage_game.deal_cards()
+        cribbage_game.discard_to_crib()
+        cribbage_game.cut_start_card()
+        first_result = cribbage_game.play_next_run_card()
+
+        self.assertFalse(first_result["is_go"])
+        self.assertEqual(first_result["run_total"], first_result.card_played.value)
+        self.assertIs(cribbage_game.play_next_run_card(), first_result)
+
+    def test_bulk_game_allocations(self):
+        """ Tests that a reused game allocates little and keeps nothing """
+        cribbage_game = cribbageengine.CribbageEngine().new_game(_LowestCardPlayer(),
+          _LowestCardPlayer(), is_bulk=True)
+        logging.disable(logging.INFO)
+        try:
+            # Fill the run play cache for the games
+            for seed in range(5):
+                random.seed(seed)
+                cribbage_game.reset()
+                _play_game(cribbage_game)
+            tracemalloc.start()
+            try:
+                # The first traced game grows the game's buffers
+                random.seed(3)
+                cribbage_game.reset()
+                _play_game(cribbage_game)
+                for seed in range(5):
+                    tracemalloc.reset_peak()
+                    base_size = tracemalloc.get_traced_memory()[0]
+                    random.seed(seed)
+                    cribbage_game.reset()
+                    _play_game(cribbage_game)
+                    size, peak_size = tracemalloc.get_traced_memory()
+
+                    self.assertLess(peak_size - base_size, 3 * 1024)
+                    self.assertLess(size - base_size, 2 * 1024)
+            finally:
+                tracemalloc.stop()
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+class _ContextPlayer(_LowestCardPlayer):
+    """Records the game context it is handed."""
+    def use_game_context(self, rng, logger):
+        """Keeps the rng and logger."""
+        self.rng = rng
+        self.logger = logger
+
+
+class TestCribbageGameContext(unittest.TestCase):
+    """
+    Unit Tests for games with their own rng and logger
+    """
+    def test_rng_replays_the_game(self):
+        """ Tests that a game's rng plays like the seeded random module """
+        cribbage_engine = cribbageengine.CribbageEngine()
+        random.seed(7)
+        scores = _play_game(cribbage_engine.new_game(_LowestCardPlayer(), _LowestCardPlayer()))
+
+        random.seed(1)
+        player = _ContextPlayer()
+        cribbage_game = cribbage_engine.new_game(player, _LowestCardPlayer(),
+          rng=random.Random(7))
+
+        self.assertIs(player.rng, cribbage_game.rng)
+        self.assertEqual(_play_game(cribbage_game), scores)
+
+        cribbage_game.reset(rng=random.Random(7))
+        self.assertEqual(_play_game(cribbage_game), scores)
+
+    def test_players_without_hooks(self):
+        """ Tests that players without the optional hooks still play """
+        cribbage_engine = cribbageengine.CribbageEngine()
+        scores = _play_game(cribbage_engine.new_game(_HooklessPlayer(), _HooklessPlayer(),
+          rng=random.Random(8)))
+        self.assertGreaterEqual(max(scores), 121)
+
+        cribbage_game = cribbage_engine.new_multiplayer_game(
+          [_HooklessPlayer() for _ in range(3)], rng=random.Random(8))
+        while not cribbage_game.is_won():
+            cribbage_game.deal_cards()
+            cribbage_game.discard_to_crib()
+            cribbage_game.cut_start_card()
+            while cribbage_game.is_more_run_cards():
+                cribbage_game.play_next_run_card()
+            cribbage_game.score_hands()
+        self.assertGreaterEqual(max(cribbage_game.scores), 121)
+
+    def test_game_logger(self):
+        """ Tests that a game logs to its own logger """
+        logger = logging.getLogger("test_cribbageengine.game")
+        player = _ContextPlayer()
+        cribbage_game = cribbageengine.CribbageEngine().new_game(player, _LowestCardPlayer(),
+          logger=logger)
+
+        self.assertIs(player.rng, random)
+        with self.assertLogs(logger, logging.INFO) as logs:
+            cribbage_game.deal_cards()
+        self.assertIn("Hands are dealt", logs.output[0])
+
+    def test_games_on_threads(self):
+        """ Tests that games on threads play the same as one after another """
+        def play_seed(seed):
+            return _play_game(cribbageengine.CribbageEngine().new_game(_LowestCardPlayer(),
+              _LowestCardPlayer(), rng=random.Random(seed)))
+
+        seeds = range(8)
+        with ThreadPoolExecutor(4) as executor:
+            self.assertEqual(list(executor.map(play_seed, seeds)),
+              [play_seed(seed) for seed in seeds])
+
+
+class _HighestDiscardPlayer(_LowestCardPlayer):
+    """Discards its highest cards, as many as the rules ask for."""
+    rules = cribbageengine.STANDARD_RULES
+
+    def use_rules(self, rules):
+        """Keeps the rules."""
+        self.rules = rules
+
+    def discard_to_crib(self, player_hand):
+        """Discards the highest cards."""
+        return tuple(sorted(player_hand)[-self.rules.discard_count:])
+
+
+class TestCribbageRules(unittest.TestCase):
+    """
+    Unit Tests for the rules variants
+    """
+    def test_rules_config(self):
+        """ Tests the precomputed deal plans and discard options """
+        rules = cribbageengine.THREE_PLAYER_RULES
+        self.assertEqual(len(rules.deal_plan), 16)
+        self.assertEqual(rules.deal_plan[:3], (1, 2, 3))
+        self.assertEqual(rules.deal_plan[-1], 0)
+        self.assertEqual(len(cribbageengine.FIVE_CARD_RULES.discard_options), 10)
+        self.assertEqual(cribbageengine.FIVE_CARD_RULES.keep_options[0], (2, 3, 4))
+        self.assertEqual(cribbageengine.RULES_VARIANTS["short"].winning_score, 61)
+
+        with self.assertRaises(ValueError):
+            cribbageengine.RulesConfig("bad", hand_size=5, discard_count=1)
+        with self.assertRaises(ValueError):
+            cribbageengine.CribbageEngine().new_game(_LowestCardPlayer(), _LowestCardPlayer(),
+              rules=rules)
+
+    def test_three_card_flush(self):
+        """ Tests that a three card hand flushes for three, or four with the start card """
+        hand = [PlayingCard(Suit.HEART, Face.TWO, 2), PlayingCard(Suit.HEART, Face.SIX, 6),
+          PlayingCard(Suit.HEART, Face.QUEEN, 10)]
+
+        self.assertEqual(cribbageengine.calculate_score_for_hand(hand,
+          PlayingCard(Suit.HEART, Face.ACE, 1)), 4)
+        self.assertEqual(cribbageengine.calculate_score_for_hand(hand,
+          PlayingCard(Suit.CLUB, Face.ACE, 1)), 3)
+
+    def test_five_card_game(self):
+        """ Tests the five card deal and the first pone's three points """
+        player = _HighestDiscardPlayer()
+        cribbage_game = cribbageengine.CribbageEngine().new_game(player, _HighestDiscardPlayer(),
+          rng=random.Random(3), rules=cribbageengine.FIVE_CARD_RULES)
+        cribbage_game.deal_cards()
+
+        self.assertIs(player.rules, cribbageengine.FIVE_CARD_RULES)
+        self.assertEqual(cribbage_game.player_two_score, 3)
+        self.assertEqual(len(cribbage_game.player_one_hand), 5)
+        cribbage_game.discard_to_crib()
+        self.assertEqual(len(cribbage_game.player_one_hand), 3)
+        self.assertEqual(len(cribbage_game.crib), 4)
+
+        while max(cribbage_game.player_one_score, cribbage_game.player_two_score) < 61:
+            cribbage_game.cut_start_card()
+            while cribbage_game.is_more_run_cards():
+                cribbage_game.play_next_run_card()
+            cribbage_game.score_pone_hand()
+            cribbage_game.score_dealer_hand()
+            cribbage_game.score_dealer_crib()
+            cribbage_game.deal_cards()
+            cribbage_game.discard_to_crib()
+        self.assertGreater(cribbage_game.round_count, 2)
+
+    def test_five_card_play_is_one_count(self):
+        """ Tests that the five card play ends at the first go or 31 """
+        cribbage_game = cribbageengine.CribbageEngine().new_game(_HighestDiscardPlayer(),
+          _HighestDiscardPlayer(), rng=random.Random(5), rules=cribbageengine.FIVE_CARD_RULES)
+        rounds_cut_short = 0
+        for _ in range(20):
+            cribbage_game.deal_cards()
+            cribbage_game.discard_to_crib()
+            cribbage_game.cut_start_card()
+            cards_played = 0
+            while cribbage_game.is_more_run_cards():
+                run_result = cribbage_game.play_next_run_card()
+                cards_played += not run_result.is_go
+                if run_result.run_total == 0:
+                    self.assertFalse(cribbage_game.is_more_run_cards())
+            rounds_cut_short += cards_played < 6
+            self.assertEqual(len(cribbage_game.player_one_hand), 3)
+            cribbage_game.score_pone_hand()
+            cribbage_game.score_dealer_hand()
+            cribbage_game.score_dealer_crib()
+        self.assertGreater(rounds_cut_short, 0)
+
+    def test_three_player_game(self):
+        """ Tests that a three player game deals, pegs every card and replays """
+        def play_game(seed):
+            cribbage_game = cribbageengine.CribbageEngine().new_multiplayer_game(
+              [_HighestDiscardPlayer() for _ in range(3)], rng=random.Random(seed))
+            while not cribbage_game.is_won():
+                cribbage_game.deal_cards()
+                self.assertEqual([len(hand) for hand in cribbage_game.hands], [5, 5, 5])
+                self.assertEqual(len(cribbage_game.crib), 1)
+                cribbage_game.discard_to_crib()
+                self.assertEqual(len(cribbage_game.crib), 4)
+                cribbage_game.cut_start_card()
+
+                run_cards = 0
+                while cribbage_game.is_more_run_cards():
+                    run_result = cribbage_game.play_next_run_card()
+                    run_cards += not run_result.is_go
+                    self.assertLessEqual(run_result.run_total, 31)
+                self.assertEqual(run_cards, 12)
+                cribbage_game.score_hands()
+            return cribbage_game.scores, cribbage_game.dealer
+
+        scores, dealer = play_game(4)
+        self.assertGreaterEqual(max(scores), 121)
+        self.assertEqual(play_game(4), (scores, dealer))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+"""
+Unit testing class for the human play hints and speculation
+"""
+
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageaicli
+import cribbagehints
+from cribbageengine import CribbageEngine
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+from cribbagehints import HumanPlayer
+from cribbagehints import SpeculativeBot
+from cribbagehints import SpeculativeJobs
+
+def _make_input(think_seconds=0):
+    """Makes an input function that discards the first two cards and tries
+    each card number in turn until one can be played."""
+    numbers = itertools.cycle(["h", "1", "2", "3", "4"])
+    def input_function(prompt):
+        time.sleep(think_seconds)
+        return "1 2" if "Discard" in prompt else next(numbers)
+    return input_function
+
+def _play_game(hint_budget, think_seconds):
+    """Plays a seeded game with the human as player one.
+
+    Returns:
+        (tuple) the scores
+        (int) the number of jobs run in the background
+    """
+    random.seed(5)
+    jobs = SpeculativeJobs(hint_budget)
+    bot = SpeculativeBot("optimized", jobs)
+    human = HumanPlayer(jobs, bot, _make_input(think_seconds), lambda *args: None)
+    cribbage_game = CribbageEngine().new_game(human, bot)
+    human.attach(cribbage_game, 1)
+    try:
+        return cribbageaicli.run_game(cribbage_game, False), jobs.run_count
+    finally:
+        jobs.close()
+
+class TestCribbageHints(unittest.TestCase):
+    def test_jobs_run_and_cancel(self):
+        jobs = SpeculativeJobs()
+        release = threading.Event()
+        try:
+            jobs.submit("blocked", release.wait)
+            jobs.submit("queued", pow, 2, 10)
+            jobs.submit("kept", pow, 3, 3)
+            jobs.cancel(keep=["kept"])
+            release.set()
+
+            self.assertEqual(jobs.get("kept"), 27)
+            self.assertIsNone(jobs.get("queued"))
+            self.assertEqual(jobs.get("queued", pow, 2, 4), 16)
+            self.assertEqual(jobs.cancelled_count, 2)
+        finally:
+            jobs.close()
+
+    def test_expired_jobs_run_when_asked(self):
+        jobs = SpeculativeJobs(budget=0)
+        try:
+            jobs.submit("late", pow, 2, 5)
+
+            self.assertEqual(jobs.get("late"), 32)
+            self.assertEqual(jobs.run_count, 0)
+        finally:
+            jobs.close()
+
+    def test_discard_hints(self):
+        jack = PlayingCard(Suit.CLUB, Face.JACK, 10)
+        king = PlayingCard(Suit.CLUB, Face.KING, 10)
+        hand = {PlayingCard(suit, Face.FIVE, 5) for suit in Suit} | {jack, king}
+
+        hints = cribbagehints.get_discard_hints(hand, False)
+
+        self.assertEqual(len(hints), 15)
+        self.assertEqual(set(hints[0][0]), {jack, king})
+        self.assertGreaterEqual(hints[0][1], hints[-1][1])
+
+    def test_pegging_hints(self):
+        five = PlayingCard(Suit.CLUB, Face.FIVE, 5)
+        hints = cribbagehints.get_pegging_hints({five, PlayingCard(Suit.CLUB, Face.KING, 10)},
+          [PlayingCard(Suit.HEART, Face.TEN, 10)], False)
+
+        # The five makes fifteen
+        self.assertEqual(hints[0][0], five)
+        self.assertEqual(len(hints), 2)
+
+    def test_speculated_game_matches_game_without(self):
+        scores, run_count = _play_game(0, 0)
+        speculated_scores, speculated_run_count = _play_game(60, 0.01)
+
+        self.assertGreaterEqual(max(scores), 121)
+        self.assertEqual(speculated_scores, scores)
+        self.assertEqual(run_count, 0)
+        self.assertGreater(speculated_run_count, 20)
+
+    def test_play_human_game(self):
+        random.seed(6)
+        scores = cribbageaicli.play_human_game(CribbageEngine(), "random",
+          human_seat=2, input_function=_make_input())
+
+        self.assertGreaterEqual(max(scores), 121)
+
+
+if __name__ == '__main__':
+    unittest.main()
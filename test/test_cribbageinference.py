@@ -0,0 +1,90 @@
+"""
+Unit testing class for the opponent hand inference
+"""
+
+from itertools import combinations
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageaicli
+import cribbageinference
+from cribbageengine import CribbageEngine
+from cribbageinference import InferencePlayer
+from cribbageinference import OpponentHandTracker
+from cribbageplayers import OptimizedPlayer
+
+class TestCribbageInference(unittest.TestCase):
+    def setUp(self):
+        # Aces through sixes of clubs dealt to the player, the king of spades cut
+        self.own_cards = [0, 4, 8, 12, 16, 20]
+        self.start_card = 51
+
+    def test_posterior_matches_enumeration(self):
+        tracker = OpponentHandTracker(cribbageinference.uniform_discard_model)
+        tracker.reset(self.own_cards, True)
+        tracker.observe_seen_card(self.start_card)
+        # The opponent plays the seven of hearts onto 20, then says go at 27
+        tracker.observe_opponent_card(26)
+        tracker.observe_opponent_go(27)
+
+        unseen = [card for card in range(52) if card not in self.own_cards + [self.start_card, 26]]
+        hands = [hand for hand in combinations(unseen, 3)
+          if all(cribbageinference.CARD_VALUES[card] > 4 for card in hand)]
+        expected = np.zeros(52)
+        for hand in hands:
+            expected[list(hand)] += 1 / len(hands)
+
+        self.assertEqual(tracker.get_hand_count(), len(hands))
+        np.testing.assert_allclose(tracker.get_card_probabilities(), expected)
+        self.assertEqual(tracker.get_rank_probabilities()[:4].tolist(), [0, 0, 0, 0])
+
+    def test_gathering_order(self):
+        lazy_tracker = OpponentHandTracker()
+        lazy_tracker.reset(self.own_cards, False)
+        lazy_tracker.observe_seen_card(self.start_card)
+        lazy_tracker.observe_opponent_card(40)
+
+        eager_tracker = OpponentHandTracker()
+        eager_tracker.reset(self.own_cards, False)
+        self.assertEqual(eager_tracker.get_hand_count(), 163185)
+        eager_tracker.observe_seen_card(self.start_card)
+        eager_tracker.observe_opponent_card(40)
+
+        np.testing.assert_array_equal(lazy_tracker.hands, eager_tracker.hands)
+        np.testing.assert_allclose(lazy_tracker.get_card_probabilities(),
+          eager_tracker.get_card_probabilities())
+        ranks = lazy_tracker.sample_ranks(10, np.random.default_rng(1))
+        self.assertEqual(ranks.shape, (10, 4))
+        self.assertTrue(((ranks == -1).sum(axis=1) == 1).all())
+
+    def test_discard_model_prefers_good_hands(self):
+        model = cribbageinference.make_rank_score_discard_model()
+        weights = model(np.array([[16, 17, 18, 43], [0, 9, 26, 47]]), False)
+
+        self.assertGreater(weights[0], weights[1])
+
+    def test_game_against_optimized(self):
+        random.seed(3)
+        players = (InferencePlayer(rng=np.random.default_rng(3)), OptimizedPlayer())
+
+        scores = cribbageaicli.run_game(CribbageEngine().new_game(*players), False)
+
+        self.assertGreaterEqual(max(scores), 121)
+        self.assertLessEqual(len(players[0].tracker.played_cards), 4)
+
+    def test_seeded_game_replays(self):
+        games = [CribbageEngine().new_game(InferencePlayer(samples=20), OptimizedPlayer(),
+          rng=random.Random(4)) for _ in range(2)]
+
+        first_scores, second_scores = (cribbageaicli.run_game(game, False) for game in games)
+
+        self.assertEqual(first_scores, second_scores)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Unit testing class for the league ratings and scheduler
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageleague
+from cribbageleague import BradleyTerryRatings
+from cribbageleague import League
+from cribbagetournament import TournamentResult
+
+class TestCribbageLeague(unittest.TestCase):
+    def test_ratings(self):
+        ratings = BradleyTerryRatings(3)
+        ratings.add_result(0, 1, 30, 10)
+        elo = ratings.get_ratings()
+        lows, highs = ratings.get_intervals()
+
+        self.assertGreater(elo[0], elo[2])
+        self.assertGreater(elo[2], elo[1])
+        self.assertAlmostEqual(elo.mean(), cribbageleague.ELO_BASE)
+        self.assertTrue(((lows < elo) & (elo < highs)).all())
+        self.assertLess(ratings.get_order_doubt(0, 1), ratings.get_order_doubt(0, 2))
+
+        # Refitting from the last fit gives the same strengths
+        strengths = ratings.strengths.copy()
+        ratings.fit()
+        self.assertTrue(abs(ratings.strengths - strengths).max() < 1e-6)
+
+    def test_even_results_rate_equally(self):
+        ratings = BradleyTerryRatings(2)
+        ratings.add_result(0, 1, 20, 20)
+
+        self.assertAlmostEqual(ratings.get_ratings()[0], ratings.get_ratings()[1])
+        self.assertAlmostEqual(ratings.get_order_doubt(0, 1), 0.5)
+
+    def test_choose_pairing(self):
+        league = League(["a", "b", "c"], batch_games=10, max_games=30)
+        self.assertEqual(league.choose_pairing(), (0, 1))
+        self.assertEqual(league.choose_pairing(busy={(0, 1)}), (0, 2))
+
+        league.get_batch((0, 1))
+        league.add_batch((0, 1), TournamentResult(10, [10, 0], [1210, 800]))
+        self.assertEqual(league.get_batch((0, 2)), (["a", "c"], 1, 10))
+        league.add_batch((0, 2), TournamentResult(10, [5, 5], [1100, 1100]))
+
+        # The even pair is least certain, but the league is out of games
+        self.assertEqual(league.get_total_games(), 20)
+        self.assertEqual(league.choose_pairing(), (0, 2))
+        league.get_batch((0, 2))
+        self.assertIsNone(league.choose_pairing())
+
+    def test_run_league(self):
+        league = cribbageleague.run_league(["random", "optimized"], max_games=40, processes=1,
+          batch_games=10)
+        standings = league.get_standings()
+
+        self.assertLessEqual(league.get_total_games(), 40)
+        self.assertEqual([row[0] for row in standings], ["optimized", "random"])
+        self.assertEqual(standings[0][4], league.get_total_games())
+        with self.assertRaises(ValueError):
+            League(["random"])
+
+
+if __name__ == '__main__':
+    unittest.main()
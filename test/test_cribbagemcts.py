@@ -0,0 +1,102 @@
+"""
+Unit testing class for the Monte Carlo tree search player
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageaicli
+import cribbagecompact
+import cribbageengine
+from cribbagemcts import MctsPlayer
+from cribbagemcts import ucb_search
+from cribbageengine import CribbageEngine
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+from cribbageplayers import OptimizedPlayer
+
+class TestCribbageMcts(unittest.TestCase):
+    def test_ucb_search_prefers_best_arm(self):
+        rewards = [1.0, 5.0, 2.0]
+        best_arm, visits, _ = ucb_search(3, lambda arm: rewards[arm], 200, exploration=1.0)
+
+        self.assertEqual(best_arm, 1)
+        self.assertGreater(visits[1], visits[0] + visits[2])
+
+    def test_discard_keeps_four_fives(self):
+        player = MctsPlayer(max_rollouts=300, rng=random.Random(3))
+        player.start_round(False, 0, 0)
+        player_hand = {
+          PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.FIVE, 5),
+          PlayingCard(Suit.HEART, Face.FIVE, 5),
+          PlayingCard(Suit.DIAMOND, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.ACE, 1),
+          PlayingCard(Suit.HEART, Face.NINE, 9)}
+
+        discards = player.discard_to_crib(player_hand)
+
+        self.assertEqual(set(discards), {PlayingCard(Suit.SPADE, Face.ACE, 1),
+          PlayingCard(Suit.HEART, Face.NINE, 9)})
+        self.assertEqual(len(player_hand), 4)
+
+    def test_pegging_worlds_follow_observed_plays(self):
+        player = MctsPlayer(max_rollouts=100, rng=random.Random(4))
+        player.start_round(True, 0, 0)
+        player_hand = {PlayingCard(Suit.CLUB, face, face.value if face.value < 10 else 10)
+          for face in (Face.ACE, Face.THREE, Face.FIVE, Face.SEVEN, Face.NINE, Face.KING)}
+        player.discard_to_crib(player_hand)
+        start_card = PlayingCard(Suit.HEART, Face.TWO, 2)
+        opponent_card = PlayingCard(Suit.SPADE, Face.QUEEN, 10)
+
+        player.observe_start_card(start_card)
+        player.observe_run_play(False, opponent_card)
+        player.observe_run_play(False, None)
+        worlds = player._get_pegging_worlds()  # pylint: disable=protected-access
+
+        self.assertGreaterEqual(len(worlds), 32)
+        for world in worlds:
+            self.assertIn(cribbagecompact.card_to_index(opponent_card), world)
+            self.assertNotIn(cribbagecompact.card_to_index(start_card), world)
+        self.assertFalse(player._go_caller)  # pylint: disable=protected-access
+
+        player.observe_run_play(True, None)
+        self.assertIsNone(player._go_caller)  # pylint: disable=protected-access
+
+    def test_full_game(self):
+        random.seed(5)
+        cribbage_game = CribbageEngine().new_game(
+          MctsPlayer(max_rollouts=60, pegging_rollouts=20, rng=random.Random(5)),
+          OptimizedPlayer())
+
+        player_one_score, player_two_score = cribbageaicli.run_game(cribbage_game, False)
+
+        self.assertTrue(max(player_one_score, player_two_score) >= 121)
+
+    def test_variant_games(self):
+        five_card_game = CribbageEngine().new_game(
+          MctsPlayer(max_rollouts=60, pegging_rollouts=20), OptimizedPlayer(),
+          rng=random.Random(6), rules=cribbageengine.FIVE_CARD_RULES)
+
+        self.assertGreaterEqual(max(cribbageaicli.run_game(five_card_game, False)), 61)
+
+        three_player_game = CribbageEngine().new_multiplayer_game(
+          [MctsPlayer(max_rollouts=60, pegging_rollouts=20), OptimizedPlayer(),
+          OptimizedPlayer()], rng=random.Random(6))
+        while not three_player_game.is_won():
+            three_player_game.deal_cards()
+            three_player_game.discard_to_crib()
+            three_player_game.cut_start_card()
+            while three_player_game.is_more_run_cards():
+                three_player_game.play_next_run_card()
+            three_player_game.score_hands()
+
+        self.assertGreaterEqual(max(three_player_game.scores), 121)
+
+
+if __name__ == '__main__':
+    unittest.main()
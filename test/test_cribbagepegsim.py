@@ -0,0 +1,90 @@
+"""
+Unit testing class for the vectorized pegging simulator
+"""
+
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagecompact
+import cribbageengine
+import cribbagepegsim
+from cribbageplayers import RandomPlayer
+
+class _ScriptedPlayer(RandomPlayer):
+    """Plays a card of each rank in the order given by the script."""
+    def __init__(self, script):
+        self.script = list(script)
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        rank = self.script.pop(0)
+        return min(card for card in player_run_hand if card.face.value - 1 == rank)
+
+class TestCribbagePegSim(unittest.TestCase):
+    def setUp(self):
+        self.deck = sorted(cribbageengine.CribbageEngine().get_deck_copy())
+
+    def test_score_plays_matches_engine(self):
+        rng = random.Random(17)
+        for _ in range(500):
+            cards = rng.sample(self.deck, rng.randint(1, 8))
+            run = cards[:-1]
+            if cribbageengine.CribbageGame.get_cards_total_value(cards) > 31:
+                continue
+            batch = cribbagepegsim.PeggingBatch(np.full((1, 2, 4), -1), 0,
+              [card.face.value - 1 for card in run])
+            points = batch.score_plays(np.array([0]), np.array([cards[-1].face.value - 1]))
+
+            self.assertEqual(points[0],
+              cribbageengine.calculate_score_for_run_play(run, cards[-1]))
+
+    def test_random_plays_match_game(self):
+        rng = random.Random(19)
+        card_hands = []
+        first_turns = []
+        for _ in range(300):
+            cards = rng.sample(self.deck, 8)
+            card_hands.append((cards[:4], cards[4:]))
+            first_turns.append(rng.randint(0, 1))
+
+        batch = cribbagepegsim.simulate_pegging(
+          cribbagepegsim.hands_from_cards(card_hands), np.array(first_turns),
+          cribbagepegsim.make_random_policy(np.random.default_rng(19)))
+
+        cribbage_engine = cribbageengine.CribbageEngine()
+        for game, hands in enumerate(card_hands):
+            plays = batch.plays[game, :batch.play_count[game]]
+            seats = batch.play_seats[game, :batch.play_count[game]]
+            cribbage_game = cribbage_engine.new_game(
+              _ScriptedPlayer(plays[seats == 0]), _ScriptedPlayer(plays[seats == 1]))
+            cribbage_game.player_one_run_hand = set(hands[0])
+            cribbage_game.player_two_run_hand = set(hands[1])
+            cribbage_game.run_turn = first_turns[game] + 1
+            while cribbage_game.is_more_run_cards():
+                cribbage_game.play_next_run_card()
+
+            self.assertEqual(list(batch.points[game]),
+              [cribbage_game.player_one_score, cribbage_game.player_two_score])
+
+    def test_greedy_policy_matches_compact(self):
+        hands = cribbagepegsim.deal_random_hands(200, np.random.default_rng(23))
+        batch = cribbagepegsim.simulate_pegging(hands, 0, cribbagepegsim.greedy_policy)
+
+        for game in range(200):
+            compact_hands = [[int(rank) * 4 for rank in hands[game, seat]] for seat in (0, 1)]
+            for seat in (0, 1):
+                for position in range(1, 4):
+                    if compact_hands[seat][position] >> 2 == compact_hands[seat][position - 1] >> 2:
+                        compact_hands[seat][position] = compact_hands[seat][position - 1] + 1
+            points = cribbagecompact.play_pegging(compact_hands, 0,
+              cribbagecompact.choose_greedy_card)
+
+            self.assertEqual(list(batch.points[game]), points)
+
+
+if __name__ == '__main__':
+    unittest.main()
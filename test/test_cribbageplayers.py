@@ -4,12 +4,15 @@ Unit testing class for the the CribbageEngine
 
 import logging
 import os
+import random
 import sys
 import unittest
 
 # This seems like a hack, but I couldn't figure out how to avoid ModuleNotFound
 sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageengine
 from cribbageplayers import OptimizedPlayer
+from cribbageplayers import RandomPlayer
 from cribbageengine import CribbageEngine
 from cribbageengine import CribbageGame
 from cribbageengine import PlayingCard
@@ -44,6 +47,45 @@ class TestCribbagePlayers(unittest.TestCase):
 
         self.assertEqual(expected_card, selected_card)
 
+    def test_run_selection_pegging_weights(self):
+        three = PlayingCard(Suit.CLUB, Face.THREE, 3)
+        four = PlayingCard(Suit.CLUB, Face.FOUR, 4)
+        run = [PlayingCard(Suit.CLUB, Face.TWO, 2)]
+
+        # Leaving a five is penalized by default
+        self.assertEqual(OptimizedPlayer().get_run_card([three, four], run, 2), four)
+        self.assertEqual(OptimizedPlayer((0.5, 1.0, -0.3, 0.5, 0.0)).get_run_card(
+          [three, four], run, 2), three)
+
+    def test_random_run_card(self):
+        player = RandomPlayer()
+        player.use_game_context(random.Random(2), logging.getLogger())
+        player_run_hand = {PlayingCard(Suit.CLUB, Face.THREE, 3),
+          PlayingCard(Suit.HEART, Face.SIX, 6), PlayingCard(Suit.SPADE, Face.KING, 10)}
+
+        played = {player.get_run_card(player_run_hand, [], 25) for _ in range(40)}
+
+        # Any card that stays at or under 31, not always the lowest
+        self.assertEqual(played, {PlayingCard(Suit.CLUB, Face.THREE, 3),
+          PlayingCard(Suit.HEART, Face.SIX, 6)})
+        self.assertIsNone(player.get_run_card(player_run_hand, [], 29))
+
+    def test_discard_for_variant_rules(self):
+        hand = {PlayingCard(Suit.CLUB, Face.FIVE, 5), PlayingCard(Suit.HEART, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.TEN, 10), PlayingCard(Suit.CLUB, Face.ACE, 1),
+          PlayingCard(Suit.DIAMOND, Face.EIGHT, 8)}
+        player = OptimizedPlayer()
+        player.use_rules(cribbageengine.FIVE_CARD_RULES)
+
+        discards = player.discard_to_crib(hand)
+
+        self.assertEqual(len(discards), 2)
+        self.assertEqual(hand, {PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.HEART, Face.FIVE, 5), PlayingCard(Suit.SPADE, Face.TEN, 10)})
+
+        player.use_rules(cribbageengine.THREE_PLAYER_RULES)
+        self.assertEqual(len(RandomPlayer.discard_to_crib(player, set(discards) | hand)), 1)
+
     def test_discard_to_crib(self):
         player = OptimizedPlayer()
         player_hand = [
@@ -57,6 +99,5 @@ class TestCribbagePlayers(unittest.TestCase):
         player.discard_to_crib(player_hand)
 
 
-
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Unit testing class for the memory mapped replay buffer
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagereplay
+from cribbagereplay import ReplayBuffer
+
+class TestCribbageReplay(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "replay")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _append_rows(self, replay_buffer, first, count):
+        for row in range(first, first + count):
+            replay_buffer.append(np.full(3, row), (row, -1), float(row), np.full(3, row + 1),
+              False)
+
+    def test_ring_overwrites_oldest(self):
+        replay_buffer = ReplayBuffer(self.directory, capacity=8, state_width=3)
+        self._append_rows(replay_buffer, 0, 10)
+
+        self.assertEqual(len(replay_buffer), 8)
+        self.assertEqual(replay_buffer.get_appended_count(), 10)
+        self.assertEqual(sorted(replay_buffer.rewards), list(range(2, 10)))
+        replay_buffer.close()
+
+    def test_persists_between_opens(self):
+        replay_buffer = ReplayBuffer(self.directory, capacity=8, state_width=3)
+        self._append_rows(replay_buffer, 0, 5)
+        replay_buffer.close()
+
+        replay_buffer = ReplayBuffer(self.directory)
+        self.assertEqual(len(replay_buffer), 5)
+        self.assertEqual(replay_buffer.capacity, 8)
+        np.testing.assert_array_equal(replay_buffer.next_states[4], [5, 5, 5])
+        replay_buffer.close()
+
+    def test_open_missing_buffer(self):
+        with self.assertRaises(ValueError):
+            ReplayBuffer(self.directory)
+
+    def test_reopen_with_other_shape(self):
+        ReplayBuffer(self.directory, capacity=8, state_width=3, alpha=0.5).close()
+
+        with self.assertRaises(ValueError):
+            ReplayBuffer(self.directory, state_width=4)
+        with self.assertRaises(ValueError):
+            ReplayBuffer(self.directory, alpha=1.0)
+        replay_buffer = ReplayBuffer(self.directory, state_width=3)
+        self.assertEqual(replay_buffer.alpha, 0.5)
+        replay_buffer.close()
+
+    def test_prioritized_sample(self):
+        replay_buffer = ReplayBuffer(self.directory, capacity=8, state_width=3, alpha=1.0)
+        self._append_rows(replay_buffer, 0, 4)
+        replay_buffer.update_priorities([2], [100.0])
+
+        batch = replay_buffer.sample(200, np.random.default_rng(1), prioritized=True)
+
+        self.assertGreater((batch["indices"] == 2).sum(), 150)
+        np.testing.assert_array_equal(batch["rewards"], batch["indices"])
+        self.assertAlmostEqual(float(batch["weights"].max()), 1.0)
+        self.assertAlmostEqual(float(batch["weights"][batch["indices"] == 2][0]), 100 ** -0.4, 5)
+        replay_buffer.close()
+
+    def test_prioritized_sample_matches_priorities(self):
+        replay_buffer = ReplayBuffer(self.directory, capacity=13, state_width=3, alpha=0.5)
+        self._append_rows(replay_buffer, 0, 20)
+        priorities = np.arange(1, 14, dtype=np.float32)
+        replay_buffer.update_priorities(np.arange(13), priorities)
+        replay_buffer.close()
+
+        # A reopened buffer samples from the same tree
+        replay_buffer = ReplayBuffer(self.directory)
+        batch = replay_buffer.sample(100000, np.random.default_rng(2), prioritized=True)
+
+        expected = np.sqrt(priorities) / np.sqrt(priorities).sum()
+        np.testing.assert_allclose(np.bincount(batch["indices"], minlength=13) / 100000,
+          expected, atol=0.01)
+        np.testing.assert_allclose(batch["weights"][batch["indices"] == 12][0],
+          (expected[12] / expected[0]) ** -0.4, rtol=1e-5)
+        replay_buffer.close()
+
+    def test_fill_from_worker_processes(self):
+        transition_count = cribbagereplay.fill_replay_buffer(self.directory, 2, capacity=4096,
+          processes=2)
+
+        replay_buffer = ReplayBuffer(self.directory)
+        self.assertEqual(len(replay_buffer), transition_count)
+        # Each game ends once for each player, with one win and one loss
+        self.assertEqual(replay_buffer.dones[:transition_count].sum(), 4)
+        self.assertEqual(replay_buffer.rewards[:transition_count].sum(), 0.0)
+        replay_buffer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
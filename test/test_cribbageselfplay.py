@@ -0,0 +1,135 @@
+"""
+Unit testing class for the self-play training data generator
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageaicli
+import cribbageselfplay
+from cribbageengine import CribbageEngine
+from cribbageengine import Face
+from cribbageengine import PlayingCard
+from cribbageengine import Suit
+from cribbageplayers import OptimizedPlayer
+from cribbageselfplay import GrowableNpyArray
+from cribbageselfplay import RecordingPlayer
+
+class _ScoreWatchingPlayer(OptimizedPlayer):
+    """Notes the game's scores at each pegging decision."""
+    def __init__(self, seat):
+        self.seat = seat
+        self.game = None
+        self.scores = []
+        self.rng_seen = None
+
+    def use_game_context(self, rng, logger):
+        """Keeps the rng to check it was forwarded."""
+        super().use_game_context(rng, logger)
+        self.rng_seen = rng
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        """Notes the scores, then plays like OptimizedPlayer."""
+        scores = (self.game.player_one_score, self.game.player_two_score)
+        self.scores.append([scores[self.seat], scores[1 - self.seat]])
+        return super().get_run_card(player_run_hand, run, run_total)
+
+class TestCribbageSelfPlay(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_growable_array_grows_in_chunks(self):
+        path = os.path.join(self.temp_dir.name, "rows.npy")
+        writer = GrowableNpyArray(path, np.int16, (3,), chunk_rows=4)
+        expected = np.arange(30, dtype=np.int16).reshape(10, 3)
+        writer.append(expected[:3])
+        writer.append(expected[3:])
+
+        self.assertEqual(writer.capacity, 12)
+        writer.close()
+
+        rows = np.load(path, mmap_mode="r")
+        self.assertEqual(rows.shape, (10, 3))
+        np.testing.assert_array_equal(rows, expected)
+
+    def test_generate_shard(self):
+        samples = cribbageselfplay.generate_selfplay(self.temp_dir.name, 2, processes=1,
+          chunk_rows=64)
+
+        features_path, actions_path, outcomes_path = cribbageselfplay.get_shard_paths(
+          self.temp_dir.name, 0)
+        features = np.load(features_path, mmap_mode="r")
+        actions = np.load(actions_path, mmap_mode="r")
+        outcomes = np.load(outcomes_path, mmap_mode="r")
+
+        self.assertEqual(features.shape, (samples, cribbageselfplay.FEATURE_WIDTH))
+        self.assertEqual(len(actions), samples)
+        self.assertEqual(len(outcomes), samples)
+
+        is_discard = features[:, 0] == cribbageselfplay.DISCARD_DECISION
+        self.assertTrue(is_discard.any() and (~is_discard).any())
+        # Every discard is two cards out of the six card hand
+        for feature, action in zip(features[is_discard], actions[is_discard]):
+            self.assertTrue(set(action) <= set(feature[4:10]))
+        # Each game has exactly one winner
+        for game in (0, 1):
+            winners = set(outcomes[outcomes[:, 2] == game][:, 0])
+            self.assertEqual(winners, {0, 1})
+            self.assertEqual(set(outcomes[outcomes[:, 2] == game][:, 3]), {0, 1})
+
+    def test_pegging_rows_follow_the_scores(self):
+        watching_players = [_ScoreWatchingPlayer(seat) for seat in (0, 1)]
+        recording_players = [RecordingPlayer(player) for player in watching_players]
+        rng = random.Random(4)
+        cribbage_game = CribbageEngine().new_game(*recording_players, rng=rng)
+        for watching_player in watching_players:
+            watching_player.game = cribbage_game
+
+        cribbageaicli.run_game(cribbage_game, False)
+
+        score_columns = slice(cribbageselfplay.FEATURE_COLUMNS.index("player_score"),
+          cribbageselfplay.FEATURE_COLUMNS.index("opponent_score") + 1)
+        for watching_player, recording_player in zip(watching_players, recording_players):
+            self.assertIs(watching_player.rng_seen, rng)
+            pegging_rows = [feature for feature in recording_player.features
+              if feature[0] == cribbageselfplay.PEGGING_DECISION]
+            self.assertEqual([feature[score_columns] for feature in pegging_rows],
+              watching_player.scores)
+
+    def test_pegging_rows_follow_the_go(self):
+        recording_player = RecordingPlayer(OptimizedPlayer())
+        recording_player.start_round(True, 10, 20)
+        recording_player.observe_run_play(False, PlayingCard(Suit.CLUB, Face.TEN, 10))
+        recording_player.observe_run_play(True, PlayingCard(Suit.CLUB, Face.KING, 10))
+        recording_player.observe_run_play(False, PlayingCard(Suit.HEART, Face.FIVE, 5))
+        recording_player.observe_run_play(True, None)
+
+        recording_player.get_run_card({PlayingCard(Suit.SPADE, Face.ACE, 1)}, [], 25)
+
+        feature = recording_player.features[-1]
+        # The opponent pegs one for the go, which the player called
+        self.assertEqual(feature[2:4], [10, 21])
+        self.assertEqual(feature[-2:], [0, 1])
+
+    def test_game_numbers_are_unique_across_shards(self):
+        cribbageselfplay.generate_selfplay(self.temp_dir.name, 5, processes=2, chunk_rows=64)
+
+        shard_games = []
+        for shard in (0, 1):
+            outcomes = np.load(cribbageselfplay.get_shard_paths(self.temp_dir.name, shard)[2])
+            shard_games.append(set(outcomes[:, 2].tolist()))
+
+        self.assertEqual(shard_games, [{0, 1, 2}, {3, 4}])
+
+
+if __name__ == '__main__':
+    unittest.main()
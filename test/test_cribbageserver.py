@@ -0,0 +1,149 @@
+"""
+Unit testing class for the asyncio game server
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagecompact
+import cribbageinference
+import cribbageserver
+from cribbageserver import GameServer
+from cribbageserver import HttpClient
+
+class _ProbabilityInferencePlayer(cribbageinference.InferencePlayer):
+    """Records the opponent card probabilities when asked for a run card."""
+    probabilities = None
+
+    def get_run_card(self, player_run_hand, run, run_total):
+        _ProbabilityInferencePlayer.probabilities = self.tracker.get_card_probabilities()
+        return super().get_run_card(player_run_hand, run, run_total)
+
+class TestCribbageServer(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+
+    def test_human_game_over_http(self):
+        async def play():
+            game_server = GameServer(ProcessPoolExecutor(1))
+            port = await game_server.start(port=0)
+            latencies = []
+            try:
+                await cribbageserver.play_load_test_game("127.0.0.1", port, "optimized",
+                  latencies, random.Random(1))
+                client = HttpClient("127.0.0.1", port)
+                status, stats = await client.request("GET", "/stats")
+                await client.close()
+            finally:
+                await game_server.stop()
+            return latencies, status, stats
+
+        latencies, status, stats = asyncio.run(play())
+
+        self.assertGreater(len(latencies), 10)
+        self.assertEqual(status, 200)
+        self.assertEqual(stats["games"], 0)
+
+    def test_rejects_bad_moves(self):
+        async def play():
+            game_server = GameServer(ThreadPoolExecutor(1))
+            created = await game_server.handle_request("POST", "/games",
+              {"players": ["human", "random"]})
+            path = f"/games/{created[1]['game_id']}"
+            hand = created[1]["hands"]["1"]
+            results = [created,
+              await game_server.handle_request("POST", f"{path}/move",
+                {"seat": 2, "cards": hand[:2]}),
+              await game_server.handle_request("POST", f"{path}/move",
+                {"seat": 1, "cards": [hand[0], hand[0]]}),
+              await game_server.handle_request("POST", f"{path}/move", {"seat": 1}),
+              await game_server.handle_request("GET", "/games/unknown", None),
+              await game_server.handle_request("POST", "/games", {"players": ["human"]}),
+              await game_server.handle_request("POST", f"{path}/move",
+                {"seat": 1, "cards": hand[:2]})]
+            game_server._bot_executor.shutdown()
+            return results
+
+        results = asyncio.run(play())
+
+        self.assertEqual([status for status, _ in results], [200, 400, 400, 400, 404, 400, 200])
+        self.assertEqual(results[0][1]["waiting_for"], [1])
+        self.assertEqual(results[-1][1]["phase"], "pegging")
+
+    def test_rejects_malformed_bodies(self):
+        async def request_all():
+            game_server = GameServer(ThreadPoolExecutor(1))
+            results = [await game_server.handle_request("POST", "/games", body)
+              for body in ([1, 2], {"players": 5}, {"players": None},
+              {"players": [{}, "random"]}, "human")]
+            results.append(await game_server.handle_request("POST", "/analyze",
+              {"queries": 5}))
+            game_server._bot_executor.shutdown()
+            return results
+
+        results = asyncio.run(request_all())
+
+        self.assertEqual([status for status, _ in results], [400] * 6)
+        self.assertTrue(all("error" in response for _, response in results))
+
+    def test_rebuilt_inference_bot_knows_its_deal(self):
+        dealt_cards = [cribbagecompact.index_to_card(card) for card in (0, 5, 18, 27, 40, 49)]
+        cribbageserver.BOT_PLAYERS["probability"] = _ProbabilityInferencePlayer
+        try:
+            cribbageserver.decide_bot_move("probability", (False, 0, 0), [], dealt_cards[:4],
+              [], 0, cribbagecompact.index_to_card(51), tuple(dealt_cards))
+        finally:
+            del cribbageserver.BOT_PLAYERS["probability"]
+
+        probabilities = _ProbabilityInferencePlayer.probabilities
+        self.assertEqual([probabilities[card] for card in (0, 5, 18, 27, 40, 49, 51)], [0] * 7)
+        self.assertAlmostEqual(probabilities.sum(), 4)
+
+    def test_bot_game_and_idle_eviction(self):
+        async def play():
+            game_server = GameServer(ThreadPoolExecutor(1), idle_timeout=10)
+            _, state = await game_server.handle_request("POST", "/games",
+              {"players": ["optimized", "tabular"]})
+            game_server.evict_idle(game_server.sessions[state["game_id"]].last_active + 5)
+            session_count = len(game_server.sessions)
+            game_server.evict_idle(game_server.sessions[state["game_id"]].last_active + 11)
+            game_server._bot_executor.shutdown()
+            return state, session_count, len(game_server.sessions)
+
+        state, session_count, evicted_session_count = asyncio.run(play())
+
+        self.assertEqual(state["phase"], "finished")
+        self.assertGreaterEqual(max(state["scores"]), 121)
+        self.assertEqual((session_count, evicted_session_count), (1, 0))
+
+    def test_analyze(self):
+        async def analyze():
+            game_server = GameServer(ThreadPoolExecutor(1))
+            query = {"type": "score", "hand": [16, 17, 18, 43], "cut": 19}
+            result = await game_server.handle_request("POST", "/analyze",
+              {"queries": [query, query]})
+            game_server._bot_executor.shutdown()
+            return result
+
+        status, response = asyncio.run(analyze())
+
+        # Four fives and a jack of the cut's suit
+        self.assertEqual(status, 200)
+        self.assertEqual(response["results"], [{"score": 29}, {"score": 29}])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(cribbageserver.get_percentile(values, 50), 50)
+        self.assertEqual(cribbageserver.get_percentile(values, 99), 99)
+        self.assertEqual(cribbageserver.get_percentile([], 99), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
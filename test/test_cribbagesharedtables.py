@@ -0,0 +1,129 @@
+"""
+Unit testing class for the shared lookup tables
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagesharedtables
+from cribbagesharedtables import SharedTables
+
+cribbagesharedtables.register_table("test_squares", lambda: np.arange(100) ** 2)
+
+def get_worker_table():
+    """Gets the attached block name and a copy of the table on a worker."""
+    block = cribbagesharedtables._attached_blocks.get("test_squares")  # pylint: disable=protected-access
+    return block.name if block else None, cribbagesharedtables.get_table("test_squares").copy()
+
+class TestCribbageSharedTables(unittest.TestCase):
+    def test_local_table(self):
+        table = cribbagesharedtables.get_table("test_squares")
+
+        self.assertIs(cribbagesharedtables.get_table("test_squares"), table)
+        self.assertEqual(table[7], 49)
+        self.assertFalse(table.flags.writeable)
+        with self.assertRaises(KeyError):
+            cribbagesharedtables.get_table("test_missing")
+
+    def test_workers_attach(self):
+        with SharedTables(["test_squares"]) as manifest:
+            block_name = manifest["test_squares"][0]
+            self.assertTrue(block_name.startswith(f"cribbage_{os.getpid()}_"))
+            with multiprocessing.Pool(2, cribbagesharedtables.attach_tables,
+              (manifest,)) as pool:
+                results = pool.starmap(get_worker_table, [()] * 2)
+
+            for attached_name, table in results:
+                self.assertEqual(attached_name, block_name)
+                np.testing.assert_array_equal(table, np.arange(100) ** 2)
+            self.assertFalse(cribbagesharedtables.get_table("test_squares").flags.writeable)
+
+        # The block is gone, and lookups build a private table again
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(block_name)
+        self.assertEqual(cribbagesharedtables.get_table("test_squares")[9], 81)
+
+    def test_nested_blocks(self):
+        with SharedTables(["test_squares"]) as outer_manifest:
+            with SharedTables(["test_squares"]) as inner_manifest:
+                self.assertNotEqual(inner_manifest["test_squares"][0],
+                  outer_manifest["test_squares"][0])
+                self.assertEqual(cribbagesharedtables.get_table("test_squares")[3], 9)
+            self.assertEqual(cribbagesharedtables.get_table("test_squares")[4], 16)
+
+        for manifest in (outer_manifest, inner_manifest):
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(manifest["test_squares"][0])
+
+    def test_failed_publish_unlinks_blocks(self):
+        if not os.path.isdir(cribbagesharedtables.SHARED_MEMORY_DIR):
+            self.skipTest("no shared memory directory")
+        with self.assertRaises(KeyError):
+            with SharedTables(["test_squares", "test_missing"]):
+                pass
+
+        self.assertEqual([block_name for block_name
+          in os.listdir(cribbagesharedtables.SHARED_MEMORY_DIR)
+          if block_name.startswith(f"cribbage_{os.getpid()}_")], [])
+
+    def test_table_readable_after_block_ends(self):
+        with SharedTables(["test_squares"]):
+            table = cribbagesharedtables.get_table("test_squares")
+            tail = table[90:]
+
+        # The views keep the unlinked block mapped until they are dropped
+        self.assertEqual(int(table.sum()), sum(square ** 2 for square in range(100)))
+        np.testing.assert_array_equal(tail, np.arange(90, 100) ** 2)
+        self.assertIsNot(cribbagesharedtables.get_table("test_squares"), table)
+
+    def test_lookups_after_shared_tables_close(self):
+        import cribbagetabular  # pylint: disable=import-outside-toplevel
+        import cribbagewinprob  # pylint: disable=import-outside-toplevel
+        policy = cribbagetabular.load_policy()
+        state = next(iter(policy))
+
+        with SharedTables(["win_probability", "tabular_policy"]):
+            shared_probability = float(cribbagewinprob.load_win_table()[0, 0])
+            shared_policy = cribbagetabular.SharedPolicy()
+            self.assertEqual(shared_policy.get(state), policy[state])
+
+        # Nothing kept a view of the unlinked blocks
+        self.assertEqual(float(cribbagewinprob.load_win_table()[0, 0]), shared_probability)
+        self.assertEqual(shared_policy.get(state), policy[state])
+
+    def test_clean_stale_blocks(self):
+        if not os.path.isdir(cribbagesharedtables.SHARED_MEMORY_DIR):
+            self.skipTest("no shared memory directory")
+        process = multiprocessing.Process(target=int)
+        process.start()
+        process.join()
+        stale_name = f"cribbage_{process.pid}_0_test_squares"
+        live_name = f"cribbage_{os.getpid()}_999_test_squares"
+        for block_name in (stale_name, live_name):
+            with open(os.path.join(cribbagesharedtables.SHARED_MEMORY_DIR, block_name), "wb"):
+                pass
+
+        try:
+            with self.assertLogs(level="WARNING"):
+                self.assertEqual(cribbagesharedtables.clean_stale_blocks(), [stale_name])
+            self.assertTrue(os.path.exists(os.path.join(cribbagesharedtables.SHARED_MEMORY_DIR,
+              live_name)))
+        finally:
+            os.unlink(os.path.join(cribbagesharedtables.SHARED_MEMORY_DIR, live_name))
+
+    def test_memory_usage(self):
+        usage = cribbagesharedtables.get_memory_usage()
+        if not usage:
+            self.skipTest("no /proc")
+        self.assertGreater(usage["VmRSS"], 0)
+        self.assertEqual(set(usage), set(cribbagesharedtables.MEMORY_FIELDS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Unit testing class for the tabular pegging player
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbageaicli
+import cribbagetabular
+from cribbagetabular import PeggingQTable
+from cribbagetabular import TabularPeggingPlayer
+from cribbageengine import CribbageEngine
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+from cribbageplayers import OptimizedPlayer
+
+class TestCribbageTabular(unittest.TestCase):
+    def test_pack_state_is_unique(self):
+        states = {
+          cribbagetabular.pack_state([], 0, [0, 4], cribbagetabular.GO_NONE),
+          cribbagetabular.pack_state([0], 1, [4], cribbagetabular.GO_NONE),
+          cribbagetabular.pack_state([0], 1, [4], cribbagetabular.GO_OPPONENT),
+          cribbagetabular.pack_state([0], 1, [0, 4], cribbagetabular.GO_NONE),
+          cribbagetabular.pack_state([9, 0], 11, [4], cribbagetabular.GO_NONE)}
+
+        self.assertEqual(len(states), 5)
+
+    def test_policy_keeps_best_rank(self):
+        q_table = PeggingQTable()
+        state = cribbagetabular.pack_state([9], 10, [3, 4], cribbagetabular.GO_NONE)
+        q_table.update(state << cribbagetabular.RANK_BITS | 3, 1)
+        q_table.update(state << cribbagetabular.RANK_BITS | 4, 2)
+        q_table.update(state << cribbagetabular.RANK_BITS | 4, 0)
+        q_table.update(state << cribbagetabular.RANK_BITS | 4, 3)
+
+        self.assertEqual(q_table.get_policy(), {state: 4})
+        self.assertEqual(q_table.get_policy(2), {state: 4})
+        self.assertEqual(q_table.choose_rank(state, [3, 4], random.Random(1), 0), 4)
+
+    def test_save_and_load_policy(self):
+        policy = cribbagetabular.train_q_table(200).get_policy()
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, "policy.npz")
+            cribbagetabular.save_policy(policy, path)
+            self.assertEqual(cribbagetabular.load_policy(path), policy)
+
+    def test_shared_policy_matches_file(self):
+        policy = cribbagetabular.load_policy()
+        shared_policy = cribbagetabular.SharedPolicy()
+
+        for state in list(policy)[::997]:
+            self.assertEqual(shared_policy.get(state), policy[state])
+        self.assertIsNone(shared_policy.get(max(policy) + 1))
+
+    def test_takes_the_fifteen(self):
+        player = TabularPeggingPlayer()
+        player.start_round(False, 0, 0)
+        player_run_hand = {
+          PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.TWO, 2)}
+
+        run_card = player.get_run_card(player_run_hand, [PlayingCard(Suit.HEART, Face.KING, 10)], 10)
+
+        self.assertEqual(run_card, PlayingCard(Suit.CLUB, Face.FIVE, 5))
+
+    def test_observe_go(self):
+        player = TabularPeggingPlayer()
+        player.start_round(False, 0, 0)
+
+        player.observe_run_play(False, None)
+        self.assertEqual(player._go_caller, False)
+        player.observe_run_play(True, PlayingCard(Suit.CLUB, Face.ACE, 1))
+        self.assertEqual(player._go_caller, False)
+        player.observe_run_play(True, None)
+        self.assertIsNone(player._go_caller)
+
+    def test_full_game(self):
+        random.seed(5)
+        cribbage_game = CribbageEngine().new_game(TabularPeggingPlayer(), OptimizedPlayer())
+
+        player_one_score, player_two_score = cribbageaicli.run_game(cribbage_game, False)
+
+        self.assertTrue(max(player_one_score, player_two_score) >= 121)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Unit testing class for the tournament runner and its coordinator
+"""
+
+import asyncio
+import multiprocessing
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagetournament
+from cribbagetournament import TournamentCoordinator
+from cribbagetournament import TournamentResult
+
+PLAYER_NAMES = ["optimized", "random"]
+
+class TestCribbageTournament(unittest.TestCase):
+    def test_split_seed_ranges(self):
+        self.assertEqual(cribbagetournament.split_seed_ranges(1, 7, 3),
+          [(1, 3), (4, 3), (7, 1)])
+
+    def test_results_merge(self):
+        result = cribbagetournament.play_seed_range(PLAYER_NAMES, 1, 2)
+        result.merge(cribbagetournament.play_seed_range(PLAYER_NAMES, 3, 2))
+
+        self.assertEqual(result, cribbagetournament.play_seed_range(PLAYER_NAMES, 1, 4))
+        self.assertEqual(result, TournamentResult.from_dict(result.to_dict()))
+        self.assertEqual(sum(result.wins), 4)
+
+    def test_seed_range_ignores_hash_seed(self):
+        script = ("import json, sys; sys.path.append('cribbageai'); import cribbagetournament; "
+          "print(json.dumps([cribbagetournament.play_seed_range(players, 1, 6).to_dict() "
+          "for players in (['optimized', 'tabular'], ['random', 'optimized'])]))")
+        results = []
+        for hash_seed in ("1", "2", "3"):
+            completed = subprocess.run([sys.executable, "-c", script], capture_output=True,
+              text=True, check=True, env=dict(os.environ, PYTHONHASHSEED=hash_seed))
+            results.append(json.loads(completed.stdout.splitlines()[-1]))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+    def test_thread_pool_matches_seed_ranges(self):
+        result = cribbagetournament.run_tournament_threads(PLAYER_NAMES, 6, threads=3,
+          range_size=2)
+
+        self.assertEqual(result, cribbagetournament.play_seed_range(PLAYER_NAMES, 1, 6))
+        self.assertIsInstance(cribbagetournament.is_gil_enabled(), bool)
+
+    def test_local_workers_with_a_stalled_worker(self):
+        async def coordinate():
+            coordinator = TournamentCoordinator(PLAYER_NAMES, 6, range_size=2, lease_seconds=1.0)
+            port = await coordinator.start("127.0.0.1", 0)
+
+            # A worker that takes a range and never finishes it
+            _, stalled_writer = await asyncio.open_connection("127.0.0.1", port)
+            stalled_writer.write(b'{"op": "ready"}\n')
+            await stalled_writer.drain()
+            await asyncio.sleep(0.2)
+
+            workers = [multiprocessing.Process(target=cribbagetournament.run_worker,
+              args=("127.0.0.1", port)) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            result = await asyncio.wait_for(coordinator.wait_finished(), 120)
+            for worker in workers:
+                await asyncio.get_running_loop().run_in_executor(None, worker.join, 30)
+            stalled_writer.close()
+            return result, coordinator.reassigned_count
+
+        result, reassigned_count = asyncio.run(coordinate())
+
+        self.assertEqual(result, cribbagetournament.play_seed_range(PLAYER_NAMES, 1, 6))
+        self.assertGreaterEqual(reassigned_count, 1)
+
+    def test_disconnected_worker_range_is_requeued(self):
+        coordinator = TournamentCoordinator(PLAYER_NAMES, 4, range_size=2)
+        first_range = coordinator.get_next_range(0.0)
+        coordinator.release_range(first_range)
+
+        self.assertEqual(coordinator.get_next_range(1.0), first_range)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit testing class for the pegging weight tuner
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagearena
+import cribbageplayers
+import cribbagetuning
+from cribbagetuning import WeightTuner
+
+class TestCribbageTuning(unittest.TestCase):
+    def test_default_weights_match_the_default_player(self):
+        result = cribbagetuning.play_weight_games(cribbageplayers.DEFAULT_PEGGING_WEIGHTS, 1, 4)
+
+        # Each seed is played from both seats, so equal players come out even
+        self.assertEqual(result.games, 8)
+        self.assertEqual(result.wins, [4, 4])
+        self.assertEqual(cribbagetuning.get_fitness(result), 0)
+        self.assertEqual(result, cribbagetuning.play_weight_games(
+          cribbageplayers.DEFAULT_PEGGING_WEIGHTS, 1, 4))
+
+    def test_checkpoint_resumes_the_search(self):
+        with tempfile.TemporaryDirectory() as directory, multiprocessing.Pool(1) as pool:
+            checkpoint_path = os.path.join(directory, "checkpoint.json")
+            config_path = os.path.join(directory, "player.json")
+            tuner = WeightTuner(population_size=3, elite_count=2, games=2, validation_games=2)
+            cribbagetuning.run_tuning(tuner, 1, 1, checkpoint_path, config_path)
+
+            resumed = WeightTuner.load_checkpoint(checkpoint_path)
+            self.assertEqual(resumed.to_dict(), tuner.to_dict())
+            self.assertEqual(resumed.sample_population(), tuner.sample_population())
+
+            fitness = resumed.step(pool)
+            self.assertEqual(len(fitness), 3)
+            self.assertEqual(resumed.generation, 2)
+            self.assertEqual(len(resumed.history), 2)
+            self.assertEqual(resumed.best_fitness,
+              max(entry["validated"] for entry in resumed.history))
+
+            player = cribbagetuning.load_player_config(config_path)()
+            self.assertIsInstance(player, cribbageplayers.OptimizedPlayer)
+            self.assertEqual(player.pegging_weights, tuner.best_weights)
+            self.assertEqual(cribbagearena.load_player_factory(config_path)().pegging_weights,
+              tuner.best_weights)
+
+    def test_best_weights_are_picked_on_held_out_seeds(self):
+        with multiprocessing.Pool(1) as pool:
+            tuner = WeightTuner(population_size=3, elite_count=2, games=2, validation_games=3)
+            tuner.step(pool)
+
+        # The held-out seeds follow the two seeds the search plays
+        self.assertEqual(tuner.validation_seed, 3)
+        held_out = cribbagetuning.get_fitness(
+          cribbagetuning.play_weight_games(tuner.best_weights, 3, 3))
+        self.assertEqual(tuner.best_fitness, held_out)
+        self.assertEqual(tuner.history[0]["validated"], held_out)
+        with self.assertRaises(ValueError):
+            WeightTuner(games=10, validation_seed=5)
+
+    def test_population_starts_with_the_mean(self):
+        tuner = WeightTuner(population_size=4)
+        population = tuner.sample_population()
+
+        self.assertEqual(len(population), 4)
+        self.assertEqual(population[0], cribbageplayers.DEFAULT_PEGGING_WEIGHTS)
+        with self.assertRaises(ValueError):
+            WeightTuner(population_size=2, elite_count=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Unit testing class for the win probability tables
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.getcwd() + "/cribbageai")
+import cribbagecompact
+import cribbagedistribution
+import cribbagewinprob
+from cribbagewinprob import RoundPoints
+from cribbageengine import PlayingCard
+from cribbageengine import Face
+from cribbageengine import Suit
+
+class TestCribbageWinProbability(unittest.TestCase):
+    def setUp(self):
+        # Each round the dealer pegs 1 and the pone pegs 0 or 2, the pone
+        # shows 4 and the dealer shows 4 or 10.
+        self.round_points = RoundPoints()
+        self.round_points.add_round(1, 0, 4, 4)
+        self.round_points.add_round(1, 2, 4, 10)
+
+    def test_table_is_probability(self):
+        table = cribbagewinprob.solve_win_table(self.round_points, 31)
+
+        self.assertEqual(table.shape, (31, 31))
+        self.assertTrue(((table >= 0) & (table <= 1)).all())
+
+    def test_pone_one_point_from_winning(self):
+        table = cribbagewinprob.solve_win_table(self.round_points, 31)
+
+        # The pone always shows 4, so it wins before the dealer can count
+        self.assertAlmostEqual(float(table[27, 30]), 0.0)
+        self.assertAlmostEqual(cribbagewinprob.win_probability(table, 30, 27, False), 1.0)
+
+    def test_dealer_one_point_from_winning(self):
+        table = cribbagewinprob.solve_win_table(self.round_points, 31)
+
+        # The dealer pegs 1 every round, the pone can't reach 31 from 0
+        self.assertAlmostEqual(float(table[30, 0]), 1.0)
+        self.assertAlmostEqual(cribbagewinprob.win_probability(table, 30, 0, True), 1.0)
+
+    def test_measure_round_points(self):
+        round_points = cribbagewinprob.measure_round_points(3, 1)
+
+        self.assertEqual(round_points.get_round_count(), 3)
+        self.assertEqual(round_points.pegging.sum(), 3)
+
+    def test_shipped_table(self):
+        table = cribbagewinprob.load_win_table()
+
+        self.assertEqual(table.shape, (121, 121))
+        self.assertGreater(cribbagewinprob.win_probability(table, 0, 0, True), 0.5)
+        self.assertGreater(cribbagewinprob.win_probability(table, 110, 60, False), 0.9)
+
+    def test_round_win_probabilities_match_table(self):
+        table = cribbagewinprob.solve_win_table(self.round_points, 31)
+        pone_show = self.round_points.pone_show / self.round_points.pone_show.sum()
+        dealer_show = self.round_points.dealer_show / self.round_points.dealer_show.sum()
+
+        # With no crib points the dealer's hand is the whole dealer show, so
+        # playing out the round lands on the table itself
+        for player_score, opponent_score in ((0, 0), (20, 25), (29, 27), (30, 30)):
+            self.assertAlmostEqual(cribbagewinprob.round_win_probabilities(table,
+              self.round_points, player_score, opponent_score, True, [dealer_show])[0],
+              cribbagewinprob.win_probability(table, player_score, opponent_score, True))
+            self.assertAlmostEqual(cribbagewinprob.round_win_probabilities(table,
+              self.round_points, player_score, opponent_score, False, [pone_show])[0],
+              cribbagewinprob.win_probability(table, player_score, opponent_score, False))
+            # So does a crib that never scores
+            self.assertAlmostEqual(cribbagewinprob.round_win_probabilities(table,
+              self.round_points, player_score, opponent_score, False, [pone_show], [[1.0]])[0],
+              cribbagewinprob.win_probability(table, player_score, opponent_score, False))
+
+    def test_round_win_probabilities_follow_crib(self):
+        table = cribbagewinprob.load_win_table()
+        round_points = cribbagewinprob.load_round_points()
+        # Two fives, a king, a nine, an ace and a three
+        hand = [16, 19, 48, 32, 1, 10]
+        crib_distributions = cribbagedistribution.crib_score_distributions(hand)
+        fives_crib = crib_distributions[cribbagecompact.DISCARD_OPTIONS.index((0, 1))]
+        king_nine_crib = crib_distributions[cribbagecompact.DISCARD_OPTIONS.index((2, 3))]
+        hand_distribution = [0.0] * 8 + [1.0]
+
+        for is_dealer in (True, False):
+            fives, king_nine = cribbagewinprob.round_win_probabilities(table, round_points,
+              100, 108, is_dealer, [hand_distribution] * 2, [fives_crib, king_nine_crib])
+            # The fives help the dealer's crib, whoever threw them
+            if is_dealer:
+                self.assertGreater(fives, king_nine)
+            else:
+                self.assertLess(fives, king_nine)
+
+    def test_shipped_round_points(self):
+        round_points = cribbagewinprob.load_round_points()
+
+        self.assertEqual(round_points.get_round_count(), round_points.crib.sum())
+        self.assertLess(round_points.crib.dot(range(len(round_points.crib))),
+          round_points.dealer_show.dot(range(len(round_points.dealer_show))))
+
+    def test_endgame_discard(self):
+        player = cribbagewinprob.EndgamePlayer()
+        player.start_round(False, 115, 100)
+        player_hand = {
+          PlayingCard(Suit.CLUB, Face.FIVE, 5),
+          PlayingCard(Suit.SPADE, Face.TEN, 10),
+          PlayingCard(Suit.HEART, Face.ACE, 1),
+          PlayingCard(Suit.DIAMOND, Face.THREE, 3),
+          PlayingCard(Suit.SPADE, Face.NINE, 9),
+          PlayingCard(Suit.HEART, Face.KING, 10)}
+
+        discards = player.discard_to_crib(player_hand)
+
+        self.assertEqual(len(discards), 2)
+        self.assertEqual(len(player_hand), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()